@@ -0,0 +1,26 @@
+"""add sentence_video_cache_key to sentences
+
+Revision ID: 028_add_sentence_video_cache_key
+Revises: 027_add_generation_history_table
+Create Date: 2026-01-05 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '028'
+down_revision = '027'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 添加渲染输入哈希字段到 sentences 表（内容寻址的单句视频缓存键）
+    op.add_column('sentences', sa.Column('sentence_video_cache_key', sa.String(length=64), nullable=True, comment='单句视频渲染输入哈希（内容寻址缓存键）'))
+
+
+def downgrade():
+    # 移除渲染输入哈希字段
+    op.drop_column('sentences', 'sentence_video_cache_key')
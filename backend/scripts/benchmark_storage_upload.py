@@ -0,0 +1,86 @@
+"""
+MinIO小文件上传基准测试
+
+上传大量小对象，统计总耗时、吞吐量以及每类存储操作的耗时和次数，
+用于确认存储桶检查只发生一次，不再占用每次上传的网络往返。
+
+使用方法:
+python scripts/benchmark_storage_upload.py
+python scripts/benchmark_storage_upload.py --count 1000 --size 2048 --concurrency 32
+python scripts/benchmark_storage_upload.py --check-every-upload  # 对比：每次上传前都检查存储桶
+"""
+
+import argparse
+import asyncio
+import io
+import sys
+import time
+from pathlib import Path
+
+from fastapi import UploadFile
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.storage import MinIOStorage
+
+
+async def run_benchmark(count: int, size: int, concurrency: int, check_every_upload: bool):
+    """
+    上传 count 个 size 字节的对象
+
+    Args:
+        count: 对象数量
+        size: 每个对象的大小（字节）
+        concurrency: 并发上传数
+        check_every_upload: 每次上传前使存储桶状态失效（模拟旧行为）
+    """
+    storage = MinIOStorage()
+    semaphore = asyncio.Semaphore(concurrency)
+    payload = b"x" * size
+    object_keys = []
+
+    async def upload(index: int):
+        async with semaphore:
+            if check_every_upload:
+                storage.invalidate_bucket()
+            result = await storage.upload_file(
+                user_id="benchmark",
+                file=UploadFile(filename=f"{index}.bin", file=io.BytesIO(payload)),
+                object_key=f"benchmark/storage_upload/{index}.bin",
+            )
+            object_keys.append(result["object_key"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*[upload(i) for i in range(count)])
+    elapsed = time.perf_counter() - started
+
+    print(f"上传 {count} 个 {size} 字节对象，并发 {concurrency}")
+    print(f"总耗时: {elapsed:.2f}s，吞吐量: {count / elapsed:.1f} 个/秒，平均: {elapsed / count * 1000:.2f}ms/个")
+    for operation, stats in sorted(storage.get_latency_stats().items()):
+        print(f"  {operation:<14} 次数={stats['count']:<6} 失败={stats['errors']:<4} "
+              f"平均={stats['avg_ms']}ms 最大={stats['max_ms']}ms")
+
+    # 清理测试对象
+    await asyncio.gather(*[storage.delete_file(key) for key in object_keys])
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="MinIO小文件上传基准测试")
+    parser.add_argument("--count", type=int, default=1000, help="上传对象数量 (默认1000)")
+    parser.add_argument("--size", type=int, default=1024, help="每个对象的大小，字节 (默认1024)")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发上传数 (默认32)")
+    parser.add_argument(
+        "--check-every-upload",
+        action="store_true",
+        help="每次上传前都检查存储桶（用于与旧行为对比）"
+    )
+
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.count, args.size, args.concurrency, args.check_every_upload))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.config import settings
 from src.core.database import get_db
 from src.core.logging import logger
+from src.utils.distributed_rate_limiter import distributed_rate_limiter
+from src.utils.llm_cache import llm_cache
+from src.utils.rate_limiter import provider_rate_limiter
 
 router = APIRouter()
 
@@ -166,6 +169,17 @@ async def system_health():
         raise HTTPException(status_code=503, detail="系统信息获取失败")
 
 
+@router.get("/providers")
+async def provider_rate_limit_stats():
+    """第三方API限流统计（当前进程内每个 provider:key哈希:model 的并发上限、吞吐量和限流次数）及LLM缓存命中率"""
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "limiters": provider_rate_limiter.get_stats(),
+        "distributed": distributed_rate_limiter.get_stats(),
+        "llm_cache": llm_cache.get_stats(),
+    }
+
+
 @router.get("/detailed")
 async def detailed_health_check():
     """详细健康检查"""
@@ -98,6 +98,7 @@ class FileListResponse(PaginatedResponse):
     """文件列表响应模型"""
     files: List[FileInfo] = Field(..., description="文件列表")
     orphaned_count: int = Field(0, description="孤立文件数量")
+    next_token: Optional[str] = Field(None, description="下一页的续页令牌，最后一页时为空")
 
     model_config = {
         "json_schema_extra": {
@@ -170,6 +171,23 @@ class FileCleanupResponse(BaseModel):
     }
 
 
+class FileCleanupTaskResponse(BaseModel):
+    """后台文件清理任务提交响应模型"""
+    success: bool = Field(True, description="是否提交成功")
+    message: str = Field(..., description="响应消息")
+    task_id: str = Field(..., description="Celery任务ID，用于查询进度")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "success": True,
+                "message": "孤立文件清理任务已提交",
+                "task_id": "b3c5f3a2-6f0e-4d5c-9d1e-2f7a8c9b0d1e"
+            }
+        }
+    }
+
+
 class FileStorageUsageResponse(BaseModel):
     """存储使用情况响应模型"""
     success: bool = Field(True, description="查询是否成功")
@@ -344,6 +362,7 @@ __all__ = [
     "FileListResponse",
     "FileDeleteResponse",
     "FileCleanupResponse",
+    "FileCleanupTaskResponse",
     "FileStorageUsageResponse",
     "FileBatchDeleteResponse",
     "FileIntegrityCheckResult",
@@ -12,6 +12,7 @@ from src.utils.storage import storage_client
 class ScriptGenerateRequest(BaseModel):
     api_key_id: str
     model: Optional[str] = None
+    refresh: bool = False  # 忽略LLM缓存重新提取
 
 class ShotExtractRequest(BaseModel):
     """分镜提取请求"""
@@ -156,6 +157,7 @@ class MovieCharacterBase(BaseModel):
 class CharacterExtractRequest(BaseModel):
     api_key_id: str
     model: Optional[str] = None
+    refresh: bool = False  # 忽略LLM缓存重新提取
 
 class CharacterUpdateRequest(BaseModel):
     avatar_url: Optional[str] = None
@@ -194,6 +196,7 @@ class ShotUpdateRequest(BaseModel):
 class StoryboardExtractRequest(BaseModel):
     api_key_id: str
     model: Optional[str] = None
+    refresh: bool = False  # 忽略LLM缓存重新提取
 
 class TransitionGenerateRequest(BaseModel):
     api_key_id: str
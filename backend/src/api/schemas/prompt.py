@@ -17,6 +17,7 @@ class PromptGenerateRequest(BaseModel):
     style: str = Field("cinematic", description="风格预设")
     model: Optional[str] = Field(None, description="模型名称")
     custom_prompt: Optional[str] = Field(None, description="自定义系统提示词")
+    refresh: bool = Field(False, description="忽略LLM缓存重新生成")
 
     model_config = {
         "json_schema_extra": {
@@ -33,6 +33,8 @@ class VideoTaskCreate(BaseModel):
                     "zoom_speed": 0.0005,
                     "video_speed": 1.0,
                     "llm_model": "gpt-4o-mini",
+                    "subtitle_renderer": "drawtext",
+                    "subtitle_timing": "asr",
                     "subtitle_style": {
                         "font": "Arial",
                         "font_size": 70,
@@ -11,14 +11,17 @@ from src.api.dependencies import get_current_user_required
 from src.core.database import get_db
 from src.core.logging import get_logger
 from src.models.user import User
+from src.services.file_cleanup_service import FileCleanupService
 from src.services.project import ProjectService
 from src.utils.file_handlers import FileHandler, FileProcessingError
 from src.utils.storage import get_storage_client
+from src.utils.storage_usage import storage_usage
 from src.api.schemas.file import (
     FileUploadResult,
     FileInfo,
     FileListResponse,
     FileCleanupResponse,
+    FileCleanupTaskResponse,
     FileStorageUsageResponse,
     FileBatchDeleteResponse,
     FileIntegrityCheckResponse,
@@ -95,7 +98,9 @@ async def cleanup_orphaned_files(
         older_than_days: int = Query(7, ge=1, description="清理多少天前的孤立文件")
 ):
     """
-    清理孤立文件（没有关联项目的文件）
+    清理孤立文件（未被项目、章节、句子、电影等任何记录引用的文件）
+
+    对象多时请使用 POST /cleanup/orphaned/tasks 在后台执行
 
     Args:
         current_user: 当前用户
@@ -106,88 +111,65 @@ async def cleanup_orphaned_files(
     Returns:
         清理结果
     """
-    from datetime import datetime, timedelta, timezone
-
-    storage_client = await get_storage_client()
-    project_service = ProjectService(db)
-
-    # 获取用户的所有项目
-    projects, _ = await project_service.get_owner_projects(
-        owner_id=current_user.id,
-        page=1,
-        size=1000  # 获取大量项目以检查关联
+    cleanup_service = FileCleanupService(db)
+    result = await cleanup_service.cleanup_orphaned_files(
+        user_id=current_user.id,
+        older_than_days=older_than_days,
+        dry_run=dry_run,
     )
 
-    # 收集所有项目关联的文件对象键
-    project_object_keys = set()
-    for project in projects:
-        if project.file_path:
-            project_object_keys.add(project.file_path)
-
-    # 获取用户上传目录下的所有文件
-    user_prefix = f"uploads/{current_user.id}/"
-    all_files = await storage_client.list_files(prefix=user_prefix, limit=1000)
-
-    # 找出孤立文件
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=older_than_days)
-    orphaned_files = []
-
-    for file_info in all_files:
-        object_key = file_info['object_key']
-
-        # 跳过项目关联的文件
-        if object_key in project_object_keys:
-            continue
-
-        # 检查文件时间
-        if file_info.get('last_modified'):
-            try:
-                file_date = datetime.fromisoformat(file_info['last_modified'].replace('Z', '+00:00'))
-                if file_date >= cutoff_date:
-                    continue
-            except ValueError:
-                logger.warning(f"无法解析文件时间: {file_info['last_modified']}")
-
-        orphaned_files.append(file_info)
-
-    # 如果不是试运行，执行删除
-    deleted_files = []
-    deleted_keys = []
-    if not dry_run:
-        for file_info in orphaned_files:
-            try:
-                success = await storage_client.delete_file(file_info['object_key'])
-                if success:
-                    deleted_files.append(file_info['object_key'])
-                    deleted_keys.append(file_info['object_key'])
-            except Exception as e:
-                logger.error(f"删除文件失败 {file_info['object_key']}: {e}")
-
-    total_size = sum(f.get('size', 0) for f in orphaned_files)
-    deleted_size = sum(f.get('size', 0) for f in orphaned_files if f['object_key'] in deleted_files)
-
     # 格式化文件详情
     files_details = [
         {
             "object_key": f['object_key'],
-            "size": f.get('size'),
-            "size_mb": round(f.get('size', 0) / (1024 * 1024), 2),
-            "last_modified": f.get('last_modified')
+            "size": f['size'],
+            "size_mb": round(f['size'] / (1024 * 1024), 2),
+            "last_modified": f['last_modified']
         }
-        for f in orphaned_files
+        for f in result["files"]
     ]
 
     return FileCleanupResponse(
         success=True,
         dry_run=dry_run,
-        found_orphaned_files=len(orphaned_files),
-        deleted_files=len(deleted_files),
-        total_size_mb=round(total_size / (1024 * 1024), 2),
-        deleted_size_mb=round(deleted_size / (1024 * 1024), 2),
+        found_orphaned_files=result["orphaned"],
+        deleted_files=result["deleted"],
+        total_size_mb=round(result["orphaned_bytes"] / (1024 * 1024), 2),
+        deleted_size_mb=round(result["deleted_bytes"] / (1024 * 1024), 2),
         files=files_details,
     )
 
 
+@router.post("/cleanup/orphaned/tasks", response_model=FileCleanupTaskResponse)
+async def start_cleanup_orphaned_files_task(
+        *,
+        current_user: User = Depends(get_current_user_required),
+        older_than_days: int = Query(7, ge=1, description="清理多少天前的孤立文件")
+):
+    """
+    在后台清理孤立文件
+
+    任务分页扫描并删除，进度通过 /tasks/{task_id} 查询；任务中断后重新提交会从上次的检查点继续
+
+    Args:
+        current_user: 当前用户
+        older_than_days: 清理多少天前的文件
+
+    Returns:
+        任务ID
+    """
+    from src.tasks.storage import cleanup_orphaned_files as cleanup_task
+
+    task = cleanup_task.delay(current_user.id, older_than_days)
+    logger.info(f"孤立文件清理任务已提交: user_id={current_user.id}, task_id={task.id}")
+
+    return FileCleanupTaskResponse(
+        success=True,
+        message="孤立文件清理任务已提交",
+        task_id=task.id,
+    )
+
+
 @router.get("/storage/usage", response_model=FileStorageUsageResponse)
 async def get_storage_usage(
         *,
@@ -210,33 +192,17 @@ async def get_storage_usage(
     # 获取项目统计信息
     stats = await project_service.get_project_statistics(current_user.id)
 
-    # 获取存储文件列表
-    user_prefix = f"uploads/{current_user.id}/"
-    files = await storage_client.list_files(prefix=user_prefix, limit=1000)
-
-    # 按文件类型统计
-    file_type_stats = {}
-    total_size = 0
-
-    for file_info in files:
-        file_size = file_info.get('size', 0)
-        total_size += file_size
-
-        # 从对象键推断文件类型
-        object_key = file_info['object_key']
-        if '.' in object_key.split('/')[-1]:
-            ext = object_key.split('.')[-1].lower()
-            if ext in file_type_stats:
-                file_type_stats[ext] += 1
-            else:
-                file_type_stats[ext] = 1
+    # 读取增量维护的存储用量（计数不存在时扫描一次上传目录重建）
+    usage = await storage_usage.get_or_rebuild(current_user.id, storage_client)
+    total_size = usage["size"]
+    file_type_stats = usage["file_types"]
 
     quota_limit_gb = 10.0  # 示例：10GB限制
     quota_usage_percent = round((total_size / (quota_limit_gb * 1024 * 1024 * 1024)) * 100, 2)
 
     return FileStorageUsageResponse(
         success=True,
-        total_files=len(files),
+        total_files=usage["files"],
         total_size_mb=round(total_size / (1024 * 1024), 2),
         total_size_gb=round(total_size / (1024 * 1024 * 1024), 2),
         file_type_distribution=file_type_stats,
@@ -253,7 +219,8 @@ async def list_user_files(
         db: AsyncSession = Depends(get_db),
         prefix: Optional[str] = Query(None, description="文件前缀过滤"),
         page: int = Query(1, ge=1, description="页码"),
-        size: int = Query(50, ge=1, le=200, description="每页大小")
+        size: int = Query(50, ge=1, le=200, description="每页大小"),
+        continuation_token: Optional[str] = Query(None, description="续页令牌（上一页返回的next_token，优先于页码）")
 ):
     """
     列出用户的文件
@@ -264,6 +231,7 @@ async def list_user_files(
         prefix: 文件前缀过滤
         page: 页码
         size: 每页大小
+        continuation_token: 续页令牌
 
     Returns:
         文件列表
@@ -274,16 +242,32 @@ async def list_user_files(
     user_prefix = f"uploads/{current_user.id}/"
     search_prefix = user_prefix + (prefix or "")
 
-    # 获取文件列表
-    files = await storage_client.list_files(prefix=search_prefix, limit=size * page)
+    # 按页码访问时逐页跳过前面的页（不生成预签名URL），推荐使用续页令牌连续翻页
+    token = continuation_token
+    exhausted = False
+    if not token:
+        for _ in range(page - 1):
+            skipped = await storage_client.list_objects_page(search_prefix, max_keys=size, continuation_token=token)
+            token = skipped["next_token"]
+            if not token:
+                exhausted = True
+                break
 
-    # 计算总数（简化处理）
-    total_files = len(files)
+    # 只为当前页生成预签名URL
+    if exhausted:
+        result = {"files": [], "next_token": None}
+    else:
+        result = await storage_client.list_objects_page(
+            search_prefix, max_keys=size, continuation_token=token, sign_urls=True
+        )
+    paginated_files = result["files"]
 
-    # 分页处理
-    start_index = (page - 1) * size
-    end_index = start_index + size
-    paginated_files = files[start_index:end_index]
+    # 计算总数：未过滤前缀时使用存储用量计数，否则为已遍历到的数量
+    if prefix:
+        total_files = (page - 1) * size + len(paginated_files)
+    else:
+        usage = await storage_usage.get_or_rebuild(current_user.id, storage_client)
+        total_files = usage["files"]
 
     # 清理文件信息
     cleaned_files = []
@@ -293,7 +277,7 @@ async def list_user_files(
             "filename": file_info['object_key'].split('/')[-1],
             "size": file_info.get('size'),
             "size_mb": round(file_info.get('size', 0) / (1024 * 1024), 2),
-            "last_modified": file_info.get('last_modified'),
+            "last_modified": file_info['last_modified'].isoformat() if file_info.get('last_modified') else None,
             "url": file_info.get('url'),
             "is_orphaned": True  # 需要进一步检查是否关联到项目
         })
@@ -325,6 +309,7 @@ async def list_user_files(
         size=size,
         total_pages=total_pages,
         orphaned_count=orphaned_count,
+        next_token=result["next_token"],
     )
 
 
@@ -359,7 +344,9 @@ async def batch_delete_files(
         )
 
     storage_client = await get_storage_client()
-    project_service = ProjectService(db)
+
+    # 仍被数据库记录引用的文件受保护（一次查询取出全部引用）
+    referenced_keys = await FileCleanupService(db).get_referenced_keys(current_user.id)
 
     # 检查权限并过滤
     user_prefix = f"uploads/{current_user.id}/"
@@ -372,37 +359,15 @@ async def batch_delete_files(
             logger.warning(f"用户 {current_user.id} 尝试删除不属于自己的文件: {object_key}")
             continue
 
-        # 检查文件是否关联到项目
-        projects, _ = await project_service.get_owner_projects(
-            owner_id=current_user.id,
-            page=1,
-            size=1000
-        )
-
-        is_protected = False
-        for project in projects:
-            if project.file_path == object_key:
-                is_protected = True
-                protected_keys.append(object_key)
-                break
-
-        if not is_protected:
+        if object_key in referenced_keys:
+            protected_keys.append(object_key)
+        else:
             valid_keys.append(object_key)
 
-    # 执行删除
-    deleted_keys = []
-    failed_keys = []
-
-    for object_key in valid_keys:
-        try:
-            success = await storage_client.delete_file(object_key)
-            if success:
-                deleted_keys.append(object_key)
-            else:
-                failed_keys.append(object_key)
-        except Exception as e:
-            logger.error(f"删除文件失败 {object_key}: {e}")
-            failed_keys.append(object_key)
+    # 执行删除（多对象删除，一次请求）
+    result = await storage_client.delete_files(valid_keys)
+    deleted_keys = result["deleted"]
+    failed_keys = result["failed"]
 
     return FileBatchDeleteResponse(
         success=True,
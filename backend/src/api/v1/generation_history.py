@@ -39,14 +39,14 @@ async def get_generation_history(
     storage_client = await get_storage_client()
     results = []
     
+    signed_urls = storage_client.sign_many(
+        (history.result_url for history in histories),
+        expires=timedelta(hours=24)
+    )
+    
     for history in histories:
         # 签名result_url
-        signed_url = history.result_url
-        if history.result_url and not history.result_url.startswith("http"):
-            signed_url = storage_client.get_presigned_url(
-                history.result_url,
-                expires=timedelta(hours=24)
-            )
+        signed_url = signed_urls.get(history.result_url, history.result_url)
         
         results.append(GenerationHistoryResponse(
             id=str(history.id),
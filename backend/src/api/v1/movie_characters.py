@@ -31,7 +31,7 @@ async def extract_characters(
 ):
     """从章节内容中提取角色（异步任务）"""
     from src.tasks.movie import movie_extract_characters
-    task = movie_extract_characters.delay(chapter_id, req.api_key_id, req.model)
+    task = movie_extract_characters.delay(chapter_id, req.api_key_id, req.model, req.refresh)
     return {"task_id": task.id, "message": "角色提取任务已提交"}
 
 @router.get("/projects/{project_id}/characters")
@@ -27,7 +27,7 @@ async def extract_scenes(
     注意：这里只提取场景，不提取分镜
     """
     from src.tasks.movie import movie_extract_scenes
-    task = movie_extract_scenes.delay(chapter_id, req.api_key_id, req.model)
+    task = movie_extract_scenes.delay(chapter_id, req.api_key_id, req.model, req.refresh)
     return {"task_id": task.id, "message": "场景提取任务已提交"}
 
 @router.get("/chapters/{chapter_id}/script", response_model=Optional[MovieScriptResponse])
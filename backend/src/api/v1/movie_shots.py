@@ -23,7 +23,7 @@ async def extract_shots(
 ):
     """从剧本的所有场景提取分镜（异步任务）"""
     from src.tasks.movie import movie_extract_shots
-    task = movie_extract_shots.delay(script_id, req.api_key_id, req.model)
+    task = movie_extract_shots.delay(script_id, req.api_key_id, req.model, req.refresh)
     return {"task_id": task.id, "message": "分镜提取任务已提交"}
 
 @router.post("/scripts/{script_id}/generate-keyframes", summary="生成剧本分镜关键帧")
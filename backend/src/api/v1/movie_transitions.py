@@ -44,16 +44,18 @@ async def get_transitions(
     
     storage_client = await get_storage_client()
     
+    # 批量转换video_url为presigned URL
+    try:
+        video_urls = storage_client.sign_many(
+            (t.video_url for t in transitions), expires=timedelta(hours=1)
+        )
+    except Exception as e:
+        logger.warning(f"获取视频URL失败: {e}")
+        video_urls = {t.video_url: t.video_url for t in transitions if t.video_url}
+    
     transition_list = []
     for t in transitions:
-        # 转换video_url为presigned URL
-        video_url = None
-        if t.video_url:
-            try:
-                video_url = storage_client.get_presigned_url(t.video_url, expires=timedelta(hours=1))
-            except Exception as e:
-                logger.warning(f"获取视频URL失败: {e}")
-                video_url = t.video_url
+        video_url = video_urls.get(t.video_url) if t.video_url else None
         
         transition_data = {
             "id": str(t.id),
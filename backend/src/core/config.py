@@ -85,6 +85,102 @@ class Settings(BaseSettings):
     MINIO_SECURE: bool = False
     MINIO_BUCKET_NAME: str = "aicg-files"
     MINIO_REGION: str = "us-east-1"
+    # 存储线程池大小：同时进行的MinIO请求上限（也是共享HTTP连接池的大小）
+    STORAGE_MAX_WORKERS: int = Field(default=32, env="STORAGE_MAX_WORKERS")
+    # 大文件传输：超过阈值的文件分片上传、按区间下载，分片大小与单个文件的并发分片数
+    STORAGE_MULTIPART_THRESHOLD: int = Field(default=64 * 1024 * 1024, env="STORAGE_MULTIPART_THRESHOLD")
+    STORAGE_MULTIPART_PART_SIZE: int = Field(default=16 * 1024 * 1024, env="STORAGE_MULTIPART_PART_SIZE")
+    STORAGE_TRANSFER_CONCURRENCY: int = Field(default=4, env="STORAGE_TRANSFER_CONCURRENCY")
+    # 预签名URL缓存：签名时间按窗口对齐，窗口内相同对象的URL直接复用
+    MINIO_PRESIGN_WINDOW_SECONDS: int = Field(default=300, env="MINIO_PRESIGN_WINDOW_SECONDS")
+    MINIO_PRESIGN_CACHE_MAX_ENTRIES: int = Field(default=100000, env="MINIO_PRESIGN_CACHE_MAX_ENTRIES")
+
+    # =============================================================================
+    # FFmpeg渲染配置
+    # =============================================================================
+    # 同时运行的FFmpeg进程上限，为空时按CPU核数自动计算
+    FFMPEG_MAX_CONCURRENCY: Optional[int] = Field(default=None, env="FFMPEG_MAX_CONCURRENCY")
+    # 句子渲染调度：并发渲染任务数与每个任务的编码线程数，为空时按CPU核数自动计算
+    RENDER_MAX_JOBS: Optional[int] = Field(default=None, env="RENDER_MAX_JOBS")
+    RENDER_THREADS_PER_JOB: Optional[int] = Field(default=None, env="RENDER_THREADS_PER_JOB")
+
+    # =============================================================================
+    # 句子视频渲染缓存配置
+    # =============================================================================
+    # 按渲染输入内容寻址的单句视频缓存，超过TTL未被访问的对象会被淘汰
+    RENDER_CACHE_TTL_DAYS: int = Field(default=30, env="RENDER_CACHE_TTL_DAYS")
+    # 缓存总大小上限（字节），超出时按最近访问时间淘汰，为空时不限制
+    RENDER_CACHE_MAX_BYTES: Optional[int] = Field(default=None, env="RENDER_CACHE_MAX_BYTES")
+    # 命中时刷新访问时间的最小间隔（小时），避免每次命中都写一次MinIO
+    RENDER_CACHE_TOUCH_INTERVAL_HOURS: int = Field(default=24, env="RENDER_CACHE_TOUCH_INTERVAL_HOURS")
+    # 缓存句子视频的并发下载数（与渲染阶段重叠进行）
+    CLIP_PREFETCH_CONCURRENCY: int = Field(default=8, env="CLIP_PREFETCH_CONCURRENCY")
+    # worker本地磁盘缓存目录，跨任务复用已下载的缓存视频，为空时禁用
+    LOCAL_CLIP_CACHE_DIR: Optional[str] = Field(default=None, env="LOCAL_CLIP_CACHE_DIR")
+    LOCAL_CLIP_CACHE_MAX_BYTES: int = Field(default=20 * 1024 * 1024 * 1024, env="LOCAL_CLIP_CACHE_MAX_BYTES")
+    # worker本地素材缓存目录（按对象键和ETag缓存图片、音频、过渡视频等），为空时禁用
+    LOCAL_MATERIAL_CACHE_DIR: Optional[str] = Field(default=None, env="LOCAL_MATERIAL_CACHE_DIR")
+    LOCAL_MATERIAL_CACHE_MAX_BYTES: int = Field(
+        default=50 * 1024 * 1024 * 1024, env="LOCAL_MATERIAL_CACHE_MAX_BYTES"
+    )
+
+    # =============================================================================
+    # 第三方API客户端配置
+    # =============================================================================
+    # 进程内共享的HTTP连接池：最大连接数、最多保持的空闲连接数与空闲连接保持时间（秒）
+    PROVIDER_HTTP_MAX_CONNECTIONS: int = Field(default=200, env="PROVIDER_HTTP_MAX_CONNECTIONS")
+    PROVIDER_HTTP_MAX_KEEPALIVE: int = Field(default=50, env="PROVIDER_HTTP_MAX_KEEPALIVE")
+    PROVIDER_HTTP_KEEPALIVE_EXPIRY: float = Field(default=60.0, env="PROVIDER_HTTP_KEEPALIVE_EXPIRY")
+    # 启用HTTP/2多路复用（需要安装h2，未安装时使用HTTP/1.1长连接）
+    PROVIDER_HTTP2: bool = Field(default=True, env="PROVIDER_HTTP2")
+
+    # =============================================================================
+    # 第三方API自适应限流配置
+    # =============================================================================
+    # 每个 (provider, api_key, model) 的并发上限：初始值、下限与上限，成功时逐步增加，收到429时减半
+    PROVIDER_CONCURRENCY_INITIAL: int = Field(default=8, env="PROVIDER_CONCURRENCY_INITIAL")
+    PROVIDER_CONCURRENCY_MIN: int = Field(default=1, env="PROVIDER_CONCURRENCY_MIN")
+    PROVIDER_CONCURRENCY_MAX: int = Field(default=32, env="PROVIDER_CONCURRENCY_MAX")
+    # 429响应未携带Retry-After时暂停新请求的秒数，以及服务端要求等待时间的上限（秒）
+    PROVIDER_THROTTLE_DEFAULT_WAIT: float = Field(default=2.0, env="PROVIDER_THROTTLE_DEFAULT_WAIT")
+    PROVIDER_THROTTLE_MAX_WAIT: float = Field(default=60.0, env="PROVIDER_THROTTLE_MAX_WAIT")
+    # 跨worker进程的分布式限流（Redis GCRA，按APIKey.id）：每分钟请求数与允许的突发请求数
+    PROVIDER_RATE_LIMIT_ENABLED: bool = Field(default=True, env="PROVIDER_RATE_LIMIT_ENABLED")
+    PROVIDER_RATE_LIMIT_PER_MINUTE: int = Field(default=600, env="PROVIDER_RATE_LIMIT_PER_MINUTE")
+    PROVIDER_RATE_LIMIT_BURST: int = Field(default=20, env="PROVIDER_RATE_LIMIT_BURST")
+    # 访问Redis限流状态的超时（秒），Redis无响应时超时后退回进程内限流
+    PROVIDER_RATE_LIMIT_REDIS_TIMEOUT: float = Field(default=0.5, env="PROVIDER_RATE_LIMIT_REDIS_TIMEOUT")
+    # 批量生成场景图/关键帧时同时处理的场景数（每个场景占用一个数据库会话），API并发由上面的限流器控制
+    MOVIE_SCENE_CONCURRENCY: int = Field(default=10, env="MOVIE_SCENE_CONCURRENCY")
+
+    # =============================================================================
+    # 提示词批量生成配置
+    # =============================================================================
+    # 多个句子打包为一次JSON请求，按估算token预算（输入+预计输出）和句子数分批
+    PROMPT_BATCH_ENABLED: bool = Field(default=True, env="PROMPT_BATCH_ENABLED")
+    PROMPT_BATCH_TOKEN_BUDGET: int = Field(default=4000, env="PROMPT_BATCH_TOKEN_BUDGET")
+    PROMPT_BATCH_MAX_ITEMS: int = Field(default=25, env="PROMPT_BATCH_MAX_ITEMS")
+    PROMPT_BATCH_OUTPUT_TOKENS_PER_ITEM: int = Field(default=120, env="PROMPT_BATCH_OUTPUT_TOKENS_PER_ITEM")
+
+    # =============================================================================
+    # LLM响应缓存配置
+    # =============================================================================
+    # 相同 (provider, model, messages, 参数) 的文本生成结果缓存在Redis中，重复生成时不再调用API
+    LLM_CACHE_ENABLED: bool = Field(default=True, env="LLM_CACHE_ENABLED")
+    LLM_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600, env="LLM_CACHE_TTL_SECONDS")
+    LLM_CACHE_MAX_ENTRIES: int = Field(default=20000, env="LLM_CACHE_MAX_ENTRIES")
+    LLM_CACHE_MAX_VALUE_BYTES: int = Field(default=256 * 1024, env="LLM_CACHE_MAX_VALUE_BYTES")
+
+    # =============================================================================
+    # Whisper语音识别配置
+    # =============================================================================
+    WHISPER_MODEL_SIZE: str = Field(default="small", env="WHISPER_MODEL_SIZE")
+    WHISPER_DEVICE: str = Field(default="cpu", env="WHISPER_DEVICE")
+    # 计算精度：CPU推荐int8（比float32快约2-4倍、内存减半），GPU推荐float16
+    WHISPER_COMPUTE_TYPE: str = Field(default="int8", env="WHISPER_COMPUTE_TYPE")
+    # 识别worker数（每个worker常驻一个模型实例）与每个worker的推理线程数，线程数为空时按CPU核数平均分配
+    WHISPER_WORKERS: int = Field(default=2, env="WHISPER_WORKERS")
+    WHISPER_CPU_THREADS: Optional[int] = Field(default=None, env="WHISPER_CPU_THREADS")
 
     # =============================================================================
     # 头像上传配置
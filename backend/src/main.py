@@ -99,6 +99,13 @@ async def startup_event():
     app_logger.info(f"🔗 API地址: http://0.0.0.0:8000")
     app_logger.info(f"📖 API文档: http://0.0.0.0:8000/docs")
 
+    # 预先检查MinIO存储桶，之后的上传不再重复检查
+    from src.utils.storage import storage_client
+    try:
+        await storage_client.ensure_bucket_exists()
+    except Exception as e:
+        app_logger.warning(f"⚠️ MinIO存储桶检查失败，将在首次使用时重试: {e}")
+
     # 这里可以添加其他启动逻辑
     # 例如: 检查数据库连接、预热缓存等
 
@@ -109,7 +116,10 @@ async def shutdown_event():
     import logging
     app_logger = logging.getLogger(__name__)
     app_logger.info("🛑 AICG平台正在关闭...")
-    # 这里可以添加清理逻辑
+
+    # 关闭第三方API共享连接池
+    from src.utils.http_client import http_client_pool
+    await http_client_pool.aclose()
 
 
 @app.exception_handler(AICGException)
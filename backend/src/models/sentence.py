@@ -6,7 +6,7 @@
 import uuid
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List, TYPE_CHECKING
+from typing import Dict, List, Optional, TYPE_CHECKING
 
 from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy import select
@@ -51,6 +51,7 @@ class Sentence(BaseModel):
 
     # 视频缓存字段
     sentence_video_key = Column(String(500), nullable=True, comment="单句视频MinIO对象键")
+    sentence_video_cache_key = Column(String(64), nullable=True, comment="单句视频渲染输入哈希（内容寻址缓存键）")
     sentence_video_duration = Column(Integer, nullable=True, comment="单句视频时长（秒）")
     needs_regeneration = Column(Boolean, default=True, comment="是否需要重新生成视频")
     last_video_generated_at = Column(DateTime, nullable=True, comment="最后生成视频时间")
@@ -79,26 +80,37 @@ class Sentence(BaseModel):
         """
         self.needs_regeneration = True
 
-    def save_video_cache(self, video_key: str, duration: int) -> None:
+    def save_video_cache(self, video_key: str, duration: int, cache_key: Optional[str] = None) -> None:
         """
         保存视频缓存信息
         
         Args:
             video_key: MinIO对象键
             duration: 视频时长（秒）
+            cache_key: 渲染输入哈希（可选）
         """
         self.sentence_video_key = video_key
         self.sentence_video_duration = duration
+        self.sentence_video_cache_key = cache_key
         self.needs_regeneration = False
         self.last_video_generated_at = datetime.utcnow()
 
-    def has_valid_cache(self) -> bool:
+    def has_valid_cache(self, cache_key: Optional[str] = None) -> bool:
         """
         检查是否有有效的视频缓存
         
+        Args:
+            cache_key: 当前渲染输入哈希（可选），提供时要求与生成缓存时的哈希一致
+        
         Returns:
             如果有缓存且未失效则返回True
         """
+        if cache_key is not None:
+            return (
+                self.sentence_video_key is not None and
+                self.sentence_video_cache_key == cache_key and
+                not self.needs_regeneration
+            )
         return (
             self.sentence_video_key is not None and
             not self.needs_regeneration
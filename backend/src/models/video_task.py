@@ -155,6 +155,8 @@ class VideoTask(BaseModel):
             "audio_codec": "aac",
             "audio_bitrate": "192k",
             "zoom_speed": 0.0005,
+            "subtitle_renderer": "drawtext",  # drawtext 或 ass（libass一次性烧录）
+            "subtitle_timing": "asr",  # asr（Whisper识别）或 align（原文强制对齐，无需LLM纠错）
             "subtitle_style": {
                 "font": "Arial",
                 "font_size": 70,  # 漫画解说标准字号
@@ -1,6 +1,5 @@
 import uuid
 import asyncio
-import random
 import io
 import aiohttp
 from typing import List
@@ -15,43 +14,13 @@ from src.services.api_key import APIKeyService
 from src.services.base import BaseService
 from src.services.provider.base import BaseLLMProvider
 from src.services.provider.factory import ProviderFactory
+from src.utils.ffmpeg_utils import get_audio_duration_from_bytes_async
+from src.utils.rate_limiter import provider_rate_limiter, retry_with_backoff
 from src.utils.storage import get_storage_client
-from openai import RateLimitError
 
 logger = get_logger(__name__)
 
 
-async def retry_with_backoff(task_fn, max_retries=5):
-    """
-    针对 429 限流错误加入指数退避重试机制
-    """
-    delay = 1.0
-
-    for attempt in range(max_retries):
-        try:
-            return await task_fn()
-        except Exception as e:
-            # 只对 429 或 RateLimitError 做重试，其余立即抛出
-            if (
-                    isinstance(e, RateLimitError)
-                    or "429" in str(e)
-                    or "RateLimit" in str(e)
-                    or "IPM limit" in str(e)
-            ):
-                if attempt == max_retries - 1:
-                    raise
-
-                # 指数退避 + 随机抖动
-                sleep_time = delay + random.random() * 0.5
-                print(f"[Retry] 限流，{sleep_time:.2f} 秒后重试 attempt={attempt + 1}/{max_retries}")
-                await asyncio.sleep(sleep_time)
-
-                delay = min(delay * 2, 20)  # 最长等待 20 秒
-            else:
-                # 非限流错误直接抛出
-                raise
-
-
 # ============================================================
 # 处理单句 – 音频版
 # ============================================================
@@ -59,7 +28,6 @@ async def retry_with_backoff(task_fn, max_retries=5):
 async def process_sentence(
         sentence: Sentence,
         llm_provider: BaseLLMProvider,
-        semaphore: asyncio.Semaphore,
         storage_client,
         user_id: str,
         voice: str = "alloy",
@@ -71,85 +39,73 @@ async def process_sentence(
     Args:
         sentence: 待处理的 Sentence 实例
         llm_provider: LLM 提供者实例
-        semaphore: 并发控制信号量
         storage_client: 存储客户端实例
         user_id: 用户ID
         db_session: 可选的数据库会话
         voice: 语音风格
         model: 模型名称
     """
-    async with semaphore:
-        try:
-            logger.info(f"[LLM] 处理句子音频 {sentence.id}")
-
-            # 加入重试机制
-            # 注意：OpenAI audio API 返回的是二进制内容，不是 URL
-            # 对于 SiliconFlow，voice 格式为 "model:voice_name"，例如 "FunAudioLLM/CosyVoice2-0.5B:alex"
-            response = await retry_with_backoff(
-                lambda: llm_provider.generate_audio(
-                    input_text=sentence.content,
-                    voice=voice,
-                    model=model,
-                )
+    try:
+        logger.info(f"[LLM] 处理句子音频 {sentence.id}")
+
+        # 加入重试机制
+        # 注意：OpenAI audio API 返回的是二进制内容，不是 URL
+        # 对于 SiliconFlow，voice 格式为 "model:voice_name"，例如 "FunAudioLLM/CosyVoice2-0.5B:alex"
+        response = await retry_with_backoff(
+            lambda: llm_provider.generate_audio(
+                input_text=sentence.content,
+                voice=voice,
+                model=model,
             )
+        )
 
-            # OpenAI SDK audio.speech.create 返回的是 HttpxBinaryResponseContent
-            # 需要读取 content
-            content = response.content
+        # OpenAI SDK audio.speech.create 返回的是 HttpxBinaryResponseContent
+        # 需要读取 content
+        content = response.content
+
+        # --- 计算音频时长（直接解析内存中的音频数据，无需上传后再下载） ---
+        duration = await get_audio_duration_from_bytes_async(content)
+        if duration is None:
+            logger.warning(f"[AUDIO] 无法获取句子 {sentence.id} 的音频时长")
+        else:
+            logger.info(f"[AUDIO] 句子 {sentence.id} 音频时长: {duration}秒")
+
+        # --- 上传 MinIO ---
+        file_id = str(uuid.uuid4())
+        upload_file = UploadFile(
+            filename=f"{file_id}.mp3",
+            file=io.BytesIO(content),
+        )
 
-            # --- 上传 MinIO ---
-            file_id = str(uuid.uuid4())
-            upload_file = UploadFile(
-                filename=f"{file_id}.mp3",
-                file=io.BytesIO(content),
-            )
+        metadata = {
+            "user_id": user_id,
+            "file_id": file_id,
+            "file_type": "audio/mpeg",
+            "original_filename": f"{file_id}.mp3"
+        }
+        if duration is not None:
+            # 时长随对象一起保存在对象元数据中
+            metadata["duration"] = f"{duration:.3f}"
+
+        storage_result = await storage_client.upload_file(
+            user_id=user_id,
+            file=upload_file,
+            metadata=metadata
+        )
+        object_key = storage_result["object_key"]
 
-            storage_result = await storage_client.upload_file(
-                user_id=user_id,
-                file=upload_file,
-                metadata={
-                    "user_id": user_id,
-                    "file_id": file_id,
-                    "file_type": "audio/mpeg",
-                    "original_filename": f"{file_id}.mp3"
-                }
-            )
-            object_key = storage_result["object_key"]
-
-            # --- 计算音频时长 ---
-            try:
-                from src.utils.ffmpeg_utils import get_audio_duration
-                import tempfile
-                import os
-                
-                # 下载音频文件到临时位置以计算时长
-                temp_audio_path = os.path.join(tempfile.gettempdir(), f"{file_id}.mp3")
-                await storage_client.download_file_to_path(object_key, temp_audio_path)
-                
-                # 获取时长
-                duration = get_audio_duration(temp_audio_path)
-                
-                # 清理临时文件
-                if os.path.exists(temp_audio_path):
-                    os.remove(temp_audio_path)
-                    
-                logger.info(f"[AUDIO] 句子 {sentence.id} 音频时长: {duration}秒")
-            except Exception as e:
-                logger.warning(f"[AUDIO] 无法获取音频时长: {e}")
-                duration = None
-
-            # --- 更新数据库 ---
-            sentence.audio_url = object_key
-            sentence.audio_duration = duration
-            sentence.status = SentenceStatus.GENERATED_AUDIO
-            sentence.mark_material_updated()  # 标记需要重新生成视频
-            # 注意：不在这里 flush/commit，避免并发冲突
-            # 统一在主函数中处理
-            return True
-
-        except Exception as e:
-            logger.error(f"[LLM] 句子 {sentence.id} 音频生成错误: {e}", exc_info=True)
-            return False
+        # --- 更新数据库 ---
+        sentence.audio_url = object_key
+        sentence.audio_duration = duration
+        sentence.status = SentenceStatus.GENERATED_AUDIO
+        sentence.mark_material_updated()  # 标记需要重新生成视频
+        # 注意：不在这里 flush/commit，避免并发冲突
+        # 统一在主函数中处理
+        return True
+
+    except Exception as e:
+        logger.error(f"[LLM] 句子 {sentence.id} 音频生成错误: {e}", exc_info=True)
+        return False
 
 
 # ============================================================
@@ -187,24 +143,22 @@ class AudioService(BaseService):
         llm_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
-            max_concurrency=5,
+            api_key_id=api_key.id,
             base_url=api_key.base_url if api_key.base_url else None,
         )
         logger.info(f"[LLM] 使用 Provider: {llm_provider}, API Key ID: {api_key.id},Base URL: {api_key.base_url}")
 
-        # --- 4. 创建统一并发控制 ---
-        semaphore = asyncio.Semaphore(5)
-
-        # --- 5. 创建任务列表 ---
+        # --- 4. 创建任务列表（并发由Provider内按Key和模型共享的自适应限流器控制） ---
         storage_client = await get_storage_client()
         tasks = [
-            process_sentence(sentence, llm_provider, semaphore, storage_client, user_id, voice, model)
+            process_sentence(sentence, llm_provider, storage_client, user_id, voice, model)
             for sentence in sentences
         ]
 
         logger.info(f"[LLM] 开始并发处理音频，共 {len(tasks)} 项")
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"[LLM] 限流统计: {provider_rate_limiter.get_stats(api_key.provider.lower(), api_key.get_api_key())}")
 
         # 统计成功和失败数量
         success_count = 0
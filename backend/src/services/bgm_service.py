@@ -3,7 +3,6 @@ BGM管理服务 - 背景音乐文件管理
 """
 
 import os
-import subprocess
 import uuid
 from typing import List, Optional, Tuple
 
@@ -15,6 +14,7 @@ from src.core.exceptions import BusinessLogicError, NotFoundError
 from src.core.logging import get_logger
 from src.models.bgm import BGM, BGMStatus
 from src.services.base import BaseService
+from src.utils.ffmpeg_utils import get_audio_duration_from_bytes_async
 from src.utils.storage import storage_client
 
 logger = get_logger(__name__)
@@ -112,7 +112,7 @@ class BGMService(BaseService):
         self, content: bytes, file_ext: str
     ) -> Optional[int]:
         """
-        使用ffprobe提取音频时长
+        提取音频时长（进程内解析文件头，无法识别的格式通过管道交给ffprobe，不写临时文件）
 
         Args:
             content: 音频文件内容
@@ -121,45 +121,11 @@ class BGMService(BaseService):
         Returns:
             音频时长（秒），如果提取失败返回None
         """
-        import tempfile
-
-        try:
-            # 写入临时文件
-            with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as tmp_file:
-                tmp_file.write(content)
-                tmp_path = tmp_file.name
-
-            # 使用ffprobe获取时长
-            cmd = [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                tmp_path,
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-
-            if result.returncode == 0 and result.stdout.strip():
-                duration = float(result.stdout.strip())
-                return int(duration)
-
-            logger.warning(f"无法提取音频时长: {result.stderr}")
-            return None
-
-        except Exception as e:
-            logger.warning(f"提取音频时长失败: {e}")
+        duration = await get_audio_duration_from_bytes_async(content)
+        if duration is None:
+            logger.warning(f"无法提取音频时长: {file_ext}")
             return None
-        finally:
-            # 清理临时文件
-            try:
-                if "tmp_path" in locals():
-                    os.unlink(tmp_path)
-            except:
-                pass
+        return int(duration)
 
     async def list_user_bgms(
         self,
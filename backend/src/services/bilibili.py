@@ -414,22 +414,22 @@ class BilibiliPublishService(BaseService):
                 self._cleanup_temp_file(cover_path)
     
     async def _download_video_from_minio(self, video_key: str) -> str:
-        """从MinIO下载视频到临时文件"""
-        storage_service = await self._get_storage_service()
+        """从MinIO下载视频到临时文件（优先使用节点本地素材缓存）"""
+        from src.services.material_service import material_service
         temp_dir = Path(tempfile.gettempdir()) / "biliup_uploads"
         temp_dir.mkdir(parents=True, exist_ok=True)
         temp_file = temp_dir / f"video_{os.urandom(8).hex()}.mp4"
-        await storage_service.download_file_to_path(video_key, str(temp_file))
+        await material_service.fetch_material_from_minio(video_key, temp_file)
         return str(temp_file)
     
     async def _download_cover(self, cover_url: str) -> str:
-        """下载封面到临时文件"""
-        storage_service = await self._get_storage_service()
+        """下载封面到临时文件（优先使用节点本地素材缓存）"""
+        from src.services.material_service import material_service
         temp_dir = Path(tempfile.gettempdir()) / "biliup_uploads"
         temp_dir.mkdir(parents=True, exist_ok=True)
         ext = Path(cover_url).suffix or ".jpg"
         temp_file = temp_dir / f"cover_{os.urandom(8).hex()}{ext}"
-        await storage_service.download_file_to_path(cover_url, str(temp_file))
+        await material_service.fetch_material_from_minio(cover_url, temp_file)
         return str(temp_file)
     
     def _cleanup_temp_file(self, file_path: str):
@@ -64,6 +64,7 @@ class DialoguePromptEngine(BaseService):
         llm_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
 
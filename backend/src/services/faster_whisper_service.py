@@ -1,21 +1,121 @@
+import asyncio
 import os
 import json
-from faster_whisper import WhisperModel
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from faster_whisper import WhisperModel, decode_audio
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import merge_punctuations
 from opencc import OpenCC
+from src.core.config import settings
 from src.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# 强制对齐时并入相邻词的标点（与 WhisperModel.transcribe 的默认值一致）
+PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+
+
+def _default_cpu_threads(num_workers: int) -> int:
+    """按CPU核数为每个识别worker分配线程数"""
+    return max(1, (os.cpu_count() or 1) // max(1, num_workers))
+
 
 class WhisperTranscriptionService:
-    def __init__(self, model_size="small", device="cpu", compute_type="float32"):
+    """
+    Whisper语音识别服务（常驻识别池）
+
+    - 模型在首次识别时才加载，导入模块不会占用内存和启动时间
+    - 识别在独立的线程池中执行，每个worker线程持有一个模型实例；
+      CTranslate2推理时释放GIL，多个句子的识别可以真正并行，且不阻塞事件循环
+    - 线程池的任务队列即识别请求队列，超出worker数的请求排队等待
+    """
+
+    def __init__(
+            self,
+            model_size: str = "small",
+            device: str = "cpu",
+            compute_type: str = "int8",
+            num_workers: int = 1,
+            cpu_threads: Optional[int] = None
+    ):
         """
         初始化语音识别服务（可复用模型，不需要每次都加载）
+
+        Args:
+            model_size: 模型大小或本地模型路径
+            device: 推理设备（cpu / cuda）
+            compute_type: 计算精度（CPU推荐int8，GPU推荐float16）
+            num_workers: 识别worker数（每个worker一个模型实例）
+            cpu_threads: 每个worker的推理线程数（可选，默认按CPU核数平均分配）
         """
-        logger.info(f"🔄 正在加载 Whisper 模型: {model_size} ...")
-        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.num_workers = max(1, num_workers)
+        self.cpu_threads = cpu_threads or _default_cpu_threads(self.num_workers)
         self.cc = OpenCC("t2s")  # 繁→简转换
+
+        # 每个worker线程各自持有模型实例
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+        # 累计统计
+        self._models_loaded = 0
+        self._requests_total = 0
+        self._pending = 0
+        self._queue_wait_total = 0.0
+        self._transcribe_time_total = 0.0
+
+    def _load_model(self) -> WhisperModel:
+        """加载Whisper模型"""
+        logger.info(
+            f"🔄 正在加载 Whisper 模型: {self.model_size} "
+            f"(device={self.device}, compute_type={self.compute_type}, cpu_threads={self.cpu_threads}) ..."
+        )
+        model = WhisperModel(
+            self.model_size,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads
+        )
         logger.info(f"✅ 模型加载完成")
+        return model
+
+    @property
+    def model(self) -> WhisperModel:
+        """当前线程的模型实例（首次访问时加载）"""
+        model = getattr(self._local, "model", None)
+        if model is None:
+            model = self._load_model()
+            self._local.model = model
+            with self._lock:
+                self._models_loaded += 1
+        return model
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        获取识别线程池
+
+        延迟创建并记录所属进程，Celery prefork 子进程不会继承父进程中已失效的线程
+        """
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._executor_pid != pid:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.num_workers,
+                    thread_name_prefix="whisper"
+                )
+                self._executor_pid = pid
+                self._local = threading.local()
+            return self._executor
 
     @staticmethod
     def format_timestamp(seconds: float):
@@ -44,6 +144,7 @@ class WhisperTranscriptionService:
 
         logger.info(f"🚀 开始识别音频: {audio_path}")
 
+        started = time.monotonic()
         segments, info = self.model.transcribe(
             audio_path,
             beam_size=10,
@@ -112,12 +213,171 @@ class WhisperTranscriptionService:
                 f.write(srt_content)
             logger.info(f"✅ SRT 字幕已保存: {srt_path}")
 
+        logger.info(f"⏱️ 识别耗时 {time.monotonic() - started:.2f}s: {audio_path}")
         return results, srt_content
 
+    async def _run_in_pool(self, func, *args, **kwargs):
+        """将识别请求提交到识别线程池排队执行，并统计排队/执行耗时"""
+        executor = self._get_executor()
+        submitted = time.monotonic()
+        with self._lock:
+            self._pending += 1
+
+        def run():
+            started = time.monotonic()
+            with self._lock:
+                self._pending -= 1
+                self._queue_wait_total += started - submitted
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._requests_total += 1
+                    self._transcribe_time_total += time.monotonic() - started
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, run)
+
+    async def transcribe_async(
+            self,
+            audio_path,
+            output_format="all",
+            initial_prompt: str | None = None
+    ):
+        """
+        异步执行语音转写任务
+
+        请求提交到识别线程池排队执行，等待期间事件循环可以继续处理FFmpeg渲染、下载等其他工作
+
+        Args:
+            audio_path: 音频文件路径
+            output_format: 输出格式，支持 "json", "srt", "all"
+            initial_prompt: 初始提示文本（可选）
+
+        Returns:
+            与 transcribe 相同
+        """
+        return await self._run_in_pool(
+            self.transcribe, audio_path, output_format=output_format, initial_prompt=initial_prompt
+        )
+
+    def align(self, audio_path, text: str):
+        """
+        强制对齐：将已知文本对齐到音频，得到词级时间轴
+
+        文本已知（TTS的输入），只需编码一次音频并用Whisper的对齐注意力头（cross-attention + DTW）
+        求每个token的时间位置，不做beam search解码，也不存在识别错误，无需LLM纠错。
+        仅支持单个Whisper窗口（30秒）以内的音频。
+
+        Args:
+            audio_path: 音频文件路径
+            text: 音频对应的文本
+
+        Returns:
+            与 transcribe 的 JSON 结果格式相同的时间轴列表（单个segment）
+
+        Raises:
+            FileNotFoundError: 音频不存在
+            ValueError: 文本为空、音频过长或对齐结果为空
+        """
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"❌ 找不到音频文件: {audio_path}")
+
+        text = (text or "").strip()
+        if not text:
+            raise ValueError("对齐文本为空")
+
+        model = self.model
+        started = time.monotonic()
+
+        audio = decode_audio(audio_path, sampling_rate=model.feature_extractor.sampling_rate)
+        features = model.feature_extractor(audio)
+        num_frames = features.shape[-1] - 1
+        if num_frames > model.feature_extractor.nb_max_frames:
+            raise ValueError(
+                f"音频超过 {model.feature_extractor.chunk_length} 秒，无法单窗口对齐: {audio_path}"
+            )
+
+        tokenizer = Tokenizer(
+            model.hf_tokenizer,
+            model.model.is_multilingual,
+            task="transcribe",
+            language="zh",
+        )
+        text_tokens = tokenizer.encode(text)
+        encoder_output = model.encode(pad_or_trim(features[:, :num_frames]))
+        alignment = model.find_alignment(tokenizer, [text_tokens], encoder_output, num_frames)[0]
+
+        # 标点并入相邻词，与识别结果的词级时间轴形式一致
+        merge_punctuations(alignment, PREPEND_PUNCTUATIONS, APPEND_PUNCTUATIONS)
+        words = [
+            {
+                "word": item["word"],
+                "start": round(float(item["start"]), 3),
+                "end": round(float(item["end"]), 3),
+            }
+            for item in alignment
+            if item["word"]
+        ]
+        if not words:
+            raise ValueError(f"对齐结果为空: {audio_path}")
+
+        logger.info(f"⏱️ 强制对齐耗时 {time.monotonic() - started:.2f}s: {audio_path}")
+        return [{
+            "id": 1,
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "text": text,
+            "words": words,
+        }]
+
+    async def align_async(self, audio_path, text: str):
+        """
+        异步执行强制对齐（在识别线程池中执行）
+
+        Args:
+            audio_path: 音频文件路径
+            text: 音频对应的文本
+
+        Returns:
+            与 align 相同
+        """
+        return await self._run_in_pool(self.align, audio_path, text)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取识别池统计信息
+
+        Returns:
+            统计字典
+        """
+        with self._lock:
+            return {
+                "num_workers": self.num_workers,
+                "compute_type": self.compute_type,
+                "models_loaded": self._models_loaded,
+                "requests_total": self._requests_total,
+                "pending": self._pending,
+                "queue_wait_total": round(self._queue_wait_total, 3),
+                "transcribe_time_total": round(self._transcribe_time_total, 3),
+            }
+
 
-transcription_service = WhisperTranscriptionService()
+# 创建全局实例（可通过 WHISPER_* 配置，模型在首次识别时加载）
+transcription_service = WhisperTranscriptionService(
+    model_size=settings.WHISPER_MODEL_SIZE,
+    device=settings.WHISPER_DEVICE,
+    compute_type=settings.WHISPER_COMPUTE_TYPE,
+    num_workers=settings.WHISPER_WORKERS,
+    cpu_threads=settings.WHISPER_CPU_THREADS,
+)
 
-all = ["WhisperTranscriptionService", "transcription_service"]
+__all__ = [
+    "APPEND_PUNCTUATIONS",
+    "PREPEND_PUNCTUATIONS",
+    "WhisperTranscriptionService",
+    "transcription_service",
+]
 
 
 # -------------------------
@@ -0,0 +1,242 @@
+"""
+文件清理服务 - 批量清理用户上传目录中的孤立文件
+
+负责:
+- 用一次 UNION 查询取出数据库中引用用户上传目录的所有对象键，与存储中的对象做差集
+- 分页扫描用户上传目录，每页的孤立文件用一次多对象删除请求删除
+- 每页处理完后保存进度检查点，任务中断后从上次的位置继续
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import func, or_, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.logging import get_logger
+from src.models import (
+    BGM,
+    Chapter,
+    MovieCharacter,
+    MovieScene,
+    MovieShot,
+    Project,
+    PublishTask,
+    Sentence,
+    User,
+    VideoTask,
+)
+from src.models.movie import MovieGenerationHistory, MovieShotTransition
+from src.services.base import BaseService
+from src.services.material_service import resolve_object_key
+from src.utils.redis_client import get_redis
+from src.utils.storage import DELETE_BATCH_SIZE, get_storage_client
+from src.utils.storage_usage import USAGE_PREFIX, storage_usage
+
+logger = get_logger(__name__)
+
+# 检查点保留时间（秒），超过后重新从头扫描
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 3600
+
+# 引用MinIO对象的字符串字段（值可能是对象键或预签名URL）
+REFERENCE_COLUMNS = [
+    Project.file_path,
+    Chapter.video_url,
+    Sentence.image_url,
+    Sentence.audio_url,
+    Sentence.sentence_video_key,
+    VideoTask.video_key,
+    BGM.file_key,
+    PublishTask.cover_url,
+    User.avatar_url,
+    MovieGenerationHistory.result_url,
+    MovieScene.scene_image_url,
+    MovieShot.keyframe_url,
+    MovieShotTransition.video_url,
+    MovieCharacter.avatar_url,
+]
+
+ProgressCallback = Callable[[Optional[int], str], Awaitable[None]]
+
+
+class FileCleanupService(BaseService):
+    """孤立文件清理服务"""
+
+    def __init__(self, db_session: AsyncSession):
+        super().__init__(db_session)
+
+    @staticmethod
+    def user_prefix(user_id: str) -> str:
+        """用户上传目录前缀"""
+        return f"{USAGE_PREFIX}/{user_id}/"
+
+    async def get_referenced_keys(self, user_id: str) -> Set[str]:
+        """
+        获取数据库中引用用户上传目录的所有对象键（单次查询）
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            对象键集合
+        """
+        prefix = self.user_prefix(user_id)
+
+        def matches(column):
+            return or_(column.like(f"{prefix}%"), column.like(f"http%/{prefix}%"))
+
+        queries = [select(column.label("object_key")).where(matches(column)) for column in REFERENCE_COLUMNS]
+
+        # 角色参考图是JSON数组，展开后再匹配
+        reference_images = select(
+            func.json_array_elements_text(MovieCharacter.reference_images).label("object_key")
+        ).where(MovieCharacter.reference_images.isnot(None)).subquery()
+        queries.append(
+            select(reference_images.c.object_key).where(matches(reference_images.c.object_key))
+        )
+
+        result = await self.execute(union(*queries))
+        return {resolve_object_key(value) for value in result.scalars() if value}
+
+    async def _load_checkpoint(self, user_id: str, older_than_days: int) -> Optional[Dict[str, Any]]:
+        """读取与本次清理参数一致的检查点"""
+        try:
+            raw = await get_redis().get(f"file_cleanup:{user_id}")
+        except Exception as e:
+            logger.warning(f"读取清理检查点失败: {user_id}, 错误: {e}")
+            return None
+        if not raw:
+            return None
+        checkpoint = json.loads(raw)
+        if checkpoint.get("older_than_days") != older_than_days:
+            return None
+        return checkpoint
+
+    async def _save_checkpoint(self, user_id: str, state: Dict[str, Any]) -> None:
+        """保存检查点"""
+        try:
+            await get_redis().set(f"file_cleanup:{user_id}", json.dumps(state), ex=CHECKPOINT_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"保存清理检查点失败: {user_id}, 错误: {e}")
+
+    async def _clear_checkpoint(self, user_id: str) -> None:
+        """清除检查点"""
+        try:
+            await get_redis().delete(f"file_cleanup:{user_id}")
+        except Exception as e:
+            logger.warning(f"清除清理检查点失败: {user_id}, 错误: {e}")
+
+    async def cleanup_orphaned_files(
+            self,
+            user_id: str,
+            older_than_days: int = 7,
+            dry_run: bool = True,
+            resume: bool = False,
+            on_progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        清理用户上传目录中未被数据库引用且早于指定天数的文件
+
+        Args:
+            user_id: 用户ID
+            older_than_days: 只清理多少天前的文件
+            dry_run: 试运行，只统计不删除
+            resume: 从上次中断的检查点继续（仅实际删除时有效）
+            on_progress: 进度回调 (percent, message)，总数未知时 percent 为None
+
+        Returns:
+            清理统计和孤立文件详情
+        """
+        storage = await get_storage_client()
+        referenced = await self.get_referenced_keys(user_id)
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+        state = {
+            "older_than_days": older_than_days,
+            "cursor": None,
+            "scanned": 0,
+            "orphaned": 0,
+            "orphaned_bytes": 0,
+            "deleted": 0,
+            "deleted_bytes": 0,
+            "failed": 0,
+        }
+        if resume and not dry_run:
+            checkpoint = await self._load_checkpoint(user_id, older_than_days)
+            if checkpoint:
+                state.update(checkpoint)
+                logger.info(f"从检查点继续清理: {user_id}, 已扫描 {state['scanned']} 个文件")
+
+        usage = await storage_usage.get(user_id)
+        total = usage["files"] + state["deleted"] if usage else None
+
+        files: List[Dict[str, Any]] = []
+        while True:
+            page = await storage.list_objects_page(
+                self.user_prefix(user_id), max_keys=DELETE_BATCH_SIZE, continuation_token=state["cursor"]
+            )
+
+            orphans = [
+                obj for obj in page["files"]
+                if obj["object_key"] not in referenced
+                and not (obj["last_modified"] and obj["last_modified"] >= cutoff)
+            ]
+            state["scanned"] += len(page["files"])
+            state["orphaned"] += len(orphans)
+            state["orphaned_bytes"] += sum(obj["size"] for obj in orphans)
+
+            deleted_keys = set()
+            if orphans and not dry_run:
+                result = await storage.delete_files(obj["object_key"] for obj in orphans)
+                deleted_keys = set(result["deleted"])
+                state["deleted"] += len(deleted_keys)
+                state["deleted_bytes"] += sum(obj["size"] for obj in orphans if obj["object_key"] in deleted_keys)
+                state["failed"] += len(result["failed"])
+
+            files.extend(
+                {
+                    "object_key": obj["object_key"],
+                    "size": obj["size"],
+                    "last_modified": obj["last_modified"].isoformat() if obj["last_modified"] else None,
+                    "deleted": obj["object_key"] in deleted_keys,
+                }
+                for obj in orphans
+            )
+
+            state["cursor"] = page["next_token"]
+            if not dry_run and state["cursor"]:
+                await self._save_checkpoint(user_id, state)
+
+            if on_progress:
+                percent = min(99, state["scanned"] * 100 // total) if total else None
+                await on_progress(percent, f"已扫描 {state['scanned']} 个文件，删除 {state['deleted']} 个")
+
+            if not state["cursor"]:
+                break
+
+        if not dry_run:
+            await self._clear_checkpoint(user_id)
+
+        logger.info(
+            f"孤立文件清理完成: {user_id}, dry_run={dry_run}, 扫描 {state['scanned']} 个, "
+            f"孤立 {state['orphaned']} 个, 删除 {state['deleted']} 个, 失败 {state['failed']} 个"
+        )
+
+        return {
+            "user_id": user_id,
+            "dry_run": dry_run,
+            "scanned": state["scanned"],
+            "orphaned": state["orphaned"],
+            "orphaned_bytes": state["orphaned_bytes"],
+            "deleted": state["deleted"],
+            "deleted_bytes": state["deleted_bytes"],
+            "failed": state["failed"],
+            "files": files,
+        }
+
+
+__all__ = [
+    "FileCleanupService",
+    "REFERENCE_COLUMNS",
+]
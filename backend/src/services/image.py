@@ -1,8 +1,6 @@
 import uuid
 import asyncio
-import random
 import io
-import aiohttp
 from typing import List
 
 from fastapi import UploadFile
@@ -15,29 +13,14 @@ from src.services.api_key import APIKeyService
 from src.services.base import BaseService
 from src.services.provider.base import BaseLLMProvider
 from src.services.provider.factory import ProviderFactory
-from src.utils.storage import get_storage_client
-from openai import RateLimitError
+from src.utils.http_client import get_aiohttp_session
+from src.utils.rate_limiter import provider_rate_limiter, retry_with_backoff
+from src.utils.storage import content_length_from_headers, get_storage_client
 
 logger = get_logger(__name__)
 
-
-async def retry_with_backoff(task_fn, max_retries=5):
-    """
-    针对 429 限流错误加入指数退避重试机制
-
-    """
-    delay = 1.0
-    for attempt in range(max_retries):
-        try:
-            return await task_fn()
-        except Exception as e:
-            if attempt == max_retries - 1:
-                raise
-            # 指数退避 + 随机抖动
-            sleep_time = delay + random.random() * 0.5
-            print(f"[Retry] 限流，{sleep_time:.2f} 秒后重试 attempt={attempt + 1}/{max_retries}")
-            await asyncio.sleep(sleep_time)
-            delay = min(delay * 2, 20)  # 最长等待 20 秒
+# 下载生成结果时每次读取的数据块大小
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
 
 # ============================================================
@@ -47,7 +30,6 @@ async def retry_with_backoff(task_fn, max_retries=5):
 async def process_sentence(
         sentence: Sentence,
         llm_provider: BaseLLMProvider,
-        semaphore: asyncio.Semaphore,
         storage_client,
         user_id: str,
         model: str = None,
@@ -58,69 +40,44 @@ async def process_sentence(
     Args:
         sentence: 待处理的 Sentence 实例
         llm_provider: LLM 提供者实例
-        semaphore: 并发控制信号量
         storage_client: 存储客户端实例
         user_id: 用户ID
         db_session: 可选的数据库会话
         model: 模型名称
     """
-    async with semaphore:
-        try:
-            logger.info(f"[LLM] 处理句子 {sentence.id}")
-
-            # 加入重试机制
-            result = await retry_with_backoff(
-                lambda: llm_provider.generate_image(
-                    prompt=sentence.image_prompt,
-                    model=model,
-                )
+    try:
+        logger.info(f"[LLM] 处理句子 {sentence.id}")
+
+        # 加入重试机制
+        result = await retry_with_backoff(
+            lambda: llm_provider.generate_image(
+                prompt=sentence.image_prompt,
+                model=model,
             )
+        )
 
-            # 检查是否是 base64 响应（Gemini）还是 URL 响应（其他）
-            image_data = result.data[0]
-
-            # gemini 格式要特殊处理
-            if hasattr(image_data, 'b64_json') and image_data.b64_json:
-                # Gemini 返回 base64 数据
-                import base64
-                logger.info(f"[LLM] 使用 base64 数据（Gemini 模型）")
-
-                b64_string = image_data.b64_json
-                content_type = image_data.mime
-                file_ext = content_type.split('/')[-1]
-                logger.info(f"[LLM] Base64 字符串长度: {len(b64_string)},ContentType:{content_type}")
-
-                try:
-                    content = base64.b64decode(b64_string)
-                except Exception as e:
-                    logger.error(f"[LLM] Base64 解码失败: {e}")
-                    raise
-
-            else:
-                # 其他提供商返回 URL
-                image_url = image_data.url
-                logger.info(f"[LLM] 从 URL 下载图片: {image_url}")
-
-                # --- 6. 统一的下载 Session ---
-                async with aiohttp.ClientSession() as http_session:
-                    # --- 下载图片 ---
-                    try:
-                        async with http_session.get(image_url) as resp:
-                            if resp.status != 200:
-                                logger.error(f"[Download] 失败 {resp.status} url={image_url}")
-                            content = await resp.read()
-                            # 要保存为临时文件上传到minio上
-
-                    except Exception as e:
-                        logger.error(f"[Download] 图片下载错误: {e}")
-                        raise
-
-                # 默认格式
-                file_ext = 'jpg'
-                content_type = 'image/jpeg'
+        # 检查是否是 base64 响应（Gemini）还是 URL 响应（其他）
+        image_data = result.data[0]
+        file_id = str(uuid.uuid4())
+
+        # gemini 格式要特殊处理
+        if hasattr(image_data, 'b64_json') and image_data.b64_json:
+            # Gemini 返回 base64 数据
+            import base64
+            logger.info(f"[LLM] 使用 base64 数据（Gemini 模型）")
+
+            b64_string = image_data.b64_json
+            content_type = image_data.mime
+            file_ext = content_type.split('/')[-1]
+            logger.info(f"[LLM] Base64 字符串长度: {len(b64_string)},ContentType:{content_type}")
+
+            try:
+                content = base64.b64decode(b64_string)
+            except Exception as e:
+                logger.error(f"[LLM] Base64 解码失败: {e}")
+                raise
 
             # --- 上传 MinIO ---
-            file_id = str(uuid.uuid4())
             upload_file = UploadFile(
                 filename=f"{file_id}.{file_ext}",
                 file=io.BytesIO(content),
@@ -136,19 +93,55 @@ async def process_sentence(
                     "original_filename": f"{file_id}.{file_ext}"
                 }
             )
-            object_key = storage_result["object_key"]
 
-            # --- 更新数据库 ---
-            sentence.image_url = object_key
-            sentence.status = SentenceStatus.GENERATED_IMAGE
-            sentence.mark_material_updated()  # 标记需要重新生成视频
-            # 注意：不在这里 flush/commit，避免并发冲突
-            # 统一在主函数中处理
-            return True
+        else:
+            # 其他提供商返回 URL
+            image_url = image_data.url
+            logger.info(f"[LLM] 从 URL 下载图片: {image_url}")
+
+            # 默认格式
+            file_ext = 'jpg'
+            content_type = 'image/jpeg'
+
+            # --- 6. 进程级共享的下载 Session（复用长连接） ---
+            http_session = get_aiohttp_session()
+            # --- 边下载边上传 MinIO，不在内存中缓存整张图片 ---
+            try:
+                async with http_session.get(image_url) as resp:
+                    if resp.status != 200:
+                        logger.error(f"[Download] 失败 {resp.status} url={image_url}")
+
+                    storage_result = await storage_client.upload_stream(
+                        user_id=user_id,
+                        chunks=resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE),
+                        filename=f"{file_id}.{file_ext}",
+                        content_type=content_type,
+                        length=content_length_from_headers(resp.headers),
+                        metadata={
+                            "user_id": user_id,
+                            "file_id": file_id,
+                            "file_type": content_type,
+                            "original_filename": f"{file_id}.{file_ext}"
+                        }
+                    )
+
+            except Exception as e:
+                logger.error(f"[Download] 图片下载错误: {e}")
+                raise
+
+        object_key = storage_result["object_key"]
 
-        except Exception as e:
-            logger.error(f"[LLM] 句子 {sentence.id} 错误: {e}", exc_info=True)
-            return False
+        # --- 更新数据库 ---
+        sentence.image_url = object_key
+        sentence.status = SentenceStatus.GENERATED_IMAGE
+        sentence.mark_material_updated()  # 标记需要重新生成视频
+        # 注意：不在这里 flush/commit，避免并发冲突
+        # 统一在主函数中处理
+        return True
+
+    except Exception as e:
+        logger.error(f"[LLM] 句子 {sentence.id} 错误: {e}", exc_info=True)
+        return False
 
 
 # ============================================================
@@ -185,24 +178,22 @@ class ImageService(BaseService):
         llm_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
-            max_concurrency=20,
+            api_key_id=api_key.id,
             base_url=api_key.base_url if api_key.base_url else None,
         )
         logger.info(f"[LLM] 使用 Provider: {llm_provider}, API Key ID: {api_key.id},Base URL: {api_key.base_url}")
 
-        # --- 4. 创建统一并发控制 ---
-        semaphore = asyncio.Semaphore(20)
-
-        # --- 5. 创建任务列表 ---
+        # --- 4. 创建任务列表（并发由Provider内按Key和模型共享的自适应限流器控制） ---
         storage_client = await get_storage_client()
         tasks = [
-            process_sentence(sentence, llm_provider, semaphore, storage_client, user_id, model)
+            process_sentence(sentence, llm_provider, storage_client, user_id, model)
             for sentence in sentences
         ]
 
         logger.info(f"[LLM] 开始并发处理，共 {len(tasks)} 项")
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"[LLM] 限流统计: {provider_rate_limiter.get_stats(api_key.provider.lower(), api_key.get_api_key())}")
 
         # 统计成功和失败数量
         success_count = 0
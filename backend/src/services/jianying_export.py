@@ -17,7 +17,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.logging import get_logger
 from src.models.chapter import Chapter, ChapterStatus
 from src.models.sentence import Sentence
-from src.utils.storage import get_storage_client
+from src.services.material_service import material_service
 
 logger = get_logger(__name__)
 
@@ -154,7 +154,6 @@ class JianYingExportService:
         Returns:
             materials_info: {sentence_id: {image_path, audio_path, ...}}
         """
-        storage_client = await get_storage_client()
         materials_info = {}
         
         # 创建素材目录
@@ -171,8 +170,8 @@ class JianYingExportService:
                 image_filename = f"{sentence.id}.jpg"
                 image_path = images_dir / image_filename
                 try:
-                    await storage_client.download_file_to_path(
-                        sentence.image_url, str(image_path)
+                    await material_service.fetch_material_from_minio(
+                        sentence.image_url, image_path
                     )
                     sentence_materials["image_path"] = f"draft_materials/images/{image_filename}"
                     sentence_materials["image_width"] = 1920  # 默认值
@@ -185,8 +184,8 @@ class JianYingExportService:
                 audio_filename = f"{sentence.id}.mp3"
                 audio_path = audios_dir / audio_filename
                 try:
-                    await storage_client.download_file_to_path(
-                        sentence.audio_url, str(audio_path)
+                    await material_service.fetch_material_from_minio(
+                        sentence.audio_url, audio_path
                     )
                     sentence_materials["audio_path"] = f"draft_materials/audios/{audio_filename}"
                     # 音频时长（微秒）
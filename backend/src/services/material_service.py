@@ -2,20 +2,49 @@
 素材服务 - 处理素材下载和管理
 
 负责:
-- 从MinIO下载素材（图片、音频）
+- 从MinIO下载素材（图片、音频、视频）
 - 解析预签名URL和对象键
-- 批量下载优化
+- 按对象键和ETag使用节点本地缓存，渲染、导出、发布同一章节时不重复下载
 """
 
 from pathlib import Path
+from typing import Any, Dict, Optional
 from urllib.parse import urlparse, unquote
 
 from src.core.logging import get_logger
+from src.utils.local_file_cache import local_material_cache
 from src.utils.storage import get_storage_client
 
 logger = get_logger(__name__)
 
 
+def resolve_object_key(object_key_or_url: str) -> str:
+    """
+    将素材地址解析为MinIO对象键（支持对象键或预签名URL）
+
+    Args:
+        object_key_or_url: MinIO对象键或预签名URL
+
+    Returns:
+        对象键
+    """
+    if not (object_key_or_url.startswith('http://') or object_key_or_url.startswith('https://')):
+        return object_key_or_url
+
+    # 是预签名URL，提取对象键
+    # URL格式: http://localhost:9000/bucket/path/to/file.jpg?X-Amz-...
+    parsed = urlparse(object_key_or_url)
+    # 路径格式: /bucket/path/to/file.jpg
+    path_parts = parsed.path.split('/', 2)  # ['', 'bucket', 'path/to/file.jpg']
+
+    if len(path_parts) < 3:
+        raise ValueError(f"无法从URL提取对象键: {object_key_or_url}")
+
+    object_key = unquote(path_parts[2])  # 'path/to/file.jpg'
+    logger.debug(f"从URL提取对象键: {object_key}")
+    return object_key
+
+
 class MaterialService:
     """素材服务 - 处理素材下载和管理"""
 
@@ -29,6 +58,38 @@ class MaterialService:
             self.storage_client = await get_storage_client()
         return self.storage_client
 
+    async def _stat_for_cache(self, object_key: str) -> Optional[Dict[str, Any]]:
+        """
+        获取用于查找本地缓存的对象元信息
+
+        对象被覆盖后 ETag 变化，旧的本地副本自然失效；未启用本地缓存或获取 ETag 失败时返回None
+
+        Args:
+            object_key: 对象键
+
+        Returns:
+            stat_file 返回的元信息（含 size、etag）
+        """
+        if not local_material_cache.enabled:
+            return None
+
+        storage = await self._get_storage_client()
+        try:
+            stat = await storage.stat_file(object_key)
+        except Exception as e:
+            logger.warning(f"获取素材ETag失败，跳过本地缓存: {object_key}, 错误: {e}")
+            return None
+
+        if not stat or not stat.get("etag"):
+            return None
+        return stat
+
+    @staticmethod
+    def _make_cache_key(etag: str, object_key: str) -> str:
+        """由 ETag 和对象键组成本地缓存键"""
+        etag = str(etag).strip('"')
+        return f"{etag}:{object_key}"
+
     async def fetch_material_from_minio(self, object_key_or_url: str, dest_path: Path) -> None:
         """
         从MinIO下载素材（支持对象键或预签名URL）
@@ -38,30 +99,31 @@ class MaterialService:
             dest_path: 目标路径
         """
         try:
-            # 判断是URL还是对象键
-            if object_key_or_url.startswith('http://') or object_key_or_url.startswith('https://'):
-                # 是预签名URL，提取对象键
-                # URL格式: http://localhost:9000/bucket/path/to/file.jpg?X-Amz-...
-                parsed = urlparse(object_key_or_url)
-                # 路径格式: /bucket/path/to/file.jpg
-                path_parts = parsed.path.split('/', 2)  # ['', 'bucket', 'path/to/file.jpg']
-
-                if len(path_parts) >= 3:
-                    object_key = unquote(path_parts[2])  # 'path/to/file.jpg'
-                    logger.debug(f"从URL提取对象键: {object_key}")
-                else:
-                    raise ValueError(f"无法从URL提取对象键: {object_key_or_url}")
-
-                # 使用对象键从MinIO下载
-                storage = await self._get_storage_client()
-                await storage.download_file_to_path(object_key, str(dest_path))
+            object_key = resolve_object_key(object_key_or_url)
+            storage = await self._get_storage_client()
+
+            stat = await self._stat_for_cache(object_key)
+
+            async def download(path: Path) -> Optional[str]:
+                # 已知大小和ETag时下载不再重复获取元信息；查找缓存与下载之间对象可能被覆盖，
+                # 按下载响应的 ETag 写入缓存，避免新内容被记在旧 ETag 下
+                etag = await storage.download_file_to_path(
+                    object_key, str(path),
+                    size=stat.get("size") if stat else None,
+                    etag=stat["etag"] if stat else None,
+                )
+                return self._make_cache_key(etag, object_key) if etag else None
+
+            if stat is None:
+                await download(dest_path)
                 logger.debug(f"下载素材成功: {object_key} -> {dest_path}")
+                return
+
+            cache_key = self._make_cache_key(stat["etag"], object_key)
+            if await local_material_cache.fetch(cache_key, dest_path, download):
+                logger.debug(f"素材命中本地缓存: {object_key} -> {dest_path}")
             else:
-                # 是对象键，直接从MinIO下载
-                logger.debug(f"从MinIO下载素材: {object_key_or_url}")
-                storage = await self._get_storage_client()
-                await storage.download_file_to_path(object_key_or_url, str(dest_path))
-                logger.debug(f"下载素材成功: {object_key_or_url} -> {dest_path}")
+                logger.debug(f"下载素材成功: {object_key} -> {dest_path}")
 
         except Exception as e:
             logger.error(
@@ -75,4 +137,5 @@ material_service = MaterialService()
 __all__ = [
     "MaterialService",
     "material_service",
+    "resolve_object_key",
 ]
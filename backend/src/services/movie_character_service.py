@@ -14,6 +14,7 @@ from src.services.base import BaseService
 from src.services.provider.factory import ProviderFactory
 from src.services.api_key import APIKeyService
 from src.services.image import retry_with_backoff
+from src.utils.llm_cache import llm_cache
 from src.utils.storage import get_storage_client
 import uuid
 import io
@@ -165,9 +166,9 @@ class MovieCharacterService(BaseService):
 ---
 """
 
-    async def extract_characters_from_chapter(self, chapter_id: str, api_key_id: str, model: str = None) -> List[MovieCharacter]:
+    async def extract_characters_from_chapter(self, chapter_id: str, api_key_id: str, model: str = None, refresh: bool = False) -> List[MovieCharacter]:
         """
-        从章节内容中提取角色
+        从章节内容中提取角色，refresh 为 True 时不使用LLM缓存
         """
         # 1. 加载章节内容
         from src.models.chapter import Chapter
@@ -204,18 +205,23 @@ class MovieCharacterService(BaseService):
         llm_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
 
         try:
             prompt = self.EXTRACT_CHARACTERS_PROMPT.format(text=script_text[:5000]) # 限制长度
-            response = await llm_provider.completions(
+            response = await llm_cache.completions(
+                llm_provider,
+                api_key.provider,
                 model=model,
                 messages=[
                     {"role": "system", "content": "你是一个专业的选角导演JSON生成器。"},
                     {"role": "user", "content": prompt},
                 ],
-                response_format={ "type": "json_object" }
+                response_format={ "type": "json_object" },
+                base_url=api_key.base_url,
+                use_cache=not refresh
             )
             
             content = response.choices[0].message.content.strip()
@@ -328,6 +334,7 @@ class MovieCharacterService(BaseService):
         image_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
         
@@ -27,11 +27,12 @@ from src.models import Chapter, VideoTask, VideoTaskStatus
 from src.models.movie import MovieScript
 from src.services.base import BaseService
 from src.services.chapter import ChapterService
+from src.services.material_service import material_service
 from src.services.video_task import VideoTaskService
 from src.utils.ffmpeg_utils import (
     check_ffmpeg_installed,
     concatenate_videos,
-    get_audio_duration,
+    get_audio_duration_async,
     mix_bgm_with_video,
 )
 from src.utils.storage import get_storage_client
@@ -127,20 +128,15 @@ class MovieVideoService(BaseService):
         Returns:
             下载后的本地视频路径列表(按顺序)
         """
-        storage_client = await self._get_storage_client()
-        
         async def download_one(transition, index: int) -> Path:
             """下载单个过渡视频"""
             video_path = temp_dir / f"transition_{index:03d}.mp4"
             
             try:
                 logger.info(f"📥 下载过渡视频 {index + 1}/{len(transitions)}: {transition.video_url}")
-                content = await storage_client.download_file(transition.video_url)
-                
-                with open(video_path, 'wb') as f:
-                    f.write(content)
+                await material_service.fetch_material_from_minio(transition.video_url, video_path)
                 
-                logger.info(f"✅ 过渡视频 {index + 1} 下载完成: {len(content)} bytes")
+                logger.info(f"✅ 过渡视频 {index + 1} 下载完成: {video_path.stat().st_size} bytes")
                 return video_path
                 
             except Exception as e:
@@ -189,7 +185,9 @@ class MovieVideoService(BaseService):
         # mode="crossfade": 使用交叉淡化过渡,视觉效果最自然
         # transition_type="fade": 淡入淡出效果,适合大多数场景
         # transition_duration=0.5: 0.5秒过渡时长,平衡流畅度和处理速度
-        success = concatenate_videos(
+        # 同步FFmpeg调用放到线程中执行，避免阻塞事件循环
+        success = await asyncio.to_thread(
+            concatenate_videos,
             video_paths,
             final_video_path,
             concat_file_path,
@@ -257,7 +255,8 @@ class MovieVideoService(BaseService):
             # 4. 混合BGM
             final_video_with_bgm_path = temp_dir / "movie_final_with_bgm.mp4"
             
-            mix_success = mix_bgm_with_video(
+            mix_success = await asyncio.to_thread(
+                mix_bgm_with_video,
                 str(video_path),
                 str(bgm_temp_path),
                 str(final_video_with_bgm_path),
@@ -319,7 +318,7 @@ class MovieVideoService(BaseService):
         video_key = result["object_key"]
         
         # 获取视频时长
-        duration = int(get_audio_duration(str(video_path)) or 0)
+        duration = int(await get_audio_duration_async(str(video_path)) or 0)
         
         logger.info(f"✅ 视频上传完成: {video_key}, 时长: {duration}秒")
         return video_key, duration
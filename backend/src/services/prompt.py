@@ -2,18 +2,22 @@
 AI导演引擎 - 提示词生成服务（优化版，含完整注释）
 
 提供服务：
-- 批量生成图像提示词
+- 批量生成图像提示词（多个句子打包为一次结构化JSON请求，解析失败的句子逐句重试）
 - 支持多种 LLM 提供商（Volcengine、DeepSeek）
 - 提示词模板与风格预设
 - 异常处理统一、方法职责清晰
 """
 
 import asyncio
-from typing import List
+import json
+import math
+import re
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
+from src.core.config import settings
 from src.core.exceptions import NotFoundError
 from src.core.logging import get_logger
 from src.models import Sentence, APIKey, ChapterStatus, SentenceStatus, Paragraph, Chapter
@@ -22,10 +26,121 @@ from src.services.api_key import APIKeyService
 from src.services.base import BaseService
 from src.services.provider.base import BaseLLMProvider
 from src.services.provider.factory import ProviderFactory
+from src.utils.llm_cache import llm_cache
+from src.utils.rate_limiter import provider_rate_limiter, retry_with_backoff
 
 logger = get_logger(__name__)
 
 
+# 批量模式追加到系统提示词的输出格式要求
+BATCH_INSTRUCTIONS = """
+本次会一次收到多个句子，输入格式为JSON：{"items": [{"id": "1", "text": "句子"}, ...]}。
+请按上述规则为每个句子分别生成提示词，只输出JSON：{"results": [{"id": "1", "prompt": "提示词"}, ...]}。
+id 必须与输入一致，每个输入句子对应一条结果，不要遗漏或合并。
+"""
+
+# 匹配中日韩文字，估算token时按每字1个token计算
+_CJK_PATTERN = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def resolve_model_name(api_key: APIKey, model: Optional[str] = None) -> str:
+    """
+    确定使用的模型：如果提供了model参数，优先使用；否则根据供应商选择默认模型
+    """
+    if model:
+        return model
+    model_name = "deepseek-v3-250324"
+    if api_key.provider == "deepseek":
+        model_name = "deepseek-chat"
+    if api_key.provider == "volcengine":
+        model_name = "doubao-pro"
+    if api_key.provider == "siliconflow":
+        model_name = "deepseek-ai/DeepSeek-V3.1-Terminus"
+    return model_name
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本token数：中文约每字1个token，其他字符约每4个字符1个token"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def pack_sentences(
+        sentences: List[Sentence],
+        token_budget: int,
+        max_items: int,
+        output_tokens_per_item: int,
+) -> List[List[Sentence]]:
+    """
+    按token预算把句子按顺序打包成批次
+
+    每个句子的开销 = 输入文本估算token + 预计输出token，单个超出预算的句子单独成批。
+
+    Args:
+        sentences: 句子列表
+        token_budget: 每批的token预算
+        max_items: 每批最多句子数
+        output_tokens_per_item: 每个句子预计输出的token数
+
+    Returns:
+        批次列表
+    """
+    batches: List[List[Sentence]] = []
+    current: List[Sentence] = []
+    used = 0
+    for sentence in sentences:
+        cost = estimate_tokens(sentence.content or "") + output_tokens_per_item
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(sentence)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_results(content: str) -> Dict[str, str]:
+    """
+    解析批量请求返回的JSON，返回 {id: 提示词}
+
+    兼容代码块包裹和直接返回数组的情况，缺少id或提示词为空的条目会被忽略。
+    """
+    content = content.strip()
+    # 清理代码块标记
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1] if "\n" in content else content[3:]
+        content = content.rsplit("```", 1)[0].strip()
+
+    data = json.loads(content)
+    items = data.get("results", []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("批量结果格式错误: results 不是数组")
+
+    prompts: Dict[str, str] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        prompt = item.get("prompt")
+        if item.get("id") is None or not isinstance(prompt, str) or not prompt.strip():
+            continue
+        prompts[str(item["id"])] = prompt.strip()
+    return prompts
+
+
+def sentence_messages(system_prompt: str, sentence: Sentence) -> List[Dict[str, str]]:
+    """
+    单句请求的对话消息
+
+    也是句子提示词在LLM缓存中的键：批量请求的结果按句子拆分后写入同一条目，
+    修改一个句子只会使该句子的缓存失效
+    """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": sentence.content},
+    ]
+
+
 # ============================================================
 # 单句处理逻辑（支持并发限流）
 # ============================================================
@@ -35,8 +150,8 @@ async def process_sentence(
         api_key: APIKey,
         llm_provider: BaseLLMProvider,
         system_prompt: str,
-        semaphore: asyncio.Semaphore,
         model: str = None,
+        use_cache: bool = True,
 ):
     """
     处理单个句子，调用 LLM 生成英文绘画提示词。
@@ -46,8 +161,8 @@ async def process_sentence(
         api_key (APIKey): 当前使用的 API Key
         llm_provider (BaseLLMProvider): LLM 提供商实例
         system_prompt (str): 系统指令提示词
-        semaphore (asyncio.Semaphore): 并发控制信号量
         model (str): 模型名称，如果提供则使用该模型
+        use_cache (bool): 是否读取LLM缓存，重新生成时为False
 
     Returns:
         Tuple[Sentence, str]: (句子对象, 生成的英文提示词)
@@ -55,44 +170,98 @@ async def process_sentence(
     Raises:
         Exception: LLM 调用失败等异常
     """
-    # 如果提供了model参数，优先使用；否则根据供应商选择默认模型
-    if model:
-        model_name = model
-    else:
-        model_name = "deepseek-v3-250324"
-        if api_key.provider == "deepseek":
-            model_name = "deepseek-chat"
-        if api_key.provider == "volcengine":
-            model_name = "doubao-pro"
-        if api_key.provider == "siliconflow":
-            model_name = "deepseek-ai/DeepSeek-V3.1-Terminus"
+    model_name = resolve_model_name(api_key, model)
 
     logger.debug(f"[LLM] 使用模型: {model_name} (Provider: {api_key.provider})")
-    # 使用信号量控制并发，避免过度同时请求
-    async with semaphore:
-        logger.info(
-            f"[LLM] 开始处理句子: id={sentence.id}, 字符数={len(sentence.content)}, 模型={model_name}"
+    # 并发由Provider内按Key和模型共享的自适应限流器控制
+    logger.info(
+        f"[LLM] 开始处理句子: id={sentence.id}, 字符数={len(sentence.content)}, 模型={model_name}"
+    )
+
+    try:
+        # 调用 LLM 生成提示词（相同句子和指令命中缓存），限流时按 Retry-After 退避重试
+        response = await retry_with_backoff(
+            lambda: llm_cache.completions(
+                llm_provider,
+                api_key.provider,
+                model=model_name,
+                messages=sentence_messages(system_prompt, sentence),
+                base_url=api_key.base_url,
+                use_cache=use_cache,
+            )
         )
 
-        try:
-            # 调用 LLM 生成提示词
-            response = await llm_provider.completions(
+        # 提取生成内容
+        prompt = response.choices[0].message.content.strip()
+        logger.debug(f"[LLM] 生成完成: id={sentence.id}, prompt_len={len(prompt)}")
+
+        return sentence, prompt
+
+    except Exception as e:
+        logger.error(f"[LLM] 处理失败: sentence_id={sentence.id}, error={e}")
+        raise
+
+
+# ============================================================
+# 多句批量处理逻辑
+# ============================================================
+
+async def process_batch(
+        sentences: List[Sentence],
+        api_key: APIKey,
+        llm_provider: BaseLLMProvider,
+        system_prompt: str,
+        model: str = None,
+) -> Tuple[List[Tuple[Sentence, str]], List[Sentence]]:
+    """
+    把多个句子打包成一次结构化JSON请求，按id把结果映射回句子。
+
+    整批响应不缓存（批次划分随句子变化），解析出的每个提示词按单句请求写入LLM缓存。
+
+    Args:
+        sentences (List[Sentence]): 同一批次的句子
+        api_key (APIKey): 当前使用的 API Key
+        llm_provider (BaseLLMProvider): LLM 提供商实例
+        system_prompt (str): 系统指令提示词
+        model (str): 模型名称
+
+    Returns:
+        Tuple: ([(句子对象, 提示词)], 需要逐句重试的句子列表)
+    """
+    model_name = resolve_model_name(api_key, model)
+    # 批次内用短序号作为id，比UUID节省token
+    id_map = {str(index): sentence for index, sentence in enumerate(sentences, start=1)}
+    payload = {"items": [{"id": item_id, "text": sentence.content} for item_id, sentence in id_map.items()]}
+
+    logger.info(f"[LLM] 批量处理句子: 数量={len(sentences)}, 模型={model_name}")
+    try:
+        response = await retry_with_backoff(
+            lambda: llm_provider.completions(
                 model=model_name,
                 messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": sentence.content},
+                    {"role": "system", "content": "\n".join(filter(None, [system_prompt, BATCH_INSTRUCTIONS]))},
+                    {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
                 ],
+                response_format={"type": "json_object"},
             )
-
-            # 提取生成内容
-            prompt = response.choices[0].message.content.strip()
-            logger.debug(f"[LLM] 生成完成: id={sentence.id}, prompt_len={len(prompt)}")
-
-            return sentence, prompt
-
-        except Exception as e:
-            logger.error(f"[LLM] 处理失败: sentence_id={sentence.id}, error={e}")
-            raise
+        )
+        prompts = parse_batch_results(response.choices[0].message.content or "")
+    except Exception as e:
+        logger.warning(f"[LLM] 批量请求失败，{len(sentences)} 个句子改为逐句处理: {e}")
+        return [], list(sentences)
+
+    results = [(sentence, prompts[item_id]) for item_id, sentence in id_map.items() if item_id in prompts]
+    missing = [sentence for item_id, sentence in id_map.items() if item_id not in prompts]
+    await asyncio.gather(*[
+        llm_cache.store(
+            api_key.provider, model_name, sentence_messages(system_prompt, sentence), prompt,
+            base_url=api_key.base_url,
+        )
+        for sentence, prompt in results
+    ])
+    if missing:
+        logger.warning(f"[LLM] 批量结果缺少 {len(missing)}/{len(sentences)} 个句子，改为逐句处理")
+    return results, missing
 
 
 # ============================================================
@@ -170,12 +339,71 @@ class PromptService(BaseService):
 
         return api_key
 
+    # ------------------------------------------------------------
+    # 工具方法：批量请求 + 逐句兜底
+    # ------------------------------------------------------------
+    async def _run_prompt_requests(self, sentences: List[Sentence], api_key: APIKey,
+                                   llm_provider: BaseLLMProvider, system_prompt: str, model: str = None,
+                                   use_cache: bool = True) -> list:
+        """
+        并发执行提示词请求：开启批量模式时先按单句缓存查找，未命中的句子按token预算打包，
+        解析失败的句子逐句重试。
+
+        Returns:
+            list: 每项为 (句子对象, 提示词) 或异常
+        """
+        results: list = []
+        pending = list(sentences)
+
+        if settings.PROMPT_BATCH_ENABLED and len(sentences) > 1:
+            if use_cache:
+                # 只有缓存未命中（内容有变化）的句子参与批量请求
+                model_name = resolve_model_name(api_key, model)
+                cached = await asyncio.gather(*[
+                    llm_cache.lookup(
+                        api_key.provider, model_name, sentence_messages(system_prompt, sentence),
+                        base_url=api_key.base_url,
+                    )
+                    for sentence in sentences
+                ])
+                results.extend(
+                    (sentence, content.strip()) for sentence, content in zip(sentences, cached) if content
+                )
+                pending = [sentence for sentence, content in zip(sentences, cached) if not content]
+
+            batches = pack_sentences(
+                pending,
+                token_budget=settings.PROMPT_BATCH_TOKEN_BUDGET,
+                max_items=settings.PROMPT_BATCH_MAX_ITEMS,
+                output_tokens_per_item=settings.PROMPT_BATCH_OUTPUT_TOKENS_PER_ITEM,
+            )
+            logger.info(
+                f"[LLM] 批量模式: {len(sentences)} 个句子，缓存命中 {len(sentences) - len(pending)} 个，"
+                f"其余打包为 {len(batches)} 个请求"
+            )
+            batch_results = await asyncio.gather(*[
+                process_batch(batch, api_key, llm_provider, system_prompt, model)
+                for batch in batches
+            ])
+            pending = []
+            for done, missing in batch_results:
+                results.extend(done)
+                pending.extend(missing)
+
+        # 逐句处理（未开启批量模式，或批量结果缺失的句子）
+        results.extend(await asyncio.gather(*[
+            process_sentence(sentence, api_key, llm_provider, system_prompt, model, use_cache)
+            for sentence in pending
+        ], return_exceptions=True))
+        return results
+
     # ------------------------------------------------------------
     # 核心共用逻辑：并发生成 + 保存数据库 + 更新状态
     # ------------------------------------------------------------
 
     async def _generate_prompts(self, sentences: List[Sentence], api_key: APIKey, style: str,
-                                update: bool = True, model: str = None, custom_prompt: str = None) -> dict:
+                                update: bool = True, model: str = None, custom_prompt: str = None,
+                                use_cache: bool = True) -> dict:
         """
         核心执行方法：批量生成提示词 + 写数据库 + 更新章节状态。
 
@@ -186,6 +414,7 @@ class PromptService(BaseService):
             update (bool): 是否更新章节，默认为 True
             model (str): 模型名称
             custom_prompt (str): 自定义系统提示词
+            use_cache (bool): 是否读取LLM缓存，为False时重新生成并覆盖缓存
             
         Returns:
             dict: 统计信息 {"total": int, "success": int, "failed": int}
@@ -195,22 +424,17 @@ class PromptService(BaseService):
         llm_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
-            max_concurrency=20,
+            api_key_id=api_key.id,
             base_url=api_key.base_url if api_key.base_url else None,
         )
 
-        # 建立并发信号量（限制同一时刻的 LLM 请求数量）
-        semaphore = asyncio.Semaphore(20)
-
-        # 构建所有句子的任务列表
-        tasks = [
-            process_sentence(sentence, api_key, llm_provider, custom_prompt, semaphore, model)
-            for sentence in sentences
-        ]
-
         logger.info(f"[LLM] 开始批量生成提示词，总数={len(sentences)}")
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        logger.info("[LLM] 所有句子处理完成")
+        results = await self._run_prompt_requests(sentences, api_key, llm_provider, custom_prompt, model, use_cache)
+        logger.info(
+            f"[LLM] 所有句子处理完成，限流统计: "
+            f"{provider_rate_limiter.get_stats(api_key.provider.lower(), api_key.get_api_key())}, "
+            f"缓存统计: {llm_cache.get_stats()}"
+        )
 
         # 统计成功和失败数量
         success_count = 0
@@ -259,9 +483,9 @@ class PromptService(BaseService):
     # 对外方法：按章节处理
     # ============================================================
 
-    async def generate_prompts_batch(self, chapter_id: str, api_key_id: str, style: str = "cinematic", model: str = None, custom_prompt: str = None) -> dict:
+    async def generate_prompts_batch(self, chapter_id: str, api_key_id: str, style: str = "cinematic", model: str = None, custom_prompt: str = None, refresh: bool = False) -> dict:
         """
-        批量生成提示词（按章节 ID 获取所有待处理句子）
+        批量生成提示词（按章节 ID 获取所有待处理句子），refresh 为 True 时不使用LLM缓存
         """
         # 查询章节句子
         chapter_service = ChapterService(self.db_session)
@@ -275,7 +499,7 @@ class PromptService(BaseService):
         api_key = await self._load_api_key(api_key_id, user_id)
 
         # 统一执行批量处理
-        return await self._generate_prompts(sentences, api_key, style, True, model, custom_prompt)
+        return await self._generate_prompts(sentences, api_key, style, True, model, custom_prompt, use_cache=not refresh)
 
     # ============================================================
     # 对外方法：按句子 ID 数组处理
@@ -284,6 +508,8 @@ class PromptService(BaseService):
     async def generate_prompts_by_ids(self, sentence_ids: List[str], api_key_id: str, style: str = "cinematic", model: str = None, custom_prompt: str = None) -> dict:
         """
         批量生成提示词（按句子 ID 列表处理）
+
+        用于"重新生成提示词"，总是调用LLM并覆盖缓存，否则会返回与上次相同的结果。
         """
         # 根据 ID 查询句子
         stmt = select(Sentence).where(Sentence.id.in_(sentence_ids)).options(
@@ -305,7 +531,7 @@ class PromptService(BaseService):
         api_key = await self._load_api_key(api_key_id, user_id)
 
         # 执行批量生成
-        return await self._generate_prompts(sentences, api_key, style, False, model, custom_prompt)
+        return await self._generate_prompts(sentences, api_key, style, False, model, custom_prompt, use_cache=False)
 
 
 __all__ = ["PromptService"]
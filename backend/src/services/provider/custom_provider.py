@@ -1,12 +1,12 @@
 # src/services/providers/custom_provider.py
-import asyncio
 import aiohttp
 import json
-from typing import Any, Dict, List
-from openai import AsyncOpenAI
+from typing import Any, Dict, List, Optional
 
 from src.core.logging import get_logger
 from src.services.provider.base import BaseLLMProvider, log_provider_call
+from src.utils.http_client import get_aiohttp_session, get_openai_client
+from src.utils.rate_limiter import provider_rate_limiter
 
 logger = get_logger(__name__)
 
@@ -26,13 +26,14 @@ class CustomProvider(BaseLLMProvider):
     def __init__(
         self,
         api_key: str,
-        max_concurrency: int = 5,
         base_url: str = "https://api.siliconflow.cn/v1",
+        api_key_id: Optional[str] = None,
     ):
-        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        self.client = get_openai_client("custom", api_key, base_url=base_url)
         self.base_url = base_url
         self.api_key = api_key
-        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # 跨worker进程限流按APIKey.id共享配额
+        self.api_key_id = api_key_id
 
     @log_provider_call("completions")
     async def completions(
@@ -42,8 +43,8 @@ class CustomProvider(BaseLLMProvider):
         调用 SiliconFlow chat.completions.create（纯粹透传）
         """
 
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        # 同一Key和模型的所有调用共享自适应并发限制
+        async with provider_rate_limiter.limit("custom", self.api_key, model, self.api_key_id):
             return await self.client.chat.completions.create(
                 model=model, messages=messages, **kwargs
             )
@@ -63,10 +64,10 @@ class CustomProvider(BaseLLMProvider):
             # 将 Gemini 响应包装成兼容格式
             return self._wrap_gemini_response(gemini_response)
 
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        model = model or "Kwai-Kolors/Kolors"
+        async with provider_rate_limiter.limit("custom", self.api_key, model, self.api_key_id):
             return await self.client.images.generate(
-                model=model or "Kwai-Kolors/Kolors", prompt=prompt, **kwargs
+                model=model, prompt=prompt, **kwargs
             )
 
     @log_provider_call("generate_audio")
@@ -77,8 +78,7 @@ class CustomProvider(BaseLLMProvider):
         调用 OpenAI audio.speech.create（纯粹透传）
         """
 
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        async with provider_rate_limiter.limit("custom", self.api_key, model, self.api_key_id):
             return await self.client.audio.speech.create(
                 model=model, voice=voice, input=input_text, **kwargs
             )
@@ -188,12 +188,12 @@ class CustomProvider(BaseLLMProvider):
                         logger.info(f"从存储直接读取参考图: {img_url[:30]}...")
                     else:
                         # 下载参考图并转 Base64
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(img_url, timeout=10) as resp:
-                                if resp.status == 200:
-                                    img_data = await resp.read()
-                                else:
-                                    logger.warning(f"下载参考图失败 HTTP {resp.status}: {img_url[:50]}...")
+                        session = get_aiohttp_session()
+                        async with session.get(img_url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                            if resp.status == 200:
+                                img_data = await resp.read()
+                            else:
+                                logger.warning(f"下载参考图失败 HTTP {resp.status}: {img_url[:50]}...")
                     
                     if img_data:
                         b64_img = base64.b64encode(img_data).decode('utf-8')
@@ -218,16 +218,18 @@ class CustomProvider(BaseLLMProvider):
             "generationConfig": {"responseModalities": ["IMAGE"], "imageConfig": {"aspectRatio": aspectRatio,"imageSize": imageSize}},
         }   
 
-        async with self.semaphore:  # 控制最大并发
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url, json=payload, headers={"Content-Type": "application/json"}
-                ) as resp:
-                    if resp.status != 200:
-                        error_text = await resp.text()
-                        logger.error(f"Gemini API Error: {error_text}")
-                        raise ValueError(f"Gemini API 请求失败: {resp.status} - {error_text}")
-                        
-                    result = await resp.text()
-                    return json.loads(result)
+        # aiohttp请求不经过httpx响应钩子，手动把状态码和限流头交给槽位
+        async with provider_rate_limiter.limit("custom", self.api_key, "gemini-3-pro-image-preview", self.api_key_id) as slot:
+            session = get_aiohttp_session()
+            async with session.post(
+                url, json=payload, headers={"Content-Type": "application/json"}
+            ) as resp:
+                slot.observe(resp.status, resp.headers)
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    logger.error(f"Gemini API Error: {error_text}")
+                    raise ValueError(f"Gemini API 请求失败: {resp.status} - {error_text}")
+
+                result = await resp.text()
+                return json.loads(result)
 
@@ -1,10 +1,10 @@
 # src/services/providers/deepseek_provider.py
 
-import asyncio
-from typing import Any, Dict, List
-from openai import AsyncOpenAI
+from typing import Any, Dict, List, Optional
 
 from src.core.logging import get_logger
+from src.utils.http_client import get_openai_client
+from src.utils.rate_limiter import provider_rate_limiter
 from .base import BaseLLMProvider, log_provider_call
 
 logger = get_logger(__name__)
@@ -15,13 +15,16 @@ class DeepSeekProvider(BaseLLMProvider):
     DeepSeek 官方 API，兼容 OpenAI Protocol
     """
 
-    def __init__(self, api_key: str, max_concurrency: int = 5):
-        self.client = AsyncOpenAI(
-            api_key=api_key,
+    def __init__(self, api_key: str, api_key_id: Optional[str] = None):
+        self.client = get_openai_client(
+            "deepseek",
+            api_key,
             base_url="https://api.deepseek.com",
             timeout=300.0  # 5分钟超时
         )
-        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.api_key = api_key
+        # 跨worker进程限流按APIKey.id共享配额
+        self.api_key_id = api_key_id
 
     @log_provider_call("completions")
     async def completions(
@@ -30,7 +33,7 @@ class DeepSeekProvider(BaseLLMProvider):
             messages: List[Dict[str, Any]],
             **kwargs: Any
     ):
-        async with self.semaphore:
+        async with provider_rate_limiter.limit("deepseek", self.api_key, model, self.api_key_id):
             return await self.client.chat.completions.create(
                 model=model,
                 messages=messages,
@@ -48,10 +51,10 @@ class DeepSeekProvider(BaseLLMProvider):
         调用 DeepSeek images.generate（纯粹透传）
         """
         
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        model = model or "deepseek-r1"
+        async with provider_rate_limiter.limit("deepseek", self.api_key, model, self.api_key_id):
             return await self.client.images.generate(
-                model=model or "deepseek-r1",
+                model=model,
                 prompt=prompt,
                 **kwargs
             )
@@ -13,21 +13,22 @@ class ProviderFactory:
     @staticmethod
     def create(provider: str, api_key: str, **kwargs) -> BaseLLMProvider:
         provider = provider.lower()
+        # APIKey.id 用作跨worker进程的限流键
+        api_key_id = kwargs.get("api_key_id")
 
         match provider:
             case "openai":
-                return OpenAIProvider(api_key, kwargs.get("max_concurrency", 5))
+                return OpenAIProvider(api_key, api_key_id=api_key_id)
             case "deepseek":
-                return DeepSeekProvider(api_key, kwargs.get("max_concurrency", 5))
+                return DeepSeekProvider(api_key, api_key_id=api_key_id)
             case "volcengine":
-                return VolcengineProvider(api_key, kwargs.get("max_concurrency", 5))
+                return VolcengineProvider(api_key, api_key_id=api_key_id)
             case "siliconflow":
-                return SiliconFlowProvider(api_key, kwargs.get("max_concurrency", 5))
+                return SiliconFlowProvider(api_key, api_key_id=api_key_id)
             case "custom":
-                return CustomProvider(api_key, kwargs.get("max_concurrency", 5),
-                                      kwargs.get("base_url", "https://api.siliconflow.cn/v1"))
+                return CustomProvider(api_key, kwargs.get("base_url", "https://api.siliconflow.cn/v1"), api_key_id)
             case "vectorengine":
                 from .vector_engine_provider import VectorEngineProvider
-                return VectorEngineProvider(api_key, kwargs.get("base_url", "https://api.vectorengine.ai/v1")) # type: ignore
+                return VectorEngineProvider(api_key, kwargs.get("base_url", "https://api.vectorengine.ai/v1"), api_key_id) # type: ignore
             case _:
                 raise ValueError(f"未知 provider: {provider}")
@@ -1,11 +1,11 @@
 # src/services/providers/openai_provider.py
 
-import asyncio
-from typing import Any, Dict, List
-from openai import AsyncOpenAI
+from typing import Any, Dict, List, Optional
 
 from src.core.logging import get_logger
 from src.services.provider.base import BaseLLMProvider, log_provider_call
+from src.utils.http_client import get_openai_client
+from src.utils.rate_limiter import provider_rate_limiter
 
 logger = get_logger(__name__)
 
@@ -22,9 +22,12 @@ class OpenAIProvider(BaseLLMProvider):
     只提供 completions() 接口 → 等同于一个可并发的 OpenAI SDK wrapper
     """
 
-    def __init__(self, api_key: str, max_concurrency: int = 5):
-        self.client = AsyncOpenAI(api_key=api_key)
-        self.semaphore = asyncio.Semaphore(max_concurrency)
+    def __init__(self, api_key: str, api_key_id: Optional[str] = None):
+        # 复用进程级客户端和连接池，避免每次创建Provider都重新握手
+        self.client = get_openai_client("openai", api_key)
+        self.api_key = api_key
+        # 跨worker进程限流按APIKey.id共享配额
+        self.api_key_id = api_key_id
 
     @log_provider_call("completions")
     async def completions(
@@ -37,8 +40,8 @@ class OpenAIProvider(BaseLLMProvider):
         调用 OpenAI chat.completions.create（纯粹透传）
         """
 
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        # 同一Key和模型的所有调用共享自适应并发限制
+        async with provider_rate_limiter.limit("openai", self.api_key, model, self.api_key_id):
             return await self.client.chat.completions.create(
                 model=model,
                 messages=messages,
@@ -56,10 +59,10 @@ class OpenAIProvider(BaseLLMProvider):
         调用 OpenAI images.generate（纯粹透传）
         """
         
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        model = model or "dall-e-3"
+        async with provider_rate_limiter.limit("openai", self.api_key, model, self.api_key_id):
             return await self.client.images.generate(
-                model=model or "dall-e-3",
+                model=model,
                 prompt=prompt,
                 **kwargs
             )
@@ -75,8 +78,7 @@ class OpenAIProvider(BaseLLMProvider):
         调用 OpenAI audio.speech.create（纯粹透传）
         """
         
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        async with provider_rate_limiter.limit("openai", self.api_key, model, self.api_key_id):
             return await self.client.audio.speech.create(
                 model=model,
                 voice=voice,
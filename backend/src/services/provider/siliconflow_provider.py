@@ -1,11 +1,11 @@
 # src/services/providers/siliconflow_provider.py
 
-import asyncio
-from typing import Any, Dict, List
-from openai import AsyncOpenAI
+from typing import Any, Dict, List, Optional
 
 from src.core.logging import get_logger
 from src.services.provider.base import BaseLLMProvider, log_provider_call
+from src.utils.http_client import get_openai_client
+from src.utils.rate_limiter import provider_rate_limiter
 
 logger = get_logger(__name__)
 
@@ -22,17 +22,25 @@ class SiliconFlowProvider(BaseLLMProvider):
     只提供 completions() 和 generate_image() 接口 → 等同于一个可并发的 SiliconFlow SDK wrapper
     """
 
-    def __init__(self, api_key: str, max_concurrency: int = 5, base_url: str = "https://api.siliconflow.cn/v1"):
+    def __init__(
+            self,
+            api_key: str,
+            base_url: str = "https://api.siliconflow.cn/v1",
+            api_key_id: Optional[str] = None
+    ):
         # 规范化 base_url: 确保以斜杠结尾
         if not base_url.endswith('/'):
             base_url = base_url + '/'
         
-        self.client = AsyncOpenAI(
-            api_key=api_key,
+        self.client = get_openai_client(
+            "siliconflow",
+            api_key,
             base_url=base_url,
             timeout=300.0  # 5分钟超时
         )
-        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.api_key = api_key
+        # 跨worker进程限流按APIKey.id共享配额
+        self.api_key_id = api_key_id
 
     @log_provider_call("completions")
     async def completions(
@@ -45,8 +53,8 @@ class SiliconFlowProvider(BaseLLMProvider):
         调用 SiliconFlow chat.completions.create（纯粹透传）
         """
 
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        # 同一Key和模型的所有调用共享自适应并发限制
+        async with provider_rate_limiter.limit("siliconflow", self.api_key, model, self.api_key_id):
             return await self.client.chat.completions.create(
                 model=model,
                 messages=messages,
@@ -64,10 +72,10 @@ class SiliconFlowProvider(BaseLLMProvider):
         调用 SiliconFlow images.generate（纯粹透传）
         """
 
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        model = model or "Kwai-Kolors/Kolors"
+        async with provider_rate_limiter.limit("siliconflow", self.api_key, model, self.api_key_id):
             return await self.client.images.generate(
-                model=model or "Kwai-Kolors/Kolors",
+                model=model,
                 prompt=prompt,
                 **kwargs
             )
@@ -84,8 +92,7 @@ class SiliconFlowProvider(BaseLLMProvider):
         调用 OpenAI audio.speech.create（纯粹透传）
         """
 
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        async with provider_rate_limiter.limit("siliconflow", self.api_key, model, self.api_key_id):
             return await self.client.audio.speech.create(
                 model=model,
                 voice=voice,
@@ -2,6 +2,8 @@ import httpx
 from typing import List, Optional, Dict, Any
 from src.core.logging import get_logger
 from src.services.provider.base import log_provider_call
+from src.utils.http_client import get_httpx_client
+from src.utils.rate_limiter import provider_rate_limiter
 
 logger = get_logger(__name__)
 
@@ -11,8 +13,15 @@ class VectorEngineProvider:
     专门用于视频生成任务
     """
 
-    def __init__(self, api_key: str, base_url: str = "https://api.vectorengine.ai/v1"):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.vectorengine.ai/v1",
+        api_key_id: Optional[str] = None
+    ):
         self.api_key = api_key
+        # 跨worker进程限流按APIKey.id共享配额
+        self.api_key_id = api_key_id
         self.base_url = base_url
         self.headers = {
             "Authorization": f"Bearer {api_key}",
@@ -45,17 +54,20 @@ class VectorEngineProvider:
         }
         payload.update(kwargs)
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(url, headers=self.headers, json=payload)
+        # 使用进程级共享连接池，轮询状态时复用同一条长连接
+        client = get_httpx_client()
+        try:
+            # 创建任务受自适应限流控制，状态查询是轻量请求不占用槽位
+            async with provider_rate_limiter.limit("vectorengine", self.api_key, model, self.api_key_id):
+                response = await client.post(url, headers=self.headers, json=payload, timeout=self.timeout)
                 response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Vector Engine Create Failed: {e.response.text}")
-                raise
-            except Exception as e:
-                logger.error(f"Vector Engine Create Error: {e}")
-                raise
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Vector Engine Create Failed: {e.response.text}")
+            raise
+        except Exception as e:
+            logger.error(f"Vector Engine Create Error: {e}")
+            raise
 
     @log_provider_call("get_task_status")
     async def get_task_status(self, task_id: str) -> Dict[str, Any]:
@@ -63,14 +75,14 @@ class VectorEngineProvider:
         查询任务状态
         """
         url = f"{self.base_url}/videos/{task_id}"
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                logger.error(f"Vector Engine Query Status Failed: {e}")
-                raise
+        client = get_httpx_client()
+        try:
+            response = await client.get(url, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Vector Engine Query Status Failed: {e}")
+            raise
 
     @log_provider_call("get_video_content")
     async def get_video_content(self, task_id: str) -> Dict[str, Any]:
@@ -78,11 +90,11 @@ class VectorEngineProvider:
         获取视频内容（包含下载链接）
         """
         url = f"{self.base_url}/videos/{task_id}/content"
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                logger.error(f"Vector Engine Get Content Failed: {e}")
-                raise
+        client = get_httpx_client()
+        try:
+            response = await client.get(url, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Vector Engine Get Content Failed: {e}")
+            raise
@@ -1,10 +1,10 @@
 # src/services/providers/volcengine_provider.py
 
-import asyncio
-from typing import Any, Dict, List
-from openai import AsyncOpenAI
+from typing import Any, Dict, List, Optional
 
 from src.core.logging import get_logger
+from src.utils.http_client import get_openai_client
+from src.utils.rate_limiter import provider_rate_limiter
 from .base import BaseLLMProvider, log_provider_call
 
 logger = get_logger(__name__)
@@ -20,14 +20,17 @@ class VolcengineProvider(BaseLLMProvider):
         https://ark.cn-beijing.volces.com/api/v3
     """
 
-    def __init__(self, api_key: str, max_concurrency: int = 5):
+    def __init__(self, api_key: str, api_key_id: Optional[str] = None):
         # 关键：使用 OpenAI SDK，设置 base_url
-        self.client = AsyncOpenAI(
-            api_key=api_key,
+        self.client = get_openai_client(
+            "volcengine",
+            api_key,
             base_url="https://ark.cn-beijing.volces.com/api/v3",
             timeout=300.0  # 5分钟超时
         )
-        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.api_key = api_key
+        # 跨worker进程限流按APIKey.id共享配额
+        self.api_key_id = api_key_id
 
     @log_provider_call("completions")
     async def completions(
@@ -39,7 +42,7 @@ class VolcengineProvider(BaseLLMProvider):
         """
         调用火山方舟兼容 OpenAI 的 completions 接口
         """
-        async with self.semaphore:
+        async with provider_rate_limiter.limit("volcengine", self.api_key, model, self.api_key_id):
             return await self.client.chat.completions.create(
                 model=model,
                 messages=messages,
@@ -57,10 +60,10 @@ class VolcengineProvider(BaseLLMProvider):
         调用火山方舟兼容 OpenAI 的 images.generate 接口
         """
         
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        model = model or "volcengine-image-model"
+        async with provider_rate_limiter.limit("volcengine", self.api_key, model, self.api_key_id):
             return await self.client.images.generate(
-                model=model or "volcengine-image-model",
+                model=model,
                 prompt=prompt,
                 **kwargs
             )
@@ -77,8 +80,7 @@ class VolcengineProvider(BaseLLMProvider):
         调用 OpenAI audio.speech.create（纯粹透传）
         """
 
-        # 用 semaphore 限制并发
-        async with self.semaphore:
+        async with provider_rate_limiter.limit("volcengine", self.api_key, model, self.api_key_id):
             return await self.client.audio.speech.create(
                 model=model,
                 voice=voice,
@@ -0,0 +1,329 @@
+"""
+句子视频渲染缓存 - 按渲染输入内容寻址
+
+负责:
+- 根据图片/音频内容哈希、句子文本（决定字幕时间轴）和渲染相关设置计算缓存键
+- 在MinIO的 render_cache/ 前缀下查找、写入单句视频，跨项目共享相同输入的渲染结果
+- 统计命中/未命中次数
+- 按TTL和总大小上限（最近访问时间优先保留）淘汰缓存对象
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.services.material_service import resolve_object_key
+from src.utils.storage import get_storage_client
+
+logger = get_logger(__name__)
+
+# 缓存对象前缀
+RENDER_CACHE_PREFIX = "render_cache/sentence_videos"
+
+# 渲染流程（FFmpeg命令、字幕渲染等）发生不兼容变化时递增，使旧缓存全部失效
+RENDER_CACHE_VERSION = 1
+
+# 批量查找缓存时同时进行的对象存储请求数（每个句子2次素材stat + 1次缓存stat）
+LOOKUP_CONCURRENCY = 16
+
+# 影响单句视频渲染结果的 gen_setting 键（拼接、配乐、变速等章节级设置不影响单句视频）
+RENDER_SETTING_KEYS = (
+    "resolution",
+    "fps",
+    "video_codec",
+    "audio_codec",
+    "audio_bitrate",
+    "zoom_speed",
+    "subtitle_renderer",
+    "subtitle_timing",
+    "subtitle_style",
+)
+
+
+class SentenceRenderCache:
+    """按内容寻址的句子视频渲染缓存"""
+
+    def __init__(
+            self,
+            prefix: str = RENDER_CACHE_PREFIX,
+            ttl_days: int = 30,
+            max_bytes: Optional[int] = None,
+            touch_interval_hours: int = 24
+    ):
+        """
+        初始化渲染缓存
+
+        Args:
+            prefix: MinIO对象前缀
+            ttl_days: 超过该天数未被访问的对象会被淘汰
+            max_bytes: 缓存总大小上限（字节，可选）
+            touch_interval_hours: 命中时刷新访问时间的最小间隔（小时）
+        """
+        self.prefix = prefix.rstrip("/")
+        self.ttl = timedelta(days=ttl_days)
+        self.max_bytes = max_bytes
+        self.touch_interval = timedelta(hours=touch_interval_hours)
+        self.storage_client = None
+
+        # 累计统计
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evicted_objects = 0
+        self._evicted_bytes = 0
+
+    async def _get_storage_client(self):
+        """获取存储客户端"""
+        if self.storage_client is None:
+            self.storage_client = await get_storage_client()
+        return self.storage_client
+
+    def object_key(self, cache_key: str) -> str:
+        """缓存键对应的MinIO对象键（按前两位分目录）"""
+        return f"{self.prefix}/{cache_key[:2]}/{cache_key}.mp4"
+
+    async def _content_hash(self, object_key_or_url: str) -> Optional[str]:
+        """
+        获取素材的内容哈希
+
+        使用MinIO的ETag（内容MD5，分片上传时为分片MD5的摘要），无需下载素材本身
+        """
+        storage = await self._get_storage_client()
+        stat = await storage.stat_file(resolve_object_key(object_key_or_url))
+        if not stat or not stat.get("etag"):
+            return None
+        return str(stat["etag"]).strip('"')
+
+    async def compute_key(
+            self,
+            sentence,
+            gen_setting: dict,
+            correction_model: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        计算句子视频的缓存键
+
+        字幕时间轴由音频和句子文本（以及LLM纠错模型）唯一决定，因此用它们代替时间轴本身参与哈希，
+        无需先运行语音识别即可判断是否命中。
+
+        Args:
+            sentence: 句子对象（需要 image_url、audio_url、content）
+            gen_setting: 生成设置
+            correction_model: LLM字幕纠错使用的模型（未纠错时为None）
+
+        Returns:
+            缓存键（sha256十六进制），素材信息获取失败时返回None
+        """
+        try:
+            image_hash, audio_hash = await asyncio.gather(
+                self._content_hash(sentence.image_url),
+                self._content_hash(sentence.audio_url),
+            )
+        except Exception as e:
+            logger.warning(f"获取素材内容哈希失败，跳过渲染缓存: {sentence.id}, 错误: {e}")
+            return None
+
+        if not image_hash or not audio_hash:
+            return None
+
+        payload = {
+            "version": RENDER_CACHE_VERSION,
+            "image": image_hash,
+            "audio": audio_hash,
+            "text": sentence.content,
+            "correction_model": correction_model,
+            "settings": {key: gen_setting.get(key) for key in RENDER_SETTING_KEYS},
+        }
+        encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def lookup(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        查找缓存
+
+        命中且距上次访问超过 touch_interval 时刷新对象的修改时间，作为LRU淘汰依据。
+
+        Args:
+            cache_key: 缓存键
+
+        Returns:
+            {"object_key", "duration"}，未命中返回None
+        """
+        storage = await self._get_storage_client()
+        object_key = self.object_key(cache_key)
+        stat = await storage.stat_file(object_key)
+
+        if not stat:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+
+        last_modified = stat.get("last_modified")
+        if last_modified and datetime.now(timezone.utc) - last_modified > self.touch_interval:
+            await storage.touch_file(object_key)
+
+        metadata = {key.lower(): value for key, value in (stat.get("metadata") or {}).items()}
+        duration = metadata.get("x-amz-meta-duration")
+
+        return {
+            "object_key": object_key,
+            "duration": int(float(duration)) if duration else None,
+        }
+
+    async def lookup_sentences(
+            self,
+            sentences: List[Any],
+            gen_setting: dict,
+            correction_model: Optional[str] = None,
+            concurrency: int = LOOKUP_CONCURRENCY
+    ) -> List[Tuple[Optional[str], Optional[Dict[str, Any]]]]:
+        """
+        并发计算一批句子的缓存键并查找缓存
+
+        已有视频且被标记为需要重新生成（needs_regeneration）的句子只计算缓存键，不复用缓存，
+        重新渲染后的结果会覆盖同一缓存对象。
+
+        Args:
+            sentences: 句子列表
+            gen_setting: 生成设置
+            correction_model: LLM字幕纠错使用的模型（未纠错时为None）
+            concurrency: 同时处理的句子数
+
+        Returns:
+            与句子一一对应的 (缓存键, 缓存信息)，无缓存键或未命中时对应项为None
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def lookup_one(sentence) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+            async with semaphore:
+                cache_key = await self.compute_key(sentence, gen_setting, correction_model)
+                if not cache_key:
+                    return None, None
+                if sentence.sentence_video_key and sentence.needs_regeneration:
+                    return cache_key, None
+                return cache_key, await self.lookup(cache_key)
+
+        return list(await asyncio.gather(*(lookup_one(sentence) for sentence in sentences)))
+
+    async def store(
+            self,
+            cache_key: str,
+            video_path: Path,
+            user_id: str,
+            duration: int
+    ) -> str:
+        """
+        写入缓存
+
+        Args:
+            cache_key: 缓存键
+            video_path: 本地视频路径
+            user_id: 首次生成该视频的用户ID
+            duration: 视频时长（秒）
+
+        Returns:
+            MinIO对象键
+        """
+        storage = await self._get_storage_client()
+        object_key = self.object_key(cache_key)
+
+        await storage.upload_file_from_path(
+            user_id=user_id,
+            file_path=str(video_path),
+            original_filename=f"{cache_key}.mp4",
+            object_key=object_key,
+            metadata={"content_type": "video/mp4", "duration": str(duration)}
+        )
+
+        self._stores += 1
+        logger.info(f"✅ 句子视频已写入渲染缓存: {object_key}")
+        return object_key
+
+    async def evict(self) -> Dict[str, int]:
+        """
+        淘汰缓存对象
+
+        1. 删除超过TTL未被访问的对象
+        2. 总大小仍超过上限时，按最近访问时间从旧到新删除
+
+        Returns:
+            淘汰统计
+        """
+        storage = await self._get_storage_client()
+        objects = await storage.list_object_stats(f"{self.prefix}/")
+        now = datetime.now(timezone.utc)
+
+        expired = [obj for obj in objects if obj["last_modified"] and now - obj["last_modified"] > self.ttl]
+        remaining = [obj for obj in objects if obj not in expired]
+        to_delete = list(expired)
+
+        total_bytes = sum(obj["size"] for obj in remaining)
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            oldest_first = sorted(
+                remaining,
+                key=lambda obj: obj["last_modified"] or datetime.min.replace(tzinfo=timezone.utc)
+            )
+            for obj in oldest_first:
+                if total_bytes <= self.max_bytes:
+                    break
+                to_delete.append(obj)
+                total_bytes -= obj["size"]
+
+        deleted = 0
+        freed_bytes = 0
+        for obj in to_delete:
+            if await storage.delete_file(obj["object_key"]):
+                deleted += 1
+                freed_bytes += obj["size"]
+
+        self._evicted_objects += deleted
+        self._evicted_bytes += freed_bytes
+
+        result = {
+            "scanned": len(objects),
+            "deleted": deleted,
+            "freed_bytes": freed_bytes,
+            "remaining_bytes": sum(obj["size"] for obj in objects) - freed_bytes,
+        }
+        logger.info(f"渲染缓存淘汰完成: {result}")
+        return result
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取累计统计信息
+
+        Returns:
+            统计字典
+        """
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "stores": self._stores,
+            "evicted_objects": self._evicted_objects,
+            "evicted_bytes": self._evicted_bytes,
+        }
+
+
+# 创建全局实例（可通过 RENDER_CACHE_* 配置）
+render_cache = SentenceRenderCache(
+    ttl_days=settings.RENDER_CACHE_TTL_DAYS,
+    max_bytes=settings.RENDER_CACHE_MAX_BYTES,
+    touch_interval_hours=settings.RENDER_CACHE_TOUCH_INTERVAL_HOURS,
+)
+
+__all__ = [
+    "LOOKUP_CONCURRENCY",
+    "RENDER_CACHE_PREFIX",
+    "RENDER_CACHE_VERSION",
+    "RENDER_SETTING_KEYS",
+    "SentenceRenderCache",
+    "render_cache",
+]
@@ -6,6 +6,7 @@ from typing import Optional, Dict, Any
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload, joinedload
 
+from src.core.config import settings
 from src.core.logging import get_logger
 from src.models.movie import MovieScene, MovieScript
 from src.models.chapter import Chapter
@@ -34,7 +35,7 @@ async def _generate_scene_image_worker(
         user_id: 用户ID
         api_key: API密钥对象
         model: 模型名称
-        semaphore: 并发控制信号量
+        semaphore: 并发控制信号量（限制同时占用的数据库会话数）
     
     Returns:
         是否成功
@@ -73,6 +74,7 @@ async def _generate_scene_image_worker(
                 provider = ProviderFactory.create(
                     provider=api_key.provider,
                     api_key=api_key.get_api_key(),
+                    api_key_id=api_key.id,
                     base_url=api_key.base_url
                 )
                 
@@ -238,7 +240,8 @@ class SceneImageService(BaseService):
         
         # 3. 筛选待处理任务 - 只生成缺少场景图的场景
         tasks = []
-        semaphore = asyncio.Semaphore(20)
+        # 每个worker占用一个数据库会话，限制同时处理的场景数；API并发由自适应限流器控制
+        semaphore = asyncio.Semaphore(settings.MOVIE_SCENE_CONCURRENCY)
         
         for scene in script.scenes:
             # 检查是否需要生成场景图
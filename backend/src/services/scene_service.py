@@ -12,6 +12,7 @@ from src.models.chapter import Chapter
 from src.services.base import BaseService
 from src.services.provider.factory import ProviderFactory
 from src.services.api_key import APIKeyService
+from src.utils.llm_cache import llm_cache
 
 logger = get_logger(__name__)
 
@@ -26,7 +27,8 @@ class SceneService(BaseService):
         chapter_id: str, 
         api_key_id: str, 
         model: str = None,
-        on_progress: Callable[[float, str], Any] = None
+        on_progress: Callable[[float, str], Any] = None,
+        refresh: bool = False
     ) -> MovieScript:
         """
         从章节提取场景
@@ -36,6 +38,7 @@ class SceneService(BaseService):
             api_key_id: API Key ID
             model: 模型名称
             on_progress: 进度回调函数
+            refresh: 是否忽略LLM缓存重新提取（已有剧本时视为重新提取）
             
         Returns:
             MovieScript: 生成的剧本对象（只包含场景，不包含分镜）
@@ -61,6 +64,7 @@ class SceneService(BaseService):
         llm_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
 
@@ -72,6 +76,7 @@ class SceneService(BaseService):
         stmt = select(MovieScript).where(MovieScript.chapter_id == chapter.id)
         result = await self.db_session.execute(stmt)
         existing_scripts = result.scalars().all()
+        use_cache = not (refresh or existing_scripts)
         
         if existing_scripts:
             logger.info(f"检测到章节 {chapter_id} 已有 {len(existing_scripts)} 个剧本，将全部删除")
@@ -98,13 +103,17 @@ class SceneService(BaseService):
             )
 
             # 调用LLM
-            response = await llm_provider.completions(
+            response = await llm_cache.completions(
+                llm_provider,
+                api_key.provider,
                 model=model,
                 messages=[
                     {"role": "system", "content": "你是一个专业的电影场景提取专家。只输出JSON。"},
                     {"role": "user", "content": prompt},
                 ],
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                base_url=api_key.base_url,
+                use_cache=use_cache
             )
 
             content = response.choices[0].message.content.strip()
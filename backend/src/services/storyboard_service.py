@@ -13,6 +13,7 @@ from src.models.movie import MovieScript, MovieScene, MovieShot, MovieCharacter
 from src.services.base import BaseService
 from src.services.provider.factory import ProviderFactory
 from src.services.api_key import APIKeyService
+from src.utils.llm_cache import llm_cache
 
 logger = get_logger(__name__)
 
@@ -26,7 +27,8 @@ class StoryboardService(BaseService):
         self,
         scene_id: str,
         api_key_id: str,
-        model: str = None
+        model: str = None,
+        refresh: bool = False
     ) -> List[MovieShot]:
         """
         从单个场景提取分镜
@@ -35,6 +37,7 @@ class StoryboardService(BaseService):
             scene_id: 场景ID
             api_key_id: API Key ID
             model: 模型名称
+            refresh: 是否忽略LLM缓存重新提取
             
         Returns:
             List[MovieShot]: 生成的分镜列表
@@ -64,6 +67,7 @@ class StoryboardService(BaseService):
         llm_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
 
@@ -77,13 +81,17 @@ class StoryboardService(BaseService):
         )
 
         # 6. 调用LLM
-        response = await llm_provider.completions(
+        response = await llm_cache.completions(
+            llm_provider,
+            api_key.provider,
             model=model,
             messages=[
                 {"role": "system", "content": "你是一个专业的电影分镜提取专家。只输出JSON。"},
                 {"role": "user", "content": prompt},
             ],
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            base_url=api_key.base_url,
+            use_cache=not refresh
         )
 
         content = response.choices[0].message.content.strip()
@@ -146,8 +154,8 @@ class StoryboardService(BaseService):
             await self.db_session.flush()
             logger.info(f"场景 {scene_id} 的现有分镜已删除")
 
-        # 3. 调用现有的提取方法生成新分镜
-        created_shots = await self.extract_shots_from_scene(scene_id, api_key_id, model)
+        # 3. 调用现有的提取方法生成新分镜（重新提取不使用LLM缓存）
+        created_shots = await self.extract_shots_from_scene(scene_id, api_key_id, model, refresh=True)
         
         logger.info(f"场景 {scene_id} 重新提取完成，生成 {len(created_shots)} 个分镜")
         return created_shots
@@ -158,7 +166,8 @@ class StoryboardService(BaseService):
         script_id: str,
         api_key_id: str,
         model: str = None,
-        max_concurrent: int = 3
+        max_concurrent: int = 3,
+        refresh: bool = False
     ) -> Dict[str, Any]:
         """
         批量从剧本的所有场景提取分镜
@@ -168,6 +177,7 @@ class StoryboardService(BaseService):
             api_key_id: API Key ID
             model: 模型名称
             max_concurrent: 最大并发数
+            refresh: 是否忽略LLM缓存重新提取（已有分镜时视为重新提取）
             
         Returns:
             Dict: 统计信息 {success: int, failed: int, total: int}
@@ -184,6 +194,7 @@ class StoryboardService(BaseService):
 
         # 2. 在删除前先提取场景ID列表和场景描述
         scene_data = [(str(scene.id), scene.scene) for scene in script.scenes]
+        use_cache = not (refresh or any(scene.shots for scene in script.scenes))
         
         # 3. 删除所有现有分镜（会级联删除关键帧）
         logger.info(f"开始删除现有分镜...")
@@ -226,6 +237,7 @@ class StoryboardService(BaseService):
                     llm_provider = ProviderFactory.create(
                         provider=api_key.provider,
                         api_key=api_key.get_api_key(),
+                        api_key_id=api_key.id,
                         base_url=api_key.base_url
                     )
 
@@ -239,13 +251,17 @@ class StoryboardService(BaseService):
                     )
 
                     # 调用LLM
-                    response = await llm_provider.completions(
+                    response = await llm_cache.completions(
+                        llm_provider,
+                        api_key.provider,
                         model=model,
                         messages=[
                             {"role": "system", "content": "你是一个专业的电影分镜提取专家。只输出JSON。"},
                             {"role": "user", "content": prompt}
                         ],
-                        response_format={"type": "json_object"}
+                        response_format={"type": "json_object"},
+                        base_url=api_key.base_url,
+                        use_cache=use_cache
                     )
 
                     # 解析结果
@@ -2,34 +2,65 @@
 字幕服务 - 处理字幕生成、时间轴和LLM纠错
 
 负责:
-- 使用Whisper生成字幕时间轴
+- 使用Whisper生成字幕时间轴（同步/异步，完整识别或原文强制对齐）
 - 使用LLM纠正字幕中的错别字
 - 创建FFmpeg字幕滤镜
 - 文本分割和格式化
 """
 
 import re
+from pathlib import Path
 from typing import Dict, List, Optional
 
 from src.core.logging import get_logger
 from src.models import APIKey
 from src.services.faster_whisper_service import transcription_service
 from src.services.provider.factory import ProviderFactory
-from src.utils.ffmpeg_utils import get_audio_duration
+from src.utils.ffmpeg_utils import get_audio_duration, get_audio_duration_async
 
 logger = get_logger(__name__)
 
+# 字幕渲染方式（gen_setting["subtitle_renderer"]）
+SUBTITLE_RENDERER_DRAWTEXT = "drawtext"
+SUBTITLE_RENDERER_ASS = "ass"
+
+# 字幕时间轴生成方式（gen_setting["subtitle_timing"]）
+# asr: Whisper完整识别（可选LLM纠错）；align: 将句子原文强制对齐到音频，无需识别和纠错
+SUBTITLE_TIMING_ASR = "asr"
+SUBTITLE_TIMING_ALIGN = "align"
+
+# 常用颜色名称到RGB的映射（与FFmpeg颜色名称一致）
+ASS_COLOR_NAMES = {
+    "white": "ffffff",
+    "black": "000000",
+    "yellow": "ffff00",
+    "red": "ff0000",
+    "green": "008000",
+    "blue": "0000ff",
+    "cyan": "00ffff",
+    "magenta": "ff00ff",
+    "orange": "ffa500",
+    "gray": "808080",
+    "grey": "808080",
+}
+
 
 class SubtitleService:
     """字幕服务 - 处理所有字幕相关操作"""
 
-    def generate_subtitle_timeline(self, audio_path: str, original_text: str) -> dict:
+    def generate_subtitle_timeline(
+            self,
+            audio_path: str,
+            original_text: str,
+            duration: Optional[float] = None
+    ) -> dict:
         """
         生成字幕时间轴
 
         Args:
             audio_path: 音频文件路径
             original_text: 原始句子文本（用于提示Whisper更好识别）
+            duration: 音频时长（秒，可选），已知时跳过ffprobe
 
         Returns:
             字幕数据，包含segments和duration
@@ -43,7 +74,8 @@ class SubtitleService:
             )
 
             # 获取音频时长
-            duration = get_audio_duration(audio_path) or 0
+            if duration is None:
+                duration = get_audio_duration(audio_path) or 0
 
             return {
                 "segments": results,
@@ -54,6 +86,72 @@ class SubtitleService:
             logger.error(f"生成字幕时间轴失败: {e}")
             raise
 
+    async def generate_subtitle_timeline_async(
+            self,
+            audio_path: str,
+            original_text: str,
+            duration: Optional[float] = None,
+            timing: str = SUBTITLE_TIMING_ASR
+    ) -> dict:
+        """
+        异步生成字幕时间轴
+
+        识别在Whisper识别池中执行，不阻塞事件循环，多个句子的识别可以与FFmpeg渲染重叠进行。
+        timing 为 align 时将原文强制对齐到音频，对齐失败（如音频超过30秒）时回退到完整识别。
+
+        Args:
+            audio_path: 音频文件路径
+            original_text: 原始句子文本（用于提示Whisper更好识别，对齐模式下为对齐文本）
+            duration: 音频时长（秒，可选），已知时跳过ffprobe
+            timing: 时间轴生成方式（asr 或 align）
+
+        Returns:
+            字幕数据，包含segments、duration和aligned（是否由原文对齐得到，无需再纠错）
+        """
+        try:
+            results = None
+            if timing == SUBTITLE_TIMING_ALIGN:
+                try:
+                    results = await transcription_service.align_async(audio_path, original_text)
+                except (ValueError, RuntimeError) as e:
+                    logger.warning(f"强制对齐失败，回退到完整识别: {e}")
+
+            aligned = results is not None
+            if not aligned:
+                results, srt_content = await transcription_service.transcribe_async(
+                    audio_path,
+                    output_format="json",
+                    initial_prompt=original_text
+                )
+
+            if duration is None:
+                duration = await get_audio_duration_async(audio_path) or 0
+
+            return {
+                "segments": results,
+                "duration": duration,
+                "aligned": aligned
+            }
+
+        except Exception as e:
+            logger.error(f"生成字幕时间轴失败: {e}")
+            raise
+
+    @staticmethod
+    def needs_llm_correction(gen_setting: dict) -> bool:
+        """
+        是否需要LLM纠正字幕
+
+        对齐模式直接使用原文，不存在识别错误
+
+        Args:
+            gen_setting: 生成设置
+
+        Returns:
+            是否需要纠错
+        """
+        return gen_setting.get("subtitle_timing", SUBTITLE_TIMING_ASR) != SUBTITLE_TIMING_ALIGN
+
     async def correct_subtitle_with_llm(
             self,
             subtitle_data: dict,
@@ -71,7 +169,7 @@ class SubtitleService:
             model: 模型名称（可选）
 
         Returns:
-            纠正后的字幕数据
+            纠正后的字幕数据（纠正成功时 corrected 为 True，失败时原样返回）
         """
         try:
             # 提取所有segment的文本
@@ -92,7 +190,7 @@ class SubtitleService:
             llm_provider = ProviderFactory.create(
                 provider=api_key.provider,
                 api_key=api_key.get_api_key(),
-                max_concurrency=1,
+                api_key_id=api_key.id,
                 base_url=api_key.base_url if api_key.base_url else None
             )
 
@@ -233,6 +331,7 @@ class SubtitleService:
                                 if old_word != new_word:
                                     logger.debug(f"[LLM纠错]   Word {i}: '{old_word}' -> '{new_word}'")
 
+            subtitle_data["corrected"] = True
             logger.info(f"[LLM纠错] 字幕时间轴纠正完成")
             return subtitle_data
 
@@ -288,142 +387,289 @@ class SubtitleService:
 
         return [line1, line2] if line2 else [line1]
 
-    def _add_subtitle_filter(
-            self,
-            filters: list,
-            words: list,
-            font_size: int,
-            color: str,
-            base_y_pos: int,
-            max_line_chars: int,
-            video_height: int
-    ) -> None:
+    def _split_subtitle_words(self, words: list, max_line_chars: int) -> List[str]:
         """
-        添加字幕滤镜，支持双行显示
-        
+        将一组词拆分为字幕行，支持双行显示
+
         Args:
-            filters: 滤镜列表
             words: 词列表，每个词包含 text, start, end
-            font_size: 字体大小
-            color: 字体颜色
-            base_y_pos: 基准Y坐标
             max_line_chars: 每行最大字符数
-            video_height: 视频高度
+
+        Returns:
+            字幕行列表（1行或2行）
         """
-        if not words:
-            return
-            
         # 合并所有词的文本
         full_text = "".join([w["text"] for w in words])
-        start_time = words[0]["start"]
-        end_time = words[-1]["end"]
-        
+
         # 计算总字符数
         total_len = len(full_text)
-        
+
         # 如果文本长度不超过单行最大长度，显示单行
         if total_len <= max_line_chars:
-            text_escaped = full_text.replace("'", "'\\\\\\''").replace(":", "\\:")
-            filter_str = (
-                f"drawtext="
-                f"text='{text_escaped}':"
-                f"fontsize={font_size}:"
-                f"fontcolor={color}:"
-                f"borderw=5:"
-                f"bordercolor=black:"
-                f"shadowcolor=black@0.7:"
-                f"shadowx=4:"
-                f"shadowy=4:"
-                f"box=1:"
-                f"boxcolor=black@0.65:"
-                f"boxborderw=20:"
-                f"x=(w-text_w)/2:"
-                f"y={base_y_pos}:"
-                f"enable='between(t,{start_time:.3f},{end_time:.3f})'"
-            )
-            filters.append(filter_str)
+            return [full_text]
+
+        # 文本过长，分成两行显示
+        # 智能分割：尽量在中间位置分割
+        mid_point = total_len // 2
+
+        # 在中间点附近找最佳分割位置（优先在词边界）
+        current_len = 0
+        for i, word in enumerate(words):
+            word_len = len(word["text"])
+            if current_len + word_len >= mid_point:
+                # 检查是在当前词之前还是之后分割更合适
+                if abs(current_len - mid_point) < abs(current_len + word_len - mid_point):
+                    split_index = i
+                else:
+                    split_index = i + 1
+                break
+            current_len += word_len
         else:
-            # 文本过长，分成两行显示
-            # 智能分割：尽量在中间位置分割
-            mid_point = total_len // 2
-            
-            # 在中间点附近找最佳分割位置（优先在词边界）
-            best_split = mid_point
-            current_len = 0
-            for i, word in enumerate(words):
-                word_len = len(word["text"])
-                if current_len + word_len >= mid_point:
-                    # 检查是在当前词之前还是之后分割更合适
-                    if abs(current_len - mid_point) < abs(current_len + word_len - mid_point):
-                        best_split = current_len
-                        split_index = i
-                    else:
-                        best_split = current_len + word_len
-                        split_index = i + 1
-                    break
-                current_len += word_len
+            split_index = len(words) // 2
+
+        # 分割文本
+        line1_text = "".join([w["text"] for w in words[:split_index]])
+        line2_text = "".join([w["text"] for w in words[split_index:]])
+
+        # 确保每行不超过最大长度
+        if len(line1_text) > max_line_chars:
+            line1_text = line1_text[:max_line_chars]
+        if len(line2_text) > max_line_chars:
+            line2_text = line2_text[:max_line_chars]
+
+        return [line1_text, line2_text]
+
+    def _add_subtitle_event(self, events: list, words: list, max_line_chars: int) -> None:
+        """
+        根据词级时间轴添加一条字幕事件（可能是双行）
+
+        Args:
+            events: 字幕事件列表
+            words: 词列表，每个词包含 text, start, end
+            max_line_chars: 每行最大字符数
+        """
+        if not words:
+            return
+
+        events.append({
+            "lines": self._split_subtitle_words(words, max_line_chars),
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+        })
+
+    def build_subtitle_events(self, subtitle_data: dict) -> List[dict]:
+        """
+        将字幕时间轴切分为屏幕上显示的字幕事件
+
+        drawtext 和 ASS 两种渲染方式共用此切分结果，保证显示效果一致
+
+        Args:
+            subtitle_data: 字幕数据
+
+        Returns:
+            字幕事件列表，每项包含 lines（1-2行文本）、start、end
+        """
+        # 标点符号正则（用于检测断句）
+        split_pattern = r'[，。！？；、,\.!?;:\'"()\[\]{}<>]'
+        # 仅用于移除显示的标点
+        remove_pattern = r'[，。！？；、,\.!?;:\'"()\[\]{}<>]'
+
+        events = []
+        segments = subtitle_data.get("segments", [])
+
+        for segment in segments:
+            words = segment.get("words", [])
+
+            if words:
+                # 使用词级时间轴构建字幕行
+                current_line_words = []
+                current_line_len = 0
+                max_line_chars = 15  # 每行最大字符数
+
+                for w in words:
+                    raw_word = w.get("word", "")
+                    # 检查这个词是否包含标点符号（意味着小句结束）
+                    has_punctuation = bool(re.search(split_pattern, raw_word))
+
+                    # 移除标点用于显示和长度计算
+                    clean_word = re.sub(remove_pattern, '', raw_word).strip()
+
+                    if not clean_word:
+                        # 即使是纯标点，如果它标志着句子结束，也可能触发换行
+                        if has_punctuation and current_line_words:
+                            # 输出当前累积的字幕（可能是双行）
+                            self._add_subtitle_event(events, current_line_words, max_line_chars)
+                            current_line_words = []
+                            current_line_len = 0
+                        continue
+
+                    word_len = len(clean_word)
+
+                    # 换行条件：加上当前词超过双行最大长度（30字）
+                    if current_line_len + word_len > max_line_chars * 2 and current_line_words:
+                        # 输出当前累积的字幕（可能是双行）
+                        self._add_subtitle_event(events, current_line_words, max_line_chars)
+                        current_line_words = []
+                        current_line_len = 0
+
+                    # 添加词到当前行
+                    current_line_words.append({
+                        "text": clean_word,
+                        "start": w.get("start", 0),
+                        "end": w.get("end", 0)
+                    })
+                    current_line_len += word_len
+
+                    # 如果当前词带有标点，且当前行不为空，则强制换行（小句结束）
+                    if has_punctuation and current_line_words:
+                        self._add_subtitle_event(events, current_line_words, max_line_chars)
+                        current_line_words = []
+                        current_line_len = 0
+
+                # 处理最后一行
+                if current_line_words:
+                    self._add_subtitle_event(events, current_line_words, max_line_chars)
+
             else:
-                split_index = len(words) // 2
-                best_split = sum(len(w["text"]) for w in words[:split_index])
-            
-            # 分割文本
-            line1_text = "".join([w["text"] for w in words[:split_index]])
-            line2_text = "".join([w["text"] for w in words[split_index:]])
-            
-            # 确保每行不超过最大长度
-            if len(line1_text) > max_line_chars:
-                line1_text = line1_text[:max_line_chars]
-            if len(line2_text) > max_line_chars:
-                line2_text = line2_text[:max_line_chars]
-            
-            # 计算行间距（字体大小的1.2倍）
-            line_spacing = int(font_size * 1.2)
-            
-            # 计算两行的Y坐标（使第一行在base_y_pos上方，第二行在下方）
-            line1_y = base_y_pos - line_spacing // 2
-            line2_y = base_y_pos + line_spacing // 2
-            
-            # 添加第一行字幕
-            text1_escaped = line1_text.replace("'", "'\\\\\\''").replace(":", "\\:")
-            filter_str1 = (
-                f"drawtext="
-                f"text='{text1_escaped}':"
-                f"fontsize={font_size}:"
-                f"fontcolor={color}:"
-                f"borderw=5:"
-                f"bordercolor=black:"
-                f"shadowcolor=black@0.7:"
-                f"shadowx=4:"
-                f"shadowy=4:"
-                f"box=1:"
-                f"boxcolor=black@0.65:"
-                f"boxborderw=20:"
-                f"x=(w-text_w)/2:"
-                f"y={line1_y}:"
-                f"enable='between(t,{start_time:.3f},{end_time:.3f})'"
-            )
-            filters.append(filter_str1)
-            
-            # 添加第二行字幕
-            text2_escaped = line2_text.replace("'", "'\\\\\\''").replace(":", "\\:")
-            filter_str2 = (
-                f"drawtext="
-                f"text='{text2_escaped}':"
-                f"fontsize={font_size}:"
-                f"fontcolor={color}:"
-                f"borderw=5:"
-                f"bordercolor=black:"
-                f"shadowcolor=black@0.7:"
-                f"shadowx=4:"
-                f"shadowy=4:"
-                f"box=1:"
-                f"boxcolor=black@0.65:"
-                f"boxborderw=20:"
-                f"x=(w-text_w)/2:"
-                f"y={line2_y}:"
-                f"enable='between(t,{start_time:.3f},{end_time:.3f})'"
-            )
-            filters.append(filter_str2)
+                # 没有词级时间轴，使用比例计算时间（回退方案）
+                text = segment.get("text", "").strip()
+                if not text:
+                    continue
+
+                # 优先按标点分割
+                # 使用正则保留分隔符，以便知道在哪里分割的
+                parts = re.split(f'({split_pattern})', text)
+                lines = []
+                current_part = ""
+
+                for part in parts:
+                    # 如果是标点
+                    if re.match(split_pattern, part):
+                        if current_part:
+                            lines.append(current_part)
+                            current_part = ""
+                    else:
+                        # 如果是文字
+                        if len(current_part) + len(part) > 18:
+                            if current_part:
+                                lines.append(current_part)
+                            current_part = part
+                        else:
+                            current_part += part
+
+                if current_part:
+                    lines.append(current_part)
+
+                # 移除每行中的标点
+                clean_lines = [re.sub(remove_pattern, '', line).strip() for line in lines if
+                               re.sub(remove_pattern, '', line).strip()]
+
+                if not clean_lines:
+                    continue
+
+                segment_start = segment.get("start", 0)
+                segment_end = segment.get("end", 0)
+                total_duration = segment_end - segment_start
+                total_length = len("".join(clean_lines))
+
+                current_start = segment_start
+
+                for line_text in clean_lines:
+                    # 按长度比例计算持续时间
+                    line_len = len(line_text)
+                    if total_length > 0:
+                        line_duration = total_duration * (line_len / total_length)
+                    else:
+                        line_duration = total_duration / len(clean_lines)
+
+                    line_end = current_start + line_duration
+
+                    events.append({
+                        "lines": [line_text],
+                        "start": current_start,
+                        "end": line_end,
+                    })
+
+                    current_start = line_end
+
+        return events
+
+    def _get_subtitle_layout(self, gen_setting: dict) -> dict:
+        """
+        计算字幕布局（字号、颜色、分辨率、Y坐标）
+
+        Args:
+            gen_setting: 生成设置
+
+        Returns:
+            布局字典
+        """
+        subtitle_style = gen_setting.get("subtitle_style", {})
+        font_size = subtitle_style.get("font_size", 70)  # 适中字号
+        color = subtitle_style.get("color", "white")
+
+        # 动态计算字幕位置
+        resolution = gen_setting.get("resolution", "1440x1080")
+        try:
+            w_str, h_str = resolution.split('x')
+            width = int(w_str)
+            height = int(h_str)
+        except:
+            width = 1440
+            height = 1080
+
+        # 根据宽高比决定位置
+        # 竖屏 (9:16) -> 下方30%处 (避开抖音/快手底部UI)
+        # 横屏 (16:9, 4:3) -> 下方15%处
+        if height > width:
+            fixed_y_pos = int(height * 0.7)
+        else:
+            fixed_y_pos = int(height * 0.85)
+
+        logger.info(f"视频分辨率: {width}x{height}, 字幕Y坐标: {fixed_y_pos}")
+
+        return {
+            "font_size": font_size,
+            "color": color,
+            "width": width,
+            "height": height,
+            "y_pos": fixed_y_pos,
+        }
+
+    @staticmethod
+    def _get_line_positions(line_count: int, base_y_pos: int, font_size: int) -> List[int]:
+        """
+        计算每行字幕的Y坐标
+
+        双行时第一行在基准位置上方、第二行在下方，间距为字号的1.2倍
+        """
+        if line_count <= 1:
+            return [base_y_pos]
+
+        line_spacing = int(font_size * 1.2)
+        return [base_y_pos - line_spacing // 2, base_y_pos + line_spacing // 2]
+
+    @staticmethod
+    def _build_drawtext(text: str, font_size: int, color: str, y_pos: int, start: float, end: float) -> str:
+        """构建单行 drawtext 滤镜"""
+        text_escaped = text.replace("'", "'\\\\\\''").replace(":", "\\:")
+        return (
+            f"drawtext="
+            f"text='{text_escaped}':"
+            f"fontsize={font_size}:"
+            f"fontcolor={color}:"
+            f"borderw=5:"
+            f"bordercolor=black:"
+            f"shadowcolor=black@0.7:"
+            f"shadowx=4:"
+            f"shadowy=4:"
+            f"box=1:"
+            f"boxcolor=black@0.65:"
+            f"boxborderw=20:"
+            f"x=(w-text_w)/2:"
+            f"y={y_pos}:"
+            f"enable='between(t,{start:.3f},{end:.3f})'"
+        )
 
     def create_subtitle_filter(
             self,
@@ -441,194 +687,209 @@ class SubtitleService:
             FFmpeg drawtext滤镜字符串
         """
         try:
-            subtitle_style = gen_setting.get("subtitle_style", {})
-            font_size = subtitle_style.get("font_size", 70)  # 适中字号
-            color = subtitle_style.get("color", "white")
-
-            # 动态计算字幕位置
-            resolution = gen_setting.get("resolution", "1440x1080")
-            try:
-                w_str, h_str = resolution.split('x')
-                width = int(w_str)
-                height = int(h_str)
-            except:
-                width = 1440
-                height = 1080
-
-            # 根据宽高比决定位置
-            # 竖屏 (9:16) -> 下方30%处 (避开抖音/快手底部UI)
-            # 横屏 (16:9, 4:3) -> 下方15%处
-            if height > width:
-                fixed_y_pos = int(height * 0.7)
-            else:
-                fixed_y_pos = int(height * 0.85)
-
-            logger.info(f"视频分辨率: {width}x{height}, 字幕Y坐标: {fixed_y_pos}")
-
-            # 标点符号正则（用于检测断句）
-            split_pattern = r'[，。！？；、,\.!?;:\'"()\[\]{}<>]'
-            # 仅用于移除显示的标点
-            remove_pattern = r'[，。！？；、,\.!?;:\'"()\[\]{}<>]'
+            layout = self._get_subtitle_layout(gen_setting)
 
             filters = []
-            segments = subtitle_data.get("segments", [])
+            for event in self.build_subtitle_events(subtitle_data):
+                positions = self._get_line_positions(
+                    len(event["lines"]), layout["y_pos"], layout["font_size"]
+                )
+                for line_text, y_pos in zip(event["lines"], positions):
+                    filters.append(self._build_drawtext(
+                        line_text, layout["font_size"], layout["color"],
+                        y_pos, event["start"], event["end"]
+                    ))
 
-            for segment in segments:
-                words = segment.get("words", [])
-
-                if words:
-                    # 使用词级时间轴构建字幕行
-                    current_line_words = []
-                    current_line_len = 0
-                    max_line_chars = 15  # 每行最大字符数
-
-                    for w in words:
-                        raw_word = w.get("word", "")
-                        # 检查这个词是否包含标点符号（意味着小句结束）
-                        has_punctuation = bool(re.search(split_pattern, raw_word))
-
-                        # 移除标点用于显示和长度计算
-                        clean_word = re.sub(remove_pattern, '', raw_word).strip()
-
-                        if not clean_word:
-                            # 即使是纯标点，如果它标志着句子结束，也可能触发换行
-                            if has_punctuation and current_line_words:
-                                # 输出当前累积的字幕（可能是双行）
-                                self._add_subtitle_filter(
-                                    filters, current_line_words, font_size, color, 
-                                    fixed_y_pos, max_line_chars, height
-                                )
-                                current_line_words = []
-                                current_line_len = 0
-                            continue
+            if not filters:
+                return ""
 
-                        word_len = len(clean_word)
+            return ",".join(filters)
 
-                        # 换行条件：加上当前词超过双行最大长度（30字）
-                        if current_line_len + word_len > max_line_chars * 2 and current_line_words:
-                            # 输出当前累积的字幕（可能是双行）
-                            self._add_subtitle_filter(
-                                filters, current_line_words, font_size, color, 
-                                fixed_y_pos, max_line_chars, height
-                            )
-                            current_line_words = []
-                            current_line_len = 0
+        except Exception as e:
+            logger.error(f"创建字幕滤镜失败: {e}", exc_info=True)
+            return ""
 
-                        # 添加词到当前行
-                        current_line_words.append({
-                            "text": clean_word,
-                            "start": w.get("start", 0),
-                            "end": w.get("end", 0)
-                        })
-                        current_line_len += word_len
+    # ==================== ASS/libass 渲染 ====================
 
-                        # 如果当前词带有标点，且当前行不为空，则强制换行（小句结束）
-                        if has_punctuation and current_line_words:
-                            self._add_subtitle_filter(
-                                filters, current_line_words, font_size, color, 
-                                fixed_y_pos, max_line_chars, height
-                            )
-                            current_line_words = []
-                            current_line_len = 0
+    @staticmethod
+    def _to_ass_color(color: str, opacity: float = 1.0) -> str:
+        """
+        将 FFmpeg 颜色（名称、#RRGGBB 或 0xRRGGBB）转换为 ASS 颜色 &HAABBGGRR
 
-                    # 处理最后一行
-                    if current_line_words:
-                        self._add_subtitle_filter(
-                            filters, current_line_words, font_size, color, 
-                            fixed_y_pos, max_line_chars, height
-                        )
+        Args:
+            color: 颜色
+            opacity: 不透明度（0-1）
 
-                else:
-                    # 没有词级时间轴，使用比例计算时间（回退方案）
-                    text = segment.get("text", "").strip()
-                    if not text:
-                        continue
+        Returns:
+            ASS颜色字符串
+        """
+        value = (color or "").strip().lower()
+        if value.startswith("#"):
+            value = value[1:]
+        elif value.startswith("0x"):
+            value = value[2:]
+
+        rgb = ASS_COLOR_NAMES.get(value, value)
+        if not re.fullmatch(r"[0-9a-f]{6}", rgb):
+            logger.warning(f"无法识别的字幕颜色: {color}，使用白色")
+            rgb = "ffffff"
+
+        alpha = int(round((1 - max(0.0, min(1.0, opacity))) * 255))
+        r, g, b = rgb[0:2], rgb[2:4], rgb[4:6]
+        return f"&H{alpha:02X}{b.upper()}{g.upper()}{r.upper()}"
+
+    @staticmethod
+    def _format_ass_time(seconds: float) -> str:
+        """格式化为 ASS 时间 H:MM:SS.cc"""
+        centiseconds = int(round(max(0.0, seconds) * 100))
+        hours, centiseconds = divmod(centiseconds, 360000)
+        minutes, centiseconds = divmod(centiseconds, 6000)
+        secs, centiseconds = divmod(centiseconds, 100)
+        return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+    def build_ass_content(self, subtitle_data: dict, gen_setting: dict) -> str:
+        """
+        生成 ASS 字幕文件内容
 
-                    # 优先按标点分割
-                    # 使用正则保留分隔符，以便知道在哪里分割的
-                    parts = re.split(f'({split_pattern})', text)
-                    lines = []
-                    current_part = ""
+        样式与 drawtext 版本对应：白字黑描边(5) + 阴影(4, 70%) + 半透明黑底框(65%, 边距20)。
+        ASS 的底框（BorderStyle=3）会替代描边，因此底框和文字分两层绘制。
 
-                    for part in parts:
-                        # 如果是标点
-                        if re.match(split_pattern, part):
-                            if current_part:
-                                lines.append(current_part)
-                                current_part = ""
-                        else:
-                            # 如果是文字
-                            if len(current_part) + len(part) > 18:
-                                if current_part:
-                                    lines.append(current_part)
-                                current_part = part
-                            else:
-                                current_part += part
-
-                    if current_part:
-                        lines.append(current_part)
-
-                    # 移除每行中的标点
-                    clean_lines = [re.sub(remove_pattern, '', line).strip() for line in lines if
-                                   re.sub(remove_pattern, '', line).strip()]
-
-                    if not clean_lines:
-                        continue
+        Args:
+            subtitle_data: 字幕数据
+            gen_setting: 生成设置
 
-                    segment_start = segment.get("start", 0)
-                    segment_end = segment.get("end", 0)
-                    total_duration = segment_end - segment_start
-                    total_length = len("".join(clean_lines))
+        Returns:
+            ASS 文件内容
+        """
+        layout = self._get_subtitle_layout(gen_setting)
+        subtitle_style = gen_setting.get("subtitle_style", {})
+        font_name = subtitle_style.get("font", "Sans")
+        font_size = layout["font_size"]
+
+        text_colour = self._to_ass_color(layout["color"])
+        black = self._to_ass_color("black")
+        box_colour = self._to_ass_color("black", 0.65)
+        shadow_colour = self._to_ass_color("black", 0.7)
+
+        # Style 字段: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour,
+        # Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow,
+        # Alignment, MarginL, MarginR, MarginV, Encoding
+        header = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {layout['width']}",
+            f"PlayResY: {layout['height']}",
+            "WrapStyle: 2",
+            "ScaledBorderAndShadow: yes",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+            "Alignment, MarginL, MarginR, MarginV, Encoding",
+            f"Style: Box,{font_name},{font_size},{text_colour},{text_colour},{box_colour},{box_colour},"
+            f"0,0,0,0,100,100,0,0,3,20,0,8,0,0,0,1",
+            f"Style: Text,{font_name},{font_size},{text_colour},{text_colour},{black},{shadow_colour},"
+            f"0,0,0,0,100,100,0,0,1,5,4,8,0,0,0,1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        ]
+
+        dialogues = []
+        center_x = layout["width"] // 2
+        for event in self.build_subtitle_events(subtitle_data):
+            start = self._format_ass_time(event["start"])
+            end = self._format_ass_time(event["end"])
+            positions = self._get_line_positions(len(event["lines"]), layout["y_pos"], font_size)
+            for line_text, y_pos in zip(event["lines"], positions):
+                # 移除会被解析为覆盖标签或换行的字符
+                text = line_text.replace("\\", "").replace("{", "").replace("}", "").replace("\n", " ")
+                pos = f"{{\\pos({center_x},{y_pos})}}"
+                dialogues.append(f"Dialogue: 0,{start},{end},Box,,0,0,0,,{pos}{text}")
+                dialogues.append(f"Dialogue: 1,{start},{end},Text,,0,0,0,,{pos}{text}")
+
+        return "\n".join(header + dialogues) + "\n"
+
+    @staticmethod
+    def _escape_filter_path(path: str) -> str:
+        """转义滤镜参数中的文件路径（兼容Windows盘符和引号）"""
+        return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+    def create_ass_subtitle_filter(
+            self,
+            subtitle_data: dict,
+            gen_setting: dict,
+            ass_path: Path
+    ) -> str:
+        """
+        写入 ASS 字幕文件并返回单个 ass 滤镜
 
-                    current_start = segment_start
+        相比逐行 drawtext，FFmpeg 只需解析和执行一个滤镜节点
 
-                    for line_text in clean_lines:
-                        # 按长度比例计算持续时间
-                        line_len = len(line_text)
-                        if total_length > 0:
-                            line_duration = total_duration * (line_len / total_length)
-                        else:
-                            line_duration = total_duration / len(clean_lines)
-
-                        line_end = current_start + line_duration
-
-                        text_escaped = line_text.replace("'", "'\\\\\\''").replace(":", "\\:")
-
-                        filter_str = (
-                            f"drawtext="
-                            f"text='{text_escaped}':"
-                            f"fontsize={font_size}:"
-                            f"fontcolor={color}:"
-                            f"borderw=5:"
-                            f"bordercolor=black:"
-                            f"shadowcolor=black@0.7:"
-                            f"shadowx=4:"
-                            f"shadowy=4:"
-                            f"box=1:"
-                            f"boxcolor=black@0.65:"
-                            f"boxborderw=20:"
-                            f"x=(w-text_w)/2:"
-                            f"y={fixed_y_pos}:"
-                            f"enable='between(t,{current_start:.3f},{line_end:.3f})'"
-                        )
-                        filters.append(filter_str)
-
-                        current_start = line_end
+        Args:
+            subtitle_data: 字幕数据
+            gen_setting: 生成设置
+            ass_path: ASS 文件输出路径
 
-            if not filters:
+        Returns:
+            FFmpeg ass 滤镜字符串，无字幕时返回空字符串
+        """
+        try:
+            if not self.build_subtitle_events(subtitle_data):
                 return ""
 
-            return ",".join(filters)
+            content = self.build_ass_content(subtitle_data, gen_setting)
+            ass_path = Path(ass_path)
+            ass_path.parent.mkdir(parents=True, exist_ok=True)
+            ass_path.write_text(content, encoding="utf-8")
+
+            return f"ass=filename='{self._escape_filter_path(str(ass_path.absolute()))}'"
 
         except Exception as e:
-            logger.error(f"创建字幕滤镜失败: {e}", exc_info=True)
+            logger.error(f"创建ASS字幕失败: {e}", exc_info=True)
             return ""
 
+    def build_subtitle_filter(
+            self,
+            subtitle_data: dict,
+            gen_setting: dict,
+            work_dir: Path
+    ) -> str:
+        """
+        按 gen_setting["subtitle_renderer"] 选择字幕渲染方式
+
+        - "drawtext"（默认）: 每行字幕一个 drawtext 滤镜
+        - "ass": 生成 ASS 文件，使用 libass 一次性烧录
+
+        Args:
+            subtitle_data: 字幕数据
+            gen_setting: 生成设置
+            work_dir: 工作目录（用于写入ASS文件）
+
+        Returns:
+            FFmpeg滤镜字符串
+        """
+        renderer = gen_setting.get("subtitle_renderer", SUBTITLE_RENDERER_DRAWTEXT)
+
+        if renderer == SUBTITLE_RENDERER_ASS:
+            return self.create_ass_subtitle_filter(
+                subtitle_data, gen_setting, Path(work_dir) / "subtitles.ass"
+            )
+
+        if renderer != SUBTITLE_RENDERER_DRAWTEXT:
+            logger.warning(f"未知的字幕渲染方式: {renderer}，使用drawtext")
+
+        return self.create_subtitle_filter(subtitle_data, gen_setting)
+
 
 # 创建全局实例
 subtitle_service = SubtitleService()
 
 __all__ = [
+    "SUBTITLE_RENDERER_ASS",
+    "SUBTITLE_RENDERER_DRAWTEXT",
+    "SUBTITLE_TIMING_ALIGN",
+    "SUBTITLE_TIMING_ASR",
     "SubtitleService",
     "subtitle_service",
 ]
@@ -0,0 +1,227 @@
+"""
+字幕时间轴缓存 - 按音频内容持久化Whisper识别/对齐结果
+
+负责:
+- 根据音频内容哈希（MinIO ETag）、句子文本、时间轴生成方式和纠错模型计算缓存键
+- 将字幕时间轴（segments + words，可能已经过LLM纠错）以紧凑JSON保存在MinIO，跨项目复用
+- 只改字幕样式、分辨率等渲染设置时重新渲染句子视频，不再重复识别和LLM纠错
+- 按TTL淘汰长期未访问的时间轴
+"""
+
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.services.material_service import resolve_object_key
+from src.utils.storage import get_storage_client
+
+logger = get_logger(__name__)
+
+# 缓存对象前缀
+SUBTITLE_TIMELINE_PREFIX = "render_cache/subtitle_timelines"
+
+# 时间轴格式或生成逻辑发生不兼容变化时递增，使旧缓存全部失效
+SUBTITLE_TIMELINE_VERSION = 1
+
+
+class SubtitleTimelineCache:
+    """按音频内容寻址的字幕时间轴缓存"""
+
+    def __init__(
+            self,
+            prefix: str = SUBTITLE_TIMELINE_PREFIX,
+            ttl_days: int = 30,
+            touch_interval_hours: int = 24
+    ):
+        """
+        初始化字幕时间轴缓存
+
+        Args:
+            prefix: MinIO对象前缀
+            ttl_days: 超过该天数未被访问的时间轴会被淘汰
+            touch_interval_hours: 命中时刷新访问时间的最小间隔（小时）
+        """
+        self.prefix = prefix.rstrip("/")
+        self.ttl = timedelta(days=ttl_days)
+        self.touch_interval = timedelta(hours=touch_interval_hours)
+        self.storage_client = None
+
+        # 累计统计
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+
+    async def _get_storage_client(self):
+        """获取存储客户端"""
+        if self.storage_client is None:
+            self.storage_client = await get_storage_client()
+        return self.storage_client
+
+    def object_key(self, cache_key: str) -> str:
+        """缓存键对应的MinIO对象键（按前两位分目录）"""
+        return f"{self.prefix}/{cache_key[:2]}/{cache_key}.json"
+
+    async def compute_key(
+            self,
+            audio_url: str,
+            text: str,
+            timing: str,
+            correction_model: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        计算字幕时间轴的缓存键
+
+        时间轴只取决于音频内容、句子文本（识别提示/对齐文本）、生成方式、Whisper模型和LLM纠错模型
+
+        Args:
+            audio_url: 音频对象键或URL
+            text: 句子文本
+            timing: 时间轴生成方式（asr 或 align）
+            correction_model: LLM字幕纠错使用的模型（未纠错时为None）
+
+        Returns:
+            缓存键（sha256十六进制），音频信息获取失败时返回None
+        """
+        try:
+            storage = await self._get_storage_client()
+            stat = await storage.stat_file(resolve_object_key(audio_url))
+        except Exception as e:
+            logger.warning(f"获取音频内容哈希失败，跳过字幕时间轴缓存: {audio_url}, 错误: {e}")
+            return None
+
+        if not stat or not stat.get("etag"):
+            return None
+
+        payload = {
+            "version": SUBTITLE_TIMELINE_VERSION,
+            "audio": str(stat["etag"]).strip('"'),
+            "text": text,
+            "timing": timing,
+            "whisper_model": settings.WHISPER_MODEL_SIZE,
+            "whisper_compute_type": settings.WHISPER_COMPUTE_TYPE,
+            "correction_model": correction_model,
+        }
+        encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的字幕时间轴
+
+        Args:
+            cache_key: 缓存键
+
+        Returns:
+            字幕数据，未命中或内容损坏时返回None
+        """
+        storage = await self._get_storage_client()
+        object_key = self.object_key(cache_key)
+        stat = await storage.stat_file(object_key)
+
+        if not stat:
+            self._misses += 1
+            return None
+
+        try:
+            subtitle_data = json.loads(await storage.download_file(object_key))
+        except Exception as e:
+            logger.warning(f"读取字幕时间轴缓存失败: {object_key}, 错误: {e}")
+            self._misses += 1
+            return None
+
+        self._hits += 1
+
+        last_modified = stat.get("last_modified")
+        if last_modified and datetime.now(timezone.utc) - last_modified > self.touch_interval:
+            await storage.touch_file(object_key)
+
+        return subtitle_data
+
+    async def put(self, cache_key: str, subtitle_data: Dict[str, Any], user_id: str) -> str:
+        """
+        写入字幕时间轴
+
+        Args:
+            cache_key: 缓存键
+            subtitle_data: 字幕数据
+            user_id: 首次生成该时间轴的用户ID
+
+        Returns:
+            MinIO对象键
+        """
+        storage = await self._get_storage_client()
+        object_key = self.object_key(cache_key)
+        content = json.dumps(subtitle_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        upload_file = UploadFile(
+            filename=f"{cache_key}.json",
+            file=io.BytesIO(content),
+            headers=Headers({"content-type": "application/json"}),
+        )
+
+        await storage.upload_file(
+            user_id=user_id,
+            file=upload_file,
+            object_key=object_key
+        )
+
+        self._stores += 1
+        logger.info(f"✅ 字幕时间轴已缓存: {object_key}")
+        return object_key
+
+    async def evict(self) -> Dict[str, int]:
+        """
+        淘汰超过TTL未被访问的时间轴
+
+        Returns:
+            淘汰统计
+        """
+        storage = await self._get_storage_client()
+        objects = await storage.list_object_stats(f"{self.prefix}/")
+        now = datetime.now(timezone.utc)
+
+        deleted = 0
+        for obj in objects:
+            if obj["last_modified"] and now - obj["last_modified"] > self.ttl:
+                if await storage.delete_file(obj["object_key"]):
+                    deleted += 1
+
+        result = {"scanned": len(objects), "deleted": deleted}
+        logger.info(f"字幕时间轴缓存淘汰完成: {result}")
+        return result
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取累计统计信息
+
+        Returns:
+            统计字典
+        """
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "stores": self._stores,
+        }
+
+
+# 创建全局实例（与渲染缓存共用TTL配置）
+subtitle_timeline_cache = SubtitleTimelineCache(
+    ttl_days=settings.RENDER_CACHE_TTL_DAYS,
+    touch_interval_hours=settings.RENDER_CACHE_TOUCH_INTERVAL_HOURS,
+)
+
+__all__ = [
+    "SUBTITLE_TIMELINE_PREFIX",
+    "SUBTITLE_TIMELINE_VERSION",
+    "SubtitleTimelineCache",
+    "subtitle_timeline_cache",
+]
@@ -58,6 +58,7 @@ class TransitionService(BaseService):
         llm_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
 
@@ -375,6 +376,7 @@ class TransitionService(BaseService):
         import base64
         import aiohttp
         from datetime import timedelta
+        from src.utils.http_client import get_aiohttp_session
         from src.utils.storage import get_storage_client
         
         # 加载分镜
@@ -398,13 +400,13 @@ class TransitionService(BaseService):
                     logger.info(f"成功从内部存储直接加载{shot_name}关键帧数据")
                 else:
                     # 下载关键帧并转base64
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(keyframe_url, timeout=10) as resp:
-                            if resp.status == 200:
-                                img_data = await resp.read()
-                                logger.info(f"成功通过URL加载{shot_name}关键帧")
-                            else:
-                                logger.warning(f"下载{shot_name}关键帧失败: HTTP {resp.status}")
+                    session = get_aiohttp_session()
+                    async with session.get(keyframe_url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                        if resp.status == 200:
+                            img_data = await resp.read()
+                            logger.info(f"成功通过URL加载{shot_name}关键帧")
+                        else:
+                            logger.warning(f"下载{shot_name}关键帧失败: HTTP {resp.status}")
                 
                 if img_data:
                     b64_img = base64.b64encode(img_data).decode('utf-8')
@@ -516,6 +518,7 @@ class TransitionService(BaseService):
         
         video_provider = VectorEngineProvider(
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
         
@@ -602,6 +605,7 @@ class TransitionService(BaseService):
         from src.services.provider.vector_engine_provider import VectorEngineProvider
         provider = VectorEngineProvider(
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
         
@@ -666,10 +670,9 @@ class TransitionService(BaseService):
             dict: 同步统计信息
         """
         import httpx
-        from fastapi import UploadFile
-        import io
         import uuid
-        from src.utils.storage import get_storage_client
+        from src.utils.http_client import get_httpx_client
+        from src.utils.storage import content_length_from_headers, get_storage_client
         
         logger.info("开始同步过渡视频任务状态")
         
@@ -707,6 +710,7 @@ class TransitionService(BaseService):
                 from src.services.provider.vector_engine_provider import VectorEngineProvider
                 provider = VectorEngineProvider(
                     api_key=api_key.get_api_key(),
+                    api_key_id=api_key.id,
                     base_url=api_key.base_url
                 )
                 
@@ -739,25 +743,22 @@ class TransitionService(BaseService):
                         # 获取user_id
                         user_id = str(transition.user_id) if transition.user_id else "system"
                         
-                        # 下载视频 (增加超时设置: 连接30s, 读取300s)
-                        async with httpx.AsyncClient(timeout=httpx.Timeout(timeout=300.0, connect=30.0)) as client:
-                            response = await client.get(video_url)
-                            response.raise_for_status()
-                            video_content = response.content
-                        
-                        # 上传到MinIO（使用通用方法）
+                        # 边下载边上传到MinIO，不在内存中缓存整个视频 (增加超时设置: 连接30s, 读取300s)
                         storage_client = await get_storage_client()
                         file_id = str(uuid.uuid4())
-                        upload_file = UploadFile(
-                            filename=f"{file_id}.mp4",
-                            file=io.BytesIO(video_content)
-                        )
-                        
-                        storage_result = await storage_client.upload_file(
-                            user_id=user_id,
-                            file=upload_file,
-                            metadata={"transition_id": str(transition.id)}
-                        )
+                        client = get_httpx_client()
+                        async with client.stream(
+                            "GET", video_url, timeout=httpx.Timeout(timeout=300.0, connect=30.0)
+                        ) as response:
+                            response.raise_for_status()
+                            storage_result = await storage_client.upload_stream(
+                                user_id=user_id,
+                                chunks=response.aiter_bytes(64 * 1024),
+                                filename=f"{file_id}.mp4",
+                                content_type="video/mp4",
+                                length=content_length_from_headers(response.headers),
+                                metadata={"transition_id": str(transition.id)}
+                            )
                         
                         transition.video_url = storage_result["object_key"]
                         transition.status = "completed"
@@ -13,11 +13,13 @@ from typing import Optional
 from src.core.logging import get_logger
 from src.models import Sentence, APIKey
 from src.services.material_service import material_service
-from src.services.subtitle_service import subtitle_service
+from src.services.subtitle_service import SUBTITLE_TIMING_ASR, subtitle_service
+from src.services.subtitle_timeline_cache import subtitle_timeline_cache
 from src.utils.ffmpeg_utils import (
     build_sentence_video_command,
-    run_ffmpeg_command,
+    get_audio_duration_async,
 )
+from src.utils.render_scheduler import render_scheduler
 
 logger = get_logger(__name__)
 
@@ -25,6 +27,78 @@ logger = get_logger(__name__)
 class VideoCompositionService:
     """视频合成服务 - 处理FFmpeg视频操作"""
 
+    async def _get_subtitle_timeline(
+            self,
+            sentence: Sentence,
+            audio_path: Path,
+            duration: float,
+            index: int,
+            gen_setting: dict,
+            api_key: Optional[APIKey] = None,
+            model: Optional[str] = None,
+            user_id: Optional[str] = None
+    ) -> dict:
+        """
+        获取句子的字幕时间轴
+
+        时间轴只取决于音频和文本，按音频ETag缓存在MinIO中；只修改字幕样式等渲染设置时
+        不再重复Whisper识别和LLM纠错
+
+        Args:
+            sentence: 句子对象
+            audio_path: 本地音频路径
+            duration: 音频时长（秒）
+            index: 句子索引
+            gen_setting: 生成设置
+            api_key: API密钥（可选，用于LLM纠错）
+            model: 模型名称（可选）
+            user_id: 用户ID（可选）
+
+        Returns:
+            字幕数据
+        """
+        timing = gen_setting.get("subtitle_timing", SUBTITLE_TIMING_ASR)
+        correction_model = (model or "default") if api_key else None
+        timeline_key = await subtitle_timeline_cache.compute_key(
+            sentence.audio_url, sentence.content, timing, correction_model
+        )
+
+        if timeline_key:
+            cached = await subtitle_timeline_cache.get(timeline_key)
+            if cached:
+                logger.info(f"🔄 句子 {index} 复用缓存的字幕时间轴")
+                cached["duration"] = duration
+                return cached
+
+        # 生成字幕时间轴（在Whisper识别池中执行，与其他句子的FFmpeg渲染重叠）
+        # subtitle_timing 为 align 时直接将原文对齐到音频
+        subtitle_data = await subtitle_service.generate_subtitle_timeline_async(
+            str(audio_path),
+            sentence.content,
+            duration=duration,
+            timing=timing
+        )
+
+        # 如果提供了API密钥，使用LLM纠正字幕（原文对齐得到的字幕无需纠错）
+        needs_correction = bool(api_key) and not subtitle_data.get("aligned")
+        if needs_correction:
+            logger.info(f"[LLM纠错] 句子 {index} 使用LLM纠正字幕")
+            subtitle_data = await subtitle_service.correct_subtitle_with_llm(
+                subtitle_data=subtitle_data,
+                original_text=sentence.content,
+                api_key=api_key,
+                model=model
+            )
+
+        # 纠错失败时返回的是未纠正的字幕，不写入缓存，下次重新纠错
+        if timeline_key and user_id and not (needs_correction and not subtitle_data.get("corrected")):
+            try:
+                await subtitle_timeline_cache.put(timeline_key, subtitle_data, user_id)
+            except Exception as e:
+                logger.warning(f"写入字幕时间轴缓存失败: {e}")
+
+        return subtitle_data
+
     async def synthesize_sentence_video(
             self,
             sentence: Sentence,
@@ -32,7 +106,8 @@ class VideoCompositionService:
             index: int,
             gen_setting: dict,
             api_key: Optional[APIKey] = None,
-            model: Optional[str] = None
+            model: Optional[str] = None,
+            user_id: Optional[str] = None
     ) -> Path:
         """
         合成单个句子的视频
@@ -44,6 +119,7 @@ class VideoCompositionService:
             gen_setting: 生成设置
             api_key: API密钥（可选，用于LLM纠错）
             model: 模型名称（可选）
+            user_id: 用户ID（可选，提供时将新生成的字幕时间轴写入缓存）
 
         Returns:
             生成的视频文件路径
@@ -61,21 +137,20 @@ class VideoCompositionService:
             audio_path = sentence_dir / f"audio.mp3"
             await material_service.fetch_material_from_minio(sentence.audio_url, audio_path)
 
-            # 生成字幕时间轴
-            subtitle_data = subtitle_service.generate_subtitle_timeline(str(audio_path),sentence.content)
+            # 获取音频时长（异步ffprobe，供字幕时间轴和合成命令复用）
+            duration = await get_audio_duration_async(str(audio_path))
+            if not duration:
+                raise ValueError(f"无法获取音频时长: {audio_path}")
 
-            # 如果提供了API密钥，使用LLM纠正字幕
-            if api_key:
-                logger.info(f"[LLM纠错] 句子 {index} 使用LLM纠正字幕")
-                subtitle_data = await subtitle_service.correct_subtitle_with_llm(
-                    subtitle_data=subtitle_data,
-                    original_text=sentence.content,
-                    api_key=api_key,
-                    model=model
-                )
+            # 获取字幕时间轴（音频和文本未变时复用已缓存的识别/纠错结果）
+            subtitle_data = await self._get_subtitle_timeline(
+                sentence, audio_path, duration, index, gen_setting, api_key, model, user_id
+            )
 
-            # 创建字幕滤镜
-            subtitle_filter = subtitle_service.create_subtitle_filter(subtitle_data, gen_setting)
+            # 创建字幕滤镜（drawtext 或 ASS，由 gen_setting["subtitle_renderer"] 决定）
+            subtitle_filter = subtitle_service.build_subtitle_filter(
+                subtitle_data, gen_setting, sentence_dir
+            )
 
             # 输出视频路径
             output_path = sentence_dir / f"video.mp4"
@@ -86,14 +161,17 @@ class VideoCompositionService:
                 str(audio_path),
                 str(output_path),
                 subtitle_filter,
-                gen_setting
+                gen_setting,
+                duration=duration
             )
 
-            # 执行FFmpeg命令
-            success, stdout, stderr = run_ffmpeg_command(command, timeout=300)
+            # 交给渲染调度器执行（按CPU核数排队并限制编码线程）
+            result = await render_scheduler.run(
+                command, timeout=300, job_name=f"sentence_{index:03d}"
+            )
 
-            if not success:
-                raise Exception(f"FFmpeg执行失败: {stderr}")
+            if not result.success:
+                raise Exception(f"FFmpeg执行失败: {result.stderr}")
 
             logger.info(f"句子视频合成成功: 索引={index}, 输出={output_path}")
             return output_path
@@ -5,22 +5,28 @@
 import asyncio
 import shutil
 import tempfile
+import time
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from src.core.config import settings
 from src.core.exceptions import BusinessLogicError
 from src.core.logging import get_logger
 from src.models import Chapter, ChapterStatus, Sentence, VideoTask, VideoTaskStatus
 from src.services.api_key import APIKeyService
 from src.services.base import BaseService
 from src.services.chapter import ChapterService
+from src.services.render_cache import RENDER_CACHE_PREFIX, render_cache
+from src.services.subtitle_service import subtitle_service
 from src.services.video_composition_service import video_composition_service
 from src.services.video_task import VideoTaskService
 from src.utils.ffmpeg_utils import (
     check_ffmpeg_installed,
     concatenate_videos,
-    get_audio_duration,
+    get_audio_duration_async,
 )
+from src.utils.local_file_cache import local_clip_cache
+from src.utils.render_scheduler import render_scheduler
 from src.utils.storage import get_storage_client
 
 logger = get_logger(__name__)
@@ -198,6 +204,8 @@ class VideoSynthesisService(BaseService):
     ) -> Path:
         """
         从 MinIO 下载缓存的句子视频
+
+        按内容寻址的渲染缓存对象不会变化，优先从worker本地磁盘缓存获取
         
         Args:
             sentence: 句子对象
@@ -207,17 +215,63 @@ class VideoSynthesisService(BaseService):
             下载后的本地视频路径
         """
         storage_client = await self._get_storage_client()
+        video_key = sentence.sentence_video_key
         video_path = temp_dir / f"cached_{sentence.id}.mp4"
+
+        async def download(dest_path: Path) -> None:
+            await storage_client.download_file_to_path(video_key, str(dest_path))
+
+        if video_key.startswith(f"{RENDER_CACHE_PREFIX}/"):
+            local_hit = await local_clip_cache.fetch(video_key, video_path, download)
+        else:
+            await download(video_path)
+            local_hit = False
         
-        # 下载视频
-        content = await storage_client.download_file(sentence.sentence_video_key)
-        
-        with open(video_path, 'wb') as f:
-            f.write(content)
-        
-        logger.info(f"📥 已下载缓存视频: {sentence.sentence_video_key}")
+        logger.info(f"📥 已{'从本地缓存获取' if local_hit else '下载'}缓存视频: {video_key}")
         return video_path
 
+    async def _prefetch_cached_videos(
+            self,
+            cached_sentences: List[Sentence],
+            temp_dir: Path
+    ) -> Tuple[Dict[str, Path], List[Sentence]]:
+        """
+        并发下载缓存的句子视频（并发数由 CLIP_PREFETCH_CONCURRENCY 控制）
+
+        Args:
+            cached_sentences: 使用缓存的句子列表
+            temp_dir: 临时目录
+
+        Returns:
+            (句子ID -> 本地视频路径, 下载失败的句子列表)
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.CLIP_PREFETCH_CONCURRENCY))
+
+        async def fetch(sentence: Sentence) -> Path:
+            async with semaphore:
+                return await self._download_cached_video(sentence, temp_dir)
+
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(fetch(sentence) for sentence in cached_sentences),
+            return_exceptions=True
+        )
+
+        cached_videos = {}
+        failed_sentences = []
+        for sentence, result in zip(cached_sentences, results):
+            if isinstance(result, BaseException):
+                logger.error(f"下载缓存视频失败 {sentence.id}: {result}")
+                failed_sentences.append(sentence)
+            else:
+                cached_videos[str(sentence.id)] = result
+
+        logger.info(
+            f"📥 缓存视频预取完成: {len(cached_videos)}/{len(cached_sentences)} 个, "
+            f"耗时 {time.monotonic() - started:.1f}s, 本地缓存 {local_clip_cache.get_stats()}"
+        )
+        return cached_videos, failed_sentences
+
     async def _get_video_duration(self, video_path: Path) -> int:
         """
         获取视频时长
@@ -229,8 +283,7 @@ class VideoSynthesisService(BaseService):
             视频时长（秒）
         """
         try:
-            # get_audio_duration 是同步函数，不需要 await
-            duration = get_audio_duration(str(video_path))
+            duration = await get_audio_duration_async(str(video_path))
             return int(duration) if duration else 5
         except Exception as e:
             logger.warning(f"获取视频时长失败: {e}，使用默认值5秒")
@@ -245,7 +298,8 @@ class VideoSynthesisService(BaseService):
             semaphore: asyncio.Semaphore,
             user_id: str,
             api_key=None,
-            model: Optional[str] = None
+            model: Optional[str] = None,
+            cache_key: Optional[str] = None
     ) -> Tuple[bool, Optional[Path], Optional[Exception]]:
         """
         处理单个句子：生成视频并上传缓存
@@ -259,6 +313,7 @@ class VideoSynthesisService(BaseService):
             user_id: 用户ID
             api_key: API密钥
             model: 模型名称
+            cache_key: 渲染输入哈希（可选），提供时写入内容寻址的渲染缓存
             
         Returns:
             (是否成功, 视频路径, 异常对象)
@@ -272,21 +327,25 @@ class VideoSynthesisService(BaseService):
                     index=index,
                     gen_setting=gen_setting,
                     api_key=api_key,
-                    model=model
-                )
-                
-                # 2. 上传到 MinIO 作为缓存
-                video_key = await self._upload_sentence_video_cache(
-                    video_path, str(sentence.id), user_id
+                    model=model,
+                    user_id=user_id
                 )
                 
-                # 3. 获取视频时长
+                # 2. 获取视频时长
                 duration = await self._get_video_duration(video_path)
                 
+                # 3. 上传到 MinIO 作为缓存（有缓存键时写入按内容寻址的渲染缓存，可跨项目复用）
+                if cache_key:
+                    video_key = await render_cache.store(cache_key, video_path, user_id, duration)
+                else:
+                    video_key = await self._upload_sentence_video_cache(
+                        video_path, str(sentence.id), user_id
+                    )
+                
                 # 4. 保存缓存信息到数据库
                 # 注意：这里只更新对象状态，不要 flush，避免并发 flush 导致 "Session is already flushing" 错误
                 # 统一在主流程中 flush
-                sentence.save_video_cache(video_key, duration)
+                sentence.save_video_cache(video_key, duration, cache_key)
                 
                 logger.info(f"✅ 句子 {index} 视频已生成并缓存")
                 return True, video_path, None
@@ -337,6 +396,7 @@ class VideoSynthesisService(BaseService):
             统计信息字典
         """
         temp_dir = None
+        prefetch_task = None
         try:
             # 检查FFmpeg
             if not check_ffmpeg_installed():
@@ -400,11 +460,23 @@ class VideoSynthesisService(BaseService):
             )
 
             # 11. 分类句子：需要生成 vs 可以复用缓存
+            # 缓存键由图片/音频内容、句子文本和渲染设置决定，任一输入变化都会重新生成
             sentences_to_generate = []
             cached_sentences = []
+            cache_keys = {}
+            shared_count = 0
+            correction_model = (model or "default") if api_key else None
             
-            for sentence in sentences:
-                if sentence.has_valid_cache():
+            # 素材stat和缓存查找并发进行，避免每个句子3次串行的对象存储往返
+            lookups = await render_cache.lookup_sentences(sentences, gen_setting, correction_model)
+            for sentence, (cache_key, cached) in zip(sentences, lookups):
+                cache_keys[str(sentence.id)] = cache_key
+                
+                if cached:
+                    if not sentence.has_valid_cache(cache_key):
+                        # 相同输入的视频已由其他句子/项目生成过，直接复用
+                        sentence.save_video_cache(cached["object_key"], cached["duration"], cache_key)
+                        shared_count += 1
                     cached_sentences.append(sentence)
                     logger.info(f"🔄 句子 {sentence.order_index} 使用缓存: {sentence.sentence_video_key}")
                 else:
@@ -413,17 +485,26 @@ class VideoSynthesisService(BaseService):
             
             logger.info(
                 f"📊 缓存统计: 总计 {len(sentences)} 个句子, "
-                f"复用缓存 {len(cached_sentences)} 个, "
-                f"需要生成 {len(sentences_to_generate)} 个"
+                f"复用缓存 {len(cached_sentences)} 个（其中跨句子/项目共享 {shared_count} 个）, "
+                f"需要生成 {len(sentences_to_generate)} 个, "
+                f"累计命中率 {render_cache.get_stats()['hit_rate']:.1%}"
+            )
+
+            # 12. 后台并发预取缓存的句子视频，与下面的渲染阶段重叠进行
+            prefetch_task = asyncio.create_task(
+                self._prefetch_cached_videos(cached_sentences, temp_dir)
             )
 
-            # 12. 并发生成需要更新的句子视频
+            # 13. 并发生成需要更新的句子视频
             generated_videos = {}
             if sentences_to_generate:
-                semaphore = asyncio.Semaphore(3)  # 限制并发数为3
+                # 流水线并发数由渲染调度器按CPU核数计算，FFmpeg编码本身由调度器排队
+                semaphore = asyncio.Semaphore(render_scheduler.pipeline_concurrency)
+                render_stats_before = render_scheduler.get_stats()
                 tasks_list = [
                     self._process_sentence_with_cache(
-                        sentence, temp_dir, idx, gen_setting, semaphore, str(task.user_id), api_key, model
+                        sentence, temp_dir, idx, gen_setting, semaphore, str(task.user_id), api_key, model,
+                        cache_key=cache_keys.get(str(sentence.id))
                     )
                     for idx, sentence in enumerate(sentences_to_generate)
                 ]
@@ -437,21 +518,26 @@ class VideoSynthesisService(BaseService):
                         generated_videos[sentence_id] = video_path
                     elif error:
                         logger.error(f"句子 {idx} 生成失败: {error}")
+
+                render_stats = render_scheduler.get_stats()
+                jobs = render_stats["jobs_total"] - render_stats_before["jobs_total"]
+                queue_wait = render_stats["queue_wait_total"] - render_stats_before["queue_wait_total"]
+                encode_time = render_stats["encode_time_total"] - render_stats_before["encode_time_total"]
+                logger.info(
+                    f"📊 渲染统计: 任务 {jobs} 个, 并发 {render_stats['max_jobs']} x "
+                    f"{render_stats['threads_per_job']} 线程, "
+                    f"累计排队 {queue_wait:.1f}s, 累计编码 {encode_time:.1f}s"
+                )
             
-            # 13. 下载缓存的句子视频
-            cached_videos = {}
-            if cached_sentences:
-                for sentence in cached_sentences:
-                    try:
-                        video_path = await self._download_cached_video(sentence, temp_dir)
-                        cached_videos[str(sentence.id)] = video_path
-                    except Exception as e:
-                        logger.error(f"下载缓存视频失败 {sentence.id}: {e}")
-                        # 如果缓存下载失败，标记需要重新生成
-                        sentence.mark_material_updated()
-                        await self.db_session.flush()
+            # 14. 等待缓存视频预取完成
+            cached_videos, failed_cached = await prefetch_task
+            for sentence in failed_cached:
+                # 如果缓存下载失败，标记需要重新生成
+                sentence.mark_material_updated()
+            if failed_cached:
+                await self.db_session.flush()
             
-            # 14. 合并所有视频路径（按句子顺序）
+            # 15. 合并所有视频路径（按句子顺序）
             video_paths = self._merge_video_paths(
                 sentences,
                 generated_videos,
@@ -469,8 +555,8 @@ class VideoSynthesisService(BaseService):
             
             logger.info(f"✅ 成功: {success_count}, ❌ 失败: {failed_count}")
             
-            # 16. 更新API密钥使用统计（如果使用了LLM纠错）
-            if api_key:
+            # 16. 更新API密钥使用统计（如果使用了LLM纠错，原文对齐模式不调用LLM）
+            if api_key and subtitle_service.needs_llm_correction(gen_setting):
                 try:
                     api_key_service = APIKeyService(self.db_session)
                     # 每个句子调用一次LLM，所以使用次数为句子数量
@@ -489,14 +575,19 @@ class VideoSynthesisService(BaseService):
             final_video_path = temp_dir / "final_video.mp4"
             concat_file_path = temp_dir / "concat.txt"
 
-            # 使用crossfade模式提供专业级的视频过渡效果
-            success = concatenate_videos(
-                video_paths, 
+            # 使用smart crossfade模式提供专业级的视频过渡效果
+            # (时间线同crossfade，只重新编码过渡区，其余画面直接复制流；无法切分时自动回退到分层crossfade)
+            # 拼接是长时间的同步FFmpeg调用，放到线程中执行以免阻塞事件循环
+            success = await asyncio.to_thread(
+                concatenate_videos,
+                video_paths,
                 final_video_path, 
                 concat_file_path,
-                mode="crossfade",
+                mode="smart_crossfade",
                 transition_type="fade",
-                transition_duration=0.5
+                transition_duration=0.5,
+                gen_setting=gen_setting,
+                threads=render_scheduler.threads_per_job
             )
             if not success:
                 raise BusinessLogicError("视频拼接失败")
@@ -508,7 +599,8 @@ class VideoSynthesisService(BaseService):
                 from src.utils.ffmpeg_utils import apply_video_speed
                 
                 speed_video_path = temp_dir / "final_video_speed.mp4"
-                speed_success = apply_video_speed(
+                speed_success = await asyncio.to_thread(
+                    apply_video_speed,
                     str(final_video_path),
                     str(speed_video_path),
                     video_speed
@@ -556,7 +648,8 @@ class VideoSynthesisService(BaseService):
                         from src.utils.ffmpeg_utils import mix_bgm_with_video
                         final_video_with_bgm_path = temp_dir / "final_video_with_bgm.mp4"
                         
-                        mix_success = mix_bgm_with_video(
+                        mix_success = await asyncio.to_thread(
+                            mix_bgm_with_video,
                             str(final_video_path),
                             str(bgm_temp_path),
                             str(final_video_with_bgm_path),
@@ -604,7 +697,7 @@ class VideoSynthesisService(BaseService):
             video_key = result["object_key"]
 
             # 19. 获取视频时长
-            duration = int(get_audio_duration(str(final_video_path)) or 0)
+            duration = int(await get_audio_duration_async(str(final_video_path)) or 0)
 
             # 20. 标记任务完成
             await task_service.mark_task_completed(task.id, video_key, duration)
@@ -638,6 +731,11 @@ class VideoSynthesisService(BaseService):
 
 
         finally:
+            # 渲染阶段出错时取消仍在进行的预取，避免继续写入即将删除的临时目录
+            if prefetch_task and not prefetch_task.done():
+                prefetch_task.cancel()
+                await asyncio.gather(prefetch_task, return_exceptions=True)
+
             # 清理临时目录
             if temp_dir and temp_dir.exists():
                 try:
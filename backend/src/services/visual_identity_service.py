@@ -4,18 +4,19 @@
 import asyncio
 import uuid
 import io
-import aiohttp
 from typing import List, Optional, Any, Dict
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload, joinedload
 from fastapi import UploadFile
 
+from src.core.config import settings
 from src.core.logging import get_logger
 from src.models.movie import MovieCharacter, MovieShot, MovieScene, MovieScript
 from src.models.chapter import Chapter
 from src.services.base import BaseService
 from src.services.provider.factory import ProviderFactory
 from src.services.api_key import APIKeyService
+from src.utils.http_client import get_aiohttp_session
 from src.utils.storage import get_storage_client
 from src.services.image import retry_with_backoff
 
@@ -35,7 +36,6 @@ async def _generate_keyframe_worker(
     user_id: Any,
     api_key,
     model: Optional[str],
-    semaphore: asyncio.Semaphore,
     db_session,  # 新增：传入数据库会话
     previous_keyframe_url: Optional[str] = None,
     previous_shot: Optional[MovieShot] = None,
@@ -51,7 +51,6 @@ async def _generate_keyframe_worker(
         user_id: 用户ID
         api_key: API密钥对象
         model: 图像模型
-        semaphore: 并发控制信号量
         previous_keyframe_url: 上一个分镜的关键帧URL（用于视觉连续性）
         previous_shot: 上一个分镜对象（用于提示词上下文）
     
@@ -59,107 +58,108 @@ async def _generate_keyframe_worker(
     """
     import base64
     
-    async with semaphore:
-        try:
-            # 1. 构建专业提示词（包含场景、分镜、角色信息、上一帧信息）
-            from src.services.keyframe_prompt_builder import KeyframePromptBuilder
-            
-            # 获取场景信息（shot已经预加载了scene关系）
-            scene = shot.scene
-            
-            final_prompt = KeyframePromptBuilder.build_prompt(
-                shot=shot,
-                scene=scene,
-                characters=chars,
-                custom_prompt=None,  # worker中不使用自定义提示词
-                previous_shot=previous_shot  # 传入上一帧信息
-            )
-            
-            # 1.5 收集参考图：根据是否有上一帧决定参考策略
-            reference_images = []
-            
-            # 如果有上一帧的关键帧，优先使用它作为参考
-            if previous_keyframe_url:
-                reference_images.append(previous_keyframe_url)
-                logger.info(f'[批量生成] 使用上一帧关键帧作为参考: {previous_keyframe_url}')
+    # 并发由Provider内按Key和模型共享的自适应限流器控制
+    try:
+        # 1. 构建专业提示词（包含场景、分镜、角色信息、上一帧信息）
+        from src.services.keyframe_prompt_builder import KeyframePromptBuilder
+        
+        # 获取场景信息（shot已经预加载了scene关系）
+        scene = shot.scene
+        
+        final_prompt = KeyframePromptBuilder.build_prompt(
+            shot=shot,
+            scene=scene,
+            characters=chars,
+            custom_prompt=None,  # worker中不使用自定义提示词
+            previous_shot=previous_shot  # 传入上一帧信息
+        )
+        
+        # 1.5 收集参考图：根据是否有上一帧决定参考策略
+        reference_images = []
+        
+        # 如果有上一帧的关键帧，优先使用它作为参考
+        if previous_keyframe_url:
+            reference_images.append(previous_keyframe_url)
+            logger.info(f'[批量生成] 使用上一帧关键帧作为参考: {previous_keyframe_url}')
+        else:
+            # 第一个分镜：如果有场景图则使用，没有也可以生成
+            if scene.scene_image_url:
+                reference_images.append(scene.scene_image_url)
+                logger.info(f'[批量生成] 第一个分镜，使用场景图作为参考: {scene.scene_image_url}')
             else:
-                # 第一个分镜：如果有场景图则使用，没有也可以生成
-                if scene.scene_image_url:
-                    reference_images.append(scene.scene_image_url)
-                    logger.info(f'[批量生成] 第一个分镜，使用场景图作为参考: {scene.scene_image_url}')
-                else:
-                    logger.info(f'[批量生成] 第一个分镜，没有场景图，仅使用提示词生成')
+                logger.info(f'[批量生成] 第一个分镜，没有场景图，仅使用提示词生成')
 
+        
+        # 然后添加角色参考图
+        if shot.characters:
+            # 获取出现在此镜头中的角色
+            shot_char_names = shot.characters if isinstance(shot.characters, list) else []
+            relevant_chars = [c for c in chars if c.name in shot_char_names]
             
-            # 然后添加角色参考图
-            if shot.characters:
-                # 获取出现在此镜头中的角色
-                shot_char_names = shot.characters if isinstance(shot.characters, list) else []
-                relevant_chars = [c for c in chars if c.name in shot_char_names]
-                
-                # 收集角色的参考图URL
-                for char in relevant_chars:
-                    if char.avatar_url:
-                        reference_images.append(char.avatar_url)
-                        logger.info(f'[批量生成] 添加角色 {char.name} 的参考图: {char.avatar_url}')
-            
-            # 2. Provider 调用
-            img_provider = ProviderFactory.create(
-                provider=api_key.provider,
-                api_key=api_key.get_api_key(),
-                base_url=api_key.base_url
-            )
+            # 收集角色的参考图URL
+            for char in relevant_chars:
+                if char.avatar_url:
+                    reference_images.append(char.avatar_url)
+                    logger.info(f'[批量生成] 添加角色 {char.name} 的参考图: {char.avatar_url}')
+        
+        # 2. Provider 调用
+        img_provider = ProviderFactory.create(
+            provider=api_key.provider,
+            api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
+            base_url=api_key.base_url
+        )
 
-            logger.info(f"生成分镜 {shot.id} 关键帧, 参考图数量={len(reference_images)}, Prompt: {final_prompt[:100]}...")
-            
-            # 准备生成参数
-            gen_params = {
-                "prompt": final_prompt,
-                "model": model
-            }
-            
-            # 如果有参考图，添加到参数中
-            if reference_images:
-                gen_params["reference_images"] = reference_images
-            
-            result = await retry_with_backoff(
-                lambda: img_provider.generate_image(**gen_params)
-            )
-            
-            # 3. 提取并上传图片（使用通用工具函数）
-            from src.utils.image_utils import extract_and_upload_image
-            
-            object_key = await extract_and_upload_image(
-                result=result,
-                user_id=str(user_id),
-                metadata={"shot_id": str(shot.id), "type": "keyframe"}
-            )
+        logger.info(f"生成分镜 {shot.id} 关键帧, 参考图数量={len(reference_images)}, Prompt: {final_prompt[:100]}...")
+        
+        # 准备生成参数
+        gen_params = {
+            "prompt": final_prompt,
+            "model": model
+        }
+        
+        # 如果有参考图，添加到参数中
+        if reference_images:
+            gen_params["reference_images"] = reference_images
+        
+        result = await retry_with_backoff(
+            lambda: img_provider.generate_image(**gen_params)
+        )
+        
+        # 3. 提取并上传图片（使用通用工具函数）
+        from src.utils.image_utils import extract_and_upload_image
+        
+        object_key = await extract_and_upload_image(
+            result=result,
+            user_id=str(user_id),
+            metadata={"shot_id": str(shot.id), "type": "keyframe"}
+        )
 
-            # 4. 更新对象属性 (不 Commit) - 使用新的keyframe_url字段
-            shot.keyframe_url = object_key
-            
-            # 5. 创建生成历史记录
-            # 使用传入的db_session而不是object_session
-            from src.services.generation_history_service import GenerationHistoryService
-            from src.models.movie import GenerationType, MediaType
-            
-            history_service = GenerationHistoryService(db_session)
-            await history_service.create_history(
-                resource_type=GenerationType.SHOT_KEYFRAME,
-                resource_id=str(shot.id),
-                result_url=object_key,
-                prompt=final_prompt,  # 使用生成时的实际prompt
-                media_type=MediaType.IMAGE,
-                model=model,
-                api_key_id=str(api_key.id) if api_key else None
-            )
-                
-            logger.info(f'[批量生成] 关键帧生成并存储完成: shot_id={shot.id}, key={object_key}')
-            return True
+        # 4. 更新对象属性 (不 Commit) - 使用新的keyframe_url字段
+        shot.keyframe_url = object_key
+        
+        # 5. 创建生成历史记录
+        # 使用传入的db_session而不是object_session
+        from src.services.generation_history_service import GenerationHistoryService
+        from src.models.movie import GenerationType, MediaType
+        
+        history_service = GenerationHistoryService(db_session)
+        await history_service.create_history(
+            resource_type=GenerationType.SHOT_KEYFRAME,
+            resource_id=str(shot.id),
+            result_url=object_key,
+            prompt=final_prompt,  # 使用生成时的实际prompt
+            media_type=MediaType.IMAGE,
+            model=model,
+            api_key_id=str(api_key.id) if api_key else None
+        )
             
-        except Exception as e:
-            logger.error(f'[批量生成] Worker 生成关键帧失败 [shot_id={shot.id}]: {e}')
-            return False
+        logger.info(f'[批量生成] 关键帧生成并存储完成: shot_id={shot.id}, key={object_key}')
+        return True
+        
+    except Exception as e:
+        logger.error(f'[批量生成] Worker 生成关键帧失败 [shot_id={shot.id}]: {e}')
+        return False
 
 
 class VisualIdentityService(BaseService):
@@ -185,6 +185,7 @@ class VisualIdentityService(BaseService):
         img_provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
 
@@ -201,10 +202,9 @@ class VisualIdentityService(BaseService):
             
             image_url = response.data[0].url
             
-            async with aiohttp.ClientSession() as http_session:
-                async with http_session.get(image_url) as resp:
-                    if resp.status != 200: raise Exception(f"下载失败: {resp.status}")
-                    content = await resp.read()
+            async with get_aiohttp_session().get(image_url) as resp:
+                if resp.status != 200: raise Exception(f"下载失败: {resp.status}")
+                content = await resp.read()
 
             storage_client = await get_storage_client()
             file_id = str(uuid.uuid4())
@@ -248,9 +248,8 @@ class VisualIdentityService(BaseService):
         api_key = await api_key_service.get_api_key_by_id(api_key_id, str(user_id))
         
         storage_client = await get_storage_client()
-        semaphore = asyncio.Semaphore(1)
         
-        success = await _generate_keyframe_worker(shot, chars, user_id, api_key, model, semaphore, storage_client, ref_images)
+        success = await _generate_keyframe_worker(shot, chars, user_id, api_key, model, storage_client, ref_images)
         if success:
             await self.db_session.commit()
             return shot.keyframe_url # type: ignore
@@ -306,8 +305,6 @@ class VisualIdentityService(BaseService):
             return {"total": 0, "success": 0, "failed": 0, "message": "所有分镜已有关键帧"}
 
         # 7. 定义场景处理函数（每个场景使用独立的数据库会话）
-        worker_semaphore = asyncio.Semaphore(20)  # API调用并发限制
-        
         async def process_scene_with_session(scene_id: str, scene_data: dict):
             """处理单个场景，使用独立的数据库会话"""
             async with get_async_db() as scene_session:
@@ -342,7 +339,6 @@ class VisualIdentityService(BaseService):
                                 user_id=user_id,
                                 api_key=api_key,
                                 model=model,
-                                semaphore=worker_semaphore,
                                 db_session=scene_session,  # 传入场景会话
                                 previous_keyframe_url=previous_keyframe_url,
                                 previous_shot=previous_shot
@@ -372,8 +368,8 @@ class VisualIdentityService(BaseService):
                     await scene_session.rollback()
                     return {'success': 0, 'failed': len(scene_data['shots'])}
         
-        # 8. 并发处理场景（限制并发数为3）
-        scene_semaphore = asyncio.Semaphore(3)
+        # 8. 并发处理场景（限制同时占用的数据库会话数，API并发由自适应限流器控制）
+        scene_semaphore = asyncio.Semaphore(settings.MOVIE_SCENE_CONCURRENCY)
         
         async def process_scene_limited(scene_id: str, scene_data: dict):
             async with scene_semaphore:
@@ -485,6 +481,7 @@ class VisualIdentityService(BaseService):
         provider = ProviderFactory.create(
             provider=api_key.provider,
             api_key=api_key.get_api_key(),
+            api_key_id=api_key.id,
             base_url=api_key.base_url
         )
         
@@ -7,6 +7,7 @@ from src.core.config import settings
 from celery.signals import worker_process_init, worker_process_shutdown
 from src.core.database import initialize_database, close_database_connections
 from src.tasks.base import run_async_task
+from src.utils.http_client import http_client_pool
 
 celery_app = Celery(
     "aicon",
@@ -17,18 +18,22 @@ celery_app = Celery(
         "src.tasks.generate",
         "src.tasks.movie",
         "src.tasks.movie_composition",  # 电影合成任务
-        "src.tasks.bilibili_task"
+        "src.tasks.bilibili_task",
+        "src.tasks.storage",  # 存储清理任务
     ]
 )
 
 @worker_process_init.connect
 def init_worker(**kwargs):
     """Worker 进程启动时初始化数据库引擎"""
+    # 丢弃从父进程继承的HTTP客户端，连接不能跨进程共享
+    http_client_pool.reset()
     run_async_task(initialize_database())
 
 @worker_process_shutdown.connect
 def shutdown_worker(**kwargs):
-    """Worker 进程关闭时清理数据库连接"""
+    """Worker 进程关闭时清理数据库连接和HTTP连接池"""
+    run_async_task(http_client_pool.aclose())
     run_async_task(close_database_connections())
 
 celery_app.conf.update(
@@ -49,5 +54,9 @@ celery_app.conf.update(
             "task": "movie.sync_transition_video_status",
             "schedule": 30.0,
         },
+        "evict-render-cache-every-6h": {
+            "task": "generate.evict_render_cache",
+            "schedule": 6 * 60 * 60.0,
+        },
     }
 )
@@ -15,13 +15,13 @@ logger = get_logger(__name__)
     name="generate.generate_prompts"
 )
 @async_task_decorator
-async def generate_prompts(db_session: AsyncSession, self, chapter_id: str, api_key_id: str, style: str, model: str = None, custom_prompt: str = None):
+async def generate_prompts(db_session: AsyncSession, self, chapter_id: str, api_key_id: str, style: str, model: str = None, custom_prompt: str = None, refresh: bool = False):
     """为章节生成提示词的 Celery 任务"""
     from src.services.prompt import PromptService
     logger.info(f"Celery任务开始: generate_prompts (chapter_id={chapter_id})")
     
     service = PromptService(db_session)
-    result = await service.generate_prompts_batch(chapter_id, api_key_id, style, model, custom_prompt)
+    result = await service.generate_prompts_batch(chapter_id, api_key_id, style, model, custom_prompt, refresh)
     
     logger.info(f"Celery任务成功: generate_prompts (chapter_id={chapter_id})")
     return result
@@ -119,3 +119,21 @@ async def synthesize_video(db_session: AsyncSession, self, video_task_id: str):
     
     logger.info(f"Celery任务成功: synthesize_video (video_task_id={video_task_id})")
     return result
+
+@celery_app.task(
+    bind=True,
+    max_retries=0,
+    name="generate.evict_render_cache"
+)
+@async_task_decorator
+async def evict_render_cache(db_session: AsyncSession, self):
+    """按TTL和总大小上限淘汰句子视频渲染缓存（及字幕时间轴缓存）的定时任务"""
+    from src.services.render_cache import render_cache
+    from src.services.subtitle_timeline_cache import subtitle_timeline_cache
+    logger.info("Celery任务开始: evict_render_cache")
+    
+    result = await render_cache.evict()
+    result["subtitle_timelines"] = await subtitle_timeline_cache.evict()
+    
+    logger.info(f"Celery任务成功: evict_render_cache, 结果: {result}")
+    return result
@@ -15,7 +15,7 @@ logger = get_logger(__name__)
     name="movie.extract_scenes"
 )
 @async_task_decorator
-async def movie_extract_scenes(db_session: AsyncSession, self, chapter_id: str, api_key_id: str, model: str = None):
+async def movie_extract_scenes(db_session: AsyncSession, self, chapter_id: str, api_key_id: str, model: str = None, refresh: bool = False):
     """从章节提取场景的 Celery 任务"""
     from src.services.scene_service import SceneService
     logger.info(f"Celery任务开始: movie_extract_scenes (chapter_id={chapter_id})")
@@ -24,7 +24,7 @@ async def movie_extract_scenes(db_session: AsyncSession, self, chapter_id: str,
         self.update_state(state='PROGRESS', meta={'percent': percent, 'message': msg})
         
     service = SceneService(db_session)
-    result = await service.extract_scenes_from_chapter(chapter_id, api_key_id, model, on_progress=on_progress)
+    result = await service.extract_scenes_from_chapter(chapter_id, api_key_id, model, on_progress=on_progress, refresh=refresh)
     
     logger.info(f"Celery任务完成: movie_extract_scenes")
     return {"script_id": str(result.id)}
@@ -35,13 +35,13 @@ async def movie_extract_scenes(db_session: AsyncSession, self, chapter_id: str,
     name="movie.extract_shots"
 )
 @async_task_decorator
-async def movie_extract_shots(db_session: AsyncSession, self, script_id: str, api_key_id: str, model: str = None):
+async def movie_extract_shots(db_session: AsyncSession, self, script_id: str, api_key_id: str, model: str = None, refresh: bool = False):
     """从剧本提取分镜的 Celery 任务"""
     from src.services.storyboard_service import StoryboardService
     logger.info(f"Celery任务开始: movie_extract_shots (script_id={script_id})")
     
     service = StoryboardService(db_session)
-    result = await service.batch_extract_shots_from_script(script_id, api_key_id, model)
+    result = await service.batch_extract_shots_from_script(script_id, api_key_id, model, refresh=refresh)
     
     logger.info(f"Celery任务完成: movie_extract_shots, 成功 {result['success']}, 失败 {result['failed']}")
     return result
@@ -87,13 +87,13 @@ async def movie_create_transitions(db_session: AsyncSession, self, script_id: st
     name="movie.extract_characters"
 )
 @async_task_decorator
-async def movie_extract_characters(db_session: AsyncSession, self, chapter_id: str, api_key_id: str, model: str = None):
+async def movie_extract_characters(db_session: AsyncSession, self, chapter_id: str, api_key_id: str, model: str = None, refresh: bool = False):
     """从章节提取角色的 Celery 任务"""
     from src.services.movie_character_service import MovieCharacterService
     logger.info(f"Celery任务开始: movie_extract_characters (chapter_id={chapter_id})")
     
     service = MovieCharacterService(db_session)
-    chars = await service.extract_characters_from_chapter(chapter_id, api_key_id, model)
+    chars = await service.extract_characters_from_chapter(chapter_id, api_key_id, model, refresh)
     
     logger.info(f"Celery任务完成: movie_extract_characters, extracted {len(chars)} characters")
     return {"character_count": len(chars)}
@@ -0,0 +1,39 @@
+"""
+存储相关的 Celery 任务
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.logging import get_logger
+from src.tasks.app import celery_app
+from src.tasks.base import async_task_decorator
+
+logger = get_logger(__name__)
+
+
+@celery_app.task(
+    bind=True,
+    max_retries=0,
+    name="storage.cleanup_orphaned_files"
+)
+@async_task_decorator
+async def cleanup_orphaned_files(db_session: AsyncSession, self, user_id: str, older_than_days: int = 7):
+    """清理用户孤立文件的 Celery 任务（中断后再次提交会从检查点继续）"""
+    from src.services.file_cleanup_service import FileCleanupService
+
+    logger.info(f"Celery任务开始: storage.cleanup_orphaned_files (user_id={user_id})")
+
+    async def on_progress(percent, msg):
+        self.update_state(state='PROGRESS', meta={'percent': percent, 'message': msg})
+
+    service = FileCleanupService(db_session)
+    result = await service.cleanup_orphaned_files(
+        user_id,
+        older_than_days=older_than_days,
+        dry_run=False,
+        resume=True,
+        on_progress=on_progress,
+    )
+    result.pop("files")
+
+    logger.info(f"Celery任务完成: storage.cleanup_orphaned_files, 删除 {result['deleted']} 个文件")
+    return result
@@ -0,0 +1,237 @@
+"""
+跨进程分布式限流 - 基于Redis的GCRA，按 APIKey.id 限制所有worker的请求速率
+
+负责:
+- 所有API进程和Celery worker进程调用同一个API Key时共享一个请求速率上限
+- 每次Provider调用前预约一个令牌，未到预约时间时等待（GCRA，允许短时突发）
+- 任一进程收到429时推迟该Key的下一个可用时间，所有进程一起退避
+- Redis不可用或无响应（超过 PROVIDER_RATE_LIMIT_REDIS_TIMEOUT）时退回进程内的本地实现，限流失效不影响业务调用
+
+GCRA（Generic Cell Rate Algorithm）只需为每个Key保存一个理论到达时间（TAT），
+在Lua脚本中原子地读取、判断并更新，时间取Redis服务器时间，避免各worker时钟不一致。
+"""
+
+import asyncio
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+# Redis键前缀
+KEY_PREFIX = "rate_limit:api_key:"
+
+# 预约令牌：返回需要等待的毫秒数（0表示立即可用）
+# KEYS[1]: 限流键  ARGV[1]: 发射间隔(ms)  ARGV[2]: 突发容忍(ms)
+_RESERVE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local wait = tat - tolerance - now
+if wait < 0 then
+    wait = 0
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], new_tat, 'PX', math.max(1, math.ceil(new_tat - now + tolerance)))
+return wait
+"""
+
+# 收到429：把下一个可用时间推迟到至少 now + pause
+# KEYS[1]: 限流键  ARGV[1]: 暂停时长(ms)  ARGV[2]: 突发容忍(ms)
+_PENALIZE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local tolerance = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+local paused_tat = now + tonumber(ARGV[1]) + tolerance
+if paused_tat > tat then
+    tat = paused_tat
+end
+redis.call('SET', KEYS[1], tat, 'PX', math.max(1, math.ceil(tat - now + tolerance)))
+return tat - tolerance - now
+"""
+
+
+class LocalRateLimitBackend:
+    """进程内的GCRA实现（单进程部署、测试或Redis不可用时使用）"""
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def reserve(self, key: str, interval: float, tolerance: float) -> float:
+        """
+        预约一个令牌
+
+        Args:
+            key: 限流键
+            interval: 发射间隔（秒）
+            tolerance: 突发容忍（秒）
+
+        Returns:
+            需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tats.get(key, now), now)
+            self._tats[key] = tat + interval
+            return max(0.0, tat - tolerance - now)
+
+    async def penalize(self, key: str, seconds: float, tolerance: float) -> float:
+        """
+        推迟下一个可用时间
+
+        Returns:
+            推迟后距离下一个可用时间的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tats.get(key, now), now + seconds + tolerance)
+            self._tats[key] = tat
+            return tat - tolerance - now
+
+
+class RedisRateLimitBackend:
+    """基于Redis Lua脚本的GCRA实现，所有进程共享"""
+
+    def __init__(self, redis_factory=get_redis):
+        self._redis_factory = redis_factory
+
+    async def reserve(self, key: str, interval: float, tolerance: float) -> float:
+        client = self._redis_factory()
+        wait_ms = await client.eval(
+            _RESERVE_SCRIPT, 1, KEY_PREFIX + key, math.ceil(interval * 1000), math.ceil(tolerance * 1000)
+        )
+        return int(wait_ms) / 1000
+
+    async def penalize(self, key: str, seconds: float, tolerance: float) -> float:
+        client = self._redis_factory()
+        wait_ms = await client.eval(
+            _PENALIZE_SCRIPT, 1, KEY_PREFIX + key, math.ceil(seconds * 1000), math.ceil(tolerance * 1000)
+        )
+        return int(wait_ms) / 1000
+
+
+class DistributedRateLimiter:
+    """按API Key限制跨进程的请求速率"""
+
+    def __init__(self, backend=None, fallback: Optional[LocalRateLimitBackend] = None):
+        """
+        Args:
+            backend: 限流后端，默认使用Redis
+            fallback: 后端出错时使用的本地实现
+        """
+        self.backend = backend if backend is not None else RedisRateLimitBackend()
+        self.fallback = fallback if fallback is not None else LocalRateLimitBackend()
+
+        # 累计统计
+        self._acquired = 0
+        self._delayed = 0
+        self._waited = 0.0
+        self._penalized = 0
+        self._fallbacks = 0
+
+    @staticmethod
+    def _params() -> tuple:
+        """当前配置下的 (发射间隔, 突发容忍)，单位秒"""
+        interval = 60.0 / max(1, settings.PROVIDER_RATE_LIMIT_PER_MINUTE)
+        tolerance = interval * max(0, settings.PROVIDER_RATE_LIMIT_BURST - 1)
+        return interval, tolerance
+
+    def _on_backend_error(self, error: Exception) -> None:
+        """记录后端错误或超时，Redis持续不可用时每100次只告警一次"""
+        self._fallbacks += 1
+        if self._fallbacks % 100 == 1:
+            logger.warning(
+                f"[RateLimit] 分布式限流不可用，使用进程内限流（累计 {self._fallbacks} 次）: {error!r}"
+            )
+
+    async def acquire(self, key: str) -> float:
+        """
+        获取一个令牌，未到可用时间时等待
+
+        Args:
+            key: API Key的ID
+
+        Returns:
+            实际等待的秒数
+        """
+        if not settings.PROVIDER_RATE_LIMIT_ENABLED:
+            return 0.0
+
+        interval, tolerance = self._params()
+        try:
+            wait = await asyncio.wait_for(
+                self.backend.reserve(key, interval, tolerance), settings.PROVIDER_RATE_LIMIT_REDIS_TIMEOUT
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self._on_backend_error(e)
+            wait = await self.fallback.reserve(key, interval, tolerance)
+
+        self._acquired += 1
+        if wait > 0:
+            self._delayed += 1
+            self._waited += wait
+            await asyncio.sleep(wait)
+        return wait
+
+    async def penalize(self, key: str, seconds: float) -> None:
+        """
+        收到429时推迟该Key在所有进程中的下一个可用时间
+
+        Args:
+            key: API Key的ID
+            seconds: 暂停秒数
+        """
+        if not settings.PROVIDER_RATE_LIMIT_ENABLED:
+            return
+
+        seconds = min(seconds, settings.PROVIDER_THROTTLE_MAX_WAIT)
+        _, tolerance = self._params()
+        self._penalized += 1
+        try:
+            await asyncio.wait_for(
+                self.backend.penalize(key, seconds, tolerance), settings.PROVIDER_RATE_LIMIT_REDIS_TIMEOUT
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self._on_backend_error(e)
+            await self.fallback.penalize(key, seconds, tolerance)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取统计信息
+
+        Returns:
+            统计字典
+        """
+        return {
+            "acquired": self._acquired,
+            "delayed": self._delayed,
+            "waited_seconds": round(self._waited, 3),
+            "penalized": self._penalized,
+            "fallbacks": self._fallbacks,
+        }
+
+
+# 创建全局实例
+distributed_rate_limiter = DistributedRateLimiter()
+
+
+__all__ = [
+    "LocalRateLimitBackend",
+    "RedisRateLimitBackend",
+    "DistributedRateLimiter",
+    "distributed_rate_limiter",
+]
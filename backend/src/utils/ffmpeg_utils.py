@@ -2,11 +2,19 @@
 FFmpeg工具函数 - 视频处理相关的FFmpeg操作
 """
 
+import asyncio
+import inspect
+import json
+import os
 import subprocess
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
+from src.core.config import settings
 from src.core.logging import get_logger
+from src.utils.media_probe import MediaInfo, probe_audio_duration, probe_media
 
 logger = get_logger(__name__)
 
@@ -16,6 +24,35 @@ import shutil
 # 全局缓存 FFmpeg 检查结果
 _ffmpeg_installed_cache = None
 
+# 句子视频强制关键帧间隔(秒), 使smart_crossfade拼接可以在片段中间按关键帧无损切分
+SENTENCE_KEYFRAME_INTERVAL = 1
+
+
+def _video_encoder_args(gen_setting: Optional[dict] = None, threads: Optional[int] = None) -> List[str]:
+    """
+    句子视频的视频编码参数
+
+    smart crossfade的过渡区使用同一组参数编码, 才能与直接复制的句子视频片段无缝拼接
+
+    Args:
+        gen_setting: 生成设置(读取video_codec)
+        threads: 编码线程数(可选)
+
+    Returns:
+        FFmpeg输出参数列表
+    """
+    args = [
+        "-c:v", (gen_setting or {}).get("video_codec", "libx264"),
+        "-preset", "slow",  # 使用slow预设获得最佳质量
+        "-crf", "20",  # 提高质量（更低的CRF值）
+        "-profile:v", "high",  # 使用high profile
+        "-level", "4.2",
+        "-pix_fmt", "yuv420p",
+    ]
+    if threads:
+        args.extend(["-threads", str(threads)])
+    return args
+
 def check_ffmpeg_installed() -> bool:
     """
     检查FFmpeg是否已安装
@@ -66,18 +103,26 @@ def check_ffmpeg_installed() -> bool:
         return False
 
 
-def get_audio_duration(audio_path: str) -> Optional[float]:
-    """
-    获取音频文件时长
+def _probe_cached(path: str) -> Optional[MediaInfo]:
+    """读取文件的探测结果（进程内解析文件头，按文件缓存）"""
+    try:
+        return probe_media(path)
+    except OSError as e:
+        logger.error(f"读取媒体文件失败: {path}, 错误: {e}")
+        return None
 
-    Args:
-        audio_path: 音频文件路径
 
-    Returns:
-        音频时长（秒），如果失败返回None
-    """
+def _parse_frame_rate(value: str) -> float:
+    """解析ffprobe输出的帧率（格式为 30/1 或 30000/1001）"""
+    if '/' in value:
+        num, den = value.split('/')
+        return float(num) / float(den)
+    return float(value)
+
+
+def _ffprobe_duration(audio_path: str) -> Optional[float]:
+    """通过ffprobe获取时长"""
     try:
-        # 使用ffprobe获取音频时长
         result = subprocess.run(
             [
                 "ffprobe",
@@ -92,9 +137,7 @@ def get_audio_duration(audio_path: str) -> Optional[float]:
         )
 
         if result.returncode == 0:
-            duration = float(result.stdout.strip())
-            logger.debug(f"音频时长: {audio_path} = {duration}秒")
-            return duration
+            return float(result.stdout.strip())
         else:
             logger.error(f"获取音频时长失败: {result.stderr}")
             return None
@@ -104,18 +147,9 @@ def get_audio_duration(audio_path: str) -> Optional[float]:
         return None
 
 
-def get_video_fps(video_path: str) -> Optional[float]:
-    """
-    获取视频帧率
-
-    Args:
-        video_path: 视频文件路径
-
-    Returns:
-        视频帧率（fps），如果失败返回None
-    """
+def _ffprobe_fps(video_path: str) -> Optional[float]:
+    """通过ffprobe获取视频帧率"""
     try:
-        # 使用ffprobe获取视频帧率
         result = subprocess.run(
             [
                 "ffprobe",
@@ -131,16 +165,7 @@ def get_video_fps(video_path: str) -> Optional[float]:
         )
 
         if result.returncode == 0:
-            # 帧率格式为 "30/1" 或 "30000/1001"
-            fps_str = result.stdout.strip()
-            if '/' in fps_str:
-                num, den = fps_str.split('/')
-                fps = float(num) / float(den)
-            else:
-                fps = float(fps_str)
-            
-            logger.debug(f"视频帧率: {video_path} = {fps:.2f}fps")
-            return fps
+            return _parse_frame_rate(result.stdout.strip())
         else:
             logger.error(f"获取视频帧率失败: {result.stderr}")
             return None
@@ -150,22 +175,74 @@ def get_video_fps(video_path: str) -> Optional[float]:
         return None
 
 
-def create_concat_file(video_paths: List[Path], output_path: Path) -> None:
+def get_audio_duration(audio_path: str) -> Optional[float]:
+    """
+    获取音频/视频文件时长
+
+    优先在进程内解析文件头，无法识别的格式回退到ffprobe；结果按文件缓存，同一文件只探测一次
+
+    Args:
+        audio_path: 音频文件路径
+
+    Returns:
+        音频时长（秒），如果失败返回None
+    """
+    info = _probe_cached(audio_path)
+    if info is None:
+        return None
+    if info.duration is None:
+        info.duration = _ffprobe_duration(audio_path)
+    logger.debug(f"音频时长: {audio_path} = {info.duration}秒")
+    return info.duration
+
+
+def get_video_fps(video_path: str) -> Optional[float]:
+    """
+    获取视频帧率
+
+    优先在进程内解析文件头，无法识别的格式回退到ffprobe；结果按文件缓存
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        视频帧率（fps），如果失败返回None
+    """
+    info = _probe_cached(video_path)
+    if info is None:
+        return None
+    if info.fps is None:
+        info.fps = _ffprobe_fps(video_path)
+    if info.fps is not None:
+        logger.debug(f"视频帧率: {video_path} = {info.fps:.2f}fps")
+    return info.fps
+
+
+def create_concat_file(
+    video_paths: List[Path],
+    output_path: Path,
+    directives: Optional[List[Dict[str, float]]] = None
+) -> None:
     """
     创建FFmpeg concat文件
 
     Args:
         video_paths: 视频文件路径列表
         output_path: concat文件输出路径
+        directives: 每个文件的concat指令（可选），如 {"inpoint": 1.0, "outpoint": 2.0, "duration": 1.0}
     """
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
-            for video_path in video_paths:
+            for index, video_path in enumerate(video_paths):
                 # 使用绝对路径并转义特殊字符
                 abs_path = video_path.absolute()
                 # FFmpeg concat文件格式: file 'path'
                 f.write(f"file '{abs_path}'\n")
 
+                if directives:
+                    for key, value in directives[index].items():
+                        f.write(f"{key} {value:.6f}\n")
+
         logger.info(f"创建concat文件成功: {output_path}, 包含{len(video_paths)}个视频")
 
     except Exception as e:
@@ -214,12 +291,350 @@ def run_ffmpeg_command(command: List[str], timeout: int = 300) -> Tuple[bool, st
         return False, "", error_msg
 
 
+# =============================================================================
+# 异步执行引擎（基于 asyncio.create_subprocess_exec，不阻塞事件循环）
+# =============================================================================
+
+# 进度回调: 接收FFmpeg -progress 输出的一组键值（如 frame, out_time_us, progress）
+ProgressCallback = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+# 每个事件循环一个信号量（asyncio.Semaphore 会绑定到首次使用它的事件循环）
+_ffmpeg_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# 进程终止时等待其退出的宽限时间（秒），超时后强制 kill
+_TERMINATE_GRACE_SECONDS = 5
+
+
+def get_ffmpeg_max_concurrency() -> int:
+    """
+    获取同时运行的FFmpeg进程上限
+
+    优先使用配置 FFMPEG_MAX_CONCURRENCY，未配置时按CPU核数计算
+
+    Returns:
+        并发上限（至少为1）
+    """
+    if settings.FFMPEG_MAX_CONCURRENCY:
+        return max(1, settings.FFMPEG_MAX_CONCURRENCY)
+    return max(1, os.cpu_count() or 1)
+
+
+def _get_ffmpeg_semaphore() -> asyncio.Semaphore:
+    """获取当前事件循环的FFmpeg并发信号量"""
+    loop = asyncio.get_running_loop()
+    semaphore = _ffmpeg_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(get_ffmpeg_max_concurrency())
+        _ffmpeg_semaphores[loop] = semaphore
+    return semaphore
+
+
+def _with_progress_args(command: List[str]) -> List[str]:
+    """在FFmpeg命令中插入 -progress pipe:1（全局选项，须位于输入之前）"""
+    if "-progress" in command:
+        return command
+    return [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+
+
+async def _terminate_process(process: asyncio.subprocess.Process) -> None:
+    """终止子进程：先 terminate，宽限期后仍未退出则 kill"""
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=_TERMINATE_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+    except ProcessLookupError:
+        pass
+
+
+async def _emit_progress(callback: ProgressCallback, progress: Dict[str, Any]) -> None:
+    """调用进度回调（兼容同步与异步回调），回调异常不影响渲染"""
+    out_time_us = progress.get("out_time_us") or progress.get("out_time_ms")
+    if out_time_us and out_time_us != "N/A":
+        try:
+            progress["out_time_seconds"] = int(out_time_us) / 1_000_000
+        except ValueError:
+            pass
+    try:
+        result = callback(progress)
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        logger.warning(f"FFmpeg进度回调异常: {e}")
+
+
+async def _run_process_async(
+        command: List[str],
+        timeout: float,
+        progress_callback: Optional[ProgressCallback] = None,
+        input_data: Optional[bytes] = None
+) -> Tuple[bool, str, str]:
+    """
+    异步执行子进程并收集输出
+
+    Args:
+        command: 命令列表
+        timeout: 超时时间（秒）
+        progress_callback: 进度回调（可选），按 -progress 输出的块调用
+        input_data: 写入标准输入的数据（可选）
+
+    Returns:
+        (是否成功, 标准输出, 标准错误)
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.DEVNULL if input_data is None else asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    stdout_lines: List[str] = []
+
+    async def _write_stdin() -> None:
+        if input_data is None:
+            return
+        try:
+            process.stdin.write(input_data)
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # 进程读到足够的数据后可能提前退出
+            pass
+        finally:
+            process.stdin.close()
+
+    async def _read_stdout() -> None:
+        progress: Dict[str, Any] = {}
+        async for raw_line in process.stdout:
+            line = raw_line.decode("utf-8", errors="ignore")
+            stdout_lines.append(line)
+            if progress_callback is None:
+                continue
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            progress[key] = value
+            # 每个进度块以 progress=continue/end 结尾
+            if key == "progress":
+                await _emit_progress(progress_callback, progress)
+                progress = {}
+
+    async def _read_stderr() -> bytes:
+        return await process.stderr.read()
+
+    try:
+        _, _, stderr_bytes, returncode = await asyncio.wait_for(
+            asyncio.gather(_write_stdin(), _read_stdout(), _read_stderr(), process.wait()),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        await _terminate_process(process)
+        raise
+    except asyncio.CancelledError:
+        await _terminate_process(process)
+        raise
+
+    stderr = stderr_bytes.decode("utf-8", errors="ignore")
+    return returncode == 0, "".join(stdout_lines), stderr
+
+
+async def run_ffmpeg_command_async(
+        command: List[str],
+        timeout: int = 300,
+        progress_callback: Optional[ProgressCallback] = None
+) -> Tuple[bool, str, str]:
+    """
+    异步执行FFmpeg命令（不阻塞事件循环）
+
+    并发进程数受 get_ffmpeg_max_concurrency() 限制；任务被取消或超时时会终止FFmpeg进程。
+
+    Args:
+        command: FFmpeg命令列表
+        timeout: 超时时间（秒），默认300秒，从获得执行槽位后开始计算
+        progress_callback: 进度回调（可选），提供时自动追加 -progress pipe:1
+
+    Returns:
+        (是否成功, 标准输出, 标准错误)
+    """
+    if progress_callback is not None:
+        command = _with_progress_args(command)
+
+    async with _get_ffmpeg_semaphore():
+        try:
+            logger.info(f"执行FFmpeg命令: {' '.join(command)}")
+
+            success, stdout, stderr = await _run_process_async(
+                command, timeout, progress_callback
+            )
+
+            if success:
+                logger.info("FFmpeg命令执行成功")
+            else:
+                logger.error(f"FFmpeg命令执行失败: {stderr}")
+
+            return success, stdout, stderr
+
+        except asyncio.TimeoutError:
+            error_msg = f"FFmpeg命令执行超时（{timeout}秒）"
+            logger.error(error_msg)
+            return False, "", error_msg
+
+        except asyncio.CancelledError:
+            logger.warning("FFmpeg命令已取消，进程已终止")
+            raise
+
+        except Exception as e:
+            error_msg = f"FFmpeg命令执行异常: {e}"
+            logger.error(error_msg)
+            return False, "", error_msg
+
+
+async def _run_ffprobe_async(
+        args: List[str],
+        timeout: int = 10,
+        input_data: Optional[bytes] = None
+) -> Optional[str]:
+    """
+    异步执行ffprobe并返回标准输出
+
+    ffprobe开销很小，不占用FFmpeg并发槽位
+
+    Returns:
+        标准输出（去除首尾空白），失败返回None
+    """
+    try:
+        success, stdout, stderr = await _run_process_async(["ffprobe", *args], timeout, input_data=input_data)
+        if not success:
+            logger.error(f"ffprobe执行失败: {stderr}")
+            return None
+        return stdout.strip()
+    except asyncio.TimeoutError:
+        logger.error(f"ffprobe执行超时（{timeout}秒）")
+        return None
+    except Exception as e:
+        logger.error(f"ffprobe执行异常: {e}")
+        return None
+
+
+async def get_audio_duration_async(audio_path: str) -> Optional[float]:
+    """
+    异步获取音频/视频文件时长
+
+    优先在进程内解析文件头，无法识别的格式回退到ffprobe；结果按文件缓存，同一文件只探测一次
+
+    Args:
+        audio_path: 音频文件路径
+
+    Returns:
+        音频时长（秒），如果失败返回None
+    """
+    info = await asyncio.to_thread(_probe_cached, audio_path)
+    if info is None:
+        return None
+    if info.duration is not None:
+        return info.duration
+
+    output = await _run_ffprobe_async([
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        audio_path
+    ])
+    if not output:
+        return None
+
+    try:
+        info.duration = float(output)
+    except ValueError:
+        logger.error(f"获取音频时长失败，无法解析: {output}")
+        return None
+
+    logger.debug(f"音频时长: {audio_path} = {info.duration}秒")
+    return info.duration
+
+
+async def get_audio_duration_from_bytes_async(data: bytes) -> Optional[float]:
+    """
+    获取内存中音频数据的时长，无需写入文件
+
+    先在进程内解析WAV/MP3文件头，无法识别的格式再通过管道交给ffprobe
+
+    Args:
+        data: 音频文件内容
+
+    Returns:
+        音频时长（秒），如果失败返回None
+    """
+    duration = probe_audio_duration(data)
+    if duration is not None:
+        return duration
+
+    output = await _run_ffprobe_async([
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        "-i", "pipe:0"
+    ], input_data=data)
+    if not output:
+        return None
+
+    try:
+        return float(output)
+    except ValueError:
+        logger.error(f"获取音频时长失败，无法解析: {output}")
+        return None
+
+
+async def get_video_fps_async(video_path: str) -> Optional[float]:
+    """
+    异步获取视频帧率
+
+    优先在进程内解析文件头，无法识别的格式回退到ffprobe；结果按文件缓存
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        视频帧率（fps），如果失败返回None
+    """
+    info = await asyncio.to_thread(_probe_cached, video_path)
+    if info is None:
+        return None
+    if info.fps is not None:
+        return info.fps
+
+    output = await _run_ffprobe_async([
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=r_frame_rate",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        video_path
+    ])
+    if not output:
+        return None
+
+    try:
+        info.fps = _parse_frame_rate(output)
+    except (ValueError, ZeroDivisionError):
+        logger.error(f"获取视频帧率失败，无法解析: {output}")
+        return None
+
+    logger.debug(f"视频帧率: {video_path} = {info.fps:.2f}fps")
+    return info.fps
+
+
 def build_sentence_video_command(
         image_path: str,
         audio_path: str,
         output_path: str,
         subtitle_filter: str,
-        gen_setting: dict
+        gen_setting: dict,
+        duration: Optional[float] = None
 ) -> List[str]:
     """
     构建单句视频合成命令（电影级效果）
@@ -230,19 +645,20 @@ def build_sentence_video_command(
         output_path: 输出视频路径
         subtitle_filter: 字幕滤镜字符串
         gen_setting: 生成设置
+        duration: 音频时长（秒，可选），未提供时通过ffprobe获取
 
     Returns:
         FFmpeg命令列表
     """
     # 获取音频时长
-    duration = get_audio_duration(audio_path)
+    if duration is None:
+        duration = get_audio_duration(audio_path)
     if not duration:
         raise ValueError(f"无法获取音频时长: {audio_path}")
 
     # 解析设置
     resolution = gen_setting.get("resolution", "1440x1080")  # 默认4:3横屏
     fps = gen_setting.get("fps", 30)  # 提高到30fps更流畅
-    video_codec = gen_setting.get("video_codec", "libx264")
     audio_codec = gen_setting.get("audio_codec", "aac")
     audio_bitrate = gen_setting.get("audio_bitrate", "192k")
     zoom_speed = gen_setting.get("zoom_speed", 0.00015)  # Ken Burns缩放速度，默认0.00015
@@ -300,14 +716,10 @@ def build_sentence_video_command(
         "-filter_complex", filter_complex,
         "-map", map_video,
         "-map", "1:a",
-        "-c:v", video_codec,
-        "-preset", "slow",  # 使用slow预设获得最佳质量
-        "-crf", "20",  # 提高质量（更低的CRF值）
-        "-profile:v", "high",  # 使用high profile
-        "-level", "4.2",
+        *_video_encoder_args(gen_setting),
         "-c:a", audio_codec,
         "-b:a", audio_bitrate,
-        "-pix_fmt", "yuv420p",
+        "-force_key_frames", f"expr:gte(t,n_forced*{SENTENCE_KEYFRAME_INTERVAL})",  # 固定间隔关键帧
         "-movflags", "+faststart",  # 优化网络播放
         "-shortest",
         output_path
@@ -327,7 +739,13 @@ def concatenate_videos(
     transition_duration: float = 0.5,
     # trim模式参数(保留向后兼容)
     remove_duplicate_frames: bool = False,
-    trim_frames: int = 35
+    trim_frames: int = 35,
+    # crossfade_tree模式参数
+    chunk_size: int = 16,
+    max_parallel_chunks: int = 2,
+    # smart_crossfade模式参数
+    gen_setting: Optional[dict] = None,
+    threads: Optional[int] = None
 ) -> bool:
     """
     拼接多个视频文件,支持多种拼接模式
@@ -338,6 +756,8 @@ def concatenate_videos(
         concat_file_path: concat文件路径(用于fallback)
         mode: 拼接模式, 可选:
             - "crossfade": 使用交叉淡化过渡(推荐,最自然)
+            - "crossfade_tree": 分层交叉淡化(效果同crossfade,适合长章节)
+            - "smart_crossfade": 只重新编码过渡区, 片段中间部分直接复制流(最快)
             - "trim": 裁剪重复帧
             - "fast": 快速拼接(不处理重复帧)
         transition_type: 过渡效果类型(仅crossfade模式), 可选:
@@ -351,6 +771,10 @@ def concatenate_videos(
         transition_duration: 过渡时长(秒), 默认0.5秒
         remove_duplicate_frames: 是否去除重复帧(trim模式,已废弃)
         trim_frames: 裁剪帧数(trim模式,已废弃)
+        chunk_size: 每个FFmpeg进程最多交叉淡化的片段数(crossfade_tree模式)
+        max_parallel_chunks: 同时渲染的分组数(crossfade_tree/smart_crossfade模式)
+        gen_setting: 句子视频的生成设置, 过渡区按相同的编码器编码(smart_crossfade模式)
+        threads: 每个过渡区编码进程的线程数(smart_crossfade模式)
     
     Returns:
         是否成功
@@ -373,6 +797,19 @@ def concatenate_videos(
                 video_paths, output_path, 
                 transition_type, transition_duration
             )
+        elif mode == "crossfade_tree":
+            return _concatenate_with_xfade_tree(
+                video_paths, output_path,
+                transition_type, transition_duration,
+                chunk_size, max_parallel_chunks
+            )
+        elif mode == "smart_crossfade":
+            return _concatenate_with_smart_xfade(
+                video_paths, output_path, concat_file_path,
+                transition_type, transition_duration,
+                chunk_size, max_parallel_chunks,
+                gen_setting, threads
+            )
         elif mode == "trim" or remove_duplicate_frames:
             return _concatenate_with_trim(
                 video_paths, output_path, 
@@ -394,6 +831,50 @@ def concatenate_videos(
             return False
 
 
+def _build_xfade_video_filters(
+    durations: List[float],
+    transition_type: str,
+    transition_duration: float
+) -> List[str]:
+    """
+    构建xfade视频滤镜链, 输出标签为 [vout]
+
+    Args:
+        durations: 每个输入视频的时长(秒)
+        transition_type: 过渡效果类型
+        transition_duration: 过渡时长(秒)
+
+    Returns:
+        滤镜片段列表
+    """
+    if len(durations) == 1:
+        return ["[0:v]null[vout]"]
+
+    video_filter_parts = []
+
+    # 第一个视频作为基础
+    current_video_label = "[0:v]"
+    offset = 0.0
+
+    for i in range(1, len(durations)):
+        # 计算offset: 前一个视频的累计时长 - 过渡时长
+        offset += durations[i-1] - transition_duration
+
+        # 构建xfade视频滤镜
+        output_video_label = f"[v{i}out]" if i < len(durations) - 1 else "[vout]"
+        xfade_filter = (
+            f"{current_video_label}[{i}:v]"
+            f"xfade=transition={transition_type}:"
+            f"duration={transition_duration}:"
+            f"offset={offset:.3f}"
+            f"{output_video_label}"
+        )
+        video_filter_parts.append(xfade_filter)
+        current_video_label = output_video_label
+
+    return video_filter_parts
+
+
 def _concatenate_with_xfade(
     video_paths: List[Path],
     output_path: Path,
@@ -427,27 +908,9 @@ def _concatenate_with_xfade(
             logger.debug(f"视频 {video_path.name}: {duration:.2f}秒")
         
         # 构建xfade滤镜链 (仅处理视频)
-        video_filter_parts = []
-        
-        # 第一个视频作为基础
-        current_video_label = "[0:v]"
-        offset = 0.0
-        
-        for i in range(1, len(video_paths)):
-            # 计算offset: 前一个视频的累计时长 - 过渡时长
-            offset += durations[i-1] - transition_duration
-            
-            # 构建xfade视频滤镜
-            output_video_label = f"[v{i}out]" if i < len(video_paths) - 1 else "[vout]"
-            xfade_filter = (
-                f"{current_video_label}[{i}:v]"
-                f"xfade=transition={transition_type}:"
-                f"duration={transition_duration}:"
-                f"offset={offset:.3f}"
-                f"{output_video_label}"
-            )
-            video_filter_parts.append(xfade_filter)
-            current_video_label = output_video_label
+        video_filter_parts = _build_xfade_video_filters(
+            durations, transition_type, transition_duration
+        )
         
         # 音频处理: 使用简单的concat滤镜
         # 为每个音频流添加延迟以匹配视频过渡
@@ -516,6 +979,660 @@ def _concatenate_with_xfade(
         return False
 
 
+# 分层crossfade: 中间文件的编码参数(高质量、快速; 音频用PCM避免多次AAC有损编码)
+_XFADE_INTERMEDIATE_ARGS = [
+    "-c:v", "libx264",
+    "-preset", "veryfast",
+    "-crf", "12",
+    "-pix_fmt", "yuv420p",
+    "-c:a", "pcm_s16le",
+    "-ar", "44100",
+]
+
+# 分层crossfade: 最终输出的编码参数(与crossfade模式一致)
+_XFADE_FINAL_ARGS = [
+    "-c:v", "libx264",
+    "-preset", "medium",
+    "-crf", "18",
+    "-pix_fmt", "yuv420p",
+    "-c:a", "aac",
+    "-b:a", "192k",
+    "-ar", "44100",
+    "-movflags", "+faststart",
+]
+
+
+def _build_crossfade_audio_filters(
+    durations: List[float],
+    global_start: int,
+    global_total: int,
+    transition_duration: float
+) -> List[str]:
+    """
+    构建与crossfade模式一致的音频裁剪+拼接滤镜, 输出标签为 [aout]
+
+    每个片段按其在整条时间线中的位置裁剪: 非第一个片段跳过开头的过渡时长,
+    非最后一个片段裁掉结尾的过渡时长
+
+    Args:
+        durations: 本组输入视频的时长(秒)
+        global_start: 本组第一个片段在整条时间线中的索引
+        global_total: 整条时间线的片段总数
+        transition_duration: 过渡时长(秒)
+
+    Returns:
+        滤镜片段列表
+    """
+    audio_filter_parts = []
+
+    for j, duration in enumerate(durations):
+        global_index = global_start + j
+        trim_args = []
+        if global_index > 0:
+            trim_args.append(f"start={transition_duration}")
+        if global_index < global_total - 1:
+            trim_args.append(f"end={duration - transition_duration}")
+        trim = f"atrim={':'.join(trim_args)}," if trim_args else ""
+        audio_filter_parts.append(f"[{j}:a]{trim}asetpts=PTS-STARTPTS[a{j}]")
+
+    audio_inputs = ''.join([f"[a{j}]" for j in range(len(durations))])
+    audio_filter_parts.append(f"{audio_inputs}concat=n={len(durations)}:v=0:a=1[aout]")
+    return audio_filter_parts
+
+
+def _build_audio_concat_filters(count: int) -> List[str]:
+    """构建直接拼接音频的滤镜(音频已按crossfade规则裁剪过), 输出标签为 [aout]"""
+    audio_inputs = ''.join([f"[{j}:a]" for j in range(count)])
+    return [f"{audio_inputs}concat=n={count}:v=0:a=1[aout]"]
+
+
+def _render_xfade_group(
+    video_paths: List[Path],
+    output_path: Path,
+    durations: List[float],
+    audio_filter_parts: List[str],
+    transition_type: str,
+    transition_duration: float,
+    encode_args: List[str],
+    retries: int = 1
+) -> bool:
+    """
+    用一个FFmpeg进程交叉淡化一组视频
+
+    Args:
+        video_paths: 本组视频路径
+        output_path: 输出路径
+        durations: 本组视频时长(秒)
+        audio_filter_parts: 音频滤镜片段(输出 [aout])
+        transition_type: 过渡效果类型
+        transition_duration: 过渡时长(秒)
+        encode_args: 编码参数
+        retries: 失败重试次数(只重做本组, 不影响其他组)
+
+    Returns:
+        是否成功
+    """
+    video_filter_parts = _build_xfade_video_filters(
+        durations, transition_type, transition_duration
+    )
+    filter_complex = ";".join(video_filter_parts + audio_filter_parts)
+
+    command = ["ffmpeg", "-y"]
+    for video_path in video_paths:
+        command.extend(["-i", str(video_path)])
+    command.extend([
+        "-filter_complex", filter_complex,
+        "-map", "[vout]",
+        "-map", "[aout]",
+        *encode_args,
+        str(output_path)
+    ])
+
+    for attempt in range(retries + 1):
+        success, stdout, stderr = run_ffmpeg_command(command, timeout=600)
+        if success:
+            return True
+        logger.warning(f"分组crossfade失败(第{attempt + 1}次): {output_path.name}")
+
+    logger.error(f"❌ 分组crossfade最终失败: {output_path}: {stderr}")
+    return False
+
+
+def _concatenate_with_xfade_tree(
+    video_paths: List[Path],
+    output_path: Path,
+    transition_type: str = "fade",
+    transition_duration: float = 0.5,
+    chunk_size: int = 16,
+    max_parallel_chunks: int = 2
+) -> bool:
+    """
+    分层(树形)交叉淡化拼接, 适合长章节
+
+    每次最多把 chunk_size 个片段交给一个FFmpeg进程交叉淡化成中间文件(可并行),
+    再逐层合并中间文件, 直到剩余文件数不超过 chunk_size 时输出最终视频。
+    每个进程同时打开的输入数和帧队列因此有上限, 单组失败只需重做该组。
+
+    画面与crossfade模式一致: xfade只作用于相邻片段的首尾过渡区, 因此组内先做、
+    组间后做得到相同的时间线; 音频在第一层按全局位置裁剪, 之后各层直接拼接。
+
+    Args:
+        video_paths: 视频文件路径列表
+        output_path: 输出视频路径
+        transition_type: 过渡效果类型
+        transition_duration: 过渡时长(秒)
+        chunk_size: 每组片段数(至少为2)
+        max_parallel_chunks: 同时渲染的分组数
+
+    Returns:
+        是否成功
+    """
+    chunk_size = max(2, chunk_size)
+    if len(video_paths) <= chunk_size:
+        return _concatenate_with_xfade(
+            video_paths, output_path, transition_type, transition_duration
+        )
+
+    work_dir = output_path.parent / f"{output_path.stem}_xfade_chunks"
+
+    try:
+        logger.info(
+            f"开始拼接 {len(video_paths)} 个视频(分层crossfade模式), "
+            f"每组 {chunk_size} 个, 并行 {max_parallel_chunks} 组"
+        )
+
+        # 获取每个视频的时长
+        durations = []
+        for video_path in video_paths:
+            duration = get_audio_duration(str(video_path))
+            if not duration:
+                logger.error(f"无法获取视频时长: {video_path}")
+                return False
+            durations.append(duration)
+
+        work_dir.mkdir(parents=True, exist_ok=True)
+
+        current_paths = list(video_paths)
+        current_durations = durations
+        audio_trimmed = False
+        level = 0
+
+        while len(current_paths) > chunk_size:
+            groups = [
+                (start, current_paths[start:start + chunk_size], current_durations[start:start + chunk_size])
+                for start in range(0, len(current_paths), chunk_size)
+            ]
+            logger.info(f"第 {level + 1} 层: {len(current_paths)} 个片段 -> {len(groups)} 组")
+
+            def render_group(group) -> Optional[Path]:
+                start, paths, group_durations = group
+                if audio_trimmed:
+                    audio_parts = _build_audio_concat_filters(len(paths))
+                else:
+                    audio_parts = _build_crossfade_audio_filters(
+                        group_durations, start, len(current_paths), transition_duration
+                    )
+                intermediate = work_dir / f"level{level}_{start // chunk_size:04d}.mkv"
+                success = _render_xfade_group(
+                    paths, intermediate, group_durations, audio_parts,
+                    transition_type, transition_duration, _XFADE_INTERMEDIATE_ARGS
+                )
+                return intermediate if success else None
+
+            with ThreadPoolExecutor(max_workers=max(1, max_parallel_chunks)) as executor:
+                intermediates = list(executor.map(render_group, groups))
+
+            if any(path is None for path in intermediates):
+                return False
+
+            next_durations = []
+            for path in intermediates:
+                duration = get_audio_duration(str(path))
+                if not duration:
+                    logger.error(f"无法获取中间文件时长: {path}")
+                    return False
+                next_durations.append(duration)
+
+            # 上一层的中间文件已不再需要, 及时删除以控制磁盘占用
+            if level > 0:
+                for path in current_paths:
+                    Path(path).unlink(missing_ok=True)
+
+            current_paths = intermediates
+            current_durations = next_durations
+            audio_trimmed = True
+            level += 1
+
+        # 最后一层: 输出最终视频
+        if audio_trimmed:
+            audio_parts = _build_audio_concat_filters(len(current_paths))
+        else:
+            audio_parts = _build_crossfade_audio_filters(
+                current_durations, 0, len(current_paths), transition_duration
+            )
+
+        success = _render_xfade_group(
+            current_paths, output_path, current_durations, audio_parts,
+            transition_type, transition_duration, _XFADE_FINAL_ARGS
+        )
+
+        if success:
+            logger.info(f"✅ 视频拼接成功(分层crossfade模式): {output_path}")
+        return success
+
+    except Exception as e:
+        logger.error(f"分层Crossfade拼接异常: {e}", exc_info=True)
+        return False
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# smart crossfade: 过渡区与直接复制的片段必须一致的视频流属性
+_STREAM_SIGNATURE_FIELDS = ("codec_name", "profile", "width", "height", "pix_fmt")
+
+# smart crossfade: 音轨分段统一为PCM, 拼接时采样精确, 最后只编码一次AAC
+_SMART_XFADE_AUDIO_ARGS = [
+    "-c:a", "pcm_s16le",
+    "-ar", "44100",
+    "-ac", "2",
+]
+
+# 关键帧时间比较的容差(秒)
+_KEYFRAME_EPSILON = 1e-3
+
+# 片段的一部分: (片段索引, 开始时间, 结束时间)
+SegmentPart = Tuple[int, float, float]
+
+
+def _probe_video_packets(video_path: str) -> Optional[Dict[str, Any]]:
+    """
+    读取视频流的参数和包信息(只解复用不解码, 开销很小)
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        {"duration": 视频流时长, "keyframes": [(pts, dts), ...], "stream": (编码, profile, 宽, 高, 像素格式)},
+        失败返回None
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries",
+                f"stream={','.join(_STREAM_SIGNATURE_FIELDS)}:packet=pts_time,dts_time,duration_time,flags",
+                "-of", "json",
+                video_path
+            ],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+
+        if result.returncode != 0:
+            logger.error(f"读取视频包信息失败: {result.stderr}")
+            return None
+
+        data = json.loads(result.stdout or "{}")
+        streams = data.get("streams") or [{}]
+
+        keyframes = []
+        start = None
+        end = 0.0
+        for packet in data.get("packets", []):
+            try:
+                pts = float(packet["pts_time"])
+                dts = float(packet["dts_time"])
+                duration = float(packet["duration_time"])
+            except (KeyError, ValueError):
+                continue
+            start = pts if start is None else min(start, pts)
+            end = max(end, pts + duration)
+            if packet.get("flags", "").startswith("K"):
+                keyframes.append((pts, dts))
+
+        if start is None:
+            return None
+
+        return {
+            "duration": end - start,
+            "keyframes": sorted(keyframes),
+            "stream": tuple(streams[0].get(field) for field in _STREAM_SIGNATURE_FIELDS),
+        }
+
+    except Exception as e:
+        logger.error(f"读取视频包信息异常: {e}")
+        return None
+
+
+def _plan_smart_crossfade(
+    durations: List[float],
+    keyframes: List[List[float]],
+    transition_duration: float
+) -> List[Tuple[str, List[SegmentPart]]]:
+    """
+    规划smart crossfade的分段
+
+    每个片段中不参与过渡的部分(从过渡区之后的第一个关键帧, 到过渡区之前的最后一个关键帧)
+    直接复制流; 相邻片段的尾部和头部组成过渡区, 用xfade重新编码。
+    没有可用关键帧的片段整体并入过渡区。
+
+    Args:
+        durations: 每个片段的时长(秒)
+        keyframes: 每个片段的关键帧时间(升序)
+        transition_duration: 过渡时长(秒)
+
+    Returns:
+        分段列表, 每项为 ("copy", [part]) 或 ("window", [part, ...])
+    """
+    count = len(durations)
+    plan: List[Tuple[str, List[SegmentPart]]] = []
+    window: List[SegmentPart] = []
+
+    for i, duration in enumerate(durations):
+        times = keyframes[i]
+
+        if i == 0:
+            copy_start = 0.0
+        else:
+            copy_start = next(
+                (t for t in times if t >= transition_duration - _KEYFRAME_EPSILON), None
+            )
+
+        if i == count - 1:
+            copy_end = duration
+        else:
+            copy_end = max(
+                (t for t in times if t <= duration - transition_duration + _KEYFRAME_EPSILON),
+                default=None
+            )
+
+        if copy_start is None or copy_end is None or copy_end - copy_start <= _KEYFRAME_EPSILON:
+            # 无法在关键帧处切分, 整个片段参与重新编码
+            window.append((i, 0.0, duration))
+            continue
+
+        if i > 0:
+            window.append((i, 0.0, copy_start))
+            plan.append(("window", window))
+
+        plan.append(("copy", [(i, copy_start, copy_end)]))
+        window = [(i, copy_end, duration)] if i < count - 1 else []
+
+    if window:
+        plan.append(("window", window))
+
+    return plan
+
+
+def _build_smart_xfade_window_command(
+    parts: List[SegmentPart],
+    video_paths: List[Path],
+    durations: List[float],
+    video_output_path: Path,
+    audio_output_path: Path,
+    transition_type: str,
+    transition_duration: float,
+    encoder_args: Optional[List[str]] = None
+) -> List[str]:
+    """
+    构建smart crossfade过渡区的FFmpeg命令
+
+    画面用xfade过渡; 音频先补齐/裁剪到与画面等长, 再用acrossfade同步过渡,
+    因此过渡区的音视频时长一致。画面和音频分别输出, 供两份concat列表使用
+
+    Args:
+        parts: 过渡区包含的片段部分
+        video_paths: 全部片段路径
+        durations: 全部片段的视频时长(秒)
+        video_output_path: 过渡区画面输出路径(仅视频)
+        audio_output_path: 过渡区音频输出路径(PCM WAV)
+        transition_type: 过渡效果类型
+        transition_duration: 过渡时长(秒)
+        encoder_args: 画面编码参数, 默认与句子视频一致(_video_encoder_args)
+
+    Returns:
+        FFmpeg命令列表
+    """
+    command = ["ffmpeg", "-y"]
+    for index, start, end in parts:
+        if start > 0:
+            command.extend(["-ss", f"{start:.6f}"])
+        if end < durations[index] - _KEYFRAME_EPSILON:
+            command.extend(["-t", f"{end - start:.6f}"])
+        command.extend(["-i", str(video_paths[index])])
+
+    part_durations = [end - start for _, start, end in parts]
+    filter_parts = _build_xfade_video_filters(
+        part_durations, transition_type, transition_duration
+    )
+
+    for j, part_duration in enumerate(part_durations):
+        filter_parts.append(
+            f"[{j}:a]apad=whole_dur={part_duration:.6f},atrim=duration={part_duration:.6f}[a{j}]"
+        )
+
+    if len(parts) == 1:
+        filter_parts.append("[a0]anull[aout]")
+    prev_label = "[a0]"
+    for j in range(1, len(parts)):
+        out_label = "[aout]" if j == len(parts) - 1 else f"[a{j}out]"
+        filter_parts.append(f"{prev_label}[a{j}]acrossfade=d={transition_duration}{out_label}")
+        prev_label = out_label
+
+    command.extend([
+        "-filter_complex", ";".join(filter_parts),
+        "-map", "[vout]",
+        *(encoder_args if encoder_args is not None else _video_encoder_args()),
+        str(video_output_path),
+        "-map", "[aout]",
+        *_SMART_XFADE_AUDIO_ARGS,
+        str(audio_output_path)
+    ])
+    return command
+
+
+def _build_smart_xfade_audio_command(
+    video_path: Path,
+    start: float,
+    duration: Optional[float],
+    output_path: Path
+) -> List[str]:
+    """
+    构建直接复制部分的音频提取命令(解码后按采样精确裁剪为PCM)
+
+    Args:
+        video_path: 片段路径
+        start: 开始时间(秒)
+        duration: 时长(秒), None表示到结尾
+        output_path: 输出WAV路径
+
+    Returns:
+        FFmpeg命令列表
+    """
+    command = ["ffmpeg", "-y"]
+    if start > 0:
+        command.extend(["-ss", f"{start:.6f}"])
+    command.extend(["-i", str(video_path)])
+    if duration is not None:
+        command.extend(["-t", f"{duration:.6f}"])
+    command.extend([
+        "-map", "0:a:0",
+        *_SMART_XFADE_AUDIO_ARGS,
+        str(output_path)
+    ])
+    return command
+
+
+def _concatenate_with_smart_xfade(
+    video_paths: List[Path],
+    output_path: Path,
+    concat_file_path: Path,
+    transition_type: str = "fade",
+    transition_duration: float = 0.5,
+    chunk_size: int = 16,
+    max_parallel_chunks: int = 2,
+    gen_setting: Optional[dict] = None,
+    threads: Optional[int] = None
+) -> bool:
+    """
+    smart crossfade拼接: 只重新编码过渡区, 其余部分直接复制流
+
+    每个片段在关键帧处切成三段: 头部过渡区、中间部分、尾部过渡区。
+    相邻片段的尾部和头部用xfade/acrossfade重新编码成过渡区文件(编码参数与句子视频一致);
+    中间部分的画面不落盘, 在concat文件中用 inpoint/outpoint 直接引用原片段,
+    最后通过concat demuxer(快速模式)以 -c copy 拼接。时间线与crossfade模式相同。
+
+    concat demuxer按DTS判断outpoint, 含B帧时关键帧的DTS早于PTS, 因此outpoint取
+    切分关键帧的DTS并用duration指令保持时间线。
+    AAC直接复制会在每个分段引入编码器延迟和预读包, 因此音轨按分段解码为PCM后拼接,
+    最后统一编码一次AAC(相对视频编码开销很小)。
+
+    句子视频按 SENTENCE_KEYFRAME_INTERVAL 强制关键帧; 旧片段缺少关键帧时整体并入过渡区,
+    完全无法切分或任一步骤失败时回退到分层crossfade模式。
+    片段之间或过渡区与片段的编码、profile、分辨率、像素格式不一致时, -c copy 拼接会得到损坏的输出,
+    同样回退到分层crossfade模式。
+
+    Args:
+        video_paths: 视频文件路径列表
+        output_path: 输出视频路径
+        concat_file_path: concat文件路径
+        transition_type: 过渡效果类型
+        transition_duration: 过渡时长(秒)
+        chunk_size: 回退到分层crossfade时的每组片段数
+        max_parallel_chunks: 同时渲染的过渡区数
+        gen_setting: 句子视频的生成设置, 过渡区使用相同的视频编码器
+        threads: 每个过渡区编码进程的线程数
+
+    Returns:
+        是否成功
+    """
+    def fallback() -> bool:
+        logger.warning("smart crossfade不可用, 回退到分层crossfade模式")
+        return _concatenate_with_xfade_tree(
+            video_paths, output_path, transition_type, transition_duration,
+            chunk_size, max_parallel_chunks
+        )
+
+    work_dir = output_path.parent / f"{output_path.stem}_smart_xfade"
+
+    try:
+        logger.info(f"开始拼接 {len(video_paths)} 个视频(smart crossfade模式, 过渡时长={transition_duration}s)")
+
+        probes = []
+        for video_path in video_paths:
+            probe = _probe_video_packets(str(video_path))
+            if not probe:
+                logger.error(f"无法读取视频信息: {video_path}")
+                return fallback()
+            probes.append(probe)
+
+        signatures = {probe["stream"] for probe in probes}
+        if len(signatures) > 1:
+            logger.warning(f"片段的视频流参数不一致, 无法直接复制: {sorted(map(str, signatures))}")
+            return fallback()
+
+        # 以视频流时长为准(帧对齐), 音频在过渡区内补齐
+        durations = [probe["duration"] for probe in probes]
+        keyframe_dts = [dict(probe["keyframes"]) for probe in probes]
+        plan = _plan_smart_crossfade(
+            durations, [sorted(dts_map) for dts_map in keyframe_dts], transition_duration
+        )
+
+        windows = [parts for kind, parts in plan if kind == "window"]
+        if len(windows) == len(plan):
+            return fallback()
+
+        window_seconds = sum(end - start for parts in windows for _, start, end in parts)
+        logger.info(
+            f"smart crossfade分段: {len(plan) - len(windows)} 段直接复制, {len(windows)} 个过渡区, "
+            f"重新编码 {window_seconds:.2f}s / {sum(durations):.2f}s"
+        )
+
+        work_dir.mkdir(parents=True, exist_ok=True)
+        encoder_args = _video_encoder_args(gen_setting, threads)
+
+        # 每个分段一个任务: 过渡区渲染画面和PCM音频, 直接复制的部分只提取PCM音频
+        def build_job(item) -> Tuple[Path, List[str]]:
+            index, (kind, parts) = item
+            audio_path = work_dir / f"audio_{index:05d}.wav"
+            if kind == "window":
+                return audio_path, _build_smart_xfade_window_command(
+                    parts, video_paths, durations,
+                    work_dir / f"window_{index:05d}.mp4", audio_path,
+                    transition_type, transition_duration, encoder_args
+                )
+            clip_index, start, end = parts[0]
+            is_tail = end >= durations[clip_index] - _KEYFRAME_EPSILON
+            return audio_path, _build_smart_xfade_audio_command(
+                video_paths[clip_index], start, None if is_tail else end - start, audio_path
+            )
+
+        def run_job(job: Tuple[Path, List[str]]) -> Optional[Path]:
+            audio_path, command = job
+            success, stdout, stderr = run_ffmpeg_command(command, timeout=600)
+            if not success:
+                logger.error(f"smart crossfade分段失败: {audio_path.name}: {stderr}")
+                return None
+            return audio_path
+
+        jobs = [build_job(item) for item in enumerate(plan)]
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel_chunks)) as executor:
+            audio_paths = list(executor.map(run_job, jobs))
+
+        if any(path is None for path in audio_paths):
+            return fallback()
+
+        # 所有过渡区使用同一组编码参数, 检查第一个过渡区与片段的视频流参数一致
+        first_window = next(index for index, (kind, _) in enumerate(plan) if kind == "window")
+        window_probe = _probe_video_packets(str(work_dir / f"window_{first_window:05d}.mp4"))
+        if not window_probe or window_probe["stream"] != probes[0]["stream"]:
+            logger.warning(
+                f"过渡区与片段的视频流参数不一致, 无法直接复制: "
+                f"{window_probe['stream'] if window_probe else None} != {probes[0]['stream']}"
+            )
+            return fallback()
+
+        # 组装concat列表: 画面中间部分引用原片段(-c copy), 过渡区引用渲染结果; 音轨按分段顺序拼接PCM
+        entries: List[Path] = []
+        directives: List[Dict[str, float]] = []
+        for index, (kind, parts) in enumerate(plan):
+            if kind == "window":
+                window_duration = sum(end - start for _, start, end in parts)
+                window_duration -= transition_duration * (len(parts) - 1)
+                entries.append(work_dir / f"window_{index:05d}.mp4")
+                directives.append({"duration": window_duration})
+                continue
+
+            clip_index, start, end = parts[0]
+            directive: Dict[str, float] = {}
+            if start > 0:
+                directive["inpoint"] = start
+            if end < durations[clip_index] - _KEYFRAME_EPSILON:
+                directive["outpoint"] = keyframe_dts[clip_index][end]
+                directive["duration"] = end - start
+            entries.append(video_paths[clip_index])
+            directives.append(directive)
+
+        if not _concatenate_videos_fast(
+            entries, output_path, concat_file_path, directives, audio_paths=audio_paths
+        ):
+            return fallback()
+
+        logger.info(f"✅ 视频拼接成功(smart crossfade模式): {output_path}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Smart crossfade拼接异常: {e}", exc_info=True)
+        return fallback()
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
 def _concatenate_with_trim(
     video_paths: List[Path],
     output_path: Path,
@@ -621,7 +1738,13 @@ def _concatenate_with_trim(
         return False
 
 
-def _concatenate_videos_fast(video_paths: List[Path], output_path: Path, concat_file_path: Path) -> bool:
+def _concatenate_videos_fast(
+    video_paths: List[Path],
+    output_path: Path,
+    concat_file_path: Path,
+    directives: Optional[List[Dict[str, float]]] = None,
+    audio_paths: Optional[List[Path]] = None
+) -> bool:
     """
     快速拼接视频(不去除重复帧)
     
@@ -631,13 +1754,16 @@ def _concatenate_videos_fast(video_paths: List[Path], output_path: Path, concat_
         video_paths: 视频文件路径列表
         output_path: 输出视频路径
         concat_file_path: concat文件路径
+        directives: 每个文件的concat指令(可选, 见 create_concat_file)
+        audio_paths: 单独的音频文件列表(可选, 采样精确的PCM), 提供时视频流直接复制,
+            音轨由这些文件拼接后统一编码为AAC
     
     Returns:
         是否成功
     """
     try:
         # 创建concat文件
-        create_concat_file(video_paths, concat_file_path)
+        create_concat_file(video_paths, concat_file_path, directives)
 
         # 构建拼接命令
         command = [
@@ -646,10 +1772,27 @@ def _concatenate_videos_fast(video_paths: List[Path], output_path: Path, concat_
             "-f", "concat",
             "-safe", "0",
             "-i", str(concat_file_path),
-            "-c", "copy",  # 直接复制流，不重新编码
-            str(output_path)
         ]
 
+        if audio_paths is None:
+            command.extend(["-c", "copy"])  # 直接复制流，不重新编码
+        else:
+            audio_concat_path = concat_file_path.with_name(f"{concat_file_path.stem}_audio.txt")
+            create_concat_file(audio_paths, audio_concat_path)
+            command.extend([
+                "-f", "concat",
+                "-safe", "0",
+                "-i", str(audio_concat_path),
+                "-map", "0:v:0",
+                "-map", "1:a:0",
+                "-c:v", "copy",
+                "-c:a", "aac",
+                "-b:a", "192k",
+                "-movflags", "+faststart",
+            ])
+
+        command.append(str(output_path))
+
         # 执行命令
         success, stdout, stderr = run_ffmpeg_command(command, timeout=600)
 
@@ -665,7 +1808,6 @@ def _concatenate_videos_fast(video_paths: List[Path], output_path: Path, concat_
         return False
 
 
-
 def mix_bgm_with_video(
         video_path: str,
         bgm_path: str,
@@ -836,6 +1978,11 @@ __all__ = [
     "get_video_fps",
     "create_concat_file",
     "run_ffmpeg_command",
+    "run_ffmpeg_command_async",
+    "get_audio_duration_async",
+    "get_audio_duration_from_bytes_async",
+    "get_video_fps_async",
+    "get_ffmpeg_max_concurrency",
     "build_sentence_video_command",
     "concatenate_videos",
     "apply_video_speed",
@@ -0,0 +1,233 @@
+"""
+进程级HTTP客户端池 - 复用第三方API和外部下载的长连接
+
+负责:
+- 所有Provider共享一个 httpx.AsyncClient（显式连接数上限、keep-alive，安装h2时启用HTTP/2）
+- 按 (provider, base_url, api_key哈希) 缓存 AsyncOpenAI 客户端，底层共用上面的连接池
+- 外部图片/视频下载共享一个 aiohttp.ClientSession
+- 共享 httpx 客户端的每个响应都交给自适应限流器（读取429和限流响应头）
+
+客户端绑定创建它的事件循环，事件循环变化时（如测试或fork后的子进程）丢弃旧客户端重新创建。
+FastAPI关闭和Celery worker进程退出时调用 aclose()，worker子进程启动时调用 reset() 丢弃从父进程继承的客户端。
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+import httpx
+from openai import DEFAULT_TIMEOUT as OPENAI_DEFAULT_TIMEOUT, AsyncOpenAI
+
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.utils.rate_limiter import observe_response
+
+logger = get_logger(__name__)
+
+# 最多缓存的 AsyncOpenAI 客户端数（每个用户的每个API Key一个），超出时淘汰最久未使用的
+MAX_OPENAI_CLIENTS = 1024
+
+# 共享连接池的默认超时，各Provider按请求传入自己的超时
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=20.0)
+
+
+def _http2_available() -> bool:
+    """是否启用HTTP/2（需要安装可选依赖h2）"""
+    return settings.PROVIDER_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _api_key_hash(api_key: str) -> str:
+    """API Key的哈希，避免明文Key作为缓存键常驻内存"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class HttpClientPool:
+    """进程级共享的HTTP客户端注册表"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._httpx_client: Optional[httpx.AsyncClient] = None
+        self._aiohttp_session: Optional[aiohttp.ClientSession] = None
+        self._openai_clients: "OrderedDict[Tuple[str, str, str], AsyncOpenAI]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 累计统计
+        self._created = 0
+        self._reused = 0
+
+    def _bind_loop(self) -> None:
+        """绑定当前事件循环，事件循环变化时丢弃旧客户端（调用方需持有锁）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 在同步代码中创建客户端（连接在首次请求时才建立）
+            return
+        if self._loop is not loop:
+            if self._loop is not None:
+                logger.info("事件循环已变化，重新创建HTTP客户端")
+            self._discard()
+            self._loop = loop
+
+    def _discard(self) -> None:
+        """丢弃所有客户端（不关闭连接，用于fork后或旧事件循环已不可用时）"""
+        self._httpx_client = None
+        self._aiohttp_session = None
+        self._openai_clients.clear()
+        self._loop = None
+
+    def get_httpx_client(self) -> httpx.AsyncClient:
+        """
+        获取共享的 httpx 客户端
+
+        Returns:
+            httpx.AsyncClient
+        """
+        with self._lock:
+            self._bind_loop()
+            if self._httpx_client is None or self._httpx_client.is_closed:
+                self._httpx_client = httpx.AsyncClient(
+                    http2=_http2_available(),
+                    timeout=DEFAULT_TIMEOUT,
+                    limits=httpx.Limits(
+                        max_connections=settings.PROVIDER_HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.PROVIDER_HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=settings.PROVIDER_HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                    event_hooks={"response": [observe_response]},
+                )
+                logger.info(
+                    f"创建共享HTTP连接池: http2={_http2_available()}, "
+                    f"max_connections={settings.PROVIDER_HTTP_MAX_CONNECTIONS}"
+                )
+            return self._httpx_client
+
+    def get_aiohttp_session(self) -> aiohttp.ClientSession:
+        """
+        获取共享的 aiohttp 会话（用于外部图片、视频下载），必须在事件循环中调用
+
+        Returns:
+            aiohttp.ClientSession
+        """
+        with self._lock:
+            self._bind_loop()
+            if self._aiohttp_session is None or self._aiohttp_session.closed:
+                self._aiohttp_session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(
+                        limit=settings.PROVIDER_HTTP_MAX_CONNECTIONS,
+                        keepalive_timeout=settings.PROVIDER_HTTP_KEEPALIVE_EXPIRY,
+                    )
+                )
+            return self._aiohttp_session
+
+    def get_openai_client(
+            self,
+            provider: str,
+            api_key: str,
+            base_url: Optional[str] = None,
+            timeout: Optional[float] = None
+    ) -> AsyncOpenAI:
+        """
+        获取缓存的 AsyncOpenAI 客户端，底层使用共享连接池
+
+        Args:
+            provider: 提供商名称
+            api_key: API Key
+            base_url: API地址，为空时使用SDK默认地址
+            timeout: 请求超时（秒），为空时使用SDK默认值（读超时600秒），不继承共享连接池的超时
+
+        Returns:
+            AsyncOpenAI
+        """
+        cache_key = (provider, base_url or "", _api_key_hash(api_key))
+        http_client = self.get_httpx_client()
+
+        with self._lock:
+            client = self._openai_clients.get(cache_key)
+            if client is not None:
+                self._openai_clients.move_to_end(cache_key)
+                self._reused += 1
+                return client
+
+            # 未指定超时时SDK会沿用 http_client 的超时（60秒），长时间的生成请求会被提前中断
+            options: Dict[str, Any] = {
+                "api_key": api_key,
+                "http_client": http_client,
+                "timeout": timeout if timeout is not None else OPENAI_DEFAULT_TIMEOUT,
+            }
+            if base_url:
+                options["base_url"] = base_url
+            client = AsyncOpenAI(**options)
+
+            self._openai_clients[cache_key] = client
+            self._created += 1
+            if len(self._openai_clients) > MAX_OPENAI_CLIENTS:
+                self._openai_clients.popitem(last=False)
+            return client
+
+    def reset(self) -> None:
+        """丢弃所有客户端，用于fork后的子进程（继承的连接不能跨进程使用）"""
+        with self._lock:
+            self._discard()
+
+    async def aclose(self) -> None:
+        """关闭所有连接"""
+        with self._lock:
+            httpx_client, aiohttp_session = self._httpx_client, self._aiohttp_session
+            self._discard()
+
+        if httpx_client is not None:
+            await httpx_client.aclose()
+        if aiohttp_session is not None:
+            await aiohttp_session.close()
+        logger.info("共享HTTP客户端已关闭")
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取统计信息
+
+        Returns:
+            统计字典
+        """
+        with self._lock:
+            return {
+                "openai_clients": len(self._openai_clients),
+                "created": self._created,
+                "reused": self._reused,
+            }
+
+
+# 创建全局实例
+http_client_pool = HttpClientPool()
+
+
+def get_httpx_client() -> httpx.AsyncClient:
+    """获取共享的 httpx 客户端"""
+    return http_client_pool.get_httpx_client()
+
+
+def get_aiohttp_session() -> aiohttp.ClientSession:
+    """获取共享的 aiohttp 会话"""
+    return http_client_pool.get_aiohttp_session()
+
+
+def get_openai_client(
+        provider: str,
+        api_key: str,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None
+) -> AsyncOpenAI:
+    """获取缓存的 AsyncOpenAI 客户端"""
+    return http_client_pool.get_openai_client(provider, api_key, base_url, timeout)
+
+
+__all__ = [
+    "HttpClientPool",
+    "http_client_pool",
+    "get_httpx_client",
+    "get_aiohttp_session",
+    "get_openai_client",
+]
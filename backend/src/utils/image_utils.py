@@ -5,10 +5,10 @@ import base64
 import io
 import re
 import uuid
-import aiohttp
 from typing import Any, Tuple, Optional
 
 from src.core.logging import get_logger
+from src.utils.http_client import get_aiohttp_session
 from src.utils.storage import get_storage_client, UploadFile
 
 logger = get_logger(__name__)
@@ -204,14 +204,13 @@ async def _download_image_from_url(image_url: str) -> Tuple[bytes, str]:
                 logger.warning(f"内部读取失败，回退到网络下载: {e}")
 
         # 正常下载
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image_url) as resp:
-                if resp.status != 200:
-                    raise Exception(f"下载图片失败: {resp.status}")
-                image_bytes = await resp.read()
-                mime_type = resp.content_type or 'image/png'
-                logger.info(f"从 HTTP URL 下载图片, 大小: {len(image_bytes)} bytes")
-                return image_bytes, mime_type
+        async with get_aiohttp_session().get(image_url) as resp:
+            if resp.status != 200:
+                raise Exception(f"下载图片失败: {resp.status}")
+            image_bytes = await resp.read()
+            mime_type = resp.content_type or 'image/png'
+            logger.info(f"从 HTTP URL 下载图片, 大小: {len(image_bytes)} bytes")
+            return image_bytes, mime_type
 
 
 def _get_extension_from_mime(mime_type: str) -> str:
@@ -0,0 +1,307 @@
+"""
+LLM响应缓存 - 相同请求的文本生成结果保存在Redis中，所有进程共享
+
+负责:
+- 按 (provider, base_url, model, messages, response_format, temperature 等参数) 的哈希缓存生成内容
+- 重复生成提示词、提取角色/场景/分镜时，原文未变化的请求直接返回缓存结果
+- 用户明确要求重新生成时跳过读取，用新结果覆盖缓存
+- 支持单独查找和写入条目，批量请求的结果可以拆分后按单个请求缓存
+- 条目设置有效期，超过最大条目数时按写入时间淘汰最早的条目，超大的结果不缓存
+- 要求JSON输出的请求只缓存能解析的结果，避免一次错误输出被反复复用
+- Redis不可用时直接调用API，缓存失效不影响业务调用
+"""
+
+import hashlib
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+# Redis键前缀，缓存格式变化时修改版本号使旧条目失效
+KEY_PREFIX = "llm_cache:v1:"
+# 按写入时间排序的条目索引，用于限制条目数
+INDEX_KEY = "llm_cache:v1:index"
+
+
+def make_cache_key(
+        provider: str,
+        model: Optional[str],
+        messages: List[Dict[str, Any]],
+        base_url: Optional[str] = None,
+        **params: Any
+) -> str:
+    """
+    计算请求的缓存键
+
+    Args:
+        provider: 提供商名称
+        model: 模型名称
+        messages: 对话消息
+        base_url: API地址（自定义提供商的同名模型可能来自不同服务）
+        **params: 其他请求参数（response_format、temperature等）
+
+    Returns:
+        sha256十六进制摘要
+    """
+    payload = json.dumps(
+        {"provider": provider, "base_url": base_url or "", "model": model, "messages": messages, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def extract_content(response: Any) -> Optional[str]:
+    """读取 ChatCompletion 响应中的文本内容，结构不符时返回None"""
+    try:
+        return response.choices[0].message.content
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return None
+
+
+def make_cached_response(content: str, model: Optional[str]) -> SimpleNamespace:
+    """构造缓存命中时的响应，字段与调用方使用的 ChatCompletion 字段一致"""
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+        cached=True,
+    )
+
+
+def _is_valid_json(content: str) -> bool:
+    """判断内容（允许被代码块包裹）能否解析为JSON"""
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+
+class RedisLLMCacheBackend:
+    """基于Redis的缓存存储"""
+
+    def __init__(self, redis_factory=get_redis):
+        self._redis_factory = redis_factory
+
+    async def get(self, key: str) -> Optional[str]:
+        client = self._redis_factory()
+        return await client.get(KEY_PREFIX + key)
+
+    async def set(self, key: str, value: str, ttl: int, max_entries: int) -> int:
+        """
+        写入缓存并淘汰超出上限的最早条目
+
+        Returns:
+            淘汰的条目数
+        """
+        client = self._redis_factory()
+        now = time.time()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.set(KEY_PREFIX + key, value, ex=ttl)
+            pipe.zadd(INDEX_KEY, {key: now})
+            # 已过期的条目只需从索引中移除
+            pipe.zremrangebyscore(INDEX_KEY, "-inf", now - ttl)
+            pipe.zcard(INDEX_KEY)
+            *_, size = await pipe.execute()
+
+        excess = int(size) - max_entries
+        if excess <= 0:
+            return 0
+        evicted = await client.zpopmin(INDEX_KEY, excess)
+        if evicted:
+            await client.delete(*(KEY_PREFIX + member for member, _ in evicted))
+        return len(evicted)
+
+
+class LLMCache:
+    """LLM文本生成结果缓存"""
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: 缓存存储，默认使用Redis
+        """
+        self.backend = backend if backend is not None else RedisLLMCacheBackend()
+
+        # 累计统计
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._skipped = 0
+        self._evicted = 0
+        self._errors = 0
+        self._refreshes = 0
+
+    def _on_backend_error(self, error: Exception) -> None:
+        """记录后端错误，Redis持续不可用时每100次只告警一次"""
+        self._errors += 1
+        if self._errors % 100 == 1:
+            logger.warning(f"[LLMCache] 缓存不可用，直接调用API（累计 {self._errors} 次）: {error}")
+
+    async def completions(
+            self,
+            llm_provider: Any,
+            provider: str,
+            model: Optional[str],
+            messages: List[Dict[str, Any]],
+            base_url: Optional[str] = None,
+            use_cache: bool = True,
+            **kwargs: Any
+    ) -> Any:
+        """
+        带缓存的 completions 调用
+
+        Args:
+            llm_provider: LLM 提供商实例
+            provider: 提供商名称（参与缓存键计算）
+            model: 模型名称
+            messages: 对话消息
+            base_url: API地址（参与缓存键计算）
+            use_cache: 为False时不读取缓存，调用API后覆盖缓存（用于重新生成）
+            **kwargs: 透传给 completions 的参数
+
+        Returns:
+            Provider的原始响应，缓存命中时为结构相同的简化响应
+        """
+        if not settings.LLM_CACHE_ENABLED:
+            return await llm_provider.completions(model=model, messages=messages, **kwargs)
+
+        key = make_cache_key(provider, model, messages, base_url=base_url, **kwargs)
+        if use_cache:
+            content = await self._get(key)
+            if content is not None:
+                logger.debug(f"[LLMCache] 命中缓存: provider={provider}, model={model}, key={key[:12]}")
+                return make_cached_response(content, model)
+        else:
+            self._refreshes += 1
+
+        response = await llm_provider.completions(model=model, messages=messages, **kwargs)
+        await self._store(key, extract_content(response), kwargs.get("response_format"))
+        return response
+
+    async def lookup(
+            self,
+            provider: str,
+            model: Optional[str],
+            messages: List[Dict[str, Any]],
+            base_url: Optional[str] = None,
+            **params: Any
+    ) -> Optional[str]:
+        """
+        只查找缓存，不调用API
+
+        Args:
+            provider: 提供商名称
+            model: 模型名称
+            messages: 对话消息
+            base_url: API地址
+            **params: 其他请求参数（与 completions 的 kwargs 一致）
+
+        Returns:
+            缓存的内容，未启用缓存或未命中时返回None
+        """
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+        return await self._get(make_cache_key(provider, model, messages, base_url=base_url, **params))
+
+    async def store(
+            self,
+            provider: str,
+            model: Optional[str],
+            messages: List[Dict[str, Any]],
+            content: str,
+            base_url: Optional[str] = None,
+            **params: Any
+    ) -> None:
+        """
+        把由其他请求得到的内容写入该请求对应的缓存条目（如批量结果按句子拆分后写入单句条目）
+
+        Args:
+            provider: 提供商名称
+            model: 模型名称
+            messages: 对话消息
+            content: 生成内容
+            base_url: API地址
+            **params: 其他请求参数（与 completions 的 kwargs 一致）
+        """
+        if not settings.LLM_CACHE_ENABLED:
+            return
+        key = make_cache_key(provider, model, messages, base_url=base_url, **params)
+        await self._store(key, content, params.get("response_format"))
+
+    async def _get(self, key: str) -> Optional[str]:
+        """读取缓存条目并统计命中，Redis不可用时视为未命中"""
+        content = None
+        try:
+            content = await self.backend.get(key)
+        except (RedisError, OSError) as e:
+            self._on_backend_error(e)
+
+        if content is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return content
+
+    async def _store(self, key: str, content: Optional[str], response_format: Optional[Dict[str, Any]]) -> None:
+        """缓存生成内容，空结果、超大结果和无法解析的JSON结果不缓存"""
+        if not content or len(content.encode("utf-8")) > settings.LLM_CACHE_MAX_VALUE_BYTES:
+            self._skipped += 1
+            return
+        if isinstance(response_format, dict) and response_format.get("type") == "json_object" \
+                and not _is_valid_json(content):
+            self._skipped += 1
+            return
+
+        try:
+            self._evicted += await self.backend.set(
+                key, content, settings.LLM_CACHE_TTL_SECONDS, settings.LLM_CACHE_MAX_ENTRIES
+            )
+            self._stores += 1
+        except (RedisError, OSError) as e:
+            self._on_backend_error(e)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取当前进程的累计统计信息
+
+        Returns:
+            统计字典
+        """
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "stores": self._stores,
+            "skipped": self._skipped,
+            "evicted": self._evicted,
+            "errors": self._errors,
+            "refreshes": self._refreshes,
+        }
+
+
+# 创建全局实例
+llm_cache = LLMCache()
+
+
+__all__ = [
+    "make_cache_key",
+    "RedisLLMCacheBackend",
+    "LLMCache",
+    "llm_cache",
+]
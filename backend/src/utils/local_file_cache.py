@@ -0,0 +1,229 @@
+"""
+节点本地文件缓存 - 在worker本地磁盘上缓存不可变的MinIO对象
+
+负责:
+- 按对象键在本地目录中保存文件副本，跨任务复用，避免重复下载
+- 命中时以reflink或硬链接（跨文件系统时复制）放到调用方的临时目录，缓存淘汰不影响正在使用的文件
+- 超过总大小上限时按最近访问时间淘汰
+
+缓存键必须唯一对应文件内容：按内容寻址的对象（如渲染缓存）直接使用对象键，
+可变对象应把 ETag 编入缓存键（见 material_service）。
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，直接使用硬链接或复制
+    fcntl = None
+
+from src.core.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 淘汰时降到上限的该比例以下，避免每次写入都触发淘汰
+EVICT_LOW_WATERMARK = 0.9
+
+# Linux FICLONE ioctl，在支持的文件系统（btrfs、xfs等）上创建写时复制副本
+FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    """尝试创建reflink副本，平台或文件系统不支持时返回False"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+        return True
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """优先reflink（写时复制），其次硬链接，跨文件系统时退化为复制"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists():
+        dest.unlink()
+    if not src.exists():
+        raise FileNotFoundError(str(src))
+    if _reflink(src, dest):
+        return
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class LocalFileCache:
+    """节点本地磁盘文件缓存"""
+
+    def __init__(self, root: Optional[str], max_bytes: int):
+        """
+        初始化本地文件缓存
+
+        Args:
+            root: 缓存目录，为空时禁用缓存
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.root = Path(root) if root else None
+        self.max_bytes = max_bytes
+
+        # 当前缓存大小的估算值，首次写入时扫描目录得到
+        self._size_bytes: Optional[int] = None
+
+        # 累计统计
+        self._hits = 0
+        self._misses = 0
+        self._evicted_files = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用本地缓存"""
+        return self.root is not None and self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        """缓存键对应的本地路径（按哈希前两位分目录，保留原扩展名）"""
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.root / digest[:2] / f"{digest}{Path(key).suffix}"
+
+    def _get_sync(self, key: str, dest_path: Path) -> bool:
+        """同步查找缓存，命中时放到目标路径"""
+        cached_path = self._path(key)
+        try:
+            _link_or_copy(cached_path, dest_path)
+        except FileNotFoundError:
+            return False
+        # 更新访问时间作为LRU淘汰依据
+        os.utime(cached_path)
+        return True
+
+    def _put_sync(self, key: str, src_path: Path) -> None:
+        """同步写入缓存（先写临时文件再原子替换，多进程共享目录时不会读到半个文件）"""
+        cached_path = self._path(key)
+        tmp_path = cached_path.with_name(f".{cached_path.name}.{uuid.uuid4().hex}.tmp")
+        _link_or_copy(src_path, tmp_path)
+        os.replace(tmp_path, cached_path)
+
+        if self._size_bytes is None:
+            self._size_bytes = self._scan()[1]
+        else:
+            self._size_bytes += cached_path.stat().st_size
+
+        if self._size_bytes > self.max_bytes:
+            self._evict_sync()
+
+    def _scan(self):
+        """扫描缓存目录，返回 (文件列表, 总大小)"""
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        return entries, total
+
+    def _evict_sync(self) -> None:
+        """按最近访问时间从旧到新淘汰，直到低于上限的 EVICT_LOW_WATERMARK"""
+        entries, total = self._scan()
+        target = int(self.max_bytes * EVICT_LOW_WATERMARK)
+        evicted = 0
+
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+
+        self._size_bytes = total
+        self._evicted_files += evicted
+        logger.info(f"本地文件缓存淘汰 {evicted} 个文件，当前大小 {total} 字节")
+
+    async def fetch(
+            self,
+            key: str,
+            dest_path: Path,
+            download: Callable[[Path], Awaitable[Optional[str]]]
+    ) -> bool:
+        """
+        获取文件到目标路径：优先使用本地缓存，未命中时下载并写入缓存
+
+        Args:
+            key: 缓存键（通常为MinIO对象键）
+            dest_path: 目标路径
+            download: 未命中时调用的下载函数，参数为目标路径；
+                返回非空字符串时以其作为写入缓存的键（如按下载响应的 ETag 重新计算的键）
+
+        Returns:
+            是否命中本地缓存
+        """
+        if not self.enabled:
+            await download(dest_path)
+            return False
+
+        if await asyncio.to_thread(self._get_sync, key, dest_path):
+            self._hits += 1
+            return True
+
+        self._misses += 1
+        key = await download(dest_path) or key
+
+        try:
+            await asyncio.to_thread(self._put_sync, key, dest_path)
+        except OSError as e:
+            # 本地缓存写入失败不影响本次任务
+            logger.warning(f"写入本地文件缓存失败: {key}, 错误: {e}")
+
+        return False
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取累计统计信息
+
+        Returns:
+            统计字典
+        """
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "evicted_files": self._evicted_files,
+        }
+
+
+# 句子视频的本地缓存实例（可通过 LOCAL_CLIP_CACHE_* 配置，未配置目录时禁用）
+local_clip_cache = LocalFileCache(
+    root=settings.LOCAL_CLIP_CACHE_DIR,
+    max_bytes=settings.LOCAL_CLIP_CACHE_MAX_BYTES,
+)
+
+# 素材（图片、音频、视频）的本地缓存实例，缓存键包含 ETag（可通过 LOCAL_MATERIAL_CACHE_* 配置）
+local_material_cache = LocalFileCache(
+    root=settings.LOCAL_MATERIAL_CACHE_DIR,
+    max_bytes=settings.LOCAL_MATERIAL_CACHE_MAX_BYTES,
+)
+
+__all__ = [
+    "LocalFileCache",
+    "local_clip_cache",
+    "local_material_cache",
+]
@@ -0,0 +1,618 @@
+"""
+媒体探测工具 - 在进程内解析媒体文件头获取时长、帧率和流信息，无需启动ffprobe
+
+支持:
+- MP4/MOV/M4A: 读取 moov 中的 mvhd/mdhd/hdlr/stsd/stts，不读取媒体数据
+- MP3: 优先读取 Xing/Info/VBRI 头中的总帧数，没有时逐帧累加（兼容VBR）
+- AAC (ADTS): 逐帧累加
+- WAV: 读取 fmt/data 块
+
+按文件路径、大小和修改时间缓存探测结果，同一文件在一次合成中被多次探测时只解析一次。
+无法识别的格式对应字段为None，由调用方回退到ffprobe
+"""
+
+import io
+import os
+import struct
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# MPEG版本（帧头中的2位编码）
+_MPEG_25, _MPEG_2, _MPEG_1 = 0, 2, 3
+
+# 比特率表（kbps），键为 (是否MPEG1, 层)
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# 采样率表（Hz）
+_SAMPLE_RATES = {
+    _MPEG_1: (44100, 48000, 32000),
+    _MPEG_2: (22050, 24000, 16000),
+    _MPEG_25: (11025, 12000, 8000),
+}
+
+# ADTS采样率表（Hz）
+_ADTS_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+# MP4顶层box类型（用于识别文件格式）
+_MP4_TOP_LEVEL_BOXES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+
+
+@dataclass
+class MediaInfo:
+    """媒体文件探测结果，无法获取的字段为None"""
+    format_name: Optional[str] = None  # mp4 / mp3 / aac / wav
+    duration: Optional[float] = None  # 容器时长（秒）
+    video_codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    audio_codec: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+    @property
+    def has_video(self) -> bool:
+        """是否包含视频流"""
+        return self.video_codec is not None
+
+    @property
+    def has_audio(self) -> bool:
+        """是否包含音频流"""
+        return self.audio_codec is not None
+
+
+# ============================================================
+# MP3 / AAC
+# ============================================================
+
+def _parse_mp3_frame_header(data: bytes, pos: int) -> Optional[Tuple[int, int, int]]:
+    """
+    解析MP3帧头
+
+    Returns:
+        (帧长度, 每帧采样数, 采样率)，不是有效帧头时返回None
+    """
+    if pos + 4 > len(data):
+        return None
+    b0, b1, b2, _ = data[pos:pos + 4]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    padding = (b2 >> 1) & 0x01
+
+    # 保留值、自由格式比特率均不支持（layer为4时是AAC的ADTS帧头）
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    is_mpeg1 = version == _MPEG_1
+    bitrate = _BITRATES[(is_mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 2 or is_mpeg1:
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+
+def _parse_adts_frame_header(data: bytes, pos: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    解析AAC ADTS帧头
+
+    Returns:
+        (帧长度, 每帧采样数, 采样率, 声道数)，不是有效帧头时返回None
+    """
+    if pos + 7 > len(data):
+        return None
+    b0, b1, b2, b3, b4, b5, b6 = data[pos:pos + 7]
+    if b0 != 0xFF or (b1 & 0xF6) != 0xF0:
+        return None
+
+    sample_rate_index = (b2 >> 2) & 0x0F
+    frame_length = ((b3 & 0x03) << 11) | (b4 << 3) | (b5 >> 5)
+    if sample_rate_index >= len(_ADTS_SAMPLE_RATES) or frame_length < 7:
+        return None
+
+    channels = ((b2 & 0x01) << 2) | (b3 >> 6)
+    samples = ((b6 & 0x03) + 1) * 1024
+    return frame_length, samples, _ADTS_SAMPLE_RATES[sample_rate_index], channels
+
+
+def _skip_id3v2(data: bytes) -> int:
+    """跳过文件开头的ID3v2标签，返回音频数据的起始位置"""
+    pos = 0
+    while data[pos:pos + 3] == b"ID3" and pos + 10 <= len(data):
+        flags = data[pos + 5]
+        size = 0
+        for byte in data[pos + 6:pos + 10]:
+            size = (size << 7) | (byte & 0x7F)
+        pos += 10 + size + (10 if flags & 0x10 else 0)
+    return pos
+
+
+def _find_first_frame(data: bytes, pos: int, parse_header) -> Optional[int]:
+    """查找第一个有效帧（要求紧随其后的也是有效帧，避免误把数据当作帧头）"""
+    limit = min(len(data), pos + 64 * 1024)
+    while pos < limit:
+        pos = data.find(b"\xff", pos, limit)
+        if pos < 0:
+            return None
+        header = parse_header(data, pos)
+        if header:
+            next_pos = pos + header[0]
+            if next_pos >= len(data) or parse_header(data, next_pos):
+                return pos
+        pos += 1
+    return None
+
+
+def _read_vbr_frame_count(data: bytes, pos: int) -> Optional[int]:
+    """读取首帧中Xing/Info或VBRI头记录的总帧数"""
+    b1, b3 = data[pos + 1], data[pos + 3]
+    is_mpeg1 = ((b1 >> 3) & 0x03) == _MPEG_1
+    mono = (b3 >> 6) == 0x03
+    side_info = (17 if mono else 32) if is_mpeg1 else (9 if mono else 17)
+
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info") and len(data) >= xing + 12:
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            return struct.unpack(">I", data[xing + 8:xing + 12])[0]
+
+    vbri = pos + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI" and len(data) >= vbri + 18:
+        return struct.unpack(">I", data[vbri + 14:vbri + 18])[0]
+    return None
+
+
+def _probe_mp3(data: bytes) -> Optional[MediaInfo]:
+    """解析MP3数据"""
+    pos = _find_first_frame(data, _skip_id3v2(data), _parse_mp3_frame_header)
+    if pos is None:
+        return None
+
+    _, samples_per_frame, sample_rate = _parse_mp3_frame_header(data, pos)
+    info = MediaInfo(
+        format_name="mp3",
+        audio_codec="mp3",
+        sample_rate=sample_rate,
+        channels=1 if (data[pos + 3] >> 6) == 0x03 else 2,
+    )
+
+    frame_count = _read_vbr_frame_count(data, pos)
+    if frame_count:
+        info.duration = frame_count * samples_per_frame / sample_rate
+        return info
+
+    # 没有VBR头：逐帧累加，直到遇到非帧数据（如末尾的ID3v1标签）
+    duration = 0.0
+    while True:
+        header = _parse_mp3_frame_header(data, pos)
+        if header is None:
+            break
+        frame_length, samples_per_frame, sample_rate = header
+        duration += samples_per_frame / sample_rate
+        pos += frame_length
+    info.duration = duration or None
+    return info
+
+
+def _probe_adts(data: bytes) -> Optional[MediaInfo]:
+    """解析AAC ADTS数据"""
+    pos = _find_first_frame(data, _skip_id3v2(data), _parse_adts_frame_header)
+    if pos is None:
+        return None
+
+    _, _, sample_rate, channels = _parse_adts_frame_header(data, pos)
+    duration = 0.0
+    while True:
+        header = _parse_adts_frame_header(data, pos)
+        if header is None:
+            break
+        frame_length, samples, frame_sample_rate, _ = header
+        duration += samples / frame_sample_rate
+        pos += frame_length
+
+    return MediaInfo(
+        format_name="aac",
+        duration=duration or None,
+        audio_codec="aac",
+        sample_rate=sample_rate,
+        channels=channels or None,
+    )
+
+
+def probe_mp3_duration(data: bytes) -> Optional[float]:
+    """
+    从MP3数据计算时长
+
+    Args:
+        data: MP3文件内容
+
+    Returns:
+        时长（秒），无法解析时返回None
+    """
+    info = _probe_mp3(data)
+    return info.duration if info else None
+
+
+# ============================================================
+# WAV
+# ============================================================
+
+def _probe_wav(data: bytes) -> Optional[MediaInfo]:
+    """解析WAV数据"""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+
+    info = MediaInfo(format_name="wav", audio_codec="pcm")
+    byte_rate = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        chunk_size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        body = pos + 8
+        if chunk_id == b"fmt " and chunk_size >= 16:
+            info.channels, info.sample_rate, byte_rate = struct.unpack("<HII", data[body + 2:body + 12])
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            available = len(data) - body
+            if chunk_size == 0 or chunk_size > available:
+                chunk_size = available
+            info.duration = chunk_size / byte_rate
+            return info
+        pos = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def probe_wav_duration(data: bytes) -> Optional[float]:
+    """
+    从WAV数据计算时长
+
+    流式生成的WAV可能把data块长度写成0或0xFFFFFFFF，此时按实际剩余字节计算
+
+    Args:
+        data: WAV文件内容
+
+    Returns:
+        时长（秒），无法解析时返回None
+    """
+    info = _probe_wav(data)
+    return info.duration if info else None
+
+
+# ============================================================
+# MP4 / MOV
+# ============================================================
+
+def _iter_boxes(stream: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    遍历 [start, end) 范围内的box
+
+    Yields:
+        (box类型, 内容起始位置, 内容结束位置)
+    """
+    pos = start
+    while pos + 8 <= end:
+        stream.seek(pos)
+        header = stream.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", stream.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _child_boxes(data: bytes, start: int, end: int) -> Dict[bytes, Tuple[int, int]]:
+    """解析内存中的子box，返回 {类型: (内容起始, 内容结束)}，同类型保留第一个"""
+    children: Dict[bytes, Tuple[int, int]] = {}
+    for box_type, body_start, body_end in _iter_boxes(io.BytesIO(data), start, end):
+        children.setdefault(box_type, (body_start, body_end))
+    return children
+
+
+def _read_time_header(data: bytes, start: int) -> Tuple[int, int]:
+    """解析 mvhd/mdhd，返回 (timescale, duration)"""
+    if data[start] == 1:
+        return struct.unpack(">IQ", data[start + 20:start + 32])
+    return struct.unpack(">II", data[start + 12:start + 20])
+
+
+def _fps_from_stts(data: bytes, start: int, timescale: int) -> Optional[float]:
+    """根据 stts 中出现最多的帧间隔计算帧率（与ffprobe的 r_frame_rate 一致）"""
+    entry_count = struct.unpack(">I", data[start + 4:start + 8])[0]
+    deltas: Counter = Counter()
+    for i in range(entry_count):
+        offset = start + 8 + i * 8
+        count, delta = struct.unpack(">II", data[offset:offset + 8])
+        if delta:
+            deltas[delta] += count
+    if not deltas:
+        return None
+    return timescale / deltas.most_common(1)[0][0]
+
+
+def _parse_trak(data: bytes, start: int, end: int, info: MediaInfo) -> Optional[float]:
+    """解析单个trak，把流信息写入info，返回该流的时长"""
+    mdia = _child_boxes(data, start, end).get(b"mdia")
+    if not mdia:
+        return None
+    mdia_children = _child_boxes(data, *mdia)
+    if not {b"mdhd", b"hdlr", b"minf"} <= mdia_children.keys():
+        return None
+
+    timescale, duration = _read_time_header(data, mdia_children[b"mdhd"][0])
+    hdlr = mdia_children[b"hdlr"][0]
+    handler = data[hdlr + 8:hdlr + 12]
+
+    stbl = _child_boxes(data, *mdia_children[b"minf"]).get(b"stbl")
+    stbl_children = _child_boxes(data, *stbl) if stbl else {}
+    stsd = stbl_children.get(b"stsd")
+    # stsd: 版本/标志(4) + 条目数(4)；条目: 大小(4) + 编码(4) + 保留(6) + 数据引用索引(2) + 编码相关字段
+    entry = stsd[0] + 8 if stsd else None
+    codec = data[entry + 4:entry + 8].decode("latin-1").strip() if entry else None
+
+    if handler == b"vide" and info.video_codec is None:
+        info.video_codec = codec
+        if entry:
+            info.width, info.height = struct.unpack(">HH", data[entry + 32:entry + 36])
+        stts = stbl_children.get(b"stts")
+        if stts and timescale:
+            info.fps = _fps_from_stts(data, stts[0], timescale)
+    elif handler == b"soun" and info.audio_codec is None:
+        info.audio_codec = codec
+        if entry:
+            info.channels = struct.unpack(">H", data[entry + 24:entry + 26])[0]
+            info.sample_rate = struct.unpack(">I", data[entry + 32:entry + 36])[0] >> 16
+
+    return duration / timescale if timescale else None
+
+
+def _probe_mp4(stream: BinaryIO) -> Optional[MediaInfo]:
+    """解析MP4/MOV文件（只读取 moov，跳过mdat等媒体数据）"""
+    stream.seek(0, io.SEEK_END)
+    file_size = stream.tell()
+
+    moov = None
+    for box_type, body_start, body_end in _iter_boxes(stream, 0, file_size):
+        if box_type == b"moov":
+            stream.seek(body_start)
+            moov = stream.read(body_end - body_start)
+            break
+    if moov is None:
+        return None
+
+    info = MediaInfo(format_name="mp4")
+    track_durations = []
+    for box_type, body_start, body_end in _iter_boxes(io.BytesIO(moov), 0, len(moov)):
+        if box_type == b"mvhd":
+            timescale, duration = _read_time_header(moov, body_start)
+            if timescale and duration:
+                info.duration = duration / timescale
+        elif box_type == b"trak":
+            track_duration = _parse_trak(moov, body_start, body_end, info)
+            if track_duration:
+                track_durations.append(track_duration)
+
+    # 分片MP4的 mvhd 时长可能为0
+    if info.duration is None and track_durations:
+        info.duration = max(track_durations)
+    return info
+
+
+# ============================================================
+# 入口
+# ============================================================
+
+def _is_mp4(head: bytes) -> bool:
+    """根据文件开头判断是否为MP4/MOV"""
+    return len(head) >= 8 and head[4:8] in _MP4_TOP_LEVEL_BOXES
+
+
+def _probe_audio_bytes(data: bytes) -> Optional[MediaInfo]:
+    """解析内存中的WAV/MP3/AAC数据"""
+    if data[:4] == b"RIFF":
+        return _probe_wav(data)
+    return _probe_mp3(data) or _probe_adts(data)
+
+
+def probe_bytes(data: bytes) -> MediaInfo:
+    """
+    探测内存中的媒体数据
+
+    Args:
+        data: 文件内容
+
+    Returns:
+        探测结果，无法识别的格式各字段为None
+    """
+    try:
+        if _is_mp4(data[:8]):
+            info = _probe_mp4(io.BytesIO(data))
+        else:
+            info = _probe_audio_bytes(data)
+    except Exception as e:
+        logger.debug(f"解析媒体文件头失败: {e}")
+        info = None
+    return info or MediaInfo()
+
+
+def probe_audio_duration(data: bytes) -> Optional[float]:
+    """
+    从内存中的音频数据计算时长（WAV、MP3、AAC或M4A）
+
+    Args:
+        data: 音频文件内容
+
+    Returns:
+        时长（秒），无法识别的格式返回None
+    """
+    return probe_bytes(data).duration
+
+
+def probe_file(path: str) -> MediaInfo:
+    """
+    探测媒体文件（不使用缓存）
+
+    MP4只读取 moov box，音频文件整体读入内存后解析
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        探测结果，无法识别的格式各字段为None
+
+    Raises:
+        OSError: 文件不存在或无法读取
+    """
+    with open(path, "rb") as f:
+        try:
+            if _is_mp4(f.read(8)):
+                info = _probe_mp4(f)
+            else:
+                f.seek(0)
+                info = _probe_audio_bytes(f.read())
+        except OSError:
+            raise
+        except Exception as e:
+            logger.debug(f"解析媒体文件头失败: {path}, 错误: {e}")
+            info = None
+    return info or MediaInfo()
+
+
+class MediaProbeCache:
+    """按 (路径, 大小, 修改时间) 缓存探测结果（线程安全），文件被改写后自动重新探测"""
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        初始化探测缓存
+
+        Args:
+            max_entries: 最多缓存的文件数，超出时淘汰最久未使用的
+        """
+        self.max_entries = max(1, int(max_entries))
+
+        self._entries: "OrderedDict[Tuple[str, int, int], MediaInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 累计统计
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, path: str) -> MediaInfo:
+        """
+        获取文件的探测结果，未命中时解析文件头
+
+        返回的对象由缓存共享：调用方回退到ffprobe后把结果补写到对应字段，
+        后续探测同一文件时直接复用
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            探测结果
+
+        Raises:
+            OSError: 文件不存在或无法读取
+        """
+        path = str(path)
+        stat = os.stat(path)
+        cache_key = (path, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            info = self._entries.get(cache_key)
+            if info is not None:
+                self._entries.move_to_end(cache_key)
+                self._hits += 1
+                return info
+            self._misses += 1
+
+        info = probe_file(path)
+
+        with self._lock:
+            info = self._entries.setdefault(cache_key, info)
+            self._entries.move_to_end(cache_key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return info
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取累计统计信息
+
+        Returns:
+            统计字典
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# 创建全局实例
+media_probe_cache = MediaProbeCache()
+
+
+def probe_media(path: str) -> MediaInfo:
+    """
+    探测媒体文件（使用全局缓存）
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        探测结果
+
+    Raises:
+        OSError: 文件不存在或无法读取
+    """
+    return media_probe_cache.get(path)
+
+
+__all__ = [
+    "MediaInfo",
+    "MediaProbeCache",
+    "media_probe_cache",
+    "probe_audio_duration",
+    "probe_bytes",
+    "probe_file",
+    "probe_media",
+    "probe_mp3_duration",
+    "probe_wav_duration",
+]
@@ -0,0 +1,112 @@
+"""
+预签名URL缓存
+
+列表接口会为每一行的每个媒体字段生成预签名URL，重复签名的开销远大于查询本身。
+签名时间按固定时间窗口对齐：同一窗口内相同对象键和有效期的签名结果完全一致，可以直接复用；
+签名有效期额外加上一个窗口长度，保证复用的URL从当前时刻起仍至少有效请求的时长。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+# S3 签名V4允许的最长有效期
+PRESIGN_MAX_EXPIRES = timedelta(days=7)
+
+# 签名函数: (object_key, expires, request_date) -> url
+SignFunc = Callable[[str, timedelta, datetime], str]
+
+
+class PresignedUrlCache:
+    """按对象键和时间窗口缓存预签名URL（线程安全）"""
+
+    def __init__(self, window_seconds: int = 300, max_entries: int = 100_000):
+        """
+        初始化预签名URL缓存
+
+        Args:
+            window_seconds: 签名时间窗口长度（秒），窗口切换时旧URL全部失效
+            max_entries: 最多缓存的URL数量，超出时淘汰最久未使用的
+        """
+        self.window_seconds = max(1, int(window_seconds))
+        self.max_entries = max(1, int(max_entries))
+
+        self._urls: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._window_start: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+        # 累计统计
+        self._hits = 0
+        self._misses = 0
+
+    def current_window(self) -> datetime:
+        """当前时间窗口的起点（UTC）"""
+        now = int(time.time())
+        return datetime.fromtimestamp(now - now % self.window_seconds, timezone.utc)
+
+    def get_or_sign(self, object_key: str, expires: timedelta, sign: SignFunc) -> str:
+        """
+        获取缓存的预签名URL，未命中时调用签名函数
+
+        Args:
+            object_key: 对象键
+            expires: 请求的有效期
+            sign: 签名函数，以窗口起点作为签名时间
+
+        Returns:
+            预签名URL
+        """
+        window = self.current_window()
+        cache_key = (object_key, int(expires.total_seconds()))
+
+        with self._lock:
+            if window != self._window_start:
+                self._urls.clear()
+                self._window_start = window
+
+            url = self._urls.get(cache_key)
+            if url is not None:
+                self._urls.move_to_end(cache_key)
+                self._hits += 1
+                return url
+            self._misses += 1
+
+        signed_expires = min(expires + timedelta(seconds=self.window_seconds), PRESIGN_MAX_EXPIRES)
+        url = sign(object_key, signed_expires, window)
+
+        with self._lock:
+            if window == self._window_start:
+                self._urls[cache_key] = url
+                if len(self._urls) > self.max_entries:
+                    self._urls.popitem(last=False)
+
+        return url
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._urls.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取累计统计信息
+
+        Returns:
+            统计字典
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._urls),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+__all__ = [
+    "PRESIGN_MAX_EXPIRES",
+    "PresignedUrlCache",
+]
@@ -0,0 +1,483 @@
+"""
+第三方API自适应限流 - 按 (provider, api_key, model) 共享的AIMD并发控制
+
+负责:
+- 同一进程内所有任务调用同一个 (provider, api_key, model) 时共享一个并发上限
+- 调用成功时加性增加并发上限（每轮约+1），收到429时乘性减小
+- 读取 Retry-After 和 x-ratelimit-* 响应头，在限流窗口内暂停该Key的所有新请求
+- 统计每个Key的吞吐量和限流次数
+- 占用槽位后再向分布式限流器（按APIKey.id，跨所有worker进程）预约令牌，收到429时所有进程一起退避
+
+Provider调用SDK前通过 provider_rate_limiter.limit(...) 占用并发槽位；共享HTTP客户端的响应钩子
+observe_response 把每个响应的状态码和限流头交给当前槽位（包括SDK内部重试时收到的429）。
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Mapping, Optional, Tuple
+
+from openai import RateLimitError
+
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.utils.distributed_rate_limiter import distributed_rate_limiter
+
+logger = get_logger(__name__)
+
+# 收到429时并发上限的缩减系数
+DECREASE_FACTOR = 0.5
+
+# 吞吐量统计窗口（秒）
+THROUGHPUT_WINDOW = 60.0
+
+# 没有结构化状态码时，通过错误信息识别限流（部分兼容接口把429包装成普通异常）
+_THROTTLE_MARKERS = ("429", "RateLimit", "rate limit", "IPM limit")
+
+# OpenAI风格的重置时长，如 "1s"、"6m0s"、"120ms"
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# 当前任务正在使用的槽位，供HTTP响应钩子回填响应头
+_current_slot: contextvars.ContextVar[Optional["LimiterSlot"]] = contextvars.ContextVar(
+    "provider_limiter_slot", default=None
+)
+
+
+def _key_fingerprint(api_key: str) -> str:
+    """API Key的短哈希，用于限流器键和统计输出，避免明文Key出现在指标中"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """解析秒数或 "6m0s" 形式的时长"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    从响应头解析需要等待的秒数
+
+    依次识别 retry-after-ms、Retry-After（秒数或HTTP日期），
+    以及剩余配额为0时的 x-ratelimit-reset-requests / x-ratelimit-reset-tokens。
+
+    Args:
+        headers: 响应头（大小写不敏感的映射）
+
+    Returns:
+        等待秒数，没有限流信息时返回None
+    """
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    waits = []
+    for kind in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        reset = headers.get(f"x-ratelimit-reset-{kind}")
+        if remaining is None or not reset:
+            continue
+        try:
+            exhausted = float(remaining) <= 0
+        except ValueError:
+            continue
+        if exhausted:
+            delay = _parse_duration(reset)
+            if delay is not None:
+                waits.append(delay)
+    return max(waits) if waits else None
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """判断异常是否为限流错误（HTTP 429）"""
+    if isinstance(error, RateLimitError):
+        return True
+    for status in (
+            getattr(error, "status_code", None),
+            getattr(error, "status", None),
+            getattr(getattr(error, "response", None), "status_code", None),
+    ):
+        if status == 429:
+            return True
+    message = str(error)
+    return any(marker in message for marker in _THROTTLE_MARKERS)
+
+
+def retry_after_from_error(error: BaseException) -> Optional[float]:
+    """从限流异常携带的响应头解析等待秒数"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None:
+        headers = getattr(error, "headers", None)
+    return parse_retry_after(headers)
+
+
+class AdaptiveLimiter:
+    """单个 (provider, api_key, model) 的AIMD并发限制器"""
+
+    def __init__(self, name: str, initial: int, minimum: int, maximum: int):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+        # 累计统计
+        self._requests = 0
+        self._successes = 0
+        self._throttled = 0
+        self._errors = 0
+        self._completed: Deque[float] = deque()
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return max(self.minimum, int(self._limit))
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        """绑定当前事件循环，事件循环变化时旧循环上的槽位和等待者都已失效"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._in_flight = 0
+            self._waiters.clear()
+        return loop
+
+    def _wake(self) -> None:
+        """把空出的槽位直接交给排队的等待者"""
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self) -> None:
+        """占用一个并发槽位，超过并发上限时排队，处于限流窗口时等待窗口结束"""
+        loop = self._bind_loop()
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+        else:
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # 已分到槽位但被取消，交还给下一个等待者
+                    self.release()
+                else:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass
+                raise
+
+        try:
+            while (delay := self._paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        self._requests += 1
+
+    def release(self) -> None:
+        """释放槽位"""
+        self._in_flight = max(0, self._in_flight - 1)
+        self._wake()
+
+    def pause(self, seconds: float) -> None:
+        """在限流窗口内暂停所有新请求"""
+        seconds = min(seconds, settings.PROVIDER_THROTTLE_MAX_WAIT)
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def on_success(self) -> None:
+        """调用成功：加性增加并发上限"""
+        self._successes += 1
+        self._record_completion()
+        if self._limit < self.maximum:
+            self._limit = min(float(self.maximum), self._limit + 1.0 / self._limit)
+            self._wake()
+
+    def on_throttle(self, started_at: float, retry_after: Optional[float] = None) -> None:
+        """
+        收到限流响应：暂停新请求并乘性减小并发上限
+
+        Args:
+            started_at: 收到429的请求开始时间（time.monotonic）
+            retry_after: 服务端要求的等待秒数，为空时使用默认等待时间
+        """
+        self._throttled += 1
+        self.pause(retry_after if retry_after is not None else settings.PROVIDER_THROTTLE_DEFAULT_WAIT)
+
+        # 同一轮并发的请求会一起收到429，只对上次减小之后发出的请求再次减小
+        if started_at < self._last_decrease:
+            return
+        old_limit = self.limit
+        self._limit = max(float(self.minimum), self._limit * DECREASE_FACTOR)
+        self._last_decrease = time.monotonic()
+        logger.warning(
+            f"[RateLimit] {self.name} 触发限流，并发上限 {old_limit} -> {self.limit}，"
+            f"暂停 {max(0.0, self._paused_until - time.monotonic()):.1f}s"
+        )
+
+    def on_error(self) -> None:
+        """调用失败（非限流）：只计数，不调整并发上限"""
+        self._errors += 1
+
+    def _record_completion(self) -> None:
+        now = time.monotonic()
+        self._completed.append(now)
+        while self._completed and now - self._completed[0] > THROUGHPUT_WINDOW:
+            self._completed.popleft()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+
+        Returns:
+            统计字典，throughput_per_min 为最近一分钟成功的调用数
+        """
+        now = time.monotonic()
+        while self._completed and now - self._completed[0] > THROUGHPUT_WINDOW:
+            self._completed.popleft()
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": sum(1 for waiter in self._waiters if not waiter.done()),
+            "paused_for": round(max(0.0, self._paused_until - now), 3),
+            "requests": self._requests,
+            "successes": self._successes,
+            "throttled": self._throttled,
+            "errors": self._errors,
+            "throughput_per_min": len(self._completed),
+        }
+
+
+class LimiterSlot:
+    """一次Provider调用占用的并发槽位（异步上下文管理器）"""
+
+    def __init__(self, limiter: AdaptiveLimiter, rate_key: str):
+        """
+        Args:
+            limiter: 进程内的并发限制器
+            rate_key: 分布式限流键（APIKey.id）
+        """
+        self.limiter = limiter
+        self.rate_key = rate_key
+        self.started_at = 0.0
+        self.throttled = False
+        self.retry_after: Optional[float] = None
+        self._token: Optional[contextvars.Token] = None
+
+    async def __aenter__(self) -> "LimiterSlot":
+        await self.limiter.acquire()
+        try:
+            await distributed_rate_limiter.acquire(self.rate_key)
+        except BaseException:
+            self.limiter.release()
+            raise
+        self.started_at = time.monotonic()
+        self._token = _current_slot.set(self)
+        return self
+
+    def observe(self, status_code: int, headers: Optional[Mapping[str, str]]) -> None:
+        """
+        记录一次HTTP响应的状态码和限流头
+
+        Args:
+            status_code: HTTP状态码
+            headers: 响应头
+        """
+        delay = parse_retry_after(headers)
+        if status_code == 429:
+            self.throttled = True
+            self.retry_after = delay
+            self.limiter.on_throttle(self.started_at, delay)
+        elif delay:
+            # 请求成功但配额已用完，等到窗口重置再发新请求
+            self.limiter.pause(delay)
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        _current_slot.reset(self._token)
+        try:
+            if exc is None:
+                self.limiter.on_success()
+            elif is_throttle_error(exc):
+                # 响应钩子已经记录过这次429时不再重复减小
+                if not self.throttled:
+                    self.throttled = True
+                    self.retry_after = retry_after_from_error(exc)
+                    self.limiter.on_throttle(self.started_at, self.retry_after)
+            elif not isinstance(exc, asyncio.CancelledError):
+                self.limiter.on_error()
+        finally:
+            self.limiter.release()
+
+        if self.throttled:
+            # 通知其他worker进程一起退避（包括SDK内部重试后最终成功的情况）
+            await distributed_rate_limiter.penalize(
+                self.rate_key,
+                self.retry_after if self.retry_after is not None else settings.PROVIDER_THROTTLE_DEFAULT_WAIT,
+            )
+        return False
+
+
+class ProviderRateLimiter:
+    """进程级的自适应限流器注册表"""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, str, str], AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, api_key: str, model: Optional[str] = None) -> AdaptiveLimiter:
+        """
+        获取 (provider, api_key, model) 对应的限流器
+
+        Args:
+            provider: 提供商名称
+            api_key: API Key
+            model: 模型名称
+
+        Returns:
+            AdaptiveLimiter
+        """
+        key = (provider, _key_fingerprint(api_key), model or "")
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = AdaptiveLimiter(
+                    name=":".join(key),
+                    initial=settings.PROVIDER_CONCURRENCY_INITIAL,
+                    minimum=settings.PROVIDER_CONCURRENCY_MIN,
+                    maximum=settings.PROVIDER_CONCURRENCY_MAX,
+                )
+                self._limiters[key] = limiter
+            return limiter
+
+    def limit(
+            self,
+            provider: str,
+            api_key: str,
+            model: Optional[str] = None,
+            api_key_id: Optional[str] = None
+    ) -> LimiterSlot:
+        """
+        获取一次调用的并发槽位
+
+        Args:
+            provider: 提供商名称
+            api_key: API Key
+            model: 模型名称
+            api_key_id: APIKey.id，作为跨进程限流键；为空时使用API Key的哈希
+
+        用法:
+            async with provider_rate_limiter.limit("openai", api_key, model, api_key_id):
+                return await client.chat.completions.create(...)
+        """
+        rate_key = str(api_key_id) if api_key_id else _key_fingerprint(api_key)
+        return LimiterSlot(self.get(provider, api_key, model), rate_key)
+
+    def reset(self) -> None:
+        """丢弃所有限流器状态"""
+        with self._lock:
+            self._limiters.clear()
+
+    def get_stats(self, provider: Optional[str] = None, api_key: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        获取每个 provider:key哈希:model 的统计信息
+
+        Args:
+            provider: 只返回该提供商的限流器
+            api_key: 只返回该API Key的限流器
+
+        Returns:
+            {限流器名称: 统计字典}
+        """
+        fingerprint = _key_fingerprint(api_key) if api_key else None
+        with self._lock:
+            limiters = [
+                limiter for (name, key_hash, _), limiter in self._limiters.items()
+                if (provider is None or name == provider) and (fingerprint is None or key_hash == fingerprint)
+            ]
+        return {limiter.name: limiter.get_stats() for limiter in limiters}
+
+
+# 创建全局实例
+provider_rate_limiter = ProviderRateLimiter()
+
+
+async def observe_response(response: Any) -> None:
+    """共享httpx客户端的响应钩子：把响应状态和限流头交给当前调用的槽位"""
+    slot = _current_slot.get()
+    if slot is not None:
+        slot.observe(response.status_code, response.headers)
+
+
+async def retry_with_backoff(task_fn: Callable[[], Awaitable[Any]], max_retries: int = 5) -> Any:
+    """
+    只对限流错误重试，其他错误直接抛出
+
+    等待时间优先使用服务端返回的Retry-After，否则指数退避 + 随机抖动（最长20秒）。
+    """
+    delay = 1.0
+    for attempt in range(max_retries):
+        try:
+            return await task_fn()
+        except Exception as e:
+            if not is_throttle_error(e) or attempt == max_retries - 1:
+                raise
+            retry_after = retry_after_from_error(e)
+            if retry_after is not None:
+                sleep_time = min(retry_after, settings.PROVIDER_THROTTLE_MAX_WAIT)
+            else:
+                sleep_time = delay + random.random() * 0.5
+            logger.warning(f"[Retry] 限流，{sleep_time:.2f} 秒后重试 attempt={attempt + 1}/{max_retries}")
+            await asyncio.sleep(sleep_time)
+            delay = min(delay * 2, 20)
+
+
+__all__ = [
+    "AdaptiveLimiter",
+    "LimiterSlot",
+    "ProviderRateLimiter",
+    "provider_rate_limiter",
+    "observe_response",
+    "parse_retry_after",
+    "is_throttle_error",
+    "retry_after_from_error",
+    "retry_with_backoff",
+]
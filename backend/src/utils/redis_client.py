@@ -0,0 +1,34 @@
+"""
+Redis客户端 - 按事件循环复用的 redis.asyncio 客户端
+
+redis.asyncio 的连接绑定创建它的事件循环，API进程只有一个事件循环，
+Celery worker 可能在不同的事件循环中运行任务，因此按事件循环缓存客户端。
+"""
+
+import asyncio
+from typing import Any, Optional, Tuple
+
+import redis.asyncio as redis
+
+from src.core.config import settings
+
+_client: Optional[Tuple[asyncio.AbstractEventLoop, Any]] = None
+
+
+def get_redis():
+    """
+    获取当前事件循环的Redis客户端（decode_responses=True）
+
+    Returns:
+        redis.asyncio.Redis
+    """
+    global _client
+    loop = asyncio.get_running_loop()
+    if _client is None or _client[0] is not loop:
+        _client = (loop, redis.from_url(settings.REDIS_URL, decode_responses=True))
+    return _client[1]
+
+
+__all__ = [
+    "get_redis",
+]
@@ -0,0 +1,224 @@
+"""
+渲染调度器 - 按CPU核数在并发FFmpeg任务之间分配线程
+
+负责:
+- 根据 os.cpu_count() 计算同时渲染的任务数和每个任务的编码线程数
+- 为FFmpeg命令注入 -threads / -filter_complex_threads，避免多个libx264进程争抢全部核心
+- 统计每个任务的排队等待时间和编码时间
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from src.core.config import settings
+from src.core.logging import get_logger
+from src.utils.ffmpeg_utils import ProgressCallback, run_ffmpeg_command_async
+
+logger = get_logger(__name__)
+
+# 未配置时每个渲染任务默认使用的线程数
+# zoompan 等滤镜基本是单线程的，少线程多任务比多线程少任务更能吃满CPU
+DEFAULT_THREADS_PER_JOB = 2
+
+
+@dataclass
+class RenderJobResult:
+    """单个渲染任务的执行结果"""
+    success: bool
+    stdout: str
+    stderr: str
+    job_name: str
+    threads: int
+    queue_wait: float  # 排队等待时间（秒）
+    encode_time: float  # 编码耗时（秒）
+
+
+class RenderScheduler:
+    """
+    CPU感知的渲染调度器
+
+    同一时刻最多运行 max_jobs 个FFmpeg渲染任务，每个任务限制为 threads_per_job 个线程，
+    max_jobs * threads_per_job 约等于CPU核数。
+    """
+
+    def __init__(
+            self,
+            max_jobs: Optional[int] = None,
+            threads_per_job: Optional[int] = None,
+            cpu_count: Optional[int] = None
+    ):
+        """
+        初始化渲染调度器
+
+        Args:
+            max_jobs: 最大并发渲染任务数（可选，默认按CPU核数计算）
+            threads_per_job: 每个任务的线程数（可选，默认按CPU核数计算）
+            cpu_count: CPU核数（可选，默认 os.cpu_count()）
+        """
+        cpu_count = max(1, cpu_count or os.cpu_count() or 1)
+
+        if threads_per_job is None:
+            threads_per_job = min(DEFAULT_THREADS_PER_JOB, cpu_count)
+        threads_per_job = max(1, threads_per_job)
+
+        if max_jobs is None:
+            max_jobs = cpu_count // threads_per_job
+        self.max_jobs = max(1, max_jobs)
+        self.threads_per_job = threads_per_job
+        self.cpu_count = cpu_count
+
+        # asyncio.Semaphore 绑定到首次使用它的事件循环，因此每个事件循环单独创建
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        # 累计统计
+        self._jobs_total = 0
+        self._jobs_failed = 0
+        self._queue_wait_total = 0.0
+        self._encode_time_total = 0.0
+        self._queue_wait_max = 0.0
+
+        logger.info(
+            f"渲染调度器初始化: CPU核数={cpu_count}, "
+            f"并发任务数={self.max_jobs}, 每任务线程数={self.threads_per_job}"
+        )
+
+    @property
+    def pipeline_concurrency(self) -> int:
+        """
+        句子流水线的并发数
+
+        比渲染并发数多一倍，使素材下载、字幕识别和上传可以与编码重叠进行
+        """
+        return self.max_jobs * 2
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环的渲染信号量"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_jobs)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def apply_thread_limits(self, command: List[str]) -> List[str]:
+        """
+        为FFmpeg命令注入线程限制
+
+        - -filter_complex_threads 为全局选项，插在可执行文件之后
+        - -threads 为输出选项，插在输出路径之前
+
+        已显式指定的参数保持不变
+
+        Args:
+            command: FFmpeg命令列表（最后一个元素为输出路径）
+
+        Returns:
+            新的命令列表
+        """
+        threads = str(self.threads_per_job)
+        command = list(command)
+
+        if "-threads" not in command and len(command) > 1:
+            command[-1:-1] = ["-threads", threads]
+
+        if "-filter_complex" in command and "-filter_complex_threads" not in command:
+            command[1:1] = ["-filter_complex_threads", threads]
+
+        return command
+
+    async def run(
+            self,
+            command: List[str],
+            timeout: int = 300,
+            job_name: str = "render",
+            progress_callback: Optional[ProgressCallback] = None
+    ) -> RenderJobResult:
+        """
+        排队执行渲染任务
+
+        Args:
+            command: FFmpeg命令列表
+            timeout: 超时时间（秒），从开始编码时计算
+            job_name: 任务名称（用于日志）
+            progress_callback: 进度回调（可选）
+
+        Returns:
+            渲染结果，包含排队和编码耗时
+        """
+        command = self.apply_thread_limits(command)
+        submitted_at = time.monotonic()
+
+        async with self._get_semaphore():
+            started_at = time.monotonic()
+            queue_wait = started_at - submitted_at
+
+            success, stdout, stderr = await run_ffmpeg_command_async(
+                command, timeout=timeout, progress_callback=progress_callback
+            )
+
+            encode_time = time.monotonic() - started_at
+
+        self._record(success, queue_wait, encode_time)
+
+        logger.info(
+            f"渲染任务{'完成' if success else '失败'}: {job_name}, "
+            f"排队 {queue_wait:.2f}s, 编码 {encode_time:.2f}s, 线程数 {self.threads_per_job}"
+        )
+
+        return RenderJobResult(
+            success=success,
+            stdout=stdout,
+            stderr=stderr,
+            job_name=job_name,
+            threads=self.threads_per_job,
+            queue_wait=queue_wait,
+            encode_time=encode_time,
+        )
+
+    def _record(self, success: bool, queue_wait: float, encode_time: float) -> None:
+        """记录任务统计"""
+        self._jobs_total += 1
+        if not success:
+            self._jobs_failed += 1
+        self._queue_wait_total += queue_wait
+        self._encode_time_total += encode_time
+        self._queue_wait_max = max(self._queue_wait_max, queue_wait)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        获取累计统计信息
+
+        Returns:
+            统计字典
+        """
+        jobs = self._jobs_total
+        return {
+            "max_jobs": self.max_jobs,
+            "threads_per_job": self.threads_per_job,
+            "jobs_total": jobs,
+            "jobs_failed": self._jobs_failed,
+            "queue_wait_total": round(self._queue_wait_total, 3),
+            "queue_wait_avg": round(self._queue_wait_total / jobs, 3) if jobs else 0.0,
+            "queue_wait_max": round(self._queue_wait_max, 3),
+            "encode_time_total": round(self._encode_time_total, 3),
+            "encode_time_avg": round(self._encode_time_total / jobs, 3) if jobs else 0.0,
+        }
+
+
+# 创建全局实例（每个worker进程一个，可通过 RENDER_MAX_JOBS / RENDER_THREADS_PER_JOB 配置）
+render_scheduler = RenderScheduler(
+    max_jobs=settings.RENDER_MAX_JOBS,
+    threads_per_job=settings.RENDER_THREADS_PER_JOB,
+)
+
+__all__ = [
+    "RenderJobResult",
+    "RenderScheduler",
+    "render_scheduler",
+]
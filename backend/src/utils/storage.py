@@ -2,64 +2,377 @@
 MinIO对象存储客户端 - 文件存储和管理
 """
 
+import asyncio
+import base64
+import hashlib
+import os
+import queue
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, TypeVar
 
 import aiofiles
+import certifi
+import urllib3
 from fastapi import UploadFile
 from minio import Minio
+from minio.commonconfig import REPLACE, CopySource
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 
 from src.core.config import settings
 from src.core.logging import get_logger
+from src.utils.presign_cache import PresignedUrlCache
+from src.utils.storage_usage import storage_usage, usage_owner
 
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+# MinIO客户端的连接超时和读取超时（秒，与SDK默认值一致）
+STORAGE_HTTP_TIMEOUT = 300
+
+# 区间下载按偏移写入同一文件，依赖 os.pwrite（Windows 上没有，此时总是单次下载）
+RANGED_DOWNLOAD_SUPPORTED = hasattr(os, "pwrite")
+
+
+def _create_http_client(max_connections: int) -> urllib3.PoolManager:
+    """
+    创建共享的HTTP连接池
+
+    与 Minio SDK 的默认配置一致，只是连接池大小与存储线程池的线程数相同，
+    避免并发请求超过默认的10个连接时反复新建连接
+    """
+    return urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=STORAGE_HTTP_TIMEOUT, read=STORAGE_HTTP_TIMEOUT),
+        maxsize=max_connections,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(
+            total=5,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504]
+        ),
+    )
+
+
+# S3多对象删除单个请求的对象数上限
+DELETE_BATCH_SIZE = 1000
+
+# 流式上传在长度未知时的分片大小（S3要求最小5MiB），也是单个分片在内存中的上限
+STREAM_PART_SIZE = 8 * 1024 * 1024
+
+# 流式上传时事件循环侧最多缓冲的数据块数，超过后暂停读取上游响应（背压）
+STREAM_MAX_BUFFERED_CHUNKS = 16
+
+
+def content_length_from_headers(headers) -> Optional[int]:
+    """
+    从HTTP响应头获取可直接用于流式上传的内容长度
+
+    响应经过压缩时HTTP客户端会自动解压，解压后的长度与 Content-Length 不一致，此时返回None
+
+    Args:
+        headers: 响应头（大小写不敏感的映射）
+
+    Returns:
+        内容长度，未知时返回None
+    """
+    encoding = (headers.get("Content-Encoding") or "identity").lower()
+    length = headers.get("Content-Length")
+    if encoding != "identity" or not length or not str(length).isdigit():
+        return None
+    return int(length)
+
+
+def _encode_continuation_token(object_key: str) -> str:
+    """将分页位置（上一页最后一个对象键）编码为不透明的续页令牌"""
+    return base64.urlsafe_b64encode(object_key.encode("utf-8")).decode("ascii")
+
+
+def _decode_continuation_token(token: str) -> str:
+    """解析续页令牌"""
+    try:
+        return base64.b64decode(token.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise StorageError(f"无效的续页令牌: {token}")
+
 
 class StorageError(Exception):
     """存储异常"""
     pass
 
 
+class _StreamReader:
+    """
+    将异步数据块桥接为同步文件对象
+
+    事件循环侧通过 feed() 写入数据块，存储线程池中的 put_object 通过 read() 读取；
+    缓冲区有上限，读取跟不上时 feed() 会等待，整个对象不会同时驻留在内存中。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_buffered: int = STREAM_MAX_BUFFERED_CHUNKS):
+        self._loop = loop
+        self._queue: "queue.Queue" = queue.Queue()
+        self._slots = asyncio.Semaphore(max_buffered)
+        self._max_buffered = max_buffered
+        self._buffer = bytearray()
+        self._eof = False
+        self._closed = False
+
+    async def feed(self, chunk: bytes) -> None:
+        """写入一个数据块（事件循环侧）"""
+        await self._slots.acquire()
+        if self._closed:
+            raise StorageError("上传已结束，无法继续写入数据")
+        self._queue.put(chunk)
+
+    def feed_eof(self) -> None:
+        """标记数据结束（事件循环侧）"""
+        self._queue.put(None)
+
+    def feed_error(self, exc: BaseException) -> None:
+        """上游读取失败，使 read() 抛出异常从而中止上传（事件循环侧）"""
+        self._queue.put(exc)
+
+    def close(self) -> None:
+        """上传结束（存储线程侧），唤醒所有等待写入的协程"""
+        self._closed = True
+        for _ in range(self._max_buffered):
+            self._loop.call_soon_threadsafe(self._slots.release)
+
+    def read(self, size: int = -1) -> bytes:
+        """读取最多 size 字节，数据不足时阻塞等待（存储线程侧）"""
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                break
+            if isinstance(item, BaseException):
+                raise item
+            self._loop.call_soon_threadsafe(self._slots.release)
+            self._buffer.extend(item)
+
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+
 class MinIOStorage:
-    """MinIO对象存储客户端"""
+    """
+    MinIO对象存储客户端
+
+    minio SDK 是同步的，所有网络请求都提交到一个有界的存储线程池中执行，
+    多个请求共享同一个HTTP连接池，不会阻塞API进程和Celery worker的事件循环。
+    每类操作的耗时（含排队时间）都会被统计，可通过 get_latency_stats() 查看。
+    """
 
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        初始化存储客户端
+
+        Args:
+            max_workers: 存储线程池大小（同时进行的MinIO请求上限，默认 STORAGE_MAX_WORKERS）
+        """
+        self.max_workers = max(1, max_workers or settings.STORAGE_MAX_WORKERS)
         self.client = Minio(
             endpoint=settings.MINIO_ENDPOINT,
             access_key=settings.MINIO_ACCESS_KEY,
             secret_key=settings.MINIO_SECRET_KEY,
             secure=settings.MINIO_SECURE,
             region=settings.MINIO_REGION,
+            # 大文件分片上传时SDK会另开线程并发发送分片，连接池为其预留连接
+            http_client=_create_http_client(self.max_workers + settings.STORAGE_TRANSFER_CONCURRENCY),
         )
         self.bucket_name = settings.MINIO_BUCKET_NAME
 
-    async def ensure_bucket_exists(self) -> None:
-        """确保存储桶存在"""
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+        # 每类操作的耗时统计: {operation: {"count", "errors", "total", "max"}}
+        self._latency: Dict[str, Dict[str, float]] = {}
+
+        # 存储桶是否已确认存在（只检查一次，遇到 NoSuchBucket 时失效）
+        self._bucket_ready = False
+        self._bucket_lock = threading.Lock()
+
+        # 预签名URL缓存与公开域名签名客户端
+        self._public_client: Optional[Minio] = None
+        self._url_cache = PresignedUrlCache(
+            window_seconds=settings.MINIO_PRESIGN_WINDOW_SECONDS,
+            max_entries=settings.MINIO_PRESIGN_CACHE_MAX_ENTRIES,
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        获取存储线程池
+
+        延迟创建并记录所属进程，Celery prefork 子进程不会继承父进程中已失效的线程
+        """
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._executor_pid != pid:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="minio"
+                )
+                self._executor_pid = pid
+            return self._executor
+
+    def _record_latency(self, operation: str, elapsed: float, failed: bool) -> None:
+        """记录一次操作的耗时"""
+        with self._lock:
+            stats = self._latency.setdefault(
+                operation, {"count": 0, "errors": 0, "total": 0.0, "max": 0.0}
+            )
+            stats["count"] += 1
+            stats["errors"] += int(failed)
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+
+    async def _run(self, operation: str, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在存储线程池中执行同步的MinIO调用
+
+        Args:
+            operation: 操作名称（用于耗时统计）
+            func: 同步函数
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await loop.run_in_executor(
+                self._get_executor(), lambda: func(*args, **kwargs)
+            )
+            failed = False
+            return result
+        except S3Error as e:
+            if e.code == "NoSuchBucket":
+                # 存储桶被删除，下次请求时重新创建
+                self.invalidate_bucket()
+            raise
+        finally:
+            self._record_latency(operation, time.perf_counter() - started, failed)
+
+    async def _run_in_bucket(self, operation: str, func: Callable[[], T]) -> T:
+        """
+        执行需要存储桶存在的MinIO调用
+
+        存储桶在运行期间被删除时（NoSuchBucket）重新创建存储桶并重试一次，
+        因此 func 必须可以重复执行（如重新定位文件指针）
+
+        Args:
+            operation: 操作名称（用于耗时统计）
+            func: 无参数的同步函数
+
+        Returns:
+            函数返回值
+        """
+        await self.ensure_bucket_exists()
         try:
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name, location="us-east-1")
-                logger.info(f"创建MinIO存储桶: {self.bucket_name}")
-
-                # 设置存储桶策略（可选）
-                policy = {
-                    "Version": "2012-10-17",
-                    "Statement": [
-                        {
-                            "Effect": "Allow",
-                            "Principal": {"AWS": "*"},
-                            "Action": ["s3:GetObject"],
-                            "Resource": [f"arn:aws:s3:::{self.bucket_name}/public/*"]
-                        }
-                    ]
+            return await self._run(operation, func)
+        except S3Error as e:
+            if e.code != "NoSuchBucket":
+                raise
+            logger.warning(f"MinIO存储桶不存在，重新创建后重试: {self.bucket_name}")
+            await self.ensure_bucket_exists()
+            return await self._run(operation, func)
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        获取每类操作的耗时统计
+
+        Returns:
+            {operation: {"count", "errors", "avg_ms", "max_ms"}}
+        """
+        with self._lock:
+            return {
+                operation: {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "avg_ms": round(stats["total"] / stats["count"] * 1000, 2) if stats["count"] else 0.0,
+                    "max_ms": round(stats["max"] * 1000, 2),
                 }
-                # 注意：实际环境中可能需要更严格的权限控制
+                for operation, stats in self._latency.items()
+            }
+
+    def _ensure_bucket_exists_sync(self) -> None:
+        """同步检查并创建存储桶（在存储线程池中执行，并发调用时只检查一次）"""
+        with self._bucket_lock:
+            if self._bucket_ready:
+                return
+            self._create_bucket_sync()
+            self._bucket_ready = True
+
+    def _create_bucket_sync(self) -> None:
+        """存储桶不存在时创建"""
+        if not self.client.bucket_exists(self.bucket_name):
+            self.client.make_bucket(self.bucket_name, location="us-east-1")
+            logger.info(f"创建MinIO存储桶: {self.bucket_name}")
+
+            # 设置存储桶策略（可选）
+            policy = {
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Effect": "Allow",
+                        "Principal": {"AWS": "*"},
+                        "Action": ["s3:GetObject"],
+                        "Resource": [f"arn:aws:s3:::{self.bucket_name}/public/*"]
+                    }
+                ]
+            }
+            # 注意：实际环境中可能需要更严格的权限控制
+
+    async def ensure_bucket_exists(self) -> None:
+        """
+        确保存储桶存在
+
+        首次调用时检查（必要时创建）存储桶，之后直接返回，不再产生网络请求
+        """
+        if self._bucket_ready:
+            return
+        try:
+            await self._run("ensure_bucket", self._ensure_bucket_exists_sync)
         except S3Error as e:
             logger.error(f"创建MinIO存储桶失败: {e}")
             raise StorageError(f"无法创建存储桶: {str(e)}")
 
+    async def _replaced_size(self, object_key: Optional[str]) -> Optional[int]:
+        """
+        上传前获取将被覆盖的对象大小，用于更新用户存储用量
+
+        自动生成的对象键不会覆盖已有对象，不计入用量的对象也无需检查
+
+        Args:
+            object_key: 调用方指定的对象键（未指定时为None）
+
+        Returns:
+            原对象大小，对象不存在或无需检查时返回None
+        """
+        if not object_key or usage_owner(object_key) is None:
+            return None
+        stat = await self.stat_file(object_key)
+        return stat["size"] if stat else None
+
+    def invalidate_bucket(self) -> None:
+        """标记存储桶状态未知，下次需要时重新检查"""
+        self._bucket_ready = False
+
     def generate_object_key(self, user_id: str, filename: str, prefix: str = "uploads") -> str:
         """
         生成对象键
@@ -100,8 +413,7 @@ class MinIOStorage:
             上传结果信息
         """
         try:
-            await self.ensure_bucket_exists()
-
+            replaced_size = await self._replaced_size(object_key)
             if not object_key:
                 object_key = self.generate_object_key(user_id, file.filename)
 
@@ -128,16 +440,21 @@ class MinIOStorage:
             file_size = file.file.tell()
             file.file.seek(0)  # 重置到开头
 
-            # 上传文件
-            result = self.client.put_object(
-                bucket_name=self.bucket_name,
-                object_name=object_key,
-                data=file.file,
-                length=file_size,
-                content_type=file.content_type,
-                metadata=metadata,
-            )
+            # 上传文件（重试时从头读取）
+            def put_file():
+                file.file.seek(0)
+                return self.client.put_object(
+                    bucket_name=self.bucket_name,
+                    object_name=object_key,
+                    data=file.file,
+                    length=file_size,
+                    content_type=file.content_type,
+                    metadata=metadata,
+                )
+
+            result = await self._run_in_bucket("upload", put_file)
 
+            await storage_usage.record_upload(object_key, file_size, replaced_size)
             logger.info(f"文件上传成功: {object_key}, 大小: {file_size} bytes")
 
             return {
@@ -177,6 +494,7 @@ class MinIOStorage:
             上传结果信息
         """
         try:
+            replaced_size = await self._replaced_size(object_key)
             if not object_key:
                 object_key = self.generate_object_key(user_id, original_filename)
 
@@ -199,16 +517,25 @@ class MinIOStorage:
                 "file_path": file_path,
             })
 
-            # 上传文件
-            with open(file_path, 'rb') as file_data:
-                result = self.client.put_object(
-                    bucket_name=self.bucket_name,
-                    object_name=object_key,
-                    data=file_data,
-                    length=file_size,
-                    metadata=metadata,
-                )
+            # 上传文件（在存储线程池中打开并读取本地文件）
+            # 大文件按固定分片大小做分片上传，多个分片并发发送
+            multipart = file_size >= settings.STORAGE_MULTIPART_THRESHOLD
+
+            def put_from_path():
+                with open(file_path, 'rb') as file_data:
+                    return self.client.put_object(
+                        bucket_name=self.bucket_name,
+                        object_name=object_key,
+                        data=file_data,
+                        length=file_size,
+                        metadata=metadata,
+                        part_size=settings.STORAGE_MULTIPART_PART_SIZE if multipart else 0,
+                        num_parallel_uploads=settings.STORAGE_TRANSFER_CONCURRENCY,
+                    )
 
+            result = await self._run_in_bucket("upload", put_from_path)
+
+            await storage_usage.record_upload(object_key, file_size, replaced_size)
             logger.info(f"文件上传成功: {object_key}, 大小: {file_size} bytes")
 
             return {
@@ -226,61 +553,226 @@ class MinIOStorage:
             logger.error(f"文件上传异常: {e}")
             raise StorageError(f"文件上传异常: {str(e)}")
 
-    def get_presigned_url(
+    async def upload_stream(
             self,
-            object_key: str,
-            expires: timedelta = timedelta(hours=1)
-    ) -> str:
+            user_id: str,
+            chunks: AsyncIterator[bytes],
+            filename: str,
+            content_type: str = "application/octet-stream",
+            length: Optional[int] = None,
+            object_key: Optional[str] = None,
+            metadata: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
         """
-        获取预签名URL
+        流式上传：边读取上游数据边上传到MinIO
+
+        长度已知时按该长度上传，未知时以 STREAM_PART_SIZE 为分片做分片上传；
+        上传过程中计算内容的 MD5 和 SHA-256，内存占用上限约为一个分片加缓冲区，与文件大小无关。
+
+        Args:
+            user_id: 用户ID
+            chunks: 数据块的异步迭代器（如 HTTP 响应体）
+            filename: 原始文件名
+            content_type: MIME类型
+            length: 内容长度（可选，如 Content-Length）
+            object_key: 对象键（可选，自动生成）
+            metadata: 文件元数据
+
+        Returns:
+            上传结果信息（含 size、md5、sha256）
         """
         try:
-            # 默认使用内部客户端
-            signing_client = self.client
-            
-            # 如果配置了公开访问 URL
-            if settings.MINIO_PUBLIC_URL:
-                public_url = settings.MINIO_PUBLIC_URL
-                clean_endpoint = public_url.replace("http://", "").replace("https://", "").rstrip('/')
-                is_secure = public_url.startswith("https://") or settings.MINIO_SECURE
-                
+            await self.ensure_bucket_exists()
+
+            replaced_size = await self._replaced_size(object_key)
+            if not object_key:
+                object_key = self.generate_object_key(user_id, filename)
+
+            if metadata is None:
+                metadata = {}
+
+            # 对文件名进行ASCII编码以支持中文字符
+            import urllib.parse
+            encoded_filename = urllib.parse.quote(filename or "", safe="")
+
+            metadata.update({
+                "original_filename": encoded_filename,
+                "content_type": content_type,
+                "upload_time": datetime.now().isoformat(),
+                "user_id": user_id,
+            })
+
+            reader = _StreamReader(asyncio.get_running_loop())
+
+            def put_stream():
                 try:
-                    # 强行指定 region 可以防止 SDK 尝试连接网络获取 location
-                    signing_client = Minio(
-                        endpoint=clean_endpoint,
-                        access_key=settings.MINIO_ACCESS_KEY,
-                        secret_key=settings.MINIO_SECRET_KEY,
-                        secure=is_secure,
-                        region=settings.MINIO_REGION,
-                    )
-                    
-                    return signing_client.presigned_get_object(
+                    return self.client.put_object(
                         bucket_name=self.bucket_name,
                         object_name=object_key,
-                        expires=expires,
+                        data=reader,
+                        length=length if length is not None else -1,
+                        content_type=content_type,
+                        metadata=metadata,
+                        part_size=0 if length is not None else STREAM_PART_SIZE,
                     )
-                except Exception as e:
-                    # 如果创建客户端或签名过程中报错（如因为 localhost 导致的连接重试）
-                    # 则回退到字符串替换逻辑，虽然可能会报 403，但至少不会让后端 API 500 崩溃
-                    logger.warning(f"使用公开域名签名失败，尝试字符串替换回退: {e}")
-                    url = self.client.presigned_get_object(
-                        bucket_name=self.bucket_name,
-                        object_name=object_key,
-                        expires=expires,
-                    )
-                    # 将内部 endpoint 替换为外部 endpoint
-                    return url.replace(settings.MINIO_ENDPOINT, clean_endpoint)
-            
-            # 正常产生内部 URL
-            return self.client.presigned_get_object(
+                finally:
+                    reader.close()
+
+            upload = asyncio.ensure_future(self._run("upload", put_stream))
+
+            # 只统计已交给上传线程的数据，结果中的大小和哈希与实际上传的内容一致
+            md5 = hashlib.md5()
+            sha256 = hashlib.sha256()
+            size = 0
+            stream_error: Optional[BaseException] = None
+            try:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if length is not None and size + len(chunk) > length:
+                        stream_error = StorageError(f"上游数据超过声明的长度: {length} bytes")
+                        break
+                    await reader.feed(chunk)
+                    md5.update(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+                else:
+                    reader.feed_eof()
+            except StorageError:
+                # 上传线程已提前结束：长度未知时异常以上传结果为准；
+                # 长度已知时 put_object 读满声明的长度才会结束，说明上游数据多于声明的长度
+                if length is not None:
+                    stream_error = StorageError(f"上游数据超过声明的长度: {length} bytes")
+            except BaseException as e:
+                stream_error = e
+
+            if stream_error is not None:
+                reader.feed_error(stream_error)
+                results = await asyncio.gather(upload, return_exceptions=True)
+                if not isinstance(results[0], BaseException):
+                    # 上传线程读满声明的长度后已完成上传，删除被截断的对象
+                    await self._run("delete", self.client.remove_object, self.bucket_name, object_key)
+                    if replaced_size is not None:
+                        await storage_usage.record_delete(object_key, replaced_size)
+                raise stream_error
+
+            result = await upload
+
+            await storage_usage.record_upload(object_key, size, replaced_size)
+            logger.info(f"文件流式上传成功: {object_key}, 大小: {size} bytes")
+
+            return {
+                "bucket": self.bucket_name,
+                "object_key": object_key,
+                "size": size,
+                "etag": result.etag,
+                "md5": md5.hexdigest(),
+                "sha256": sha256.hexdigest(),
+                "url": self.get_presigned_url(object_key),
+            }
+
+        except S3Error as e:
+            logger.error(f"MinIO上传失败: {e}")
+            raise StorageError(f"文件上传失败: {str(e)}")
+        except StorageError:
+            raise
+        except Exception as e:
+            logger.error(f"文件上传异常: {e}")
+            raise StorageError(f"文件上传异常: {str(e)}")
+
+    def _get_signing_client(self) -> Minio:
+        """
+        获取用于签名的客户端
+
+        配置了公开访问 URL 时使用指向公开域名的客户端（只创建一次），否则使用内部客户端
+        """
+        if not settings.MINIO_PUBLIC_URL:
+            return self.client
+
+        if self._public_client is None:
+            public_url = settings.MINIO_PUBLIC_URL
+            # 强行指定 region 可以防止 SDK 尝试连接网络获取 location
+            self._public_client = Minio(
+                endpoint=self._public_endpoint(),
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=public_url.startswith("https://") or settings.MINIO_SECURE,
+                region=settings.MINIO_REGION,
+            )
+        return self._public_client
+
+    @staticmethod
+    def _public_endpoint() -> str:
+        """公开访问 URL 对应的 endpoint（去掉协议和末尾斜杠）"""
+        return settings.MINIO_PUBLIC_URL.replace("http://", "").replace("https://", "").rstrip('/')
+
+    def _presign(self, object_key: str, expires: timedelta, request_date: datetime) -> str:
+        """以指定签名时间生成预签名URL（纯本地计算，不访问网络）"""
+        try:
+            return self._get_signing_client().presigned_get_object(
+                bucket_name=self.bucket_name,
+                object_name=object_key,
+                expires=expires,
+                request_date=request_date,
+            )
+        except Exception as e:
+            if not settings.MINIO_PUBLIC_URL:
+                raise
+            # 如果创建客户端或签名过程中报错（如因为 localhost 导致的连接重试）
+            # 则回退到字符串替换逻辑，虽然可能会报 403，但至少不会让后端 API 500 崩溃
+            logger.warning(f"使用公开域名签名失败，尝试字符串替换回退: {e}")
+            url = self.client.presigned_get_object(
                 bucket_name=self.bucket_name,
                 object_name=object_key,
                 expires=expires,
+                request_date=request_date,
             )
+            # 将内部 endpoint 替换为外部 endpoint
+            return url.replace(settings.MINIO_ENDPOINT, self._public_endpoint())
+
+    def get_presigned_url(
+            self,
+            object_key: str,
+            expires: timedelta = timedelta(hours=1)
+    ) -> str:
+        """
+        获取预签名URL
+
+        同一签名时间窗口内相同对象键和有效期的URL直接从缓存返回
+        """
+        try:
+            return self._url_cache.get_or_sign(object_key, expires, self._presign)
         except S3Error as e:
             logger.error(f"获取预签名URL失败: {e}")
             raise StorageError(f"获取预签名URL失败: {str(e)}")
 
+    def sign_many(
+            self,
+            object_keys: Iterable[Optional[str]],
+            expires: timedelta = timedelta(hours=1)
+    ) -> Dict[str, str]:
+        """
+        批量获取预签名URL
+
+        空值会被跳过，已经是完整 http(s) 地址的值原样返回
+
+        Args:
+            object_keys: 对象键列表（可包含重复值和空值）
+            expires: 有效期
+
+        Returns:
+            {object_key: url}
+        """
+        urls: Dict[str, str] = {}
+        for object_key in object_keys:
+            if not object_key or object_key in urls:
+                continue
+            if object_key.startswith("http"):
+                urls[object_key] = object_key
+            else:
+                urls[object_key] = self.get_presigned_url(object_key, expires)
+        return urls
+
     async def download_file(self, object_key: str) -> bytes:
         """
         下载文件
@@ -292,35 +784,194 @@ class MinIOStorage:
             文件内容
         """
         try:
-            response = self.client.get_object(self.bucket_name, object_key)
-            return response.read()
+            return await self._run("download", self._download_file_sync, object_key)
         except S3Error as e:
             logger.error(f"下载文件失败: {e}")
             raise StorageError(f"下载文件失败: {str(e)}")
 
-    async def download_file_to_path(self, object_key: str, dest_path: str) -> None:
+    def _download_file_sync(self, object_key: str) -> bytes:
+        """同步下载文件内容（在存储线程池中执行）"""
+        response = self.client.get_object(self.bucket_name, object_key)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    @staticmethod
+    def _response_etag(response) -> Optional[str]:
+        """读取响应头中的ETag（去掉引号），没有时返回None"""
+        return (response.headers.get("ETag") or "").strip('"') or None
+
+    def _write_response_sync(self, response, dest_path: str) -> Optional[str]:
         """
-        下载文件到指定路径
+        把整个响应写入目标路径并关闭响应（在存储线程池中执行）
 
-        Args:
-            object_key: 对象键
-            dest_path: 目标路径
+        Returns:
+            本次下载内容的ETag（取自响应头，响应中没有时为None）
         """
         try:
-            response = self.client.get_object(self.bucket_name, object_key)
-
             # 确保目标目录存在
             Path(dest_path).parent.mkdir(parents=True, exist_ok=True)
 
-            # MinIO的stream()返回同步生成器，使用同步写入
             with open(dest_path, 'wb') as f:
-                for chunk in response.stream(8192):
+                for chunk in response.stream(64 * 1024):
                     f.write(chunk)
-            
+            return self._response_etag(response)
+        finally:
             response.close()
             response.release_conn()
 
+    def _download_file_to_path_sync(self, object_key: str, dest_path: str) -> Optional[str]:
+        """同步下载文件到指定路径（在存储线程池中执行），返回下载内容的ETag"""
+        response = self.client.get_object(self.bucket_name, object_key)
+        return self._write_response_sync(response, dest_path)
+
+    def _write_range_sync(self, response, object_key: str, dest_path: str, offset: int, length: int) -> None:
+        """把响应的前 length 字节写入文件的 offset 位置并关闭响应（在存储线程池中执行）"""
+        position = offset
+        end = offset + length
+        try:
+            fd = os.open(dest_path, os.O_WRONLY)
+            try:
+                for chunk in response.stream(1024 * 1024):
+                    chunk = chunk[:end - position]
+                    os.pwrite(fd, chunk, position)
+                    position += len(chunk)
+                    if position >= end:
+                        break
+            finally:
+                os.close(fd)
+        finally:
+            response.close()
+            response.release_conn()
+
+        if position != end:
+            raise StorageError(f"区间下载不完整: {object_key} [{offset}, {end})")
+
+    def _download_range_sync(self, object_key: str, dest_path: str, offset: int, length: int, etag: str) -> None:
+        """
+        同步下载对象的一个区间并写入文件的对应位置（在存储线程池中执行）
+
+        使用 If-Match 保证所有区间来自同一版本的对象，下载期间对象被覆盖时报错
+        """
+        response = self.client.get_object(
+            self.bucket_name, object_key,
+            offset=offset, length=length,
+            request_headers={"If-Match": etag},
+        )
+        self._write_range_sync(response, object_key, dest_path, offset, length)
+
+    async def _download_ranged(
+            self,
+            object_key: str,
+            dest_path: str,
+            size: int,
+            etag: str,
+            first_response=None
+    ) -> None:
+        """
+        按区间并发下载大文件
+
+        目标文件预先分配好大小，各区间直接写入各自的位置；任一区间失败后不再开始新的区间，
+        等已开始的区间结束后删除目标文件
+
+        Args:
+            object_key: 对象键
+            dest_path: 目标路径
+            size: 对象大小
+            etag: 对象ETag
+            first_response: 已打开的整个对象的GET响应（可选），用于写入第一个区间，由调用方负责关闭
+        """
+        part_size = settings.STORAGE_MULTIPART_PART_SIZE
+        semaphore = asyncio.Semaphore(max(1, settings.STORAGE_TRANSFER_CONCURRENCY))
+        failed = False
+
+        Path(dest_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(dest_path, 'wb') as f:
+            f.truncate(size)
+
+        async def download_range(offset: int) -> None:
+            nonlocal failed
+            async with semaphore:
+                if failed:
+                    return
+                length = min(part_size, size - offset)
+                try:
+                    if offset == 0 and first_response is not None:
+                        await self._run(
+                            "download_range", self._write_range_sync,
+                            first_response, object_key, dest_path, 0, length
+                        )
+                    else:
+                        await self._run(
+                            "download_range", self._download_range_sync,
+                            object_key, dest_path, offset, length, etag
+                        )
+                except BaseException:
+                    failed = True
+                    raise
+
+        results = await asyncio.gather(
+            *[download_range(offset) for offset in range(0, size, part_size)],
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            Path(dest_path).unlink(missing_ok=True)
+            raise errors[0]
+
+    async def download_file_to_path(
+            self,
+            object_key: str,
+            dest_path: str,
+            size: Optional[int] = None,
+            etag: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        下载文件到指定路径
+
+        下载在存储线程池中执行，多个下载可以真正并发而不阻塞事件循环；
+        超过 STORAGE_MULTIPART_THRESHOLD 的大文件按区间并发下载。调用方已知对象大小和ETag时
+        直接据此选择下载方式，否则按首个GET响应的 Content-Length 判断，不额外请求对象元信息
+
+        Args:
+            object_key: 对象键
+            dest_path: 目标路径
+            size: 已知的对象大小（可选）
+            etag: 已知的对象ETag（可选，与 size 同时提供时生效）
+
+        Returns:
+            实际下载内容的ETag（不含引号），无法确定时为None
+        """
+        try:
+            threshold = settings.STORAGE_MULTIPART_THRESHOLD
+            known = size is not None and bool(etag)
+            ranged = settings.STORAGE_TRANSFER_CONCURRENCY > 1 and RANGED_DOWNLOAD_SUPPORTED
+
+            if not ranged or (known and size < threshold):
+                etag = await self._run("download", self._download_file_to_path_sync, object_key, dest_path)
+            elif known:
+                # 各区间以 If-Match 校验，下载内容一定对应该ETag
+                etag = str(etag).strip('"')
+                await self._download_ranged(object_key, dest_path, size, etag)
+            else:
+                response = await self._run("download", self.client.get_object, self.bucket_name, object_key)
+                content_length = int(response.headers.get("Content-Length") or 0)
+                etag = self._response_etag(response)
+                if etag and content_length >= threshold:
+                    # 首个响应直接写入第一个区间，其余区间以 If-Match 并发下载
+                    try:
+                        await self._download_ranged(
+                            object_key, dest_path, content_length, etag, first_response=response
+                        )
+                    finally:
+                        response.close()
+                        response.release_conn()
+                else:
+                    etag = await self._run("download", self._write_response_sync, response, dest_path)
             logger.info(f"文件下载成功: {object_key} -> {dest_path}")
+            return etag
 
         except S3Error as e:
             logger.error(f"下载文件失败: {e}")
@@ -337,13 +988,64 @@ class MinIOStorage:
             是否删除成功
         """
         try:
-            self.client.remove_object(self.bucket_name, object_key)
+            # 计入用量的对象删除前先获取大小
+            stat = await self.stat_file(object_key) if usage_owner(object_key) else None
+
+            await self._run("delete", self.client.remove_object, self.bucket_name, object_key)
+            if stat:
+                await storage_usage.record_delete(object_key, stat["size"])
             logger.info(f"文件删除成功: {object_key}")
             return True
         except S3Error as e:
             logger.error(f"删除文件失败: {e}")
             return False
 
+    def _delete_batch_sync(self, object_keys: List[str]) -> Dict[str, str]:
+        """同步批量删除一批对象（单次请求，在存储线程池中执行），返回 {对象键: 错误信息}"""
+        errors = self.client.remove_objects(
+            self.bucket_name, [DeleteObject(object_key) for object_key in object_keys]
+        )
+        # remove_objects 是惰性的，迭代错误列表时才真正发出请求
+        return {error.name: error.message for error in errors}
+
+    async def delete_files(self, object_keys: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        批量删除文件（S3多对象删除，每个请求最多 DELETE_BATCH_SIZE 个对象，多个请求并发执行）
+
+        删除的对象计入用户存储用量时，对应用户的用量计数会失效并在下次查询时重建
+
+        Args:
+            object_keys: 对象键列表
+
+        Returns:
+            {"deleted": [...], "failed": [...]}
+        """
+        object_keys = list(dict.fromkeys(object_keys))
+        batches = [
+            object_keys[i:i + DELETE_BATCH_SIZE]
+            for i in range(0, len(object_keys), DELETE_BATCH_SIZE)
+        ]
+
+        async def delete_batch(batch: List[str]) -> Dict[str, str]:
+            try:
+                return await self._run("delete_batch", self._delete_batch_sync, batch)
+            except S3Error as e:
+                logger.error(f"批量删除文件失败: {e}")
+                return {object_key: str(e) for object_key in batch}
+
+        failed: Dict[str, str] = {}
+        for errors in await asyncio.gather(*[delete_batch(batch) for batch in batches]):
+            failed.update(errors)
+
+        deleted = [object_key for object_key in object_keys if object_key not in failed]
+        for user_id in {usage_owner(object_key) for object_key in deleted} - {None}:
+            await storage_usage.invalidate(user_id)
+
+        if failed:
+            logger.warning(f"批量删除部分失败: {len(failed)} 个, 示例: {list(failed.items())[:3]}")
+        logger.info(f"批量删除完成: 成功 {len(deleted)} 个, 失败 {len(failed)} 个")
+        return {"deleted": deleted, "failed": list(failed)}
+
     async def copy_file(
             self,
             source_object_key: str,
@@ -362,7 +1064,9 @@ class MinIOStorage:
             是否复制成功
         """
         try:
-            result = self.client.copy_object(
+            result = await self._run(
+                "copy",
+                self.client.copy_object,
                 bucket_name=self.bucket_name,
                 object_name=dest_object_key,
                 source=f"{self.bucket_name}/{source_object_key}",
@@ -389,28 +1093,34 @@ class MinIOStorage:
         Returns:
             文件列表
         """
-        try:
-            objects = self.client.list_objects(
-                bucket_name=self.bucket_name,
-                prefix=prefix,
-                recursive=True
-            )
-
-            files = []
-            for i, obj in enumerate(objects):
+        def list_objects():
+            # list_objects 返回惰性分页的生成器，迭代时才发出请求，因此整体放在线程池中执行
+            objects = []
+            for i, obj in enumerate(self.client.list_objects(
+                    bucket_name=self.bucket_name,
+                    prefix=prefix,
+                    recursive=True
+            )):
                 if i >= limit:
                     break
+                objects.append(obj)
+            return objects
 
-                if obj.object_name.endswith('/'):
-                    continue  # 跳过目录
+        try:
+            objects = await self._run("list", list_objects)
 
+            objects = [obj for obj in objects if not obj.object_name.endswith('/')]  # 跳过目录
+            urls = self.sign_many(obj.object_name for obj in objects)
+
+            files = []
+            for obj in objects:
                 files.append({
                     "object_key": obj.object_name,
                     "size": obj.size,
                     "last_modified": obj.last_modified.isoformat() if obj.last_modified else None,
                     "etag": obj.etag,
                     "content_type": obj.content_type,
-                    "url": self.get_presigned_url(obj.object_name),
+                    "url": urls[obj.object_name],
                 })
 
             return files
@@ -430,7 +1140,7 @@ class MinIOStorage:
             文件信息
         """
         try:
-            stat = self.client.stat_object(self.bucket_name, object_key)
+            stat = await self._run("stat", self.client.stat_object, self.bucket_name, object_key)
             return {
                 "object_key": object_key,
                 "size": stat.size,
@@ -455,25 +1165,186 @@ class MinIOStorage:
             文件是否存在
         """
         try:
-            self.client.stat_object(self.bucket_name, object_key)
+            await self._run("stat", self.client.stat_object, self.bucket_name, object_key)
             return True
         except S3Error:
             return False
 
+    async def stat_file(self, object_key: str) -> Optional[Dict[str, Any]]:
+        """
+        获取对象元信息（不生成预签名URL，开销比 get_file_info 小）
+
+        Args:
+            object_key: 对象键
+
+        Returns:
+            {"object_key", "size", "etag", "last_modified", "metadata"}，对象不存在时返回None
+        """
+        try:
+            stat = await self._run("stat", self.client.stat_object, self.bucket_name, object_key)
+            return {
+                "object_key": object_key,
+                "size": stat.size,
+                "etag": stat.etag,
+                "last_modified": stat.last_modified,
+                "metadata": stat.metadata,
+            }
+        except S3Error as e:
+            if e.code not in ("NoSuchKey", "NoSuchObject"):
+                logger.error(f"获取对象信息失败: {e}")
+            return None
+
+    async def touch_file(self, object_key: str) -> bool:
+        """
+        刷新对象的最后修改时间（原地复制并保留用户元数据和Content-Type），用于按最近访问时间淘汰
+
+        Args:
+            object_key: 对象键
+
+        Returns:
+            是否成功
+        """
+        def touch():
+            stat = self.client.stat_object(self.bucket_name, object_key)
+            metadata = {
+                key[len("x-amz-meta-"):]: value
+                for key, value in stat.metadata.items()
+                if key.lower().startswith("x-amz-meta-")
+            }
+            metadata["touched_at"] = datetime.now().isoformat()
+            # REPLACE 会丢弃原对象的所有元数据，Content-Type 需要显式带上
+            if stat.content_type:
+                metadata["Content-Type"] = stat.content_type
+            self.client.copy_object(
+                bucket_name=self.bucket_name,
+                object_name=object_key,
+                source=CopySource(self.bucket_name, object_key),
+                metadata=metadata,
+                metadata_directive=REPLACE,
+            )
+
+        try:
+            await self._run("touch", touch)
+            return True
+        except S3Error as e:
+            logger.error(f"刷新对象时间失败: {e}")
+            return False
+
+    async def list_objects_page(
+            self,
+            prefix: str,
+            max_keys: int = 1000,
+            continuation_token: Optional[str] = None,
+            sign_urls: bool = False
+    ) -> Dict[str, Any]:
+        """
+        分页列出对象
+
+        每页只读取需要的对象数量，默认不生成预签名URL
+
+        Args:
+            prefix: 前缀
+            max_keys: 每页最多返回的对象数量
+            continuation_token: 上一页返回的 next_token，为空时从头开始
+            sign_urls: 是否为每个对象生成预签名URL
+
+        Returns:
+            {"files": [{"object_key", "size", "last_modified", "etag", "url"?}], "next_token"}，
+            已是最后一页时 next_token 为None
+        """
+        start_after = _decode_continuation_token(continuation_token) if continuation_token else None
+
+        def list_page():
+            # 多读取一个对象用于判断是否还有下一页，list_objects 的惰性分页在此之后不再发出请求
+            objects = []
+            for obj in self.client.list_objects(
+                    bucket_name=self.bucket_name,
+                    prefix=prefix,
+                    recursive=True,
+                    start_after=start_after,
+            ):
+                if obj.object_name.endswith('/'):
+                    continue  # 跳过目录
+                objects.append(obj)
+                if len(objects) > max_keys:
+                    break
+            return objects
+
+        try:
+            objects = await self._run("list", list_page)
+        except S3Error as e:
+            logger.error(f"列出文件失败: {e}")
+            raise StorageError(f"列出文件失败: {str(e)}")
+
+        has_more = len(objects) > max_keys
+        objects = objects[:max_keys]
+        urls = self.sign_many(obj.object_name for obj in objects) if sign_urls else {}
+
+        files = []
+        for obj in objects:
+            file_info = {
+                "object_key": obj.object_name,
+                "size": obj.size or 0,
+                "last_modified": obj.last_modified,
+                "etag": obj.etag,
+            }
+            if sign_urls:
+                file_info["url"] = urls[obj.object_name]
+            files.append(file_info)
+
+        return {
+            "files": files,
+            "next_token": _encode_continuation_token(objects[-1].object_name) if has_more else None,
+        }
+
+    async def list_object_stats(self, prefix: str) -> List[Dict[str, Any]]:
+        """
+        列出前缀下所有对象的大小和修改时间（不签名、不限数量）
+
+        Args:
+            prefix: 前缀
+
+        Returns:
+            [{"object_key", "size", "last_modified"}]
+        """
+        def list_objects():
+            return [
+                {
+                    "object_key": obj.object_name,
+                    "size": obj.size or 0,
+                    "last_modified": obj.last_modified,
+                }
+                for obj in self.client.list_objects(
+                    bucket_name=self.bucket_name,
+                    prefix=prefix,
+                    recursive=True
+                )
+                if not obj.object_name.endswith('/')
+            ]
+
+        try:
+            return await self._run("list", list_objects)
+        except S3Error as e:
+            logger.error(f"列出文件失败: {e}")
+            raise StorageError(f"列出文件失败: {str(e)}")
+
 
 # 全局存储客户端实例
 storage_client = MinIOStorage()
 
 
 async def get_storage_client() -> MinIOStorage:
-    """获取存储客户端实例"""
+    """获取存储客户端实例（存储桶只在首次使用时检查）"""
     await storage_client.ensure_bucket_exists()
     return storage_client
 
 
 __all__ = [
+    "DELETE_BATCH_SIZE",
+    "STREAM_PART_SIZE",
     "MinIOStorage",
     "StorageError",
     "storage_client",
+    "content_length_from_headers",
     "get_storage_client",
 ]
@@ -0,0 +1,219 @@
+"""
+用户存储用量计数器 - 在Redis中增量维护每个用户上传目录的文件数和总大小
+
+负责:
+- 上传、删除 uploads/{user_id}/ 下的对象时增量更新计数，用量查询为 O(1)
+- 计数不存在时（首次查询、计数过期、Redis数据丢失、更新失败）通过一次完整的分页扫描重建
+- 计数更新失败不影响上传和删除本身，只会让计数失效并在下次查询时重建
+"""
+
+from pathlib import PurePosixPath
+from typing import Any, Dict, Optional
+
+from src.core.logging import get_logger
+from src.utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+# 计入用量的对象前缀，与 MinIOStorage.generate_object_key 的默认前缀一致
+USAGE_PREFIX = "uploads"
+
+# 计数的有效期（秒），到期后下次查询时重建，限制Redis不可用期间漏记造成的偏差
+USAGE_TTL_SECONDS = 24 * 3600
+
+# 计数存在时才增量更新（计数不存在说明尚未初始化或已失效，等待重建）
+_INCREMENT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'size', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'files', ARGV[2])
+if ARGV[3] ~= '' then
+    redis.call('HINCRBY', KEYS[1], 'ext:' .. ARGV[3], ARGV[2])
+end
+return 1
+"""
+
+
+def usage_owner(object_key: str) -> Optional[str]:
+    """
+    获取对象所属的用户ID（只统计 uploads/{user_id}/ 下的对象）
+
+    Args:
+        object_key: 对象键
+
+    Returns:
+        用户ID，不计入用量的对象返回None
+    """
+    parts = object_key.split("/", 2)
+    if len(parts) == 3 and parts[0] == USAGE_PREFIX and parts[1]:
+        return parts[1]
+    return None
+
+
+def _extension(object_key: str) -> str:
+    """对象键的小写扩展名（不含点）"""
+    return PurePosixPath(object_key).suffix.lstrip(".").lower()
+
+
+class StorageUsageCounter:
+    """基于Redis哈希的用户存储用量计数器"""
+
+    def __init__(self, key_prefix: str = "storage_usage"):
+        """
+        初始化计数器
+
+        Args:
+            key_prefix: Redis键前缀
+        """
+        self.key_prefix = key_prefix
+
+    def _get_client(self):
+        """获取Redis客户端"""
+        return get_redis()
+
+    def _key(self, user_id: str) -> str:
+        """用户计数对应的Redis键"""
+        return f"{self.key_prefix}:{user_id}"
+
+    async def _increment(self, object_key: str, size: int, files: int) -> None:
+        """增量更新对象所属用户的计数，失败时使计数失效"""
+        user_id = usage_owner(object_key)
+        if user_id is None:
+            return
+
+        try:
+            await self._get_client().eval(_INCREMENT_SCRIPT, 1, self._key(user_id), size, files, _extension(object_key))
+        except Exception as e:
+            logger.warning(f"更新存储用量失败，下次查询时重建: {user_id}, 错误: {e}")
+            await self.invalidate(user_id)
+
+    async def record_upload(self, object_key: str, size: int, replaced_size: Optional[int] = None) -> None:
+        """
+        记录一次上传
+
+        Args:
+            object_key: 对象键
+            size: 对象大小
+            replaced_size: 覆盖已有对象时原对象的大小
+        """
+        if replaced_size is None:
+            await self._increment(object_key, size, 1)
+        else:
+            await self._increment(object_key, size - replaced_size, 0)
+
+    async def record_delete(self, object_key: str, size: int) -> None:
+        """
+        记录一次删除
+
+        Args:
+            object_key: 对象键
+            size: 被删除对象的大小
+        """
+        await self._increment(object_key, -size, -1)
+
+    async def invalidate(self, user_id: str) -> None:
+        """删除用户计数，下次查询时重建"""
+        try:
+            await self._get_client().delete(self._key(user_id))
+        except Exception as e:
+            logger.error(f"清除存储用量计数失败: {user_id}, 错误: {e}")
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取用户用量
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            {"files", "size", "file_types": {ext: count}}，计数不存在时返回None
+        """
+        try:
+            data = await self._get_client().hgetall(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"读取存储用量失败: {user_id}, 错误: {e}")
+            return None
+        if not data:
+            return None
+        return {
+            "files": int(data.get("files", 0)),
+            "size": int(data.get("size", 0)),
+            "file_types": {
+                field[4:]: int(count)
+                for field, count in data.items()
+                if field.startswith("ext:") and int(count) > 0
+            },
+        }
+
+    async def rebuild(self, user_id: str, storage) -> Dict[str, Any]:
+        """
+        通过分页扫描用户上传目录重建计数
+
+        扫描期间发生的上传和删除可能不会被计入，下次重建时修正
+
+        Args:
+            user_id: 用户ID
+            storage: 存储客户端
+
+        Returns:
+            用量信息（格式同 get）
+        """
+        usage = {"files": 0, "size": 0, "file_types": {}}
+        token = None
+        while True:
+            page = await storage.list_objects_page(
+                f"{USAGE_PREFIX}/{user_id}/", max_keys=1000, continuation_token=token
+            )
+            for obj in page["files"]:
+                usage["files"] += 1
+                usage["size"] += obj["size"]
+                ext = _extension(obj["object_key"])
+                if ext:
+                    usage["file_types"][ext] = usage["file_types"].get(ext, 0) + 1
+            token = page["next_token"]
+            if not token:
+                break
+
+        mapping = {"files": usage["files"], "size": usage["size"]}
+        mapping.update({f"ext:{ext}": count for ext, count in usage["file_types"].items()})
+
+        try:
+            async with self._get_client().pipeline(transaction=True) as pipe:
+                pipe.delete(self._key(user_id))
+                pipe.hset(self._key(user_id), mapping=mapping)
+                pipe.expire(self._key(user_id), USAGE_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"保存存储用量失败: {user_id}, 错误: {e}")
+
+        logger.info(f"存储用量已重建: {user_id}, {usage['files']} 个文件, {usage['size']} 字节")
+        return usage
+
+    async def get_or_rebuild(self, user_id: str, storage) -> Dict[str, Any]:
+        """
+        读取用户用量，计数不存在时重建
+
+        Args:
+            user_id: 用户ID
+            storage: 存储客户端
+
+        Returns:
+            用量信息（格式同 get）
+        """
+        usage = await self.get(user_id)
+        if usage is None:
+            usage = await self.rebuild(user_id, storage)
+        return usage
+
+
+# 创建全局实例
+storage_usage = StorageUsageCounter()
+
+__all__ = [
+    "USAGE_PREFIX",
+    "USAGE_TTL_SECONDS",
+    "StorageUsageCounter",
+    "storage_usage",
+    "usage_owner",
+]
@@ -0,0 +1,124 @@
+"""
+跨进程分布式限流单元测试
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.core.config import settings
+from src.utils.distributed_rate_limiter import (
+    KEY_PREFIX,
+    DistributedRateLimiter,
+    LocalRateLimitBackend,
+    RedisRateLimitBackend,
+)
+from src.utils.rate_limiter import ProviderRateLimiter
+
+
+@pytest.fixture
+def limiter():
+    """每分钟600次（间隔0.1秒）、允许3次突发的进程内限流器"""
+    with patch.object(settings, "PROVIDER_RATE_LIMIT_PER_MINUTE", 600), \
+            patch.object(settings, "PROVIDER_RATE_LIMIT_BURST", 3), \
+            patch.object(settings, "PROVIDER_RATE_LIMIT_ENABLED", True):
+        yield DistributedRateLimiter(backend=LocalRateLimitBackend())
+
+
+class TestLocalBackend:
+    """进程内GCRA测试"""
+
+    async def test_burst_then_spaced(self):
+        """测试突发额度内立即放行，超出后按发射间隔排队"""
+        backend = LocalRateLimitBackend()
+        waits = [await backend.reserve("key", 0.1, 0.2) for _ in range(5)]
+
+        assert waits[:3] == [0.0, 0.0, 0.0]
+        assert waits[3] == pytest.approx(0.1, abs=0.01)
+        assert waits[4] == pytest.approx(0.2, abs=0.01)
+        # 其他Key不受影响
+        assert await backend.reserve("other", 0.1, 0.2) == 0.0
+
+    async def test_penalize_delays_next_reservation(self):
+        """测试收到429后推迟下一个可用时间"""
+        backend = LocalRateLimitBackend()
+        await backend.penalize("key", 5.0, 0.2)
+
+        assert await backend.reserve("key", 0.1, 0.2) == pytest.approx(5.0, abs=0.01)
+
+
+class TestDistributedRateLimiter:
+    """分布式限流器测试"""
+
+    async def test_acquire_waits_for_token(self, limiter):
+        """测试超出突发额度的调用等待令牌"""
+        with patch("src.utils.distributed_rate_limiter.asyncio.sleep", new=AsyncMock()) as sleep:
+            for _ in range(4):
+                await limiter.acquire("key-1")
+
+        sleep.assert_awaited_once()
+        stats = limiter.get_stats()
+        assert stats["acquired"] == 4
+        assert stats["delayed"] == 1
+
+    async def test_falls_back_when_redis_unavailable(self, limiter):
+        """测试Redis不可用时使用进程内限流，不影响调用"""
+        backend = AsyncMock()
+        backend.reserve.side_effect = RedisConnectionError("connection refused")
+        backend.penalize.side_effect = RedisConnectionError("connection refused")
+        limiter.backend = backend
+
+        assert await limiter.acquire("key-1") == 0.0
+        await limiter.penalize("key-1", 1.0)
+
+        assert limiter.get_stats()["fallbacks"] == 2
+        assert await limiter.fallback.reserve("key-1", 0.1, 0.2) > 0.9
+
+    async def test_falls_back_when_redis_hangs(self, limiter):
+        """测试Redis无响应时超时后使用进程内限流，调用不会一直等待"""
+        async def hang(*args):
+            await asyncio.Event().wait()
+
+        backend = AsyncMock()
+        backend.reserve.side_effect = hang
+        backend.penalize.side_effect = hang
+        limiter.backend = backend
+
+        with patch.object(settings, "PROVIDER_RATE_LIMIT_REDIS_TIMEOUT", 0.05):
+            assert await asyncio.wait_for(limiter.acquire("key-1"), 1) == 0.0
+            await asyncio.wait_for(limiter.penalize("key-1", 1.0), 1)
+
+        assert limiter.get_stats()["fallbacks"] == 2
+
+    async def test_redis_backend_runs_script(self):
+        """测试Redis后端以毫秒为单位调用Lua脚本并换算等待秒数"""
+        client = AsyncMock()
+        client.eval.return_value = 250
+        backend = RedisRateLimitBackend(redis_factory=lambda: client)
+
+        assert await backend.reserve("key-1", 0.1, 1.9) == 0.25
+
+        args = client.eval.await_args.args
+        assert args[1:] == (1, KEY_PREFIX + "key-1", 100, 1900)
+
+    async def test_slots_share_quota_by_api_key_id(self, limiter):
+        """测试同一APIKey.id的不同模型共享配额，429时推迟该Key的下一个令牌"""
+        registry = ProviderRateLimiter()
+
+        with patch("src.utils.rate_limiter.distributed_rate_limiter", limiter), \
+                patch("src.utils.distributed_rate_limiter.asyncio.sleep", new=AsyncMock()) as sleep:
+            for model in ("gpt-4o", "dall-e-3", "tts-1"):
+                async with registry.limit("openai", "sk-test", model, api_key_id="key-1"):
+                    pass
+            sleep.assert_not_awaited()
+
+            async with registry.limit("openai", "sk-test", "gpt-4o", api_key_id="key-1") as slot:
+                slot.observe(429, httpx.Headers({"Retry-After": "3"}))
+
+        assert sleep.await_count == 1
+        assert limiter.get_stats()["penalized"] == 1
+        assert await limiter.fallback.reserve("key-1", 0.1, 0.2) == 0.0
+        assert await limiter.backend.reserve("key-1", 0.1, 0.2) == pytest.approx(3.0, abs=0.01)
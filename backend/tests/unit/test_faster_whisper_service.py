@@ -0,0 +1,116 @@
+"""
+Whisper识别池单元测试
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.faster_whisper_service import WhisperTranscriptionService
+
+
+class FakeWhisperModel:
+    """模拟WhisperModel，记录创建它的线程"""
+
+    def __init__(self, delay: float = 0.0):
+        self.thread = threading.current_thread().name
+        self.delay = delay
+
+    def transcribe(self, audio_path, **kwargs):
+        time.sleep(self.delay)
+        segment = SimpleNamespace(
+            text="你好 世界",
+            start=0.0,
+            end=1.5,
+            words=[SimpleNamespace(word="你好", start=0.0, end=0.6)],
+        )
+        info = SimpleNamespace(language="zh", language_probability=0.99)
+        return iter([segment]), info
+
+
+class FakeTranscriptionService(WhisperTranscriptionService):
+    """使用模拟模型的识别服务"""
+
+    def __init__(self, delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.loaded_in = []
+
+    def _load_model(self):
+        model = FakeWhisperModel(self.delay)
+        self.loaded_in.append(model.thread)
+        return model
+
+
+class TestWhisperTranscriptionService:
+    """Whisper识别池测试"""
+
+    def test_model_loaded_lazily(self):
+        """测试创建服务时不加载模型"""
+        service = FakeTranscriptionService()
+
+        assert service.loaded_in == []
+        assert service.get_stats()["models_loaded"] == 0
+
+    async def test_transcribe_async(self, tmp_path):
+        """测试异步识别结果与同步接口一致"""
+        audio_path = tmp_path / "audio.mp3"
+        audio_path.write_bytes(b"fake")
+        service = FakeTranscriptionService()
+
+        results, srt_content = await service.transcribe_async(str(audio_path), output_format="json")
+
+        assert results[0]["text"] == "你好 世界"
+        assert results[0]["words"][0] == {"word": "你好", "start": 0.0, "end": 0.6}
+        assert "00:00:00,000 --> 00:00:01,500" in srt_content
+        assert service.loaded_in[0].startswith("whisper")
+        assert service.get_stats()["requests_total"] == 1
+
+    async def test_one_model_per_worker_runs_in_parallel(self, tmp_path):
+        """测试每个worker各自持有模型，多个请求并行执行且不阻塞事件循环"""
+        audio_path = tmp_path / "audio.mp3"
+        audio_path.write_bytes(b"fake")
+        service = FakeTranscriptionService(delay=0.3, num_workers=2)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker_task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        await asyncio.gather(*[
+            service.transcribe_async(str(audio_path), output_format="json")
+            for _ in range(4)
+        ])
+        elapsed = time.monotonic() - started
+        ticker_task.cancel()
+
+        assert len(service.loaded_in) == 2
+        assert len(set(service.loaded_in)) == 2
+        assert elapsed < 1.0
+        assert ticks > 10
+        assert service.get_stats()["requests_total"] == 4
+        assert service.get_stats()["pending"] == 0
+
+    async def test_missing_audio(self, tmp_path):
+        """测试音频文件不存在"""
+        service = FakeTranscriptionService()
+
+        with pytest.raises(FileNotFoundError):
+            await service.transcribe_async(str(tmp_path / "missing.mp3"))
+
+    def test_align_rejects_empty_text(self, tmp_path):
+        """测试对齐文本为空时不加载模型直接报错"""
+        audio_path = tmp_path / "audio.mp3"
+        audio_path.write_bytes(b"fake")
+        service = FakeTranscriptionService()
+
+        with pytest.raises(ValueError):
+            service.align(str(audio_path), "  ")
+        assert service.loaded_in == []
@@ -0,0 +1,295 @@
+"""
+FFmpeg工具函数单元测试
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.utils.ffmpeg_utils import (
+    _build_crossfade_audio_filters,
+    _build_smart_xfade_window_command,
+    _build_xfade_video_filters,
+    _concatenate_with_smart_xfade,
+    _plan_smart_crossfade,
+    _run_process_async,
+    _video_encoder_args,
+    _with_progress_args,
+    build_sentence_video_command,
+    create_concat_file,
+    get_ffmpeg_max_concurrency,
+    run_ffmpeg_command_async,
+)
+
+
+def _python_command(script: str, *extra: str) -> list:
+    """用Python解释器模拟FFmpeg进程"""
+    return [sys.executable, "-c", script, *extra]
+
+
+class TestAsyncFFmpegRunner:
+    """异步FFmpeg执行引擎测试"""
+
+    def test_with_progress_args(self):
+        """测试插入 -progress 参数"""
+        command = ["ffmpeg", "-y", "-i", "in.mp4", "out.mp4"]
+
+        result = _with_progress_args(command)
+
+        assert result[:4] == ["ffmpeg", "-progress", "pipe:1", "-nostats"]
+        assert result[4:] == command[1:]
+        # 已有 -progress 时保持不变
+        assert _with_progress_args(result) == result
+
+    def test_max_concurrency_positive(self):
+        """测试并发上限至少为1"""
+        assert get_ffmpeg_max_concurrency() >= 1
+
+    async def test_run_success(self):
+        """测试成功执行并收集输出"""
+        command = _python_command(
+            "import sys; print('hello'); sys.stderr.write('warn')"
+        )
+
+        success, stdout, stderr = await run_ffmpeg_command_async(command)
+
+        assert success is True
+        assert stdout.strip() == "hello"
+        assert stderr == "warn"
+
+    async def test_stdin_input(self):
+        """测试通过标准输入传入数据，进程提前退出时不报错"""
+        command = _python_command("import sys; print(len(sys.stdin.buffer.read()))")
+        success, stdout, _ = await _run_process_async(command, 10, input_data=b"x" * 200000)
+        assert success is True
+        assert stdout.strip() == "200000"
+
+        command = _python_command("print('done')")
+        success, stdout, _ = await _run_process_async(command, 10, input_data=b"x" * 2000000)
+        assert success is True
+        assert stdout.strip() == "done"
+
+    async def test_run_failure(self):
+        """测试非零退出码"""
+        command = _python_command("import sys; sys.stderr.write('boom'); sys.exit(1)")
+
+        success, _, stderr = await run_ffmpeg_command_async(command)
+
+        assert success is False
+        assert stderr == "boom"
+
+    async def test_run_timeout_kills_process(self):
+        """测试超时后终止进程"""
+        command = _python_command("import time; time.sleep(30)")
+
+        started = time.monotonic()
+        success, _, stderr = await run_ffmpeg_command_async(command, timeout=1)
+
+        assert success is False
+        assert "超时" in stderr
+        assert time.monotonic() - started < 10
+
+    async def test_run_cancel(self):
+        """测试取消任务时抛出CancelledError"""
+        command = _python_command("import time; time.sleep(30)")
+
+        task = asyncio.create_task(run_ffmpeg_command_async(command, timeout=60))
+        await asyncio.sleep(0.5)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async def test_progress_callback(self):
+        """测试解析 -progress 输出"""
+        script = (
+            "print('frame=10'); print('out_time_us=1500000'); print('progress=continue');"
+            "print('frame=20'); print('out_time_us=3000000'); print('progress=end')"
+        )
+        command = _python_command(script, "-progress")
+        updates = []
+
+        success, _, _ = await run_ffmpeg_command_async(
+            command, progress_callback=updates.append
+        )
+
+        assert success is True
+        assert [u["frame"] for u in updates] == ["10", "20"]
+        assert updates[-1]["progress"] == "end"
+        assert updates[-1]["out_time_seconds"] == 3.0
+
+    async def test_missing_binary(self):
+        """测试命令不存在"""
+        success, _, stderr = await run_ffmpeg_command_async(["definitely-not-ffmpeg-bin"])
+
+        assert success is False
+        assert "异常" in stderr
+
+
+class TestCrossfadeFilters:
+    """crossfade滤镜构建测试"""
+
+    def test_xfade_video_offsets(self):
+        """测试xfade偏移量按累计时长计算"""
+        parts = _build_xfade_video_filters([3.0, 2.0, 4.0], "fade", 0.5)
+
+        assert parts == [
+            "[0:v][1:v]xfade=transition=fade:duration=0.5:offset=2.500[v1out]",
+            "[v1out][2:v]xfade=transition=fade:duration=0.5:offset=4.000[vout]",
+        ]
+
+    def test_xfade_single_input(self):
+        """测试单个输入直接透传"""
+        assert _build_xfade_video_filters([3.0], "fade", 0.5) == ["[0:v]null[vout]"]
+
+    def test_chunked_audio_matches_global_positions(self):
+        """测试分组音频按全局位置裁剪"""
+        # 第一组: 全局第0、1个片段
+        first = _build_crossfade_audio_filters([3.0, 2.0], 0, 4, 0.5)
+        # 最后一组: 全局第2、3个片段
+        last = _build_crossfade_audio_filters([4.0, 2.0], 2, 4, 0.5)
+
+        assert first[0] == "[0:a]atrim=end=2.5,asetpts=PTS-STARTPTS[a0]"
+        assert first[1] == "[1:a]atrim=start=0.5:end=1.5,asetpts=PTS-STARTPTS[a1]"
+        assert last[0] == "[0:a]atrim=start=0.5:end=3.5,asetpts=PTS-STARTPTS[a0]"
+        assert last[1] == "[1:a]atrim=start=0.5,asetpts=PTS-STARTPTS[a1]"
+        assert last[-1] == "[a0][a1]concat=n=2:v=0:a=1[aout]"
+
+
+class TestSmartCrossfade:
+    """smart crossfade分段规划测试"""
+
+    def test_plan_splits_at_keyframes(self):
+        """测试按关键帧切分: 中间部分直接复制, 首尾组成过渡区"""
+        keyframes = [[0.0, 1.0, 2.0], [0.0, 1.0, 2.0, 3.0], [0.0, 1.0]]
+
+        plan = _plan_smart_crossfade([3.0, 4.0, 2.0], keyframes, 0.5)
+
+        assert plan == [
+            ("copy", [(0, 0.0, 2.0)]),
+            ("window", [(0, 2.0, 3.0), (1, 0.0, 1.0)]),
+            ("copy", [(1, 1.0, 3.0)]),
+            ("window", [(1, 3.0, 4.0), (2, 0.0, 1.0)]),
+            ("copy", [(2, 1.0, 2.0)]),
+        ]
+
+    def test_plan_merges_clip_without_keyframes(self):
+        """测试没有可用关键帧的片段整体并入过渡区"""
+        keyframes = [[0.0, 1.0, 2.0], [0.0], [0.0, 1.0, 2.0]]
+
+        plan = _plan_smart_crossfade([3.0, 2.0, 3.0], keyframes, 0.5)
+
+        assert plan == [
+            ("copy", [(0, 0.0, 2.0)]),
+            ("window", [(0, 2.0, 3.0), (1, 0.0, 2.0), (2, 0.0, 1.0)]),
+            ("copy", [(2, 1.0, 3.0)]),
+        ]
+
+    def test_plan_timeline_matches_crossfade(self):
+        """测试分段总时长与crossfade模式一致"""
+        durations = [3.0, 4.0, 2.0, 5.0]
+        keyframes = [[float(t) for t in range(int(d))] for d in durations]
+
+        plan = _plan_smart_crossfade(durations, keyframes, 0.5)
+
+        total = 0.0
+        for kind, parts in plan:
+            total += sum(end - start for _, start, end in parts)
+            if kind == "window":
+                total -= 0.5 * (len(parts) - 1)
+        assert total == pytest.approx(sum(durations) - 0.5 * (len(durations) - 1))
+
+    def test_plan_without_keyframes_has_no_copy(self):
+        """测试完全无法切分时只有一个过渡区"""
+        plan = _plan_smart_crossfade([2.0, 2.0], [[0.0], [0.0]], 0.5)
+
+        assert plan == [("window", [(0, 0.0, 2.0), (1, 0.0, 2.0)])]
+
+    def test_window_command(self):
+        """测试过渡区命令: 输入裁剪、音频补齐与画面/音频分别输出"""
+        command = _build_smart_xfade_window_command(
+            [(0, 2.0, 3.0), (1, 0.0, 1.0)],
+            [Path("a.mp4"), Path("b.mp4")],
+            [3.0, 4.0],
+            Path("w.mp4"),
+            Path("w.wav"),
+            "fade",
+            0.5
+        )
+
+        assert command[2:6] == ["-ss", "2.000000", "-i", "a.mp4"]
+        assert command[6:10] == ["-t", "1.000000", "-i", "b.mp4"]
+        filter_complex = command[command.index("-filter_complex") + 1]
+        assert "xfade=transition=fade:duration=0.5:offset=0.500[vout]" in filter_complex
+        assert "[0:a]apad=whole_dur=1.000000,atrim=duration=1.000000[a0]" in filter_complex
+        assert "[a0][a1]acrossfade=d=0.5[aout]" in filter_complex
+        assert command.index("w.mp4") < command.index("[aout]") < command.index("w.wav")
+
+    def test_window_encoder_matches_sentence_video(self):
+        """测试过渡区使用与句子视频相同的编码器参数, 并带上线程数"""
+        gen_setting = {"video_codec": "libx265"}
+        sentence = build_sentence_video_command("a.png", "a.mp3", "a.mp4", "", gen_setting, duration=2.0)
+        command = _build_smart_xfade_window_command(
+            [(0, 2.0, 3.0), (1, 0.0, 1.0)],
+            [Path("a.mp4"), Path("b.mp4")],
+            [3.0, 4.0],
+            Path("w.mp4"),
+            Path("w.wav"),
+            "fade",
+            0.5,
+            _video_encoder_args(gen_setting, threads=2)
+        )
+
+        encoder = sentence[sentence.index("-c:v"):sentence.index("-c:v") + 12]
+        assert encoder[1] == "libx265"
+        video_args = command[command.index("[vout]") + 1:command.index("w.mp4")]
+        assert video_args == encoder + ["-threads", "2"]
+
+    def test_mismatched_streams_fall_back(self, tmp_path):
+        """测试片段编码参数不一致或过渡区与片段不一致时回退到分层crossfade, 不做 -c copy 拼接"""
+        clips = [tmp_path / "a.mp4", tmp_path / "b.mp4"]
+        keyframes = [(float(t), float(t)) for t in range(4)]
+        h264 = ("h264", "High", 1440, 1080, "yuv420p")
+        hevc = ("hevc", "Main", 1440, 1080, "yuv420p")
+
+        def probe(streams):
+            def fake_probe(path):
+                stream = streams.get(Path(path).name, h264)
+                return {"duration": 4.0, "keyframes": keyframes, "stream": stream}
+            return fake_probe
+
+        with patch("src.utils.ffmpeg_utils._concatenate_with_xfade_tree", return_value=True) as tree, \
+                patch("src.utils.ffmpeg_utils._concatenate_videos_fast") as fast, \
+                patch("src.utils.ffmpeg_utils.run_ffmpeg_command", return_value=(True, "", "")) as run:
+            with patch("src.utils.ffmpeg_utils._probe_video_packets", side_effect=probe({"b.mp4": hevc})):
+                assert _concatenate_with_smart_xfade(clips, tmp_path / "out.mp4", tmp_path / "concat.txt")
+            assert tree.call_count == 1
+            run.assert_not_called()
+
+            with patch("src.utils.ffmpeg_utils._probe_video_packets", side_effect=probe({"window_00001.mp4": hevc})):
+                assert _concatenate_with_smart_xfade(clips, tmp_path / "out.mp4", tmp_path / "concat.txt")
+            assert tree.call_count == 2
+            assert run.called
+            fast.assert_not_called()
+
+    def test_concat_file_directives(self, tmp_path):
+        """测试concat文件写入inpoint/outpoint/duration指令"""
+        concat_path = tmp_path / "concat.txt"
+
+        create_concat_file(
+            [Path("/tmp/a.mp4"), Path("/tmp/b.mp4")],
+            concat_path,
+            [{"inpoint": 1.0, "outpoint": 2.5, "duration": 1.5}, {}]
+        )
+
+        assert concat_path.read_text(encoding="utf-8").splitlines() == [
+            "file '/tmp/a.mp4'",
+            "inpoint 1.000000",
+            "outpoint 2.500000",
+            "duration 1.500000",
+            "file '/tmp/b.mp4'",
+        ]
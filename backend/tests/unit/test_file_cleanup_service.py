@@ -0,0 +1,142 @@
+"""
+孤立文件清理服务单元测试
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.services.file_cleanup_service import FileCleanupService
+
+
+class FakeRedis:
+    """只支持 get/set/delete 的内存Redis替身"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+class FakeStorage:
+    """内存中的存储替身，支持分页列举和批量删除"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.delete_calls = []
+        self.fail_after_pages = None
+
+    async def list_objects_page(self, prefix, max_keys=1000, continuation_token=None):
+        if self.fail_after_pages is not None:
+            if self.fail_after_pages == 0:
+                raise RuntimeError("连接中断")
+            self.fail_after_pages -= 1
+        # 与真实实现一样以上一页最后一个键作为续页位置，删除对象不影响后续分页
+        keys = sorted(
+            key for key in self.objects
+            if key.startswith(prefix) and key > (continuation_token or "")
+        )
+        page = keys[:max_keys]
+        next_token = page[-1] if len(keys) > max_keys else None
+        return {
+            "files": [{"object_key": key, **self.objects[key]} for key in page],
+            "next_token": next_token,
+        }
+
+    async def delete_files(self, object_keys):
+        object_keys = list(object_keys)
+        self.delete_calls.append(len(object_keys))
+        for key in object_keys:
+            self.objects.pop(key)
+        return {"deleted": object_keys, "failed": []}
+
+
+@pytest.fixture
+def objects():
+    old = datetime.now(timezone.utc) - timedelta(days=30)
+    new = datetime.now(timezone.utc)
+    objects = {f"uploads/u1/{i:04d}.png": {"size": 10, "last_modified": old} for i in range(2500)}
+    objects["uploads/u1/new.png"] = {"size": 10, "last_modified": new}
+    return objects
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def service(redis):
+    service = FileCleanupService(AsyncMock())
+    # 偶数编号的文件仍被引用
+    service.get_referenced_keys = AsyncMock(
+        return_value={f"uploads/u1/{i:04d}.png" for i in range(0, 2500, 2)}
+    )
+    with patch("src.services.file_cleanup_service.get_redis", return_value=redis), \
+            patch("src.services.file_cleanup_service.storage_usage") as usage:
+        usage.get = AsyncMock(return_value={"files": 2501, "size": 25010, "file_types": {}})
+        yield service
+
+
+class TestOrphanCleanup:
+    """孤立文件清理测试"""
+
+    async def test_dry_run(self, service, objects):
+        """测试试运行只统计未被引用且足够旧的文件，不删除"""
+        storage = FakeStorage(objects)
+
+        with patch("src.services.file_cleanup_service.get_storage_client", AsyncMock(return_value=storage)):
+            result = await service.cleanup_orphaned_files("u1", dry_run=True)
+
+        assert result["scanned"] == 2501
+        assert result["orphaned"] == 1250
+        assert result["deleted"] == 0
+        assert storage.delete_calls == []
+        assert len(objects) == 2501
+
+    async def test_delete_per_page(self, service, objects, redis):
+        """测试每页孤立文件一次批量删除，完成后清除检查点并上报进度"""
+        storage = FakeStorage(objects)
+        progress = []
+
+        async def on_progress(percent, message):
+            progress.append(percent)
+
+        with patch("src.services.file_cleanup_service.get_storage_client", AsyncMock(return_value=storage)):
+            result = await service.cleanup_orphaned_files("u1", dry_run=False, on_progress=on_progress)
+
+        assert result["deleted"] == 1250
+        assert result["deleted_bytes"] == 12500
+        assert storage.delete_calls == [500, 500, 250]
+        assert "uploads/u1/new.png" in objects
+        assert progress == [39, 79, 99]
+        assert redis.data == {}
+
+    async def test_resume_from_checkpoint(self, service, objects, redis):
+        """测试中断后从检查点继续，不重复扫描已处理的页"""
+        storage = FakeStorage(objects)
+        storage.fail_after_pages = 1
+
+        with patch("src.services.file_cleanup_service.get_storage_client", AsyncMock(return_value=storage)):
+            with pytest.raises(RuntimeError):
+                await service.cleanup_orphaned_files("u1", dry_run=False, resume=True)
+
+            checkpoint = json.loads(redis.data["file_cleanup:u1"])
+            assert checkpoint["scanned"] == 1000
+            assert checkpoint["deleted"] == 500
+
+            storage.fail_after_pages = None
+            result = await service.cleanup_orphaned_files("u1", dry_run=False, resume=True)
+
+        assert result["scanned"] == 2501
+        assert result["deleted"] == 1250
+        assert storage.delete_calls == [500, 500, 250]
@@ -0,0 +1,80 @@
+"""
+进程级HTTP客户端池单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from src.services.provider.factory import ProviderFactory
+from src.utils.http_client import HttpClientPool
+
+
+@pytest.fixture
+def pool():
+    return HttpClientPool()
+
+
+class TestHttpClientPool:
+    """HTTP客户端池测试"""
+
+    async def test_openai_clients_keyed_by_provider_url_and_key(self, pool):
+        """测试相同 (provider, base_url, api_key) 复用客户端，且所有客户端共用一个连接池"""
+        first = pool.get_openai_client("custom", "sk-a", base_url="https://a.example.com/v1")
+        second = pool.get_openai_client("custom", "sk-a", base_url="https://a.example.com/v1")
+        other_key = pool.get_openai_client("custom", "sk-b", base_url="https://a.example.com/v1")
+        other_url = pool.get_openai_client("custom", "sk-a", base_url="https://b.example.com/v1")
+
+        assert first is second
+        assert len({id(first), id(other_key), id(other_url)}) == 3
+        assert first._client is other_key._client is pool.get_httpx_client()
+        assert pool.get_stats() == {"openai_clients": 3, "created": 3, "reused": 1}
+        await pool.aclose()
+
+    async def test_sdk_timeout_not_inherited_from_pool(self, pool):
+        """测试未指定超时时使用SDK默认的600秒读超时，而不是共享连接池的60秒"""
+        default = pool.get_openai_client("openai", "sk-a")
+        explicit = pool.get_openai_client("deepseek", "sk-a", base_url="https://api.deepseek.com", timeout=300.0)
+
+        assert default.timeout.read == 600
+        assert explicit.timeout == 300.0
+        await pool.aclose()
+
+    async def test_factory_reuses_clients(self):
+        """测试每次创建Provider时复用同一个SDK客户端"""
+        first = ProviderFactory.create("siliconflow", "sk-test")
+        second = ProviderFactory.create("siliconflow", "sk-test")
+
+        assert first is not second
+        assert first.client is second.client
+
+    def test_new_event_loop_recreates_clients(self, pool):
+        """测试事件循环变化后重新创建客户端（连接不能跨事件循环使用）"""
+
+        async def get_clients():
+            return pool.get_httpx_client(), pool.get_aiohttp_session()
+
+        httpx_1, session_1 = asyncio.run(get_clients())
+        httpx_2, session_2 = asyncio.run(get_clients())
+
+        assert httpx_1 is not httpx_2
+        assert session_1 is not session_2
+        asyncio.run(pool.aclose())
+
+    async def test_reset_and_close(self, pool):
+        """测试reset丢弃客户端，aclose关闭连接"""
+        client = pool.get_httpx_client()
+        session = pool.get_aiohttp_session()
+
+        pool.reset()
+        assert pool.get_httpx_client() is not client
+
+        await session.close()
+        current = pool.get_httpx_client()
+        current_session = pool.get_aiohttp_session()
+        await pool.aclose()
+
+        assert current.is_closed
+        assert current_session.closed
+        assert pool.get_stats()["openai_clients"] == 0
+        await client.aclose()
@@ -0,0 +1,186 @@
+"""
+LLM响应缓存单元测试
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.core.config import settings
+from src.utils.llm_cache import KEY_PREFIX, INDEX_KEY, LLMCache, RedisLLMCacheBackend, make_cache_key
+
+MESSAGES = [
+    {"role": "system", "content": "只输出JSON。"},
+    {"role": "user", "content": "月光洒在湖面上。"},
+]
+
+
+class MemoryBackend:
+    """字典实现的缓存存储替身"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ttl, max_entries):
+        self.data[key] = value
+        return 0
+
+
+class BrokenBackend:
+    """模拟Redis不可用"""
+
+    async def get(self, key):
+        raise RedisConnectionError("connection refused")
+
+    async def set(self, key, value, ttl, max_entries):
+        raise RedisConnectionError("connection refused")
+
+
+def make_provider(*contents):
+    responses = [
+        SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        for content in contents
+    ]
+    return SimpleNamespace(completions=AsyncMock(side_effect=responses))
+
+
+class TestCacheKey:
+    """缓存键测试"""
+
+    def test_key_covers_request_parameters(self):
+        """测试provider、模型、消息和参数任一变化时缓存键不同"""
+        base = make_cache_key("deepseek", "deepseek-chat", MESSAGES, response_format={"type": "json_object"})
+
+        assert base == make_cache_key("deepseek", "deepseek-chat", MESSAGES, response_format={"type": "json_object"})
+        assert base != make_cache_key("openai", "deepseek-chat", MESSAGES, response_format={"type": "json_object"})
+        assert base != make_cache_key("deepseek", "deepseek-reasoner", MESSAGES, response_format={"type": "json_object"})
+        assert base != make_cache_key("deepseek", "deepseek-chat", MESSAGES[:1], response_format={"type": "json_object"})
+        assert base != make_cache_key("deepseek", "deepseek-chat", MESSAGES)
+        assert base != make_cache_key(
+            "deepseek", "deepseek-chat", MESSAGES, response_format={"type": "json_object"}, temperature=0.2
+        )
+
+    def test_key_covers_base_url(self):
+        """测试不同API地址的同名模型不共用缓存"""
+        first = make_cache_key("custom", "gpt-4o", MESSAGES, base_url="https://a.example.com/v1")
+        second = make_cache_key("custom", "gpt-4o", MESSAGES, base_url="https://b.example.com/v1")
+
+        assert first != second
+        assert make_cache_key("custom", "gpt-4o", MESSAGES) == make_cache_key("custom", "gpt-4o", MESSAGES, base_url=None)
+
+
+class TestLLMCache:
+    """缓存命中与写入规则测试"""
+
+    async def test_repeated_request_hits_cache(self):
+        """测试相同请求第二次直接返回缓存内容，不再调用API"""
+        cache = LLMCache(backend=MemoryBackend())
+        provider = make_provider('{"scenes": []}')
+
+        first = await cache.completions(provider, "deepseek", "deepseek-chat", MESSAGES, response_format={"type": "json_object"})
+        second = await cache.completions(provider, "deepseek", "deepseek-chat", MESSAGES, response_format={"type": "json_object"})
+
+        assert provider.completions.await_count == 1
+        assert second.choices[0].message.content == first.choices[0].message.content
+        assert second.cached
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["stores"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+    async def test_refresh_skips_read_and_overwrites(self):
+        """测试重新生成时不读取缓存，新结果覆盖旧条目，之后的请求命中新结果"""
+        backend = MemoryBackend()
+        cache = LLMCache(backend=backend)
+        provider = make_provider("first", "second")
+
+        await cache.completions(provider, "deepseek", None, MESSAGES)
+        refreshed = await cache.completions(provider, "deepseek", None, MESSAGES, use_cache=False)
+        cached = await cache.completions(provider, "deepseek", None, MESSAGES)
+
+        assert provider.completions.await_count == 2
+        assert refreshed.choices[0].message.content == "second"
+        assert cached.choices[0].message.content == "second"
+        assert "use_cache" not in provider.completions.await_args.kwargs
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["refreshes"]) == (1, 1, 1)
+
+    async def test_store_then_lookup(self):
+        """测试单独写入的条目可以被查找和 completions 命中"""
+        cache = LLMCache(backend=MemoryBackend())
+        provider = make_provider()
+
+        assert await cache.lookup("deepseek", None, MESSAGES) is None
+        await cache.store("deepseek", None, MESSAGES, "from batch")
+
+        assert await cache.lookup("deepseek", None, MESSAGES) == "from batch"
+        response = await cache.completions(provider, "deepseek", None, MESSAGES)
+        assert response.choices[0].message.content == "from batch"
+        provider.completions.assert_not_awaited()
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["stores"]) == (2, 1, 1)
+
+    async def test_invalid_or_oversized_results_not_cached(self):
+        """测试无法解析的JSON结果和超过大小上限的结果不缓存，代码块包裹的JSON可以缓存"""
+        backend = MemoryBackend()
+        cache = LLMCache(backend=backend)
+        json_format = {"response_format": {"type": "json_object"}}
+
+        await cache.completions(make_provider("not json"), "deepseek", None, MESSAGES, **json_format)
+        assert backend.data == {}
+
+        await cache.completions(make_provider('```json\n{"shots": []}\n```'), "deepseek", None, MESSAGES, **json_format)
+        assert len(backend.data) == 1
+
+        with patch.object(settings, "LLM_CACHE_MAX_VALUE_BYTES", 10):
+            await cache.completions(make_provider("a" * 11), "deepseek", None, MESSAGES)
+        assert len(backend.data) == 1
+        assert cache.get_stats()["skipped"] == 2
+
+    async def test_disabled_bypasses_cache(self):
+        """测试关闭缓存后每次都调用API"""
+        cache = LLMCache(backend=MemoryBackend())
+        provider = make_provider("a", "b")
+
+        with patch.object(settings, "LLM_CACHE_ENABLED", False):
+            await cache.completions(provider, "deepseek", None, MESSAGES)
+            await cache.completions(provider, "deepseek", None, MESSAGES)
+
+        assert provider.completions.await_count == 2
+        assert cache.get_stats()["hits"] + cache.get_stats()["misses"] == 0
+
+    async def test_backend_error_falls_back_to_api(self):
+        """测试Redis不可用时直接调用API"""
+        cache = LLMCache(backend=BrokenBackend())
+        provider = make_provider("prompt")
+
+        response = await cache.completions(provider, "deepseek", None, MESSAGES)
+
+        assert response.choices[0].message.content == "prompt"
+        assert cache.get_stats()["errors"] == 2
+
+
+class TestRedisBackend:
+    """Redis存储测试"""
+
+    async def test_set_evicts_oldest_entries(self):
+        """测试写入时设置有效期，超过条目上限时淘汰最早写入的条目"""
+        pipe = MagicMock()
+        pipe.__aenter__ = AsyncMock(return_value=pipe)
+        pipe.__aexit__ = AsyncMock(return_value=False)
+        pipe.execute = AsyncMock(return_value=[True, 1, 0, 5])
+        client = MagicMock()
+        client.pipeline.return_value = pipe
+        client.zpopmin = AsyncMock(return_value=[("old1", 1.0), ("old2", 2.0)])
+        client.delete = AsyncMock()
+        backend = RedisLLMCacheBackend(redis_factory=lambda: client)
+
+        evicted = await backend.set("new", json.dumps({"a": 1}), ttl=60, max_entries=3)
+
+        assert evicted == 2
+        pipe.set.assert_called_once_with(KEY_PREFIX + "new", '{"a": 1}', ex=60)
+        client.zpopmin.assert_awaited_once_with(INDEX_KEY, 2)
+        client.delete.assert_awaited_once_with(KEY_PREFIX + "old1", KEY_PREFIX + "old2")
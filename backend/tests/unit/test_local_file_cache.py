@@ -0,0 +1,92 @@
+"""
+节点本地文件缓存单元测试
+"""
+
+import os
+import time
+from unittest.mock import patch
+
+from src.utils.local_file_cache import LocalFileCache, _reflink
+
+
+def _downloader(content: bytes, calls: list):
+    """构造记录调用次数的下载函数"""
+    async def download(dest_path):
+        calls.append(dest_path)
+        dest_path.write_bytes(content)
+    return download
+
+
+class TestLocalFileCache:
+    """本地文件缓存测试"""
+
+    async def test_miss_then_hit(self, tmp_path):
+        """测试未命中时下载并写入缓存，再次获取时不再下载"""
+        cache = LocalFileCache(str(tmp_path / "cache"), max_bytes=1024)
+        calls = []
+        download = _downloader(b"clip", calls)
+
+        first = await cache.fetch("render_cache/a.mp4", tmp_path / "job1" / "a.mp4", download)
+        second = await cache.fetch("render_cache/a.mp4", tmp_path / "job2" / "a.mp4", download)
+
+        assert first is False
+        assert second is True
+        assert len(calls) == 1
+        assert (tmp_path / "job2" / "a.mp4").read_bytes() == b"clip"
+        assert cache.get_stats()["hits"] == 1
+
+    async def test_cached_file_survives_job_cleanup(self, tmp_path):
+        """测试删除任务临时文件后缓存仍然可用"""
+        cache = LocalFileCache(str(tmp_path / "cache"), max_bytes=1024)
+        calls = []
+        download = _downloader(b"clip", calls)
+        job_path = tmp_path / "job1" / "a.mp4"
+
+        await cache.fetch("render_cache/a.mp4", job_path, download)
+        os.remove(job_path)
+
+        assert await cache.fetch("render_cache/a.mp4", tmp_path / "job2" / "a.mp4", download) is True
+
+    async def test_without_fcntl(self, tmp_path):
+        """测试没有 fcntl 的平台（Windows）跳过reflink，仍可通过链接或复制命中缓存"""
+        cache = LocalFileCache(str(tmp_path / "cache"), max_bytes=1024)
+        calls = []
+        download = _downloader(b"clip", calls)
+
+        with patch("src.utils.local_file_cache.fcntl", None):
+            assert _reflink(tmp_path / "missing", tmp_path / "dest") is False
+            await cache.fetch("render_cache/a.mp4", tmp_path / "job1" / "a.mp4", download)
+            assert await cache.fetch("render_cache/a.mp4", tmp_path / "job2" / "a.mp4", download) is True
+
+        assert len(calls) == 1
+        assert (tmp_path / "job2" / "a.mp4").read_bytes() == b"clip"
+
+    async def test_disabled(self, tmp_path):
+        """测试未配置目录时每次都下载"""
+        cache = LocalFileCache(None, max_bytes=1024)
+        calls = []
+        download = _downloader(b"clip", calls)
+
+        await cache.fetch("render_cache/a.mp4", tmp_path / "a.mp4", download)
+        await cache.fetch("render_cache/a.mp4", tmp_path / "b.mp4", download)
+
+        assert cache.enabled is False
+        assert len(calls) == 2
+
+    async def test_evicts_least_recently_used(self, tmp_path):
+        """测试超过上限时淘汰最久未访问的文件"""
+        cache = LocalFileCache(str(tmp_path / "cache"), max_bytes=250)
+        download = _downloader(b"x" * 100, [])
+
+        await cache.fetch("a.mp4", tmp_path / "job" / "a.mp4", download)
+        await cache.fetch("b.mp4", tmp_path / "job" / "b.mp4", download)
+        # 让a比b更旧
+        past = time.time() - 3600
+        os.utime(cache._path("a.mp4"), (past, past))
+
+        await cache.fetch("c.mp4", tmp_path / "job" / "c.mp4", download)
+
+        assert not cache._path("a.mp4").exists()
+        assert cache._path("b.mp4").exists()
+        assert cache._path("c.mp4").exists()
+        assert cache.get_stats()["evicted_files"] == 1
@@ -0,0 +1,107 @@
+"""
+素材服务单元测试
+"""
+
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.services.material_service import MaterialService
+from src.utils.local_file_cache import LocalFileCache
+
+
+class FakeStorage:
+    """内存中的MinIO替身，记录下载次数"""
+
+    def __init__(self):
+        self.objects = {}
+        self.downloads = 0
+        self.overwrite_before_download = None
+        self.download_args = []
+
+    async def stat_file(self, object_key):
+        obj = self.objects.get(object_key)
+        return {"object_key": object_key, "size": len(obj["content"]), "etag": obj["etag"]} if obj else None
+
+    async def download_file_to_path(self, object_key, file_path, size=None, etag=None):
+        self.downloads += 1
+        self.download_args.append((size, etag))
+        if self.overwrite_before_download:
+            self.objects[object_key] = self.overwrite_before_download
+            self.overwrite_before_download = None
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(file_path).write_bytes(self.objects[object_key]["content"])
+        return self.objects[object_key]["etag"].strip('"')
+
+
+@pytest.fixture
+def storage():
+    storage = FakeStorage()
+    storage.objects["uploads/a.mp3"] = {"content": b"audio-v1", "etag": '"e1"'}
+    return storage
+
+
+@pytest.fixture
+def service(storage):
+    service = MaterialService()
+    service.storage_client = storage
+    return service
+
+
+class TestMaterialLocalCache:
+    """素材本地缓存测试"""
+
+    async def test_reuse_across_tasks(self, service, storage, tmp_path):
+        """测试不同任务目录获取同一素材只下载一次"""
+        cache = LocalFileCache(str(tmp_path / "cache"), max_bytes=1024)
+
+        with patch("src.services.material_service.local_material_cache", cache):
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "render" / "a.mp3")
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "export" / "a.mp3")
+
+        assert storage.downloads == 1
+        assert (tmp_path / "export" / "a.mp3").read_bytes() == b"audio-v1"
+        # 查找缓存时已获取的大小和ETag传给下载，不再重复请求元信息
+        assert storage.download_args == [(8, '"e1"')]
+
+    async def test_overwritten_object_downloaded_again(self, service, storage, tmp_path):
+        """测试对象被覆盖（ETag变化）后重新下载"""
+        cache = LocalFileCache(str(tmp_path / "cache"), max_bytes=1024)
+
+        with patch("src.services.material_service.local_material_cache", cache):
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "job1" / "a.mp3")
+            storage.objects["uploads/a.mp3"] = {"content": b"audio-v2", "etag": '"e2"'}
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "job2" / "a.mp3")
+
+        assert storage.downloads == 2
+        assert (tmp_path / "job2" / "a.mp3").read_bytes() == b"audio-v2"
+
+    async def test_overwrite_during_download_keyed_by_downloaded_etag(self, service, storage, tmp_path):
+        """测试查找缓存后、下载前对象被覆盖时，新内容按下载响应的ETag缓存"""
+        cache = LocalFileCache(str(tmp_path / "cache"), max_bytes=1024)
+        storage.overwrite_before_download = {"content": b"audio-v2", "etag": '"e2"'}
+
+        with patch("src.services.material_service.local_material_cache", cache):
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "job1" / "a.mp3")
+            assert (tmp_path / "job1" / "a.mp3").read_bytes() == b"audio-v2"
+
+            # 旧ETag下没有缓存新内容
+            storage.objects["uploads/a.mp3"] = {"content": b"audio-v1", "etag": '"e1"'}
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "job2" / "a.mp3")
+            assert (tmp_path / "job2" / "a.mp3").read_bytes() == b"audio-v1"
+
+            # 新ETag下的缓存可以命中
+            storage.objects["uploads/a.mp3"] = {"content": b"audio-v2", "etag": '"e2"'}
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "job3" / "a.mp3")
+
+        assert storage.downloads == 2
+        assert (tmp_path / "job3" / "a.mp3").read_bytes() == b"audio-v2"
+
+    async def test_disabled(self, service, storage, tmp_path):
+        """测试未启用本地缓存时直接下载"""
+        with patch("src.services.material_service.local_material_cache", LocalFileCache(None, 0)):
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "job1" / "a.mp3")
+            await service.fetch_material_from_minio("uploads/a.mp3", tmp_path / "job2" / "a.mp3")
+
+        assert storage.downloads == 2
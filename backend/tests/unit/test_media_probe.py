@@ -0,0 +1,222 @@
+"""
+媒体探测工具单元测试
+"""
+
+import io
+import os
+import struct
+import wave
+from unittest.mock import patch
+
+import pytest
+
+from src.utils.ffmpeg_utils import get_audio_duration, get_audio_duration_async, get_video_fps
+from src.utils.media_probe import (
+    MediaProbeCache,
+    probe_audio_duration,
+    probe_file,
+    probe_mp3_duration,
+    probe_wav_duration,
+)
+
+
+def _mp3_frames(count: int, padding: bool = False) -> bytes:
+    """生成 MPEG1 Layer III、128kbps、44.1kHz、立体声的帧（帧体为零）"""
+    header = bytes([0xFF, 0xFB, 0x92 if padding else 0x90, 0x00])
+    frame_length = 144 * 128000 // 44100 + (1 if padding else 0)
+    return (header + b"\x00" * (frame_length - 4)) * count
+
+
+def _xing_frame(frame_count: int) -> bytes:
+    """生成带 Xing 头的首帧"""
+    frame = bytearray(_mp3_frames(1))
+    frame[36:48] = b"Xing" + struct.pack(">II", 0x01, frame_count)
+    return bytes(frame)
+
+
+def _adts_frames(count: int) -> bytes:
+    """生成 AAC-LC、44.1kHz、双声道的ADTS帧（帧体为零）"""
+    frame_length = 200
+    header = bytes([
+        0xFF, 0xF1,
+        (1 << 6) | (4 << 2),
+        (2 << 6) | (frame_length >> 11),
+        (frame_length >> 3) & 0xFF,
+        ((frame_length & 0x07) << 5) | 0x1F,
+        0xFC,
+    ])
+    return (header + b"\x00" * (frame_length - 7)) * count
+
+
+def _box(box_type: bytes, *payload: bytes) -> bytes:
+    """生成MP4 box"""
+    body = b"".join(payload)
+    return struct.pack(">I4s", len(body) + 8, box_type) + body
+
+
+def _full_box(box_type: bytes, *payload: bytes) -> bytes:
+    """生成带版本和标志的MP4 box"""
+    return _box(box_type, b"\x00\x00\x00\x00", *payload)
+
+
+def _trak(handler: bytes, timescale: int, duration: int, sample_entry: bytes, stts=()) -> bytes:
+    """生成只包含探测所需字段的trak"""
+    stts_box = _full_box(b"stts", struct.pack(">I", len(stts)), *[struct.pack(">II", *e) for e in stts])
+    stbl = _box(b"stbl", _full_box(b"stsd", struct.pack(">I", 1), sample_entry), stts_box)
+    return _box(
+        b"trak",
+        _box(
+            b"mdia",
+            _full_box(b"mdhd", struct.pack(">IIII", 0, 0, timescale, duration), b"\x00" * 4),
+            _full_box(b"hdlr", b"\x00" * 4, handler, b"\x00" * 12),
+            _box(b"minf", stbl),
+        ),
+    )
+
+
+def _mp4(duration_seconds: float = 10.0) -> bytes:
+    """生成 moov 位于文件末尾的MP4（30000/1001fps 1280x720 视频 + 48kHz 双声道音频）"""
+    video_entry = _box(b"avc1", b"\x00" * 6, struct.pack(">H", 1), b"\x00" * 16, struct.pack(">HH", 1280, 720))
+    audio_entry = _box(
+        b"mp4a", b"\x00" * 6, struct.pack(">H", 1), b"\x00" * 8,
+        struct.pack(">HHHH", 2, 16, 0, 0), struct.pack(">I", 48000 << 16)
+    )
+    moov = _box(
+        b"moov",
+        _full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, int(duration_seconds * 1000)), b"\x00" * 80),
+        _trak(b"vide", 30000, int(duration_seconds * 30000), video_entry, stts=[(299, 1001), (1, 500)]),
+        _trak(b"soun", 48000, int(duration_seconds * 48000), audio_entry),
+    )
+    return _box(b"ftyp", b"isom\x00\x00\x02\x00") + _box(b"mdat", os.urandom(4096)) + moov
+
+
+def _id3v2(size: int) -> bytes:
+    """生成指定大小的ID3v2标签"""
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + syncsafe + b"\x00" * size
+
+
+class TestProbeAudioDuration:
+    """音频时长解析测试"""
+
+    def test_wav(self):
+        """测试WAV按data块长度计算时长"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(24000)
+            wav.writeframes(b"\x00\x00" * 36000)
+
+        assert probe_wav_duration(buffer.getvalue()) == pytest.approx(1.5)
+        assert probe_audio_duration(buffer.getvalue()) == pytest.approx(1.5)
+
+    def test_streaming_wav(self):
+        """测试流式WAV的data块长度为0xFFFFFFFF时按实际数据计算"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes(b"\x00\x00" * 16000)
+        data = bytearray(buffer.getvalue())
+        data[40:44] = b"\xff\xff\xff\xff"
+
+        assert probe_wav_duration(bytes(data)) == pytest.approx(1.0)
+
+    def test_cbr_mp3_with_id3(self):
+        """测试跳过ID3v2标签后逐帧累加时长，末尾的ID3v1标签不计入"""
+        data = _id3v2(300) + _mp3_frames(200) + _mp3_frames(10, padding=True) + b"TAG" + b"\x00" * 125
+
+        assert probe_mp3_duration(data) == pytest.approx(210 * 1152 / 44100)
+
+    def test_xing_mp3(self):
+        """测试读取Xing头中的总帧数"""
+        data = _xing_frame(1000) + _mp3_frames(5)
+
+        assert probe_mp3_duration(data) == pytest.approx(1000 * 1152 / 44100)
+
+    def test_adts(self):
+        """测试AAC ADTS逐帧累加时长"""
+        assert probe_audio_duration(_adts_frames(430)) == pytest.approx(430 * 1024 / 44100)
+
+    def test_unknown_format(self):
+        """测试无法识别的数据返回None"""
+        assert probe_audio_duration(b"OggS" + b"\x00" * 1000) is None
+        assert probe_audio_duration(b"") is None
+
+
+class TestProbeMediaFile:
+    """媒体文件探测测试"""
+
+    def test_mp4(self, tmp_path):
+        """测试MP4跳过mdat读取moov中的时长、帧率和流信息"""
+        path = tmp_path / "clip.mp4"
+        path.write_bytes(_mp4(10.0))
+
+        info = probe_file(str(path))
+
+        assert info.format_name == "mp4"
+        assert info.duration == pytest.approx(10.0)
+        assert (info.video_codec, info.width, info.height) == ("avc1", 1280, 720)
+        assert info.fps == pytest.approx(30000 / 1001)
+        assert (info.audio_codec, info.sample_rate, info.channels) == ("mp4a", 48000, 2)
+
+    def test_unknown_file(self, tmp_path):
+        """测试无法识别的文件各字段为None"""
+        path = tmp_path / "a.ogg"
+        path.write_bytes(b"OggS" + b"\x00" * 100)
+
+        info = probe_file(str(path))
+
+        assert info.format_name is None
+        assert info.duration is None
+
+    def test_cache_by_path_and_mtime(self, tmp_path):
+        """测试同一文件只解析一次，文件被改写后重新解析"""
+        cache = MediaProbeCache()
+        path = tmp_path / "a.mp3"
+        path.write_bytes(_mp3_frames(100))
+
+        first = cache.get(str(path))
+        second = cache.get(str(path))
+        path.write_bytes(_mp3_frames(200))
+        os.utime(path, ns=(0, 10 ** 9))
+        third = cache.get(str(path))
+
+        assert first is second
+        assert third.duration == pytest.approx(200 * 1152 / 44100)
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 2
+
+
+class TestFFmpegUtilsProbe:
+    """FFmpeg工具函数优先使用进程内探测"""
+
+    async def test_no_ffprobe_for_supported_formats(self, tmp_path):
+        """测试支持的格式不启动ffprobe进程"""
+        video = tmp_path / "clip.mp4"
+        video.write_bytes(_mp4(4.0))
+        audio = tmp_path / "a.mp3"
+        audio.write_bytes(_mp3_frames(50))
+
+        with patch("src.utils.ffmpeg_utils.subprocess.run", side_effect=AssertionError("不应调用ffprobe")), \
+                patch("src.utils.ffmpeg_utils._run_process_async", side_effect=AssertionError("不应调用ffprobe")):
+            assert get_audio_duration(str(video)) == pytest.approx(4.0)
+            assert get_video_fps(str(video)) == pytest.approx(30000 / 1001)
+            assert await get_audio_duration_async(str(audio)) == pytest.approx(50 * 1152 / 44100)
+
+    def test_ffprobe_fallback_memoized(self, tmp_path):
+        """测试无法识别的格式回退到ffprobe，结果随探测缓存复用"""
+        path = tmp_path / "a.ogg"
+        path.write_bytes(b"OggS" + b"\x00" * 100)
+
+        with patch("src.utils.ffmpeg_utils._ffprobe_duration", return_value=3.5) as ffprobe:
+            assert get_audio_duration(str(path)) == 3.5
+            assert get_audio_duration(str(path)) == 3.5
+
+        assert ffprobe.call_count == 1
+
+    def test_missing_file(self, tmp_path):
+        """测试文件不存在时返回None"""
+        assert get_audio_duration(str(tmp_path / "missing.mp3")) is None
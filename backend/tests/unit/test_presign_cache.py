@@ -0,0 +1,90 @@
+"""
+预签名URL缓存单元测试
+"""
+
+import time
+from datetime import timedelta
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from src.utils.presign_cache import PresignedUrlCache
+from src.utils.storage import MinIOStorage
+
+
+class TestPresignedUrlCache:
+    """预签名URL缓存测试"""
+
+    def test_reuse_within_window(self):
+        """测试同一窗口内相同对象键和有效期只签名一次，有效期额外加上窗口长度"""
+        cache = PresignedUrlCache(window_seconds=300)
+        calls = []
+
+        def sign(object_key, expires, request_date):
+            calls.append((object_key, expires, request_date))
+            return f"url-{object_key}-{len(calls)}"
+
+        first = cache.get_or_sign("a.png", timedelta(hours=1), sign)
+        second = cache.get_or_sign("a.png", timedelta(hours=1), sign)
+        cache.get_or_sign("a.png", timedelta(hours=24), sign)
+
+        assert first == second
+        assert len(calls) == 2
+        assert calls[0][1] == timedelta(hours=1, minutes=5)
+        assert calls[0][2].timestamp() % 300 == 0
+        assert cache.get_stats()["hits"] == 1
+
+    def test_new_window_resigns(self):
+        """测试窗口切换后重新签名"""
+        cache = PresignedUrlCache(window_seconds=300)
+        calls = []
+
+        def sign(object_key, expires, request_date):
+            calls.append(request_date)
+            return f"url-{len(calls)}"
+
+        with patch("src.utils.presign_cache.time.time", return_value=1_000_000):
+            cache.get_or_sign("a.png", timedelta(hours=1), sign)
+        with patch("src.utils.presign_cache.time.time", return_value=1_000_300):
+            cache.get_or_sign("a.png", timedelta(hours=1), sign)
+
+        assert len(calls) == 2
+        assert cache.get_stats()["entries"] == 1
+
+    def test_max_entries(self):
+        """测试超过上限时淘汰最久未使用的URL"""
+        cache = PresignedUrlCache(max_entries=2)
+        sign = lambda object_key, expires, request_date: object_key
+
+        for key in ["a", "b", "a", "c"]:
+            cache.get_or_sign(key, timedelta(hours=1), sign)
+
+        assert cache.get_stats()["entries"] == 2
+        assert cache.get_stats()["hits"] == 1
+
+
+class TestStorageSigning:
+    """存储客户端签名测试（使用真实SDK，本地签名不访问网络）"""
+
+    def test_signed_url_valid_for_requested_duration(self):
+        """测试复用的URL从当前时刻起仍至少有效请求的时长"""
+        storage = MinIOStorage()
+
+        url = storage.get_presigned_url("users/u1/a.png", timedelta(hours=1))
+        query = parse_qs(urlparse(url).query)
+
+        assert int(query["X-Amz-Expires"][0]) == 3600 + storage._url_cache.window_seconds
+        assert storage.get_presigned_url("users/u1/a.png", timedelta(hours=1)) == url
+
+    def test_sign_many(self):
+        """测试批量签名跳过空值并保留完整URL，大列表每个URL只需微秒级"""
+        storage = MinIOStorage()
+        keys = [f"users/u1/{i}.png" for i in range(500)]
+        storage.sign_many(keys)
+
+        started = time.perf_counter()
+        urls = storage.sign_many(keys + [None, "", "https://cdn.example.com/x.png"])
+        elapsed = time.perf_counter() - started
+
+        assert len(urls) == 501
+        assert urls["https://cdn.example.com/x.png"] == "https://cdn.example.com/x.png"
+        assert elapsed / 500 < 1e-4
@@ -0,0 +1,203 @@
+"""
+提示词批量生成单元测试
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.core.config import settings
+from src.services.prompt import (
+    PromptService,
+    estimate_tokens,
+    pack_sentences,
+    parse_batch_results,
+)
+from src.utils.llm_cache import LLMCache
+
+
+def make_sentence(index, content=None):
+    return SimpleNamespace(id=f"s{index}", content=content or f"第{index}句，月光洒在湖面上。")
+
+
+def make_response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class MemoryBackend:
+    """字典实现的LLM缓存存储替身"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ttl, max_entries):
+        self.data[key] = value
+        return 0
+
+
+class FakeProvider:
+    """按请求内容返回结果的Provider替身"""
+
+    def __init__(self, drop_ids=(), malformed=False):
+        self.drop_ids = set(drop_ids)
+        self.malformed = malformed
+        self.batch_calls = []
+        self.single_calls = []
+
+    async def completions(self, model, messages, **kwargs):
+        if kwargs.get("response_format"):
+            items = json.loads(messages[1]["content"])["items"]
+            self.batch_calls.append([item["id"] for item in items])
+            if self.malformed:
+                return make_response("not json")
+            results = [
+                {"id": item["id"], "prompt": f"prompt for {item['text']}"}
+                for item in items if item["id"] not in self.drop_ids
+            ]
+            return make_response("```json\n" + json.dumps({"results": results}, ensure_ascii=False) + "\n```")
+        self.single_calls.append(messages[1]["content"])
+        return make_response(f" single prompt for {messages[1]['content']} ")
+
+
+@pytest.fixture(autouse=True)
+def disable_llm_cache():
+    """批量逻辑测试不经过LLM缓存"""
+    with patch.object(settings, "LLM_CACHE_ENABLED", False):
+        yield
+
+
+@pytest.fixture
+def service():
+    return PromptService(AsyncMock())
+
+
+@pytest.fixture
+def api_key():
+    return SimpleNamespace(provider="deepseek", base_url=None)
+
+
+class TestBatchPacking:
+    """批次打包与结果解析测试"""
+
+    def test_estimate_tokens(self):
+        """测试中文按字计数，英文约4字符1个token"""
+        assert estimate_tokens("月光洒在湖面") == 6
+        assert estimate_tokens("moonlight") == 3
+
+    def test_pack_by_budget_and_max_items(self):
+        """测试按token预算和句子数上限顺序分批，超长句子单独成批"""
+        sentences = [make_sentence(i, "字" * 10) for i in range(5)]
+        sentences.insert(2, make_sentence(99, "字" * 500))
+
+        batches = pack_sentences(sentences, token_budget=100, max_items=2, output_tokens_per_item=20)
+
+        assert [[s.id for s in batch] for batch in batches] == [
+            ["s0", "s1"], ["s99"], ["s2", "s3"], ["s4"]
+        ]
+
+    def test_parse_batch_results(self):
+        """测试解析代码块包裹的结果，忽略空提示词和无id条目"""
+        content = '```json\n{"results": [{"id": 1, "prompt": " a cat "}, {"id": "2", "prompt": ""}, {"prompt": "x"}]}\n```'
+
+        assert parse_batch_results(content) == {"1": "a cat"}
+        with pytest.raises(ValueError):
+            parse_batch_results("not json")
+
+
+class TestBatchedGeneration:
+    """批量请求与逐句兜底测试"""
+
+    async def test_batches_map_results_by_id(self, service, api_key):
+        """测试多个句子合并为少量请求，结果按id映射回原句子"""
+        sentences = [make_sentence(i) for i in range(5)]
+        provider = FakeProvider()
+
+        with patch.object(settings, "PROMPT_BATCH_MAX_ITEMS", 2):
+            results = await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+
+        assert len(provider.batch_calls) == 3
+        assert provider.single_calls == []
+        assert sorted(results, key=lambda r: r[0].id) == [
+            (sentence, f"prompt for {sentence.content}") for sentence in sentences
+        ]
+
+    async def test_missing_items_fall_back_to_single_calls(self, service, api_key):
+        """测试批量结果缺失的句子逐句重新生成"""
+        sentences = [make_sentence(i) for i in range(3)]
+        provider = FakeProvider(drop_ids={"2"})
+
+        results = await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+
+        assert provider.single_calls == [sentences[1].content]
+        assert dict((s.id, p) for s, p in results)["s1"] == f"single prompt for {sentences[1].content}"
+        assert len(results) == 3
+
+    async def test_unparseable_batch_falls_back(self, service, api_key):
+        """测试整批结果无法解析时全部改为逐句处理"""
+        sentences = [make_sentence(i) for i in range(3)]
+        provider = FakeProvider(malformed=True)
+
+        results = await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+
+        assert len(provider.batch_calls) == 1
+        assert len(provider.single_calls) == 3
+        assert all(prompt.startswith("single prompt") for _, prompt in results)
+
+    async def test_batch_disabled(self, service, api_key):
+        """测试关闭批量模式时每个句子单独请求"""
+        sentences = [make_sentence(i) for i in range(3)]
+        provider = FakeProvider()
+
+        with patch.object(settings, "PROMPT_BATCH_ENABLED", False):
+            await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+
+        assert provider.batch_calls == []
+        assert len(provider.single_calls) == 3
+
+    async def test_regeneration_bypasses_cache(self, service, api_key):
+        """测试相同句子再次生成命中缓存，重新生成时重新调用LLM"""
+        sentences = [make_sentence(i) for i in range(3)]
+        provider = FakeProvider()
+        cache = LLMCache(backend=MemoryBackend())
+
+        with patch.object(settings, "LLM_CACHE_ENABLED", True), patch("src.services.prompt.llm_cache", cache):
+            await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+            await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+            assert len(provider.batch_calls) == 1
+
+            await service._run_prompt_requests(sentences, api_key, provider, "system", None, use_cache=False)
+            assert len(provider.batch_calls) == 2
+
+    async def test_only_changed_sentences_are_batched(self, service, api_key):
+        """测试批量结果按句子缓存，修改一个句子后只有该句子重新请求"""
+        sentences = [make_sentence(i) for i in range(5)]
+        provider = FakeProvider()
+        cache = LLMCache(backend=MemoryBackend())
+
+        with patch.object(settings, "LLM_CACHE_ENABLED", True), patch("src.services.prompt.llm_cache", cache):
+            await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+            sentences[2].content = "修改后的句子。"
+            results = await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+
+        assert provider.batch_calls == [["1", "2", "3", "4", "5"], ["1"]]
+        assert dict((s.id, p) for s, p in results)["s2"] == "prompt for 修改后的句子。"
+        assert len(results) == 5
+
+    async def test_dropped_items_cached_after_single_call(self, service, api_key):
+        """测试批量结果缺失的句子逐句生成后同样写入缓存，再次生成不再请求"""
+        sentences = [make_sentence(i) for i in range(3)]
+        provider = FakeProvider(drop_ids={"2"})
+        cache = LLMCache(backend=MemoryBackend())
+
+        with patch.object(settings, "LLM_CACHE_ENABLED", True), patch("src.services.prompt.llm_cache", cache):
+            await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+            results = await service._run_prompt_requests(sentences, api_key, provider, "system", None)
+
+        assert len(provider.batch_calls) == 1
+        assert provider.single_calls == [sentences[1].content]
+        assert dict((s.id, p) for s, p in results)["s1"] == f"single prompt for {sentences[1].content}"
@@ -0,0 +1,188 @@
+"""
+第三方API自适应限流单元测试
+"""
+
+import asyncio
+import time
+from email.utils import formatdate
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from src.utils.distributed_rate_limiter import DistributedRateLimiter, LocalRateLimitBackend
+from src.utils.rate_limiter import (
+    AdaptiveLimiter,
+    ProviderRateLimiter,
+    is_throttle_error,
+    observe_response,
+    parse_retry_after,
+    retry_with_backoff,
+)
+
+
+@pytest.fixture(autouse=True)
+def local_distributed_limiter():
+    """分布式限流使用进程内实现，测试不依赖Redis"""
+    limiter = DistributedRateLimiter(backend=LocalRateLimitBackend())
+    with patch("src.utils.rate_limiter.distributed_rate_limiter", limiter):
+        yield limiter
+
+
+def make_rate_limit_error(headers=None):
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+class TestRetryAfterParsing:
+    """限流响应头解析测试"""
+
+    def test_retry_after_formats(self):
+        """测试秒数、毫秒和HTTP日期格式的Retry-After"""
+        assert parse_retry_after(httpx.Headers({"Retry-After": "3"})) == 3.0
+        assert parse_retry_after(httpx.Headers({"retry-after-ms": "250"})) == 0.25
+        delay = parse_retry_after(httpx.Headers({"Retry-After": formatdate(time.time() + 30, usegmt=True)}))
+        assert 25 < delay <= 30
+        assert parse_retry_after(httpx.Headers({})) is None
+
+    def test_exhausted_quota_headers(self):
+        """测试剩余配额为0时按重置时长等待，仍有配额时不等待"""
+        headers = httpx.Headers({
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "1m30s",
+            "x-ratelimit-remaining-tokens": "0",
+            "x-ratelimit-reset-tokens": "120ms",
+        })
+        assert parse_retry_after(headers) == 90.0
+
+        headers = httpx.Headers({
+            "x-ratelimit-remaining-requests": "5",
+            "x-ratelimit-reset-requests": "1s",
+        })
+        assert parse_retry_after(headers) is None
+
+
+class TestAdaptiveLimiter:
+    """AIMD并发控制测试"""
+
+    async def test_concurrency_bounded_by_limit(self):
+        """测试同时进行的调用数不超过当前并发上限"""
+        limiter = AdaptiveLimiter("test", initial=3, minimum=1, maximum=3)
+        active = 0
+        peak = 0
+
+        async def call():
+            nonlocal active, peak
+            await limiter.acquire()
+            try:
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+                limiter.on_success()
+            finally:
+                limiter.release()
+
+        await asyncio.gather(*(call() for _ in range(12)))
+
+        assert peak == 3
+        stats = limiter.get_stats()
+        assert stats["requests"] == stats["successes"] == 12
+        assert stats["in_flight"] == 0
+        assert stats["throughput_per_min"] == 12
+
+    async def test_additive_increase_multiplicative_decrease(self):
+        """测试成功时逐步增加并发上限，同一轮的多个429只减半一次"""
+        limiter = AdaptiveLimiter("test", initial=4, minimum=1, maximum=6)
+        # 每个成功调用增加 1/上限，约一轮（上限个调用）后上限+1
+        for _ in range(5):
+            limiter.on_success()
+        assert limiter.limit == 5
+
+        started_at = time.monotonic()
+        limiter.on_throttle(started_at, retry_after=0)
+        limiter.on_throttle(started_at, retry_after=0)
+        limiter.on_throttle(started_at, retry_after=0)
+
+        assert limiter.limit == 2
+        assert limiter.get_stats()["throttled"] == 3
+
+        # 减半之后发出的请求再次收到429才继续减小
+        limiter.on_throttle(time.monotonic(), retry_after=0)
+        assert limiter.limit == 1
+
+    async def test_throttle_pauses_new_requests(self):
+        """测试收到429后在Retry-After窗口内暂停该Key的所有新请求"""
+        limiter = AdaptiveLimiter("test", initial=4, minimum=1, maximum=4)
+        limiter.on_throttle(time.monotonic(), retry_after=0.1)
+
+        started = time.monotonic()
+        await limiter.acquire()
+        limiter.release()
+
+        assert time.monotonic() - started >= 0.09
+
+
+class TestProviderRateLimiter:
+    """限流器注册表与响应钩子测试"""
+
+    async def test_shared_per_provider_key_and_model(self):
+        """测试相同 (provider, api_key, model) 共享限流器，统计中不出现明文Key"""
+        registry = ProviderRateLimiter()
+        first = registry.get("openai", "sk-secret", "gpt-4o")
+
+        assert registry.get("openai", "sk-secret", "gpt-4o") is first
+        assert registry.get("openai", "sk-secret", "dall-e-3") is not first
+        assert registry.get("openai", "sk-other", "gpt-4o") is not first
+
+        stats = registry.get_stats()
+        assert len(stats) == 3
+        assert all("sk-" not in name for name in stats)
+        assert len(registry.get_stats("openai", "sk-secret")) == 2
+
+    async def test_response_hook_records_throttle_once(self):
+        """测试响应钩子记录SDK收到的429，异常退出时不重复计数"""
+        registry = ProviderRateLimiter()
+        limiter = registry.get("openai", "sk-test", "gpt-4o")
+        initial = limiter.limit
+        error = make_rate_limit_error({"Retry-After": "0"})
+
+        with pytest.raises(RateLimitError):
+            async with registry.limit("openai", "sk-test", "gpt-4o") as slot:
+                await observe_response(error.response)
+                raise error
+
+        assert slot.throttled
+        assert limiter.limit == initial // 2
+        assert limiter.get_stats()["throttled"] == 1
+        assert limiter.get_stats()["in_flight"] == 0
+
+        # 槽位之外的响应不影响任何限流器
+        await observe_response(httpx.Response(429))
+        assert limiter.get_stats()["throttled"] == 1
+
+
+class TestRetryWithBackoff:
+    """限流重试测试"""
+
+    async def test_only_retries_throttle_errors(self):
+        """测试非限流错误直接抛出，不重试"""
+        task = AsyncMock(side_effect=ValueError("bad request"))
+
+        with pytest.raises(ValueError):
+            await retry_with_backoff(task)
+
+        assert task.await_count == 1
+        assert not is_throttle_error(ValueError("bad request"))
+
+    async def test_retry_uses_retry_after(self):
+        """测试限流错误按服务端返回的Retry-After等待后重试"""
+        task = AsyncMock(side_effect=[make_rate_limit_error({"Retry-After": "7"}), "ok"])
+
+        with patch("src.utils.rate_limiter.asyncio.sleep", new=AsyncMock()) as sleep:
+            assert await retry_with_backoff(task) == "ok"
+
+        assert task.await_count == 2
+        sleep.assert_awaited_once_with(7.0)
@@ -0,0 +1,217 @@
+"""
+句子视频渲染缓存单元测试
+"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.sentence import Sentence
+from src.services.render_cache import SentenceRenderCache
+
+
+class FakeStorage:
+    """内存中的MinIO替身"""
+
+    def __init__(self):
+        self.objects = {}
+        self.touched = []
+
+    def put(self, object_key, etag="etag", size=100, age=timedelta(0), metadata=None):
+        self.objects[object_key] = {
+            "object_key": object_key,
+            "etag": etag,
+            "size": size,
+            "last_modified": datetime.now(timezone.utc) - age,
+            "metadata": metadata or {},
+        }
+
+    async def stat_file(self, object_key):
+        return self.objects.get(object_key)
+
+    async def touch_file(self, object_key):
+        self.touched.append(object_key)
+        self.objects[object_key]["last_modified"] = datetime.now(timezone.utc)
+        return True
+
+    async def upload_file_from_path(self, user_id, file_path, original_filename, object_key=None, metadata=None):
+        self.put(object_key, metadata={f"X-Amz-Meta-{k}": v for k, v in (metadata or {}).items()})
+        return {"object_key": object_key}
+
+    async def list_object_stats(self, prefix):
+        return [
+            {"object_key": obj["object_key"], "size": obj["size"], "last_modified": obj["last_modified"]}
+            for key, obj in self.objects.items()
+            if key.startswith(prefix)
+        ]
+
+    async def delete_file(self, object_key):
+        return self.objects.pop(object_key, None) is not None
+
+
+@pytest.fixture
+def storage():
+    storage = FakeStorage()
+    storage.put("uploads/image.jpg", etag="img-1")
+    storage.put("uploads/audio.mp3", etag="aud-1")
+    return storage
+
+
+@pytest.fixture
+def cache(storage):
+    cache = SentenceRenderCache(ttl_days=30, touch_interval_hours=24)
+    cache.storage_client = storage
+    return cache
+
+
+def _sentence(content="你好世界", image_url="uploads/image.jpg", audio_url="uploads/audio.mp3",
+              video_key=None, needs_regeneration=True):
+    return SimpleNamespace(
+        id="s1", content=content, image_url=image_url, audio_url=audio_url,
+        sentence_video_key=video_key, needs_regeneration=needs_regeneration,
+    )
+
+
+GEN_SETTING = {"resolution": "1440x1080", "fps": 30, "subtitle_style": {"font_size": 70}}
+
+
+class TestRenderCacheKey:
+    """缓存键计算测试"""
+
+    async def test_key_is_stable(self, cache):
+        """测试相同输入得到相同缓存键"""
+        first = await cache.compute_key(_sentence(), GEN_SETTING)
+        second = await cache.compute_key(_sentence(), dict(GEN_SETTING))
+
+        assert first == second
+        assert len(first) == 64
+
+    async def test_key_ignores_presigned_url(self, cache):
+        """测试预签名URL与对象键得到相同缓存键"""
+        by_key = await cache.compute_key(_sentence(), GEN_SETTING)
+        by_url = await cache.compute_key(
+            _sentence(image_url="http://localhost:9000/aicg-files/uploads/image.jpg?X-Amz-Signature=abc"),
+            GEN_SETTING
+        )
+
+        assert by_key == by_url
+
+    async def test_key_changes_with_inputs(self, cache, storage):
+        """测试素材、文本、渲染设置或纠错模型变化时缓存键变化"""
+        base = await cache.compute_key(_sentence(), GEN_SETTING)
+
+        assert await cache.compute_key(_sentence(content="别的文本"), GEN_SETTING) != base
+        assert await cache.compute_key(_sentence(), {**GEN_SETTING, "fps": 25}) != base
+        assert await cache.compute_key(
+            _sentence(), {**GEN_SETTING, "subtitle_style": {"font_size": 60}}
+        ) != base
+        assert await cache.compute_key(_sentence(), GEN_SETTING, correction_model="gpt") != base
+
+        storage.put("uploads/image.jpg", etag="img-2")
+        assert await cache.compute_key(_sentence(), GEN_SETTING) != base
+
+    async def test_key_ignores_chapter_settings(self, cache):
+        """测试配乐、变速等章节级设置不影响缓存键"""
+        base = await cache.compute_key(_sentence(), GEN_SETTING)
+
+        other = await cache.compute_key(_sentence(), {**GEN_SETTING, "bgm_volume": 0.5, "video_speed": 1.2})
+
+        assert other == base
+
+    async def test_missing_material_returns_none(self, cache):
+        """测试素材不存在时不使用缓存"""
+        assert await cache.compute_key(_sentence(audio_url="uploads/missing.mp3"), GEN_SETTING) is None
+
+
+class TestRenderCacheLookup:
+    """缓存读写与统计测试"""
+
+    async def test_store_then_lookup(self, cache, tmp_path):
+        """测试写入后命中并返回时长"""
+        cache_key = "ab" + "0" * 62
+
+        assert await cache.lookup(cache_key) is None
+
+        object_key = await cache.store(cache_key, tmp_path / "video.mp4", "user-1", 7)
+        result = await cache.lookup(cache_key)
+
+        assert object_key == f"render_cache/sentence_videos/ab/{cache_key}.mp4"
+        assert result == {"object_key": object_key, "duration": 7}
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+        assert cache.get_stats()["hit_rate"] == 0.5
+
+    async def test_lookup_touches_stale_object(self, cache, storage):
+        """测试命中较旧的对象时刷新访问时间"""
+        fresh_key = "aa" + "0" * 62
+        stale_key = "bb" + "0" * 62
+        storage.put(cache.object_key(fresh_key))
+        storage.put(cache.object_key(stale_key), age=timedelta(days=3))
+
+        await cache.lookup(fresh_key)
+        await cache.lookup(stale_key)
+
+        assert storage.touched == [cache.object_key(stale_key)]
+
+    async def test_lookup_sentences(self, cache, storage):
+        """测试批量查找: 结果与句子顺序对应, 被标记为重新生成的句子不复用缓存"""
+        new = _sentence()
+        marked = _sentence(video_key="render_cache/old.mp4", needs_regeneration=True)
+        missing = _sentence(image_url="uploads/missing.jpg")
+        cache_key = await cache.compute_key(new, GEN_SETTING)
+        storage.put(cache.object_key(cache_key), metadata={"X-Amz-Meta-Duration": "3"})
+
+        results = await cache.lookup_sentences([new, marked, missing], GEN_SETTING, concurrency=2)
+
+        assert results == [
+            (cache_key, {"object_key": cache.object_key(cache_key), "duration": 3}),
+            (cache_key, None),
+            (None, None),
+        ]
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 0
+
+
+class TestSentenceVideoCache:
+    """句子视频缓存有效性测试"""
+
+    def test_marked_sentence_cache_is_invalid(self):
+        """测试标记为需要重新生成的句子即使缓存键一致也不复用旧视频"""
+        sentence = Sentence()
+        sentence.save_video_cache("render_cache/a.mp4", 3, "key-1")
+
+        assert sentence.has_valid_cache("key-1")
+        assert not sentence.has_valid_cache("key-2")
+
+        sentence.mark_material_updated()
+        assert not sentence.has_valid_cache("key-1")
+
+
+class TestRenderCacheEviction:
+    """缓存淘汰测试"""
+
+    async def test_evict_expired(self, cache, storage):
+        """测试删除超过TTL的对象"""
+        storage.put(cache.object_key("aa" + "0" * 62), age=timedelta(days=31))
+        storage.put(cache.object_key("bb" + "0" * 62), age=timedelta(days=1))
+
+        result = await cache.evict()
+
+        assert result["deleted"] == 1
+        assert cache.object_key("bb" + "0" * 62) in storage.objects
+        assert "uploads/image.jpg" in storage.objects
+
+    async def test_evict_least_recently_used_over_size(self, storage):
+        """测试超过总大小上限时按最近访问时间淘汰"""
+        cache = SentenceRenderCache(ttl_days=30, max_bytes=250)
+        cache.storage_client = storage
+        for name, days in (("aa", 5), ("bb", 1), ("cc", 3)):
+            storage.put(cache.object_key(name + "0" * 62), size=100, age=timedelta(days=days))
+
+        result = await cache.evict()
+
+        assert result["deleted"] == 1
+        assert result["freed_bytes"] == 100
+        assert cache.object_key("aa" + "0" * 62) not in storage.objects
+        assert cache.get_stats()["evicted_objects"] == 1
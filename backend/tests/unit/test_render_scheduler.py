@@ -0,0 +1,73 @@
+"""
+渲染调度器单元测试
+"""
+
+import asyncio
+import sys
+
+from src.utils.render_scheduler import RenderScheduler
+
+
+class TestRenderScheduler:
+    """渲染调度器测试"""
+
+    def test_split_cores(self):
+        """测试按CPU核数拆分任务数和线程数"""
+        scheduler = RenderScheduler(cpu_count=32)
+
+        assert scheduler.threads_per_job == 2
+        assert scheduler.max_jobs == 16
+        assert scheduler.pipeline_concurrency == 32
+
+    def test_explicit_config(self):
+        """测试显式配置"""
+        scheduler = RenderScheduler(max_jobs=3, threads_per_job=8, cpu_count=32)
+
+        assert scheduler.max_jobs == 3
+        assert scheduler.threads_per_job == 8
+
+    def test_single_core(self):
+        """测试单核机器"""
+        scheduler = RenderScheduler(cpu_count=1)
+
+        assert scheduler.max_jobs == 1
+        assert scheduler.threads_per_job == 1
+
+    def test_apply_thread_limits(self):
+        """测试注入线程参数"""
+        scheduler = RenderScheduler(threads_per_job=4, cpu_count=16)
+        command = ["ffmpeg", "-y", "-i", "a.jpg", "-filter_complex", "[0:v]null[v]", "out.mp4"]
+
+        result = scheduler.apply_thread_limits(command)
+
+        assert result[:3] == ["ffmpeg", "-filter_complex_threads", "4"]
+        assert result[-3:] == ["-threads", "4", "out.mp4"]
+        # 原命令不被修改
+        assert "-threads" not in command
+
+    def test_apply_thread_limits_keeps_explicit(self):
+        """测试已指定 -threads 时不覆盖"""
+        scheduler = RenderScheduler(threads_per_job=4, cpu_count=16)
+        command = ["ffmpeg", "-i", "a.mp4", "-threads", "1", "out.mp4"]
+
+        assert scheduler.apply_thread_limits(command) == command
+
+    async def test_run_limits_concurrency_and_reports(self, monkeypatch):
+        """测试并发限制与耗时统计"""
+        scheduler = RenderScheduler(max_jobs=1, threads_per_job=1, cpu_count=1)
+        # 用Python进程模拟FFmpeg，跳过线程参数注入
+        monkeypatch.setattr(scheduler, "apply_thread_limits", lambda command: command)
+        command = [sys.executable, "-c", "import time; time.sleep(0.3)"]
+
+        results = await asyncio.gather(
+            scheduler.run(command, job_name="a"),
+            scheduler.run(command, job_name="b"),
+        )
+
+        assert all(r.success for r in results)
+        # 第二个任务必须等待第一个完成
+        assert max(r.queue_wait for r in results) >= 0.2
+        stats = scheduler.get_stats()
+        assert stats["jobs_total"] == 2
+        assert stats["jobs_failed"] == 0
+        assert stats["encode_time_total"] > 0
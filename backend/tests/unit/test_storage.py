@@ -2,14 +2,20 @@
 存储服务单元测试
 """
 
+import asyncio
+import hashlib
 import pytest
 import tempfile
 import os
+import time
 from pathlib import Path
 from unittest.mock import Mock, AsyncMock, patch
 from datetime import datetime, timedelta
 
-from src.utils.storage import MinIOStorage, StorageError
+from minio.deleteobjects import DeleteError
+from minio.error import S3Error
+
+from src.utils.storage import MinIOStorage, StorageError, content_length_from_headers
 from src.core.config import settings
 
 
@@ -410,6 +416,21 @@ class TestMinIOStorage:
         assert result is True
         mock_storage.client.copy_object.assert_called_once()
 
+    async def test_touch_file_keeps_metadata_and_content_type(self, storage_client):
+        """测试刷新对象时间时保留用户元数据和Content-Type"""
+        storage, mock_client = storage_client
+        mock_client.stat_object.return_value = Mock(
+            content_type="video/mp4",
+            metadata={"X-Amz-Meta-Duration": "7", "Content-Type": "video/mp4"},
+        )
+
+        assert await storage.touch_file("render_cache/ab/key.mp4") is True
+
+        metadata = mock_client.copy_object.call_args.kwargs["metadata"]
+        assert metadata["Content-Type"] == "video/mp4"
+        assert metadata["Duration"] == "7"
+        assert "touched_at" in metadata
+
 
 class TestStorageIntegration:
     """存储服务集成测试"""
@@ -484,5 +505,435 @@ class TestStorageIntegration:
         assert await storage.file_exists(object_key) is False
 
 
+class TestStorageThreadPool:
+    """存储线程池测试"""
+
+    @pytest.fixture
+    def storage(self):
+        """使用模拟MinIO客户端的存储实例"""
+        with patch('src.utils.storage.Minio') as mock_minio:
+            mock_client = Mock()
+            mock_minio.return_value = mock_client
+            storage = MinIOStorage(max_workers=4)
+            storage.client = mock_client
+            return storage
+
+    async def test_requests_do_not_block_event_loop(self, storage):
+        """测试同步MinIO调用在线程池中并发执行，不阻塞事件循环"""
+        def slow_stat(bucket_name, object_key):
+            time.sleep(0.2)
+            return Mock(size=1, etag="etag", last_modified=None, metadata={})
+
+        storage.client.stat_object.side_effect = slow_stat
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker_task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        results = await asyncio.gather(*[storage.stat_file(f"key-{i}") for i in range(4)])
+        elapsed = time.monotonic() - started
+        ticker_task.cancel()
+
+        assert all(result["etag"] == "etag" for result in results)
+        assert elapsed < 0.6
+        assert ticks > 10
+
+    async def test_latency_stats(self, storage):
+        """测试按操作统计耗时和失败次数"""
+        storage.client.get_object.return_value = Mock(read=Mock(return_value=b"content"))
+        storage.client.remove_object.side_effect = [None, S3Error(
+            "NoSuchKey", "missing", "key", "request-id", "host-id", Mock()
+        )]
+
+        assert await storage.download_file("a") == b"content"
+        assert await storage.delete_file("a") is True
+        assert await storage.delete_file("b") is False
+
+        stats = storage.get_latency_stats()
+        assert stats["download"]["count"] == 1
+        assert stats["delete"]["count"] == 2
+        assert stats["delete"]["errors"] == 1
+        assert stats["delete"]["max_ms"] >= stats["delete"]["avg_ms"]
+
+
+class TestStreamUpload:
+    """流式上传测试"""
+
+    @pytest.fixture
+    def storage(self):
+        """使用模拟MinIO客户端的存储实例，put_object 按分片读取数据"""
+        with patch('src.utils.storage.Minio') as mock_minio:
+            mock_client = Mock()
+            mock_minio.return_value = mock_client
+            storage = MinIOStorage(max_workers=4)
+            storage.client = mock_client
+
+        storage.uploaded = {}
+
+        def put_object(bucket_name, object_name, data, length, content_type, metadata, part_size):
+            parts = []
+            while True:
+                part = data.read(length if length >= 0 else 1024)
+                if not part:
+                    break
+                parts.append(part)
+                if length >= 0:
+                    break
+            storage.uploaded[object_name] = {"parts": parts, "length": length, "part_size": part_size}
+            return Mock(etag="etag")
+
+        mock_client.put_object.side_effect = put_object
+        mock_client.bucket_exists.return_value = True
+        mock_client.presigned_get_object.return_value = "http://minio/url"
+        return storage
+
+    @staticmethod
+    async def _chunks(count, size=300, fail=False):
+        for i in range(count):
+            yield bytes([i % 256]) * size
+        if fail:
+            raise ConnectionError("上游连接中断")
+
+    async def test_unknown_length_multipart(self, storage):
+        """测试长度未知时分片上传，并在上传过程中计算哈希"""
+        expected = b"".join([bytes([i]) * 300 for i in range(10)])
+
+        result = await storage.upload_stream("user-1", self._chunks(10), "a.mp4", "video/mp4")
+
+        uploaded = storage.uploaded[result["object_key"]]
+        assert uploaded["length"] == -1
+        assert b"".join(uploaded["parts"]) == expected
+        assert len(uploaded["parts"]) == 3
+        assert result["size"] == len(expected)
+        assert result["md5"] == hashlib.md5(expected).hexdigest()
+        assert result["sha256"] == hashlib.sha256(expected).hexdigest()
+
+    async def test_known_length(self, storage):
+        """测试长度已知时按该长度上传"""
+        result = await storage.upload_stream("user-1", self._chunks(4), "a.jpg", "image/jpeg", length=1200)
+
+        uploaded = storage.uploaded[result["object_key"]]
+        assert uploaded["length"] == 1200
+        assert len(uploaded["parts"][0]) == 1200
+        assert result["size"] == 1200
+
+    async def test_stream_longer_than_length(self, storage):
+        """测试上游数据超过声明的长度时上传失败，不保留被截断的对象"""
+        storage.client.remove_object.side_effect = lambda bucket_name, object_name: storage.uploaded.pop(object_name)
+
+        # 上传线程读满声明的长度后已完成上传
+        with pytest.raises(StorageError, match="超过声明的长度"):
+            await storage.upload_stream("user-1", self._chunks(40, size=1000), "a.jpg", "image/jpeg", length=5000)
+        # 超出的数据块跨过声明的长度，上传线程仍在等待数据
+        with pytest.raises(StorageError, match="超过声明的长度"):
+            await storage.upload_stream("user-1", self._chunks(4), "b.jpg", "image/jpeg", length=1000)
+
+        assert storage.uploaded == {}
+        assert storage.client.remove_object.call_count == 1
+
+    async def test_upstream_error_aborts_upload(self, storage):
+        """测试上游读取失败时中止上传"""
+        with pytest.raises(StorageError):
+            await storage.upload_stream("user-1", self._chunks(3, fail=True), "a.mp4")
+
+        assert storage.uploaded == {}
+        assert storage.get_latency_stats()["upload"]["errors"] == 1
+
+    def test_content_length_from_headers(self):
+        """测试压缩响应不使用 Content-Length"""
+        assert content_length_from_headers({"Content-Length": "42"}) == 42
+        assert content_length_from_headers({}) is None
+        assert content_length_from_headers({"Content-Length": "42", "Content-Encoding": "gzip"}) is None
+
+
+class TestBucketProvisioning:
+    """存储桶检查测试"""
+
+    @pytest.fixture
+    def storage(self):
+        """使用模拟MinIO客户端的存储实例"""
+        with patch('src.utils.storage.Minio') as mock_minio:
+            mock_client = Mock()
+            mock_minio.return_value = mock_client
+            storage = MinIOStorage(max_workers=4)
+            storage.client = mock_client
+
+        mock_client.bucket_exists.return_value = True
+        mock_client.put_object.return_value = Mock(etag="etag")
+        mock_client.presigned_get_object.return_value = "http://minio/url"
+        return storage
+
+    @staticmethod
+    def _upload(index):
+        from fastapi import UploadFile
+        import io
+        return UploadFile(filename=f"{index}.bin", file=io.BytesIO(b"data"))
+
+    async def test_bucket_checked_once(self, storage):
+        """测试并发上传时只检查一次存储桶"""
+        await asyncio.gather(*[
+            storage.upload_file("user-1", self._upload(i)) for i in range(50)
+        ])
+
+        assert storage.client.bucket_exists.call_count == 1
+        assert storage.client.put_object.call_count == 50
+
+    async def test_no_such_bucket_recreates_and_retries(self, storage):
+        """测试存储桶被删除后重新创建并重试上传"""
+        await storage.ensure_bucket_exists()
+        storage.client.bucket_exists.return_value = False
+        storage.client.put_object.side_effect = [
+            S3Error(Mock(), "NoSuchBucket", "missing", "bucket", "request-id", "host-id"),
+            Mock(etag="etag"),
+        ]
+
+        result = await storage.upload_file("user-1", self._upload(0))
+
+        assert result["etag"] == "etag"
+        storage.client.make_bucket.assert_called_once()
+        assert storage.client.put_object.call_count == 2
+
+
+class FakeMinioClient:
+    """内存中的MinIO客户端替身，支持区间读取和 If-Match"""
+
+    def __init__(self):
+        self.objects = {}
+        self.range_requests = []
+        self.put_calls = []
+        self.delete_requests = []
+
+    def bucket_exists(self, bucket_name):
+        return True
+
+    def stat_object(self, bucket_name, object_name):
+        content = self.objects[object_name]
+        return Mock(size=len(content), etag=f"etag-{len(content)}", last_modified=None, metadata={})
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0, request_headers=None):
+        content = self.objects[object_name]
+        if request_headers and request_headers.get("If-Match") != f"etag-{len(content)}":
+            raise S3Error(Mock(), "PreconditionFailed", "etag changed", object_name, "request-id", "host-id")
+        self.range_requests.append((offset, length))
+        data = content[offset:offset + length] if length else content[offset:]
+        return Mock(
+            stream=lambda amt: (data[i:i + amt] for i in range(0, len(data), amt)),
+            headers={"ETag": f'"etag-{len(content)}"', "Content-Length": str(len(data))},
+            close=Mock(), release_conn=Mock()
+        )
+
+    def put_object(self, bucket_name, object_name, data, length, metadata=None,
+                   part_size=0, num_parallel_uploads=3, **kwargs):
+        self.put_calls.append({"part_size": part_size, "num_parallel_uploads": num_parallel_uploads})
+        self.objects[object_name] = data.read(length)
+        return Mock(etag="etag")
+
+    def presigned_get_object(self, bucket_name, object_name, **kwargs):
+        return f"http://minio/{object_name}"
+
+    def remove_objects(self, bucket_name, delete_object_list):
+        """惰性批量删除：迭代时才执行，记录每个请求的对象数，locked/ 下的对象删除失败"""
+        def run():
+            names = [obj.name for obj in delete_object_list]
+            self.delete_requests.append(len(names))
+            for name in names:
+                if name.startswith("locked/"):
+                    yield DeleteError("AccessDenied", "Access Denied", name, None)
+                else:
+                    self.objects.pop(name, None)
+        return run()
+
+
+class TestLargeObjectTransfer:
+    """大文件分片上传与区间并发下载测试"""
+
+    @pytest.fixture
+    def storage(self):
+        """使用内存MinIO替身的存储实例，阈值和分片大小调小以便测试"""
+        with patch('src.utils.storage.Minio'):
+            storage = MinIOStorage(max_workers=8)
+        storage.client = FakeMinioClient()
+        storage.client.stat_object = Mock(wraps=storage.client.stat_object)
+        with patch.object(settings, "STORAGE_MULTIPART_THRESHOLD", 1000), \
+                patch.object(settings, "STORAGE_MULTIPART_PART_SIZE", 300), \
+                patch.object(settings, "STORAGE_TRANSFER_CONCURRENCY", 3):
+            yield storage
+
+    async def test_ranged_download(self, storage, tmp_path):
+        """测试大文件按区间下载后内容完整"""
+        content = os.urandom(2000)
+        storage.client.objects["movies/a.mp4"] = content
+
+        etag = await storage.download_file_to_path("movies/a.mp4", str(tmp_path / "a.mp4"))
+
+        assert etag == "etag-2000"
+        assert (tmp_path / "a.mp4").read_bytes() == content
+        # 第一个区间直接使用首个GET的响应
+        assert sorted(storage.client.range_requests) == [
+            (0, 0), (300, 300), (600, 300), (900, 300), (1200, 300), (1500, 300), (1800, 200)
+        ]
+        storage.client.stat_object.assert_not_called()
+
+    async def test_ranged_download_with_known_size(self, storage, tmp_path):
+        """测试调用方提供大小和ETag时直接按区间下载"""
+        content = os.urandom(2000)
+        storage.client.objects["movies/a.mp4"] = content
+
+        etag = await storage.download_file_to_path(
+            "movies/a.mp4", str(tmp_path / "a.mp4"), size=2000, etag="etag-2000"
+        )
+
+        assert etag == "etag-2000"
+        assert (tmp_path / "a.mp4").read_bytes() == content
+        assert sorted(storage.client.range_requests)[0] == (0, 300)
+        assert len(storage.client.range_requests) == 7
+
+    async def test_small_file_single_request(self, storage, tmp_path):
+        """测试小文件单次下载，不额外请求对象元信息"""
+        storage.client.objects["a.jpg"] = b"small"
+
+        etag = await storage.download_file_to_path("a.jpg", str(tmp_path / "a.jpg"))
+
+        assert etag == "etag-5"
+        assert (tmp_path / "a.jpg").read_bytes() == b"small"
+        assert storage.client.range_requests == [(0, 0)]
+        storage.client.stat_object.assert_not_called()
+
+    async def test_without_pwrite_single_request(self, storage, tmp_path):
+        """测试没有 os.pwrite 的平台（Windows）大文件也单次下载"""
+        content = os.urandom(2000)
+        storage.client.objects["movies/a.mp4"] = content
+
+        with patch('src.utils.storage.RANGED_DOWNLOAD_SUPPORTED', False):
+            await storage.download_file_to_path(
+                "movies/a.mp4", str(tmp_path / "a.mp4"), size=2000, etag="etag-2000"
+            )
+
+        assert (tmp_path / "a.mp4").read_bytes() == content
+        assert storage.client.range_requests == [(0, 0)]
+
+    async def test_failed_range_removes_file(self, storage, tmp_path):
+        """测试区间下载失败时删除不完整的文件"""
+        storage.client.objects["movies/a.mp4"] = os.urandom(2000)
+        original_get = storage.client.get_object
+
+        def flaky_get(bucket_name, object_name, offset=0, length=0, request_headers=None):
+            if offset == 900:
+                raise S3Error(Mock(), "InternalError", "boom", object_name, "request-id", "host-id")
+            return original_get(bucket_name, object_name, offset, length, request_headers)
+
+        storage.client.get_object = flaky_get
+
+        with pytest.raises(StorageError):
+            await storage.download_file_to_path("movies/a.mp4", str(tmp_path / "a.mp4"))
+        assert not (tmp_path / "a.mp4").exists()
+
+    async def test_multipart_upload(self, storage, tmp_path):
+        """测试大文件使用配置的分片大小和并发数上传"""
+        path = tmp_path / "movie.mp4"
+        path.write_bytes(os.urandom(2000))
+
+        await storage.upload_file_from_path("user-1", str(path), "movie.mp4", object_key="movies/b.mp4")
+
+        assert storage.client.objects["movies/b.mp4"] == path.read_bytes()
+        assert storage.client.put_calls[-1] == {"part_size": 300, "num_parallel_uploads": 3}
+
+
+class TestListObjectsPage:
+    """分页列出对象测试"""
+
+    @pytest.fixture
+    def storage(self):
+        """模拟按对象键排序、支持 start_after 的 list_objects"""
+        with patch('src.utils.storage.Minio'):
+            storage = MinIOStorage(max_workers=4)
+        storage.client = Mock()
+        keys = sorted(f"uploads/u1/{i:04d}.jpg" for i in range(2500))
+
+        def list_objects(bucket_name, prefix, recursive, start_after=None):
+            for key in keys:
+                if key.startswith(prefix) and (start_after is None or key > start_after):
+                    yield Mock(object_name=key, size=10, last_modified=None, etag="etag")
+
+        storage.client.list_objects.side_effect = list_objects
+        return storage
+
+    async def test_pages_with_continuation_token(self, storage):
+        """测试按续页令牌遍历全部对象，且默认不签名"""
+        token = None
+        pages = []
+        while True:
+            page = await storage.list_objects_page("uploads/u1/", max_keys=1000, continuation_token=token)
+            pages.append(page["files"])
+            token = page["next_token"]
+            if not token:
+                break
+
+        assert [len(files) for files in pages] == [1000, 1000, 500]
+        assert len({f["object_key"] for files in pages for f in files}) == 2500
+        assert "url" not in pages[0][0]
+        storage.client.presigned_get_object.assert_not_called()
+
+    async def test_sign_urls(self, storage):
+        """测试按需为当前页签名"""
+        storage.client.presigned_get_object.return_value = "http://minio/url"
+
+        page = await storage.list_objects_page("uploads/u1/", max_keys=5, sign_urls=True)
+
+        assert [f["url"] for f in page["files"]] == ["http://minio/url"] * 5
+
+    async def test_invalid_token(self, storage):
+        """测试无效的续页令牌"""
+        with pytest.raises(StorageError):
+            await storage.list_objects_page("uploads/u1/", continuation_token="%%%")
+
+
+class TestBulkDelete:
+    """多对象批量删除测试"""
+
+    @pytest.fixture
+    def storage(self):
+        """使用内存MinIO替身的存储实例"""
+        with patch('src.utils.storage.Minio'):
+            storage = MinIOStorage()
+        storage.client = FakeMinioClient()
+        return storage
+
+    async def test_batches_of_1000(self, storage):
+        """测试按每批1000个对象拆分请求，并使涉及用户的用量计数失效"""
+        keys = [f"uploads/u1/{i}.png" for i in range(2500)]
+        storage.client.objects = {key: b"x" for key in keys}
+
+        with patch('src.utils.storage.storage_usage') as usage:
+            usage.invalidate = AsyncMock()
+            result = await storage.delete_files(keys + keys[:10])
+
+        assert sorted(storage.client.delete_requests) == [500, 1000, 1000]
+        assert len(result["deleted"]) == 2500
+        assert result["failed"] == []
+        assert storage.client.objects == {}
+        usage.invalidate.assert_awaited_once_with("u1")
+
+    async def test_partial_failure(self, storage):
+        """测试单个对象删除失败时只报告该对象"""
+        with patch('src.utils.storage.storage_usage') as usage:
+            usage.invalidate = AsyncMock()
+            result = await storage.delete_files(["uploads/u1/a.png", "locked/b.png"])
+
+        assert result == {"deleted": ["uploads/u1/a.png"], "failed": ["locked/b.png"]}
+
+    async def test_empty(self, storage):
+        """测试空列表不发出请求"""
+        result = await storage.delete_files([])
+
+        assert result == {"deleted": [], "failed": []}
+        assert storage.client.delete_requests == []
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
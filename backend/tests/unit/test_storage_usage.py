@@ -0,0 +1,123 @@
+"""
+用户存储用量计数器单元测试
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.utils.storage_usage import StorageUsageCounter, usage_owner
+
+
+class FakeRedis:
+    """内存中的Redis替身（只实现计数器用到的命令）"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    async def eval(self, script, numkeys, key, size, files, ext):
+        if key not in self.hashes:
+            return 0
+        data = self.hashes[key]
+        data["size"] = str(int(data.get("size", 0)) + int(size))
+        data["files"] = str(int(data.get("files", 0)) + int(files))
+        if ext:
+            data[f"ext:{ext}"] = str(int(data.get(f"ext:{ext}", 0)) + int(files))
+        return 1
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """依次执行的事务替身"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def delete(self, key):
+        self.commands.append(lambda: self.redis.hashes.pop(key, None))
+
+    def hset(self, key, mapping):
+        self.commands.append(lambda: self.redis.hashes.setdefault(key, {}).update(
+            {field: str(value) for field, value in mapping.items()}
+        ))
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        for command in self.commands:
+            command()
+
+
+class FakeStorage:
+    """按页返回对象的存储替身"""
+
+    def __init__(self, files):
+        self.files = files
+        self.pages = 0
+
+    async def list_objects_page(self, prefix, max_keys=1000, continuation_token=None):
+        self.pages += 1
+        start = int(continuation_token or 0)
+        end = start + max_keys
+        return {
+            "files": self.files[start:end],
+            "next_token": str(end) if end < len(self.files) else None,
+        }
+
+
+@pytest.fixture
+def counter():
+    counter = StorageUsageCounter()
+    fake_redis = FakeRedis()
+    with patch.object(counter, "_get_client", return_value=fake_redis):
+        yield counter
+
+
+class TestStorageUsageCounter:
+    """存储用量计数器测试"""
+
+    def test_usage_owner(self):
+        """测试只统计用户上传目录下的对象"""
+        assert usage_owner("uploads/u1/2024/01/01/a.jpg") == "u1"
+        assert usage_owner("render_cache/videos/a.mp4") is None
+        assert usage_owner("uploads/a.jpg") is None
+
+    async def test_rebuild_then_increment(self, counter):
+        """测试首次查询时分页扫描重建，之后按上传和删除增量更新"""
+        storage = FakeStorage([
+            {"object_key": f"uploads/u1/{i}.jpg", "size": 100} for i in range(2500)
+        ])
+
+        usage = await counter.get_or_rebuild("u1", storage)
+        assert usage == {"files": 2500, "size": 250000, "file_types": {"jpg": 2500}}
+        assert storage.pages == 3
+
+        await counter.record_upload("uploads/u1/b.mp3", 50)
+        await counter.record_upload("uploads/u1/0.jpg", 300, replaced_size=100)
+        await counter.record_delete("uploads/u1/1.jpg", 100)
+
+        usage = await counter.get_or_rebuild("u1", storage)
+        assert usage == {"files": 2500, "size": 250150, "file_types": {"jpg": 2499, "mp3": 1}}
+        assert storage.pages == 3
+
+    async def test_increment_without_counter_ignored(self, counter):
+        """测试计数不存在时不做增量更新，避免得到不完整的用量"""
+        await counter.record_upload("uploads/u2/a.jpg", 100)
+
+        assert await counter.get("u2") is None
@@ -0,0 +1,166 @@
+"""
+字幕服务单元测试
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.services.subtitle_service import (
+    SUBTITLE_TIMING_ALIGN,
+    SUBTITLE_TIMING_ASR,
+    SubtitleService,
+)
+
+ALIGNED_SEGMENTS = [{
+    "id": 1,
+    "start": 0.1,
+    "end": 1.4,
+    "text": "你好，世界。",
+    "words": [
+        {"word": "你", "start": 0.1, "end": 0.3},
+        {"word": "好，", "start": 0.3, "end": 0.6},
+        {"word": "世", "start": 0.8, "end": 1.0},
+        {"word": "界。", "start": 1.0, "end": 1.4},
+    ],
+}]
+
+RECOGNIZED_SEGMENTS = [{"id": 1, "start": 0.0, "end": 1.5, "text": "你好世介", "words": []}]
+
+
+@pytest.fixture
+def mock_transcription():
+    """模拟Whisper识别池"""
+    with patch("src.services.subtitle_service.transcription_service") as mock_service:
+        mock_service.align_async = AsyncMock(return_value=ALIGNED_SEGMENTS)
+        mock_service.transcribe_async = AsyncMock(return_value=(RECOGNIZED_SEGMENTS, ""))
+        yield mock_service
+
+
+class TestSubtitleTiming:
+    """字幕时间轴生成方式测试"""
+
+    async def test_asr_mode(self, mock_transcription):
+        """测试默认使用完整识别"""
+        service = SubtitleService()
+
+        result = await service.generate_subtitle_timeline_async("audio.mp3", "你好，世界。", duration=1.5)
+
+        assert result == {"segments": RECOGNIZED_SEGMENTS, "duration": 1.5, "aligned": False}
+        mock_transcription.align_async.assert_not_called()
+
+    async def test_align_mode(self, mock_transcription):
+        """测试对齐模式直接使用原文时间轴，不做识别"""
+        service = SubtitleService()
+
+        result = await service.generate_subtitle_timeline_async(
+            "audio.mp3", "你好，世界。", duration=1.5, timing=SUBTITLE_TIMING_ALIGN
+        )
+
+        assert result["aligned"] is True
+        assert result["segments"] == ALIGNED_SEGMENTS
+        mock_transcription.align_async.assert_awaited_once_with("audio.mp3", "你好，世界。")
+        mock_transcription.transcribe_async.assert_not_called()
+
+    async def test_align_failure_falls_back_to_asr(self, mock_transcription):
+        """测试对齐失败（如音频过长）时回退到完整识别"""
+        mock_transcription.align_async.side_effect = ValueError("音频超过 30 秒")
+        service = SubtitleService()
+
+        result = await service.generate_subtitle_timeline_async(
+            "audio.mp3", "你好，世界。", duration=1.5, timing=SUBTITLE_TIMING_ALIGN
+        )
+
+        assert result["aligned"] is False
+        assert result["segments"] == RECOGNIZED_SEGMENTS
+
+    def test_aligned_words_split_at_punctuation(self):
+        """测试对齐得到的词级时间轴按标点切分字幕"""
+        service = SubtitleService()
+
+        events = service.build_subtitle_events({"segments": ALIGNED_SEGMENTS, "duration": 1.5})
+
+        assert [event["lines"] for event in events] == [["你好"], ["世界"]]
+        assert events[1]["start"] == 0.8
+        assert events[1]["end"] == 1.4
+
+    def test_needs_llm_correction(self):
+        """测试对齐模式不需要LLM纠错"""
+        assert SubtitleService.needs_llm_correction({}) is True
+        assert SubtitleService.needs_llm_correction({"subtitle_timing": SUBTITLE_TIMING_ASR}) is True
+        assert SubtitleService.needs_llm_correction({"subtitle_timing": SUBTITLE_TIMING_ALIGN}) is False
+
+
+class TestAssRenderer:
+    """ASS/libass 字幕渲染测试"""
+
+    GEN_SETTING = {
+        "resolution": "1080x1920",
+        "subtitle_renderer": "ass",
+        "subtitle_style": {"font": "Arial", "font_size": 60, "color": "#FFCC00"},
+    }
+
+    def test_to_ass_color(self):
+        """测试颜色转换为 &HAABBGGRR（字节顺序反转，alpha 为透明度）"""
+        assert SubtitleService._to_ass_color("white") == "&H00FFFFFF"
+        assert SubtitleService._to_ass_color("#FFCC00") == "&H0000CCFF"
+        assert SubtitleService._to_ass_color("0x102030") == "&H00302010"
+        assert SubtitleService._to_ass_color("black", 0.65) == "&H59000000"
+        assert SubtitleService._to_ass_color("black", 0.0) == "&HFF000000"
+        # 无法识别的颜色使用白色，不透明度超出范围时截断
+        assert SubtitleService._to_ass_color("not-a-color", 2) == "&H00FFFFFF"
+
+    def test_format_ass_time(self):
+        """测试时间格式化为 H:MM:SS.cc 并四舍五入到厘秒"""
+        assert SubtitleService._format_ass_time(0) == "0:00:00.00"
+        assert SubtitleService._format_ass_time(1.234) == "0:00:01.23"
+        assert SubtitleService._format_ass_time(1.235001) == "0:00:01.24"
+        assert SubtitleService._format_ass_time(59.999) == "0:01:00.00"
+        assert SubtitleService._format_ass_time(3723.5) == "1:02:03.50"
+        assert SubtitleService._format_ass_time(-1) == "0:00:00.00"
+
+    def test_dialogue_lines(self):
+        """测试每行字幕生成底框和文字两层 Dialogue，并使用配置的字体"""
+        service = SubtitleService()
+
+        content = service.build_ass_content({"segments": ALIGNED_SEGMENTS, "duration": 1.5}, self.GEN_SETTING)
+        dialogues = [line for line in content.splitlines() if line.startswith("Dialogue:")]
+
+        assert "Style: Text,Arial,60,&H0000CCFF," in content
+        assert "PlayResX: 1080" in content
+        # 竖屏字幕在高度的70%处，水平居中
+        assert dialogues == [
+            "Dialogue: 0,0:00:00.10,0:00:00.60,Box,,0,0,0,,{\\pos(540,1344)}你好",
+            "Dialogue: 1,0:00:00.10,0:00:00.60,Text,,0,0,0,,{\\pos(540,1344)}你好",
+            "Dialogue: 0,0:00:00.80,0:00:01.40,Box,,0,0,0,,{\\pos(540,1344)}世界",
+            "Dialogue: 1,0:00:00.80,0:00:01.40,Text,,0,0,0,,{\\pos(540,1344)}世界",
+        ]
+
+    def test_escapes_override_tags_and_newlines(self):
+        """测试移除会被解析为覆盖标签的 {} 和反斜杠，换行替换为空格"""
+        service = SubtitleService()
+        events = [{"lines": ["{\\b1}粗体\n换行", "第二行"], "start": 0.0, "end": 1.0}]
+
+        with patch.object(service, "build_subtitle_events", return_value=events):
+            content = service.build_ass_content({}, self.GEN_SETTING)
+
+        dialogues = [line for line in content.splitlines() if line.startswith("Dialogue:")]
+        assert len(dialogues) == 4
+        assert dialogues[1].endswith("}b1粗体 换行")
+        assert dialogues[3].endswith("}第二行")
+        # 双行字幕分别位于基准位置上下
+        assert "\\pos(540,1308)" in dialogues[1]
+        assert "\\pos(540,1380)" in dialogues[3]
+
+    def test_create_ass_subtitle_filter(self, tmp_path):
+        """测试写入ASS文件并返回单个 ass 滤镜"""
+        service = SubtitleService()
+        subtitle_data = {"segments": ALIGNED_SEGMENTS, "duration": 1.5}
+
+        subtitle_filter = service.build_subtitle_filter(subtitle_data, self.GEN_SETTING, tmp_path)
+
+        ass_path = tmp_path / "subtitles.ass"
+        assert subtitle_filter.startswith("ass=filename='")
+        assert "subtitles.ass'" in subtitle_filter
+        assert ass_path.read_text(encoding="utf-8").count("Dialogue:") == 4
+        assert service.create_ass_subtitle_filter({"segments": []}, self.GEN_SETTING, tmp_path / "empty.ass") == ""
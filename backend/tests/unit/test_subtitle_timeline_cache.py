@@ -0,0 +1,149 @@
+"""
+字幕时间轴缓存单元测试
+"""
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.services.subtitle_timeline_cache import SubtitleTimelineCache
+from src.services.video_composition_service import VideoCompositionService
+
+
+class FakeStorage:
+    """内存中的MinIO替身"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put(self, object_key, content=b"", etag="etag", age=timedelta(0)):
+        self.objects[object_key] = {
+            "object_key": object_key,
+            "content": content,
+            "etag": etag,
+            "size": len(content),
+            "last_modified": datetime.now(timezone.utc) - age,
+        }
+
+    async def stat_file(self, object_key):
+        return self.objects.get(object_key)
+
+    async def download_file(self, object_key):
+        return self.objects[object_key]["content"]
+
+    async def upload_file(self, user_id, file, object_key=None, metadata=None):
+        self.put(object_key, file.file.read())
+        return {"object_key": object_key}
+
+    async def touch_file(self, object_key):
+        return True
+
+    async def list_object_stats(self, prefix):
+        return [obj for key, obj in self.objects.items() if key.startswith(prefix)]
+
+    async def delete_file(self, object_key):
+        return self.objects.pop(object_key, None) is not None
+
+
+SUBTITLE_DATA = {
+    "segments": [{"id": 1, "start": 0.0, "end": 1.5, "text": "你好", "words": []}],
+    "duration": 1.5,
+}
+
+
+@pytest.fixture
+def storage():
+    storage = FakeStorage()
+    storage.put("uploads/audio.mp3", b"audio", etag="aud-1")
+    return storage
+
+
+@pytest.fixture
+def cache(storage):
+    cache = SubtitleTimelineCache()
+    cache.storage_client = storage
+    return cache
+
+
+class TestSubtitleTimelineCache:
+    """字幕时间轴缓存测试"""
+
+    async def test_key_depends_on_audio_text_and_mode(self, cache, storage):
+        """测试缓存键随音频、文本、生成方式和纠错模型变化"""
+        base = await cache.compute_key("uploads/audio.mp3", "你好", "asr")
+
+        assert base == await cache.compute_key("uploads/audio.mp3", "你好", "asr")
+        assert base != await cache.compute_key("uploads/audio.mp3", "您好", "asr")
+        assert base != await cache.compute_key("uploads/audio.mp3", "你好", "align")
+        assert base != await cache.compute_key("uploads/audio.mp3", "你好", "asr", "gpt-4o-mini")
+
+        storage.put("uploads/audio.mp3", b"audio2", etag="aud-2")
+        assert base != await cache.compute_key("uploads/audio.mp3", "你好", "asr")
+
+    async def test_put_then_get(self, cache, storage):
+        """测试写入紧凑JSON后读取"""
+        cache_key = await cache.compute_key("uploads/audio.mp3", "你好", "asr")
+
+        assert await cache.get(cache_key) is None
+
+        object_key = await cache.put(cache_key, SUBTITLE_DATA, "user-1")
+
+        assert b" " not in storage.objects[object_key]["content"]
+        assert await cache.get(cache_key) == SUBTITLE_DATA
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+
+    async def test_missing_audio(self, cache):
+        """测试音频不存在时不使用缓存"""
+        assert await cache.compute_key("uploads/missing.mp3", "你好", "asr") is None
+
+    async def test_evict_expired(self, cache, storage):
+        """测试只淘汰超过TTL的时间轴"""
+        storage.put(cache.object_key("aa" + "0" * 62), b"{}", age=timedelta(days=31))
+        storage.put(cache.object_key("bb" + "0" * 62), b"{}", age=timedelta(days=1))
+
+        result = await cache.evict()
+
+        assert result["deleted"] == 1
+        assert "uploads/audio.mp3" in storage.objects
+
+
+class TestCompositionTimelineReuse:
+    """句子合成复用字幕时间轴测试"""
+
+    @pytest.fixture
+    def sentence(self):
+        return SimpleNamespace(id="s1", content="你好", audio_url="uploads/audio.mp3")
+
+    async def test_reuses_cached_timeline(self, cache, sentence):
+        """测试时间轴已缓存时不再识别和纠错"""
+        cache_key = await cache.compute_key("uploads/audio.mp3", "你好", "asr")
+        await cache.put(cache_key, SUBTITLE_DATA, "user-1")
+
+        with patch("src.services.video_composition_service.subtitle_timeline_cache", cache), \
+                patch("src.services.video_composition_service.subtitle_service") as mock_subtitle:
+            result = await VideoCompositionService()._get_subtitle_timeline(
+                sentence, Path("audio.mp3"), 1.5, 0, {}, user_id="user-1"
+            )
+
+        assert result["segments"] == SUBTITLE_DATA["segments"]
+        mock_subtitle.generate_subtitle_timeline_async.assert_not_called()
+
+    async def test_failed_correction_not_cached(self, cache, sentence):
+        """测试LLM纠错失败时不缓存未纠正的时间轴"""
+        with patch("src.services.video_composition_service.subtitle_timeline_cache", cache), \
+                patch("src.services.video_composition_service.subtitle_service") as mock_subtitle:
+            mock_subtitle.generate_subtitle_timeline_async = AsyncMock(
+                return_value={**SUBTITLE_DATA, "aligned": False}
+            )
+            mock_subtitle.correct_subtitle_with_llm = AsyncMock(
+                side_effect=lambda subtitle_data, **kwargs: subtitle_data
+            )
+            await VideoCompositionService()._get_subtitle_timeline(
+                sentence, Path("audio.mp3"), 1.5, 0, {}, api_key=object(), user_id="user-1"
+            )
+
+        assert cache.get_stats()["stores"] == 0